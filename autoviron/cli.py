@@ -1,24 +1,76 @@
+import os
+import json
 import typer
 from pathlib import Path
 from typing import Optional, List
 from autoviron.ux.console import console, print_welcome, log_info, log_success, log_error, log_warning, print_step
 from autoviron.core.env_manager import EnvManager, EnvironmentType
 from autoviron.core.detector import detect_project_type
-from autoviron.core.deps import detect_missing_imports
-from autoviron.doctor.diagnostics import check_env_health
+from autoviron.core.deps import detect_missing_imports, read_requirements
 from autoviron.shell.hooks import generate_bash_hook, generate_zsh_hook, update_vscode_settings
 from autoviron.core.execution import self_healing_execute
 
 app = typer.Typer(help="AutoViron - Universal Python Environment Launcher", no_args_is_help=True)
 
+@app.callback()
+def output_options(
+    output: Optional[str] = typer.Option(None, "--output", "-o", help="auto, rich, plain or json (NDJSON events)"),
+    events: Optional[str] = typer.Option(None, "--events", help="Also write NDJSON events to a file, fd:N or - (stdout)"),
+    quiet: Optional[bool] = typer.Option(None, "--quiet/--no-quiet", "-q", help="Only show warnings, errors and command output"),
+    verbose: Optional[bool] = typer.Option(None, "--verbose/--no-verbose", "-v", help="Also show debug messages and phase timings"),
+):
+    """AutoViron - Universal Python Environment Launcher"""
+    from autoviron.core.config import get_config
+    from autoviron.ux import events as event_bus
+    config = get_config(Path.cwd())
+    try:
+        event_bus.configure(output, events,
+                            quiet=bool(config.get("quiet")) if quiet is None else quiet,
+                            verbose=bool(config.get("verbose")) if verbose is None else verbose)
+    except (ValueError, OSError) as e:
+        raise typer.BadParameter(str(e))
+
 @app.command()
 def run(
-    cmd: List[str] = typer.Argument(..., help="Command to run in the virtual environment"),
-    force_recreate: bool = typer.Option(False, "--force", "-f", help="Force recreate environment")
+    cmd: Optional[List[str]] = typer.Argument(None, help="Command to run in the virtual environment"),
+    force_recreate: bool = typer.Option(False, "--force", "-f", help="Force recreate environment"),
+    exec_mode: Optional[bool] = typer.Option(None, "--exec/--no-exec", help="Exec straight into the interpreter when the project is warm"),
+    fork_server: Optional[bool] = typer.Option(None, "--fork-server/--no-fork-server", help="Fork attempts from a pre-warmed interpreter"),
+    importtime: bool = typer.Option(False, "--importtime", help="Profile the program's imports and compare with the last profile"),
+    importtime_json: Optional[Path] = typer.Option(None, "--importtime-json", help="Also save the import tree to this JSON file"),
+    importtime_baseline: Optional[Path] = typer.Option(None, "--importtime-baseline", help="Compare against this saved import tree instead"),
+    matrix_mode: Optional[bool] = typer.Option(None, "--matrix/--no-matrix", help="Run in one env per available interpreter, concurrently"),
+    script_mode: Optional[bool] = typer.Option(None, "--script/--no-script", help="Run a single-file script in a cached env built from its inline metadata or imports"),
+    refresh: bool = typer.Option(False, "--refresh", help="Retry installs that failed recently instead of skipping them"),
+    serve: bool = typer.Option(False, "--serve", help="Supervise the project's dev server: keep its port bound, heal crashes and restart"),
+    host: Optional[str] = typer.Option(None, "--host", help="Address --serve listens on"),
+    port: Optional[int] = typer.Option(None, "--port", help="Port --serve listens on (default: the project type's, else 8000)"),
+    max_rss: Optional[str] = typer.Option(None, "--max-rss", help="Memory limit per attempt, e.g. 512M or 2G"),
+    max_cpu: Optional[float] = typer.Option(None, "--max-cpu", help="CPU-time limit per attempt, in seconds"),
+    show_resources: bool = typer.Option(False, "--resources", help="Print each attempt's resource usage at the end"),
+    resources_json: Optional[Path] = typer.Option(None, "--resources-json", help="Write each attempt's resource usage as JSON"),
 ):
     """Run a command inside the automatically detected/created environment (Self-Healing)."""
-    print_welcome()
     project_root = Path.cwd()
+    cmd = cmd or []
+    if not cmd and not serve:
+        log_error("Missing command to run.")
+        raise typer.Exit(2)
+    from autoviron.core.config import get_config
+    config = get_config(project_root)
+    if exec_mode is None:
+        exec_mode = bool(config.get("exec_passthrough"))
+    if matrix_mode is None:
+        from autoviron.core import matrix
+        matrix_mode = bool(matrix.settings(config)["enabled"])
+    importtime = importtime or importtime_json is not None or importtime_baseline is not None
+    if exec_mode and not force_recreate and not importtime and not matrix_mode and not script_mode and not serve:
+        from autoviron.core.passthrough import try_exec
+        from autoviron.core.scripts import has_inline_metadata
+        # Replaces this process when the cached state is still valid
+        if not has_inline_metadata(cmd):
+            try_exec(project_root, cmd)
+    print_welcome()
     
     # Intelligence: Detect project type
     proj_type = detect_project_type(project_root)
@@ -26,62 +78,217 @@ def run(
         log_info(f"🔍 Detected project type: [highlight]{proj_type}[/highlight]")
         
     manager = EnvManager(project_root)
-    env_info = manager.detect_environment()
-    
-    if env_info and not force_recreate:
-        env_type, env_path = env_info
-        log_info(f"Found {env_type.value} environment at {env_path}")
+    if matrix_mode and not serve:
+        raise typer.Exit(_run_matrix(manager, cmd))
+    script_env = _script_env(manager, cmd, script_mode)
+    if script_env is not None:
+        env_type, env_path = EnvironmentType.VENV, script_env
     else:
-        log_info("No existing environment found. Creating one...")
-        env_path = manager.create_venv()
-        if not env_path:
-            raise typer.Exit(1)
-        env_type = EnvironmentType.VENV
+        from autoviron.core.watcher import read_status
+        watch_status = read_status(project_root)
+        if watch_status and watch_status["state"] == "syncing":
+            log_info("Waiting for the background sync to finish...")
+        # Shared: waits out a concurrent create/install instead of racing it
+        with manager.env_lock(shared=True):
+            env_info = manager.detect_environment()
 
-    # IDE Integration
-    update_vscode_settings(env_path, project_root)
+        if env_info and not force_recreate:
+            env_type, env_path = env_info
+            log_info(f"Found {env_type.value} environment at {env_path}")
+        else:
+            log_info("No existing environment found. Creating one...")
+            env_path = manager.create_venv()
+            if not env_path:
+                raise typer.Exit(1)
+            env_type = EnvironmentType.VENV
+
+        # IDE Integration
+        update_vscode_settings(env_path, project_root)
+    from autoviron.core import knowledge
+    knowledge.remember_env(env_path, int(knowledge.settings(manager.config)["max_envs"]))
+    if serve:
+        from autoviron.core.supervisor import Supervisor
+        raise typer.Exit(Supervisor(env_type, env_path, project_root, cmd, host, port, refresh=refresh).serve())
 
-    # Intelligence: AST Parsing for missing dependencies if running a python file
-    if cmd and cmd[0].endswith(".py"):
+    # Intelligence: AST Parsing for missing dependencies if running a python file or notebook
+    if script_env is None and cmd and cmd[0].endswith((".py", ".ipynb")):
         script_path = Path(cmd[0])
         if script_path.exists():
-            missing = detect_missing_imports(script_path)
+            missing = detect_missing_imports(script_path, project_root)
             if missing:
                 log_warning(f"Script uses non-standard modules: {', '.join(missing)}")
                 log_info("Ensure they are installed in the environment.")
 
+    from autoviron.core import resources
+    opts = resources.settings(manager.config)
+    try:
+        limits = resources.Limits(resources.parse_size(max_rss or opts["max_rss"]), max_cpu or opts["max_cpu"])
+    except ValueError as e:
+        log_error(str(e))
+        raise typer.Exit(2)
+    accounting = resources.Accounting(limits)
+
     print_step(f"Executing: {' '.join(cmd)}")
-    exit_code = self_healing_execute(env_type, env_path, cmd, project_root)
+    profiler = None
+    from autoviron.core.notebooks import notebook_target, run_notebook
+    notebook = notebook_target(cmd)
+    if notebook is not None:
+        exit_code = run_notebook(env_type, env_path, notebook, cmd[1:], project_root, refresh=refresh,
+                                 accounting=accounting)
+    else:
+        if importtime:
+            from autoviron.core.importtime import ImportTimeProfiler
+            profiler = ImportTimeProfiler()
+        exit_code = self_healing_execute(env_type, env_path, cmd, project_root, fork_server=fork_server,
+                                         import_profiler=profiler, accounting=accounting, refresh=refresh,
+                                         auto_install=script_env is None)
+    if show_resources and accounting.attempts:
+        resources.print_summary(accounting)
+    if resources_json:
+        accounting.write_json(resources_json)
+    regression = resources.check_rss_regression(project_root, cmd, accounting, opts)
+    if regression:
+        log_warning(regression)
+    if profiler is not None:
+        _report_importtime(profiler, manager, env_path, cmd, importtime_json, importtime_baseline)
+    if exit_code == 0 and script_env is None and notebook is None:
+        from autoviron.core.passthrough import record_warm_state
+        record_warm_state(manager, env_type, env_path, cmd)
     raise typer.Exit(exit_code)
 
+def _script_env(manager: EnvManager, cmd: List[str], enabled: Optional[bool]) -> Optional[Path]:
+    """The cached env to run a single-file script in, or None to use the project's env."""
+    from autoviron.core import scripts, interpreters
+    opts = scripts.settings(manager.config)
+    script = scripts.script_target(cmd)
+    if script is None or enabled is False or (enabled is None and opts["mode"] == "never"):
+        return None
+    try:
+        spec = scripts.script_spec(script)
+    except scripts.ScriptMetadataError as e:
+        log_error(f"{script}: {e}")
+        raise typer.Exit(2)
+    if spec.source != "pep723" and not enabled and opts["mode"] != "always":
+        # Without inline metadata, only scripts outside a project get a cached env
+        with manager.env_lock(shared=True):
+            if manager.detect_environment() or manager.get_requirement_files():
+                return None
+    info = interpreters.select(manager.project_root, manager.python_versions, manager.config, requires=spec.requires_python)
+    if info is None:
+        log_error(f"No installed Python satisfies {spec.requires_python or 'the project'}.")
+        raise typer.Exit(1)
+    try:
+        with console.status("[highlight]Preparing script environment...[/highlight]", phase="script_env"):
+            env_path = scripts.ensure_env(spec, info.executable, manager.config, manager.lock_timeout)
+    except (RuntimeError, scripts.ScriptMetadataError) as e:
+        log_error(f"Could not build the environment for {script.name}: {e}")
+        if spec.source != "pep723":
+            log_info("Declare its dependencies in a `# /// script` block to control what gets installed.")
+        raise typer.Exit(1)
+    for removed in scripts.evict(opts, keep=env_path):
+        log_info(f"Evicted cached script environment {removed.name}")
+    deps = ", ".join(spec.dependencies) or "no dependencies"
+    log_info(f"Using cached script environment {env_path.name} (Python {info.version}; {deps})")
+    return env_path
+
+def _run_matrix(manager: EnvManager, cmd: List[str]) -> int:
+    from autoviron.core import matrix, envvars
+    from autoviron.core.interpreters import requires_python
+    opts = matrix.settings(manager.config)
+    with console.status("[highlight]Probing interpreters...[/highlight]"):
+        interpreters = matrix.discover(list(opts["pythons"] or manager.python_versions), requires_python(manager.project_root))
+    if not interpreters:
+        log_error("No Python interpreters found for the matrix.")
+        return 1
+    log_info(f"Matrix: {', '.join(f'{i.version} ({i.executable})' for i in interpreters)}")
+    extra_env = envvars.collect_environment(manager.project_root, cmd, manager.config)
+    print_step(f"Executing in {len(interpreters)} environments: {' '.join(cmd)}")
+    results = matrix.run_matrix(manager, cmd, interpreters, opts, dict(os.environ, **extra_env))
+    matrix.print_results(results)
+    return 0 if all(result.passed for result in results) else 1
+
+def _report_importtime(profiler, manager: EnvManager, env_path: Path, cmd: List[str],
+                       json_path: Optional[Path], baseline_path: Optional[Path]):
+    from autoviron.core import importtime
+    if not profiler.roots:
+        log_warning("No import timings were captured (is the command a Python program?).")
+        return
+    importtime.attribute(profiler.roots, env_path, manager.project_root)
+    last_path = importtime.profile_path(manager.project_root, cmd)
+    baseline = importtime.load_profile(baseline_path or last_path)
+    if baseline_path and baseline is None:
+        log_warning(f"Could not read the baseline {baseline_path}.")
+    importtime.print_profile(profiler.roots, importtime.settings(manager.config), baseline)
+    importtime.save_profile(last_path, cmd, profiler.roots)
+    if json_path:
+        importtime.save_profile(json_path, cmd, profiler.roots)
+        log_info(f"Saved the import tree to {json_path}")
+
 @app.command()
-def doctor():
+def doctor(
+    full: bool = typer.Option(False, "--full", help="Hash every file in RECORD instead of a sample"),
+    json_output: bool = typer.Option(False, "--json", help="Print the report as JSON"),
+):
     """Diagnose broken environments."""
-    print_welcome()
-    log_info("Running diagnostics...")
+    from autoviron.doctor.diagnostics import run_deep_checks, print_report, missing_env_report
     project_root = Path.cwd()
     manager = EnvManager(project_root)
     env_info = manager.detect_environment()
     
     if not env_info:
-        log_warning("No environment detected.")
-    else:
-        env_type, env_path = env_info
+        # Nothing to be broken yet; report it without failing CI or pre-commit hooks
+        report = missing_env_report()
+        if json_output:
+            print(json.dumps(report.to_dict(), indent=2))
+        else:
+            print_welcome()
+            print_report(report)
+        return
+
+    env_type, env_path = env_info
+    if not json_output:
+        print_welcome()
         log_info(f"Detected {env_type.value} environment at {env_path}")
-        is_healthy = check_env_health(env_type, env_path)
-        if not is_healthy:
+        with console.status("[highlight]Running deep diagnostics...[/highlight]"), manager.env_lock(shared=True):
+            report = run_deep_checks(env_type, env_path, project_root, full=full)
+        print_report(report)
+    else:
+        with manager.env_lock(shared=True):
+            report = run_deep_checks(env_type, env_path, project_root, full=full)
+        print(json.dumps(report.to_dict(), indent=2))
+
+    if not report.healthy:
+        if not json_output:
             log_error("Environment is broken! Run `autoviron fix` to repair it.")
+        raise typer.Exit(1)
 
 @app.command()
-def fix():
+def fix(full: bool = typer.Option(False, "--full", help="Remove and recreate the environment from scratch")):
     """Repair broken environments and reinstall dependencies."""
     print_welcome()
     project_root = Path.cwd()
     manager = EnvManager(project_root)
+    with manager.env_lock():
+        _fix(manager, full)
+
+def _fix(manager: EnvManager, full: bool):
+    project_root = manager.project_root
     env_info = manager.detect_environment()
     
     if env_info:
         env_type, env_path = env_info
+        if not full:
+            from autoviron.doctor.repair import RepairResult, repair_environment
+            result = repair_environment(manager, env_type, env_path)
+            if result == RepairResult.REPAIRED:
+                log_success("Environment successfully repaired!")
+            if result != RepairResult.REBUILD:
+                return
+            if env_type != EnvironmentType.VENV:
+                log_error(f"Could not repair the {env_type.value} environment in place.")
+                raise typer.Exit(1)
+            log_warning("Incremental repair was not enough; falling back to a full rebuild.")
+
         if env_type == EnvironmentType.VENV:
             import shutil
             with console.status(f"[highlight]Removing corrupted environment at {env_path}...[/highlight]"):
@@ -104,6 +311,140 @@ def fix():
         log_error("Failed to repair environment.")
         raise typer.Exit(1)
 
+@app.command()
+def lock(check: bool = typer.Option(False, "--check", help="Only verify the lockfile matches the requirement sources")):
+    """Pin the exact installed set, with hashes, into autoviron.lock."""
+    from autoviron.core import lockfile
+    print_welcome()
+    project_root = Path.cwd()
+    manager = EnvManager(project_root)
+    
+    if check:
+        if lockfile.lock_is_current(project_root, manager.requirements_hash()):
+            log_success(f"{lockfile.LOCKFILE_NAME} is up to date.")
+            return
+        log_error(f"{lockfile.LOCKFILE_NAME} is missing or out of date. Run `autoviron lock`.")
+        raise typer.Exit(1)
+    
+    env_info = manager.detect_environment()
+    if not env_info:
+        log_error("No environment detected. Run `autoviron run` or `autoviron sync` first.")
+        raise typer.Exit(1)
+    if not manager.lock(env_info[1]):
+        raise typer.Exit(1)
+
+@app.command()
+def sync(force: bool = typer.Option(False, "--force", "-f", help="Reinstall even if the sources are unchanged")):
+    """Install dependencies into the environment, from autoviron.lock when it is current."""
+    print_welcome()
+    project_root = Path.cwd()
+    manager = EnvManager(project_root)
+    env_info = manager.detect_environment()
+    if not env_info:
+        log_info("No existing environment found. Creating one...")
+        if not manager.create_venv():
+            raise typer.Exit(1)
+        return
+    manager._auto_install_deps(env_info[1], force=force)
+
+@app.command()
+def prune(
+    apply: bool = typer.Option(False, "--apply", help="Uninstall the unused packages instead of only listing them"),
+    update_requirements: bool = typer.Option(
+        False, "--update-requirements",
+        help="With --apply, also drop them from the requirement files. Runtime requirement files are always "
+             "kept, so only dev requirement files (with prune.keep_dev_requirements off) can change"),
+):
+    """Find (and optionally remove) installed packages the project's imports never need."""
+    from autoviron.core import prune as pruning
+    from rich.table import Table
+    if update_requirements and not apply:
+        log_error("--update-requirements only works together with --apply.")
+        raise typer.Exit(2)
+    print_welcome()
+    project_root = Path.cwd()
+    manager = EnvManager(project_root)
+    env_info = manager.detect_environment()
+    if not env_info:
+        log_error("No environment detected.")
+        raise typer.Exit(1)
+    env_type, env_path = env_info
+
+    with manager.env_lock(shared=not apply):
+        with console.status("[highlight]Mapping imports to installed packages...[/highlight]"):
+            plan = pruning.plan_prune(env_path, project_root, manager.config, manager.requirements_files)
+        if plan.unattributed_imports:
+            log_warning(f"Imports no installed package provides: {', '.join(plan.unattributed_imports)}")
+        if not plan.unused:
+            log_success(f"All {len(plan.needed)} installed packages are needed.")
+            return
+
+        listed = {key for name in manager.requirements_files if (project_root / name).exists()
+                  for key in (pruning.dist_meta.normalize_name(r.name) for r in read_requirements(project_root / name))}
+        table = Table(title=f"Unused packages ({pruning.format_size(plan.reclaimable)} reclaimable)")
+        table.add_column("Package")
+        table.add_column("Version")
+        table.add_column("Size", justify="right")
+        table.add_column("In requirements")
+        for dist in plan.unused:
+            table.add_row(dist.name, dist.version, pruning.format_size(plan.size(dist)), "yes" if dist.key in listed else "")
+        console.print(table)
+        log_info("Dynamic imports (importlib, plugins, entry points) are invisible to the scan; "
+                 "add such packages to `prune.keep`.")
+        if not apply:
+            log_info("Dry run. Re-run with --apply to uninstall them.")
+            return
+
+        names = [dist.name for dist in plan.unused]
+        with console.status(f"[highlight]Uninstalling {len(names)} packages...[/highlight]"):
+            if not pruning.uninstall(env_type, env_path, project_root, names):
+                log_error("Uninstall failed; the environment was left as it was.")
+                raise typer.Exit(1)
+        log_success(f"Removed {len(names)} packages.")
+        if update_requirements:
+            for name in pruning.update_requirement_files(project_root, manager.requirements_files, names):
+                log_info(f"Updated {name}")
+        elif any(dist.key in listed for dist in plan.unused):
+            log_warning("Some removed packages are still listed in your requirements; use --update-requirements to drop them.")
+        from autoviron.core import lockfile
+        if lockfile.lockfile_path(project_root).exists():
+            log_warning(f"Run `autoviron lock` to refresh {lockfile.LOCKFILE_NAME}.")
+
+@app.command()
+def watch(
+    detach: bool = typer.Option(False, "--detach", "-d", help="Run the watcher in the background"),
+    status: bool = typer.Option(False, "--status", help="Show what the project's watcher is doing"),
+    stop: bool = typer.Option(False, "--stop", help="Stop the project's background watcher"),
+    once: bool = typer.Option(False, "--once", help="Do a single full sync and exit"),
+):
+    """Keep dependencies in sync in the background as sources change."""
+    from autoviron.core import watcher
+    project_root = Path.cwd()
+    if status:
+        info = watcher.read_status(project_root)
+        if info is None:
+            log_info("No watcher has run for this project.")
+            raise typer.Exit(1)
+        print(json.dumps(info, indent=2))
+        raise typer.Exit(0 if info["state"] != "stopped" else 1)
+    if stop:
+        if watcher.stop(project_root):
+            log_success("Watcher stopped.")
+        else:
+            log_info("No watcher is running for this project.")
+        return
+    if detach:
+        current = watcher.read_status(project_root)
+        if current and current["state"] != "stopped":
+            log_info(f"A watcher is already running (pid {current['pid']}).")
+            return
+        pid = watcher.start_detached(project_root)
+        log_success(f"Watching in the background (pid {pid}). Logs: {watcher.log_path(project_root)}")
+        return
+    print_welcome()
+    if not watcher.watch(project_root, once=once):
+        raise typer.Exit(1)
+
 @app.command()
 def hook(shell: str = typer.Argument(..., help="Shell name (bash, zsh, fish, powershell)")):
     """Print the eval script to enable AutoViron magic in your shell."""
@@ -117,10 +458,12 @@ def hook(shell: str = typer.Argument(..., help="Shell name (bash, zsh, fish, pow
 @app.command()
 def hook_source(shell: str = typer.Argument(..., help="Shell name (bash, zsh)")):
     """Generate the actual shell hook source code."""
+    from autoviron.core.config import get_config
+    venv_patterns = get_config(Path.cwd()).get("venv_patterns")
     if shell == "zsh":
-        console.print(generate_zsh_hook())
+        print(generate_zsh_hook(venv_patterns))
     elif shell == "bash":
-        console.print(generate_bash_hook())
+        print(generate_bash_hook(venv_patterns))
     else:
         log_error(f"Unsupported shell: {shell}")
 
@@ -156,41 +499,130 @@ def explain():
     explain_codebase(project_root)
 
 @app.command()
-def sandbox():
+def sandbox(force: bool = typer.Option(False, "--force", "-f", help="Overwrite an existing Dockerfile/.dockerignore")):
     """Generate a Dockerfile to isolate the project based on its detected architecture."""
     print_welcome()
     project_root = Path.cwd()
     from autoviron.core.detector import get_active_plugin
+    from autoviron.core.sandbox import DEFAULT_PYTHON_VERSION, generate_dockerfile, generate_dockerignore
+    from autoviron.core.dists import read_pyvenv_cfg
+    from autoviron.core import lockfile
     
     plugin = get_active_plugin(project_root)
     proj_type = plugin.name if plugin else "Standard Python"
     
     log_info(f"Generating Sandbox (Docker) for a [highlight]{proj_type}[/highlight] project...")
     
-    # Try to get the Dockerfile from the plugin's missing files logic
-    missing_files = plugin.get_missing_files(project_root) if plugin else {}
-    dockerfile_content = missing_files.get("Dockerfile")
+    # Match the image to the interpreter the project already runs on
+    python_version = DEFAULT_PYTHON_VERSION
+    manager = EnvManager(project_root)
+    env_info = manager.detect_environment()
+    if env_info:
+        version = read_pyvenv_cfg(env_info[1]).get("version") or ""
+        if version.count(".") >= 1:
+            python_version = ".".join(version.split(".")[:2])
+    if lockfile.lockfile_path(project_root).exists() and not lockfile.lock_is_current(project_root, manager.requirements_hash()):
+        log_warning(f"{lockfile.LOCKFILE_NAME} is out of date; run `autoviron lock` before building.")
     
-    if not dockerfile_content:
-        # Fallback basic Dockerfile
-        dockerfile_content = "FROM python:3.11-slim\nWORKDIR /app\nCOPY requirements.txt .\nRUN pip install -r requirements.txt\nCOPY . .\nCMD [\"python\", \"main.py\"]"
+    outputs = {
+        "Dockerfile": generate_dockerfile(project_root, plugin, python_version),
+        ".dockerignore": generate_dockerignore(project_root),
+    }
+    for filename, content in outputs.items():
+        path = project_root / filename
+        if path.exists() and not force:
+            log_warning(f"{filename} already exists. Skipping generation (use --force to overwrite).")
+            continue
+        path.write_text(content)
+        log_success(f"Generated {filename} for isolated sandbox execution!")
         
-    dockerfile_path = project_root / "Dockerfile"
-    if dockerfile_path.exists():
-        log_warning("Dockerfile already exists. Skipping generation.")
-    else:
-        dockerfile_path.write_text(dockerfile_content)
-        log_success("Generated Dockerfile for isolated sandbox execution!")
-        console.print("\nTo run your sandbox:")
-        console.print("  [dim]$ docker build -t autoviron-sandbox .[/dim]")
-        console.print("  [dim]$ docker run -it --rm autoviron-sandbox[/dim]")
+    console.print("\nTo run your sandbox:")
+    console.print("  [dim]$ DOCKER_BUILDKIT=1 docker build -t autoviron-sandbox .[/dim]")
+    console.print("  [dim]$ docker run -it --rm autoviron-sandbox[/dim]")
+
+@app.command()
+def pythons(refresh: bool = typer.Option(False, "--refresh", help="Re-probe every interpreter instead of using the cache")):
+    """List the Python interpreters found on this machine and the one new envs will use."""
+    from rich.table import Table
+    from autoviron.core import interpreters
+    print_welcome()
+    project_root = Path.cwd()
+    manager = EnvManager(project_root)
+    if refresh:
+        interpreters.clear_cache()
+    roots = interpreters.settings(manager.config)["search_paths"]
+    with console.status("[highlight]Probing interpreters...[/highlight]"):
+        found = interpreters.discover(manager.python_versions, roots)
+        selected = manager._find_python()
+    spec = interpreters.requires_python(project_root)
+    table = Table(title=f"Python interpreters (requires-python {spec})" if spec else "Python interpreters")
+    table.add_column("")
+    table.add_column("Version")
+    table.add_column("Implementation")
+    table.add_column("ABI")
+    table.add_column("Executable", overflow="fold")
+    for info in found:
+        mark = "*" if selected and os.path.realpath(selected) == os.path.realpath(info.executable) else ""
+        style = None if interpreters.matches(info, spec) else "dim"
+        table.add_row(mark, info.version, info.implementation, info.abi, info.executable, style=style)
+    console.print(table)
+    if not selected:
+        log_error("No suitable interpreter; new environments cannot be created.")
+        raise typer.Exit(1)
 
 @app.command()
-def learn(package: str = typer.Argument(..., help="The package name to learn about")):
-    """Learn what a dependency does and why it's used."""
+def scripts(clear: bool = typer.Option(False, "--clear", help="Remove every cached script environment not in use")):
+    """List the cached environments single-file scripts run in."""
+    import time
+    from rich.table import Table
+    from autoviron.core import scripts as script_envs
+    from autoviron.core.prune import format_size
     print_welcome()
-    from autoviron.core.learning import explain_dependency
-    explain_dependency(package)
+    if clear:
+        log_success(f"Removed {script_envs.clear()} script environments.")
+        return
+    envs = script_envs.cached_envs()
+    if not envs:
+        log_info("No cached script environments.")
+        return
+    table = Table(title=f"Script environments ({format_size(sum(e.get('size', 0) for e in envs))})")
+    table.add_column("Key")
+    table.add_column("Dependencies")
+    table.add_column("Python", overflow="fold")
+    table.add_column("Size", justify="right")
+    table.add_column("Uses", justify="right")
+    table.add_column("Last used")
+    for meta in reversed(envs):
+        last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(meta.get("last_used", 0)))
+        table.add_row(meta["path"].name, ", ".join(meta.get("dependencies") or []) or "-", meta.get("python", ""),
+                      format_size(meta.get("size", 0)), str(meta.get("uses", 0)), last_used)
+    console.print(table)
+
+@app.command()
+def learn(
+    package: Optional[str] = typer.Argument(None, help="The package name to learn about"),
+    search: Optional[str] = typer.Option(None, "--search", "-s", help="Search indexed packages by description"),
+    rebuild: bool = typer.Option(False, "--rebuild", help="Re-read every source instead of only the changed ones"),
+):
+    """Learn what a dependency does and why it's installed (offline)."""
+    if not package and not search:
+        log_error("Give a package name or --search QUERY.")
+        raise typer.Exit(1)
+    print_welcome()
+    from autoviron.core.knowledge import env_requirements, load_index
+    from autoviron.core.learning import explain_dependency, print_search, direct_requirements
+    project_root = Path.cwd()
+    manager = EnvManager(project_root)
+    env_info = manager.detect_environment()
+    with console.status("[highlight]Updating the package index...[/highlight]"):
+        index = load_index(manager.config, [env_info[1]] if env_info else [], rebuild=rebuild)
+    if search:
+        print_search(search, index)
+    if package:
+        installed = None
+        if env_info:
+            installed = env_requirements(env_info[1])
+        explain_dependency(package, index, installed, direct_requirements(project_root, manager.requirements_files))
 
 
 @app.command()
@@ -200,15 +632,16 @@ def export(file_name: str = typer.Option("autoviron.toml", "--file", "-f", help=
     project_root = Path.cwd()
     from autoviron.core.config import save_config
     
-    # We create a base config with the project type and some default rules
-    config = {
-        "project_type": detect_project_type(project_root),
-        "auto_create": True,
-        "auto_activate": True,
-        "python_versions": ["python3", "python"]
-    }
+    from autoviron.core.config import get_config
+    
+    # Export the merged view so teammates get the same effective settings
+    merged = get_config(project_root)
+    config = {"project_type": detect_project_type(project_root)}
+    for key in ("auto_create", "auto_activate", "venv_name", "python_versions", "venv_patterns", "requirements_files", "hooks", "cache"):
+        if key in merged:
+            config[key] = merged[key]
     
-    save_config(project_root, config)
+    save_config(project_root, config, file_name)
     log_success(f"Exported environment configuration to {file_name}")
 
 @app.command()
@@ -216,19 +649,41 @@ def import_config(file_name: str = typer.Option("autoviron.toml", "--file", "-f"
     """Import and apply an environment configuration from a file."""
     print_welcome()
     project_root = Path.cwd()
-    from autoviron.core.config import load_config
+    from autoviron.core.config import read_config_file, get_config
     
-    config = load_config(project_root)
+    config = read_config_file(project_root / file_name)
     if not config:
         log_error(f"No configuration found in {file_name}")
         raise typer.Exit(1)
         
     log_info(f"Loaded configuration from {file_name}")
     console.print(config)
+    if file_name not in ("autoviron.toml", "autoviron.json"):
+        from autoviron.core.config import save_config
+        save_config(project_root, config)
+    # Recompile the cached snapshot so the next invocation picks it up
+    get_config(project_root)
     log_success("Configuration applied!")
 
 def main():
-    app()
+    import time
+    from autoviron.core.locking import LockTimeout
+    from autoviron.ux.events import bus
+    started = time.monotonic()
+    code = 0
+    try:
+        app()
+    except LockTimeout as e:
+        log_error(str(e))
+        code = 1
+        raise SystemExit(1)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        raise
+    finally:
+        if bus.configured:
+            bus.emit("end", exit_code=code, duration=round(time.monotonic() - started, 6))
+            bus.close()
 
 if __name__ == "__main__":
     main()
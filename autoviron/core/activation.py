@@ -0,0 +1,179 @@
+"""
+Direct execution of commands inside poetry, pipenv, conda and venv environments.
+
+Instead of prefixing every attempt with `poetry run`, `pipenv run` or
+`conda run`, the environment's interpreter and activation variables are
+resolved once, cached keyed by the env's metadata, and applied to the
+child's environment directly. The wrapper CLIs remain as a fallback.
+"""
+import os
+import json
+import hashlib
+import subprocess
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from autoviron.core.config import cache_dir
+from autoviron.core.env_manager import EnvironmentType
+from autoviron.core import dists as dist_meta
+
+SNAPSHOT_VERSION = 1
+# Variables that would point the child at the wrong interpreter
+UNSET_VARIABLES = ["PYTHONHOME", "__PYVENV_LAUNCHER__"]
+ACTIVE_MARKERS = {
+    EnvironmentType.POETRY: {"POETRY_ACTIVE": "1"},
+    EnvironmentType.PIPENV: {"PIPENV_ACTIVE": "1"},
+}
+
+
+@dataclass
+class ActivationSnapshot:
+    """Everything needed to run a command as if the environment were activated."""
+    env_type: str
+    env_path: str
+    python: str
+    path_prepend: List[str] = field(default_factory=list)
+    variables: Dict[str, str] = field(default_factory=dict)
+    unset: List[str] = field(default_factory=list)
+    key: List = field(default_factory=list)
+
+    def apply(self, base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Return a copy of `base` (default: os.environ) with the activation applied."""
+        env = dict(os.environ if base is None else base)
+        for name in self.unset:
+            env.pop(name, None)
+        env.update(self.variables)
+        current = env.get("PATH", "")
+        env["PATH"] = os.pathsep.join(self.path_prepend + ([current] if current else []))
+        return env
+
+
+def _metadata_paths(env_type: EnvironmentType, env_path: Path) -> List[Path]:
+    paths = [env_path / "pyvenv.cfg", dist_meta.bin_dir(env_path), dist_meta.python_executable(env_path)]
+    if env_type == EnvironmentType.CONDA:
+        paths += [env_path / "conda-meta" / "history", env_path / "etc" / "conda" / "activate.d"]
+    return paths
+
+
+def _metadata_key(env_type: EnvironmentType, env_path: Path) -> List:
+    """Fingerprint the env by the mtimes of the files activation depends on."""
+    key = [env_type.value, str(env_path)]
+    for path in _metadata_paths(env_type, env_path):
+        try:
+            key.append(path.stat().st_mtime_ns)
+        except OSError:
+            key.append(0)
+    return key
+
+
+def _snapshot_file(env_path: Path) -> Path:
+    digest = hashlib.sha1(str(env_path.resolve()).encode()).hexdigest()[:16]
+    return cache_dir() / "activation" / f"{digest}.json"
+
+
+def _conda_path_entries(env_path: Path) -> List[str]:
+    if os.name == "nt":
+        subdirs = ["", "Library/mingw-w64/bin", "Library/usr/bin", "Library/bin", "Scripts", "bin"]
+        return [str(env_path / s) if s else str(env_path) for s in subdirs]
+    return [str(env_path / "bin")]
+
+
+def _activate_d_variables(env_path: Path, base_env: Dict[str, str]) -> Dict[str, str]:
+    """Source conda's activate.d scripts once and capture the variables they set."""
+    scripts = sorted((env_path / "etc" / "conda" / "activate.d").glob("*.sh"))
+    if not scripts or os.name == "nt":
+        return {}
+    sourced = "; ".join(f'. "{s}"' for s in scripts)
+    try:
+        proc = subprocess.run(["sh", "-c", f"{sourced} >/dev/null 2>&1; env -0"], env=base_env,
+                              capture_output=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return {}
+    if proc.returncode != 0:
+        return {}
+    captured = {}
+    for item in proc.stdout.split(b"\0"):
+        name, sep, value = item.decode(errors="replace").partition("=")
+        if sep and name and base_env.get(name) != value and name not in ("PWD", "SHLVL", "_", "OLDPWD"):
+            captured[name] = value
+    return captured
+
+
+def _build_snapshot(env_type: EnvironmentType, env_path: Path) -> Optional[ActivationSnapshot]:
+    python_bin = dist_meta.python_executable(env_path)
+    if not python_bin.exists():
+        return None
+    snapshot = ActivationSnapshot(env_type.value, str(env_path), str(python_bin), unset=list(UNSET_VARIABLES))
+    if env_type == EnvironmentType.CONDA:
+        snapshot.path_prepend = _conda_path_entries(env_path)
+        snapshot.variables = {
+            "CONDA_PREFIX": str(env_path),
+            "CONDA_DEFAULT_ENV": env_path.name,
+            "CONDA_PROMPT_MODIFIER": f"({env_path.name}) ",
+        }
+        base = snapshot.apply()
+        snapshot.variables.update(_activate_d_variables(env_path, base))
+        snapshot.variables.pop("PATH", None)
+    else:
+        snapshot.path_prepend = [str(dist_meta.bin_dir(env_path))]
+        snapshot.variables = {"VIRTUAL_ENV": str(env_path)}
+        snapshot.variables.update(ACTIVE_MARKERS.get(env_type, {}))
+    return snapshot
+
+
+def resolve_activation(env_type: EnvironmentType, env_path: Path, use_cache: bool = True) -> Optional[ActivationSnapshot]:
+    """Return the cached activation snapshot for an env, rebuilding it if the env changed."""
+    key = _metadata_key(env_type, env_path)
+    cache_file = _snapshot_file(env_path)
+    if use_cache:
+        try:
+            data = json.loads(cache_file.read_text())
+            if data.pop("version", None) == SNAPSHOT_VERSION and data.get("key") == key:
+                return ActivationSnapshot(**data)
+        except (OSError, ValueError, TypeError):
+            pass
+
+    snapshot = _build_snapshot(env_type, env_path)
+    if snapshot is None:
+        return None
+    snapshot.key = key
+    if use_cache:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(dict(asdict(snapshot), version=SNAPSHOT_VERSION)))
+            os.replace(tmp, cache_file)
+        except OSError:
+            pass
+    return snapshot
+
+
+def wrapper_command(env_type: EnvironmentType, env_path: Path, command: List[str]) -> List[str]:
+    """The wrapper-CLI form of `command`, used when direct execution is not possible."""
+    if env_type == EnvironmentType.POETRY:
+        return ["poetry", "run"] + command
+    if env_type == EnvironmentType.PIPENV:
+        return ["pipenv", "run"] + command
+    if env_type == EnvironmentType.CONDA:
+        return ["conda", "run", "--no-capture-output", "-p", str(env_path)] + command
+    return list(command)
+
+
+def prepare_command(env_type: EnvironmentType, env_path: Path, command: List[str],
+                    base_env: Optional[Dict[str, str]] = None) -> Tuple[List[str], Dict[str, str]]:
+    """Return (argv, environment) to run `command` inside the env.
+
+    `python`/`python3` and bare `.py` scripts are pointed at the env's
+    interpreter; other commands resolve through the activated PATH.
+    """
+    snapshot = resolve_activation(env_type, env_path)
+    if snapshot is None:
+        env = dict(os.environ if base_env is None else base_env)
+        return wrapper_command(env_type, env_path, command), env
+
+    cmd = list(command)
+    if cmd and cmd[0] in ("python", "python3"):
+        cmd[0] = snapshot.python
+    elif cmd and cmd[0].endswith(".py"):
+        cmd = [snapshot.python] + cmd
+    return cmd, snapshot.apply(base_env)
@@ -0,0 +1,139 @@
+"""
+Post-install bytecode precompilation.
+
+When enabled, installs run pip with `--no-compile` and the distributions
+that actually changed are then byte-compiled across all cores by the env's
+own interpreter (see `bytecode_worker.py`), optionally with the project's
+sources too. pip never recorded the `.pyc` files we wrote, so uninstalling
+a top-level module leaves its bytecode behind; precompile removes those.
+"""
+import os
+import fnmatch
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from autoviron.core.config import excluded_patterns, section
+from autoviron.core import dists as dist_meta
+from autoviron.ux.console import log_warning
+
+WORKER_SCRIPT = Path(__file__).resolve().parent / "bytecode_worker.py"
+
+# Snapshot of installed dists: key -> (version, RECORD mtime, top-level .py files)
+DistSnapshot = Dict[str, Tuple[str, int, Tuple[str, ...]]]
+
+
+def settings(config: dict) -> dict:
+    merged = section(config, "bytecode")
+    optimize = merged["optimize"]
+    merged["optimize"] = [int(optimize)] if isinstance(optimize, (int, str)) else [int(o) for o in optimize]
+    return merged
+
+
+def pip_flags(config: dict) -> List[str]:
+    """Extra pip install flags: skip pip's serial compile when we precompile ourselves."""
+    return ["--no-compile"] if settings(config)["enabled"] else []
+
+
+def snapshot(env_path: Path) -> DistSnapshot:
+    """Record the installed distributions so changed ones can be found after an install."""
+    state = {}
+    for dist in dist_meta.env_distributions(env_path):
+        try:
+            mtime = (dist.path / "RECORD").stat().st_mtime_ns
+        except OSError:
+            mtime = 0
+        modules = tuple(str(dist.site_packages / entry.path) for entry in dist.record()
+                        if entry.path.endswith(".py") and "/" not in entry.path)
+        state[dist.key] = (dist.version, mtime, modules)
+    return state
+
+
+def changed_distributions(env_path: Path, before: Optional[DistSnapshot]) -> List[dist_meta.Distribution]:
+    """Return distributions that are new or were rewritten since `before` (all if None)."""
+    dists = dist_meta.env_distributions(env_path)
+    if before is None:
+        return dists
+    after = snapshot(env_path)
+    return [d for d in dists if before.get(d.key, ())[:2] != after.get(d.key, ())[:2]]
+
+
+def purge_removed(before: DistSnapshot) -> int:
+    """Delete the `__pycache__` entries of top-level modules whose source is gone; returns how many."""
+    removed = 0
+    for _, _, modules in before.values():
+        for source in modules:
+            if os.path.exists(source):
+                continue
+            path = Path(source)
+            for pyc in path.parent.glob(f"__pycache__/{path.stem}.*.pyc"):
+                try:
+                    pyc.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+    return removed
+
+
+def distribution_sources(dists: Iterable[dist_meta.Distribution]) -> List[str]:
+    """List the `.py` files installed by the given distributions."""
+    sources = []
+    for dist in dists:
+        for entry in dist.record():
+            if entry.path.endswith(".py") and not entry.path.startswith(".."):
+                path = dist.site_packages / entry.path
+                if path.is_file():
+                    sources.append(str(path))
+    return sources
+
+
+def project_sources(project_root: Path, exclude: Iterable[str]) -> List[str]:
+    """List the project's `.py` files, skipping envs and excluded directories."""
+    exclude = list(exclude)
+    sources = []
+    for root, dirs, files in os.walk(project_root):
+        dirs[:] = [
+            d for d in dirs
+            if not d.startswith(".") and not any(fnmatch.fnmatch(d, pat) for pat in exclude)
+            and not (Path(root) / d / "pyvenv.cfg").exists()
+        ]
+        sources.extend(os.path.join(root, f) for f in files if f.endswith(".py"))
+    return sources
+
+
+def compile_sources(env_path: Path, sources: List[str], optimize: List[int], workers: int = 0) -> int:
+    """Byte-compile `sources` with the env's interpreter in parallel. Returns the failure count."""
+    if not sources:
+        return 0
+    python_bin = dist_meta.python_executable(env_path)
+    proc = subprocess.run(
+        [str(python_bin), str(WORKER_SCRIPT), ",".join(str(o) for o in optimize), str(workers)],
+        input="\0".join(sources), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return len(sources)
+    try:
+        return int(proc.stdout.strip() or 0)
+    except ValueError:
+        return 0
+
+
+def precompile(env_path: Path, project_root: Path, config: dict, before: Optional[DistSnapshot] = None,
+               include_project: Optional[bool] = None) -> int:
+    """Precompile what changed since `before` (and the project, if configured).
+
+    `include_project` overrides the `bytecode.include_project` setting.
+    Returns the number of source files handed to the compiler; 0 when the
+    stage is disabled or nothing changed.
+    """
+    opts = settings(config)
+    if not opts["enabled"]:
+        return 0
+    if before is not None:
+        purge_removed(before)
+    sources = distribution_sources(changed_distributions(env_path, before))
+    if opts["include_project"] if include_project is None else include_project:
+        sources += project_sources(project_root, excluded_patterns(config))
+    failures = compile_sources(env_path, sources, opts["optimize"], int(opts["workers"] or 0))
+    if failures:
+        log_warning(f"{failures} of {len(sources)} files failed to byte-compile; they compile on first import instead.")
+    return len(sources)
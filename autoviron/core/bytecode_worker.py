@@ -0,0 +1,42 @@
+"""
+Parallel byte-compiler executed by an environment's own interpreter.
+
+Run as a script (`<env python> bytecode_worker.py <levels> <workers>`) with
+NUL-separated source paths on stdin, so the `.pyc` files match that
+interpreter's magic number. It must not import anything from autoviron.
+Prints the number of files that failed to compile.
+"""
+import sys
+import py_compile
+from concurrent.futures import ProcessPoolExecutor
+
+CHUNK_SIZE = 200
+
+
+def compile_chunk(args):
+    paths, levels = args
+    failed = 0
+    for path in paths:
+        for level in levels:
+            try:
+                py_compile.compile(path, optimize=level, doraise=True)
+            except (py_compile.PyCompileError, OSError, ValueError):
+                failed += 1
+    return failed
+
+
+def main():
+    levels = [int(level) for level in sys.argv[1].split(",")]
+    workers = int(sys.argv[2]) or None
+    paths = [p for p in sys.stdin.read().split("\0") if p]
+    chunks = [(paths[i:i + CHUNK_SIZE], levels) for i in range(0, len(paths), CHUNK_SIZE)]
+    if len(chunks) <= 1:
+        failed = sum(map(compile_chunk, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            failed = sum(pool.map(compile_chunk, chunks))
+    print(failed)
+
+
+if __name__ == "__main__":
+    main()
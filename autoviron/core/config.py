@@ -1,48 +1,277 @@
-from pathlib import Path
+import os
 import json
+import copy
+import hashlib
+import marshal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
-def load_config(project_root: Path) -> dict:
-    """Load configuration from autoviron.toml or autoviron.json."""
-    config = {}
-    
-    # Check for JSON first (legacy)
-    json_path = project_root / "autoviron.json"
-    if json_path.exists():
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parent.parent / "config" / "default_config.json"
+PROJECT_CONFIG_FILES = ("autoviron.json", "autoviron.toml")
+ENV_PREFIX = "AUTOVIRON_"
+SNAPSHOT_VERSION = 1
+
+# In-process memo so repeated lookups within one invocation are free
+_MEMO: Dict[str, Tuple[tuple, Dict[str, Any]]] = {}
+_DEFAULTS: Dict[str, Dict[str, Any]] = {}
+
+
+def cache_dir() -> Path:
+    """Return the user-level cache directory used by AutoViron."""
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "autoviron"
+
+
+def project_key(project_root: Path) -> str:
+    """Short, stable key for a project checkout, used to name its per-project cache files."""
+    return hashlib.sha1(str(project_root.resolve()).encode()).hexdigest()[:16]
+
+
+def section(config: Dict[str, Any], name: str) -> Dict[str, Any]:
+    """Return the `name` table of `config` merged over its packaged defaults."""
+    merged = copy.deepcopy(_default_config().get(name) or {})
+    merged.update(config.get(name) or {})
+    return merged
+
+
+def excluded_patterns(config: Dict[str, Any]) -> List[str]:
+    """Name patterns of directories and files that are not project sources (envs, build output, ...)."""
+    return list(config.get("venv_patterns") or []) + list(config.get("exclude_patterns") or [])
+
+
+def user_config_path() -> Path:
+    """Return the path of the user config file (~/.autovironrc)."""
+    return Path(os.environ.get("AUTOVIRON_RC", str(Path.home() / ".autovironrc")))
+
+
+def read_config_file(path: Path) -> Dict[str, Any]:
+    """Parse a config file as TOML or JSON depending on its name/content."""
+    try:
+        content = path.read_bytes()
+    except OSError:
+        return {}
+    if path.suffix == ".toml":
         try:
-            with open(json_path, "r") as f:
-                config.update(json.load(f))
-        except json.JSONDecodeError:
-            pass
-            
-    # Check for TOML (preferred)
-    toml_path = project_root / "autoviron.toml"
-    if toml_path.exists():
+            return tomllib.loads(content.decode("utf-8"))
+        except (tomllib.TOMLDecodeError, UnicodeDecodeError):
+            return {}
+    try:
+        data = json.loads(content)
+        return data if isinstance(data, dict) else {}
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        pass
+    # ~/.autovironrc may be written in TOML as well
+    try:
+        return tomllib.loads(content.decode("utf-8"))
+    except (tomllib.TOMLDecodeError, UnicodeDecodeError):
+        return {}
+
+
+def _deep_merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """Recursively merge `override` into `base` (tables merge, everything else replaces)."""
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _deep_merge(base[key], value)
+        else:
+            base[key] = copy.deepcopy(value)
+    return base
+
+
+def _coerce_env_value(raw: str, default: Any) -> Any:
+    """Convert an environment override string into the type of the key's default value."""
+    if isinstance(default, bool):
+        return raw.strip().lower() in ("true", "1", "yes", "on")
+    if isinstance(default, str):
+        return raw
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        pass
+    if isinstance(default, list):
+        return [item.strip() for item in raw.split(",") if item.strip()]
+    return raw
+
+
+def _default_config() -> Dict[str, Any]:
+    if "defaults" not in _DEFAULTS:
+        _DEFAULTS["defaults"] = read_config_file(DEFAULT_CONFIG_PATH)
+    return _DEFAULTS["defaults"]
+
+
+_MISSING = object()
+
+
+def _default_value(path: List[str], defaults: Dict[str, Any]) -> Any:
+    """The packaged default at a key path, or `_MISSING` when the defaults have no such key."""
+    for part in path:
+        if not isinstance(defaults, dict) or part not in defaults:
+            return _MISSING
+        defaults = defaults[part]
+    return defaults
+
+
+def _apply_env_overrides(config: Dict[str, Any], environ=None) -> Dict[str, Any]:
+    """Apply AUTOVIRON_<KEY> overrides; nested keys use `__` (AUTOVIRON_CACHE__TTL=60).
+
+    Only keys the default config defines can be overridden, so other
+    AUTOVIRON_* variables (AUTOVIRON_RC, AUTOVIRON_OUTPUT, ...) stay out of it.
+    """
+    environ = os.environ if environ is None else environ
+    defaults = _default_config()
+    for name, raw in environ.items():
+        if not name.startswith(ENV_PREFIX):
+            continue
+        path = [part.lower() for part in name[len(ENV_PREFIX):].split("__") if part]
+        default = _default_value(path, defaults) if path else _MISSING
+        if default is _MISSING:
+            continue
+        target = config
+        for part in path[:-1]:
+            if not isinstance(target.get(part), dict):
+                target[part] = {}
+            target = target[part]
+        target[path[-1]] = _coerce_env_value(raw, default)
+    return config
+
+
+def config_sources(project_root: Path) -> List[Path]:
+    """Return the config files in the order they are layered (lowest priority first)."""
+    sources = [DEFAULT_CONFIG_PATH, user_config_path()]
+    sources.extend(project_root / name for name in PROJECT_CONFIG_FILES)
+    return sources
+
+
+def _sources_key(sources: List[Path]) -> tuple:
+    """Fingerprint the config sources by mtime and size; missing files are part of the key."""
+    key = []
+    for path in sources:
         try:
-            # Simple TOML parser for basic key-value pairs to avoid heavy dependencies
-            content = toml_path.read_text()
-            for line in content.splitlines():
-                line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    k, v = line.split("=", 1)
-                    k = k.strip()
-                    v = v.strip().strip('"').strip("'")
-                    if v.lower() == "true": v = True
-                    elif v.lower() == "false": v = False
-                    config[k] = v
-        except Exception:
-            pass
-            
+            st = path.stat()
+            key.append((str(path), st.st_mtime_ns, st.st_size))
+        except OSError:
+            key.append((str(path), 0, -1))
+    return tuple(key)
+
+
+def _snapshot_path(project_root: Path) -> Path:
+    return cache_dir() / "config" / f"{project_key(project_root)}.marshal"
+
+
+def _load_snapshot(path: Path, key: tuple) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "rb") as f:
+            data = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION or data.get("key") != key:
+        return None
+    return data.get("config")
+
+
+def _write_snapshot(path: Path, key: tuple, config: Dict[str, Any]):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            marshal.dump({"version": SNAPSHOT_VERSION, "key": key, "config": config}, f)
+        os.replace(tmp, path)
+    except (OSError, ValueError):
+        pass
+
+
+def compile_config(project_root: Path) -> Dict[str, Any]:
+    """Merge packaged defaults, ~/.autovironrc and the project config files (no caching)."""
+    config: Dict[str, Any] = {}
+    for path in config_sources(project_root):
+        if path.exists():
+            _deep_merge(config, read_config_file(path))
     return config
 
-def save_config(project_root: Path, config: dict):
-    """Save configuration to autoviron.toml for team syncing."""
-    toml_path = project_root / "autoviron.toml"
+
+def get_config(project_root: Path, use_cache: bool = True) -> Dict[str, Any]:
+    """Return the merged configuration view for a project.
+
+    Layers, lowest priority first: packaged defaults, ~/.autovironrc,
+    autoviron.json, autoviron.toml, then AUTOVIRON_* environment variables.
+    The merged file layers are stored as a compiled snapshot keyed by the
+    sources' mtimes, so warm invocations only pay for a few stat calls.
+    """
+    sources = config_sources(project_root)
+    key = _sources_key(sources)
+    memo_key = str(project_root)
+
+    config = None
+    if use_cache:
+        memo = _MEMO.get(memo_key)
+        if memo and memo[0] == key:
+            config = copy.deepcopy(memo[1])
+        else:
+            config = _load_snapshot(_snapshot_path(project_root), key)
+
+    if config is None:
+        config = compile_config(project_root)
+        if use_cache:
+            _write_snapshot(_snapshot_path(project_root), key, config)
+
+    if use_cache:
+        _MEMO[memo_key] = (key, copy.deepcopy(config))
+    return _apply_env_overrides(config)
+
+
+def load_config(project_root: Path) -> dict:
+    """Load the project layer only, from autoviron.toml or autoviron.json."""
+    config: Dict[str, Any] = {}
+    for name in PROJECT_CONFIG_FILES:
+        path = project_root / name
+        if path.exists():
+            _deep_merge(config, read_config_file(path))
+    return config
+
+
+def _toml_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_toml_value(v) for v in value) + "]"
+    if isinstance(value, dict):
+        return "{ " + ", ".join(f"{_toml_key(k)} = {_toml_value(v)}" for k, v in value.items()) + " }"
+    return json.dumps(str(value))
+
+
+def _toml_key(key: str) -> str:
+    if key and all(c.isalnum() or c in "-_" for c in key):
+        return key
+    return json.dumps(key)
+
+
+def dumps_toml(config: Dict[str, Any]) -> str:
+    """Serialize a config dict to TOML (scalars and arrays first, then tables)."""
     lines = []
+    tables = []
     for k, v in config.items():
-        if isinstance(v, bool):
-            val_str = "true" if v else "false"
+        if v is None:
+            continue
+        if isinstance(v, dict):
+            tables.append((k, v))
         else:
-            val_str = f'"{v}"'
-        lines.append(f"{k} = {val_str}")
-        
-    toml_path.write_text("\n".join(lines))
+            lines.append(f"{_toml_key(k)} = {_toml_value(v)}")
+    for name, table in tables:
+        lines.append("")
+        lines.append(f"[{_toml_key(name)}]")
+        for k, v in table.items():
+            if v is not None:
+                lines.append(f"{_toml_key(k)} = {_toml_value(v)}")
+    return "\n".join(lines) + "\n"
+
+
+def save_config(project_root: Path, config: dict, file_name: str = "autoviron.toml"):
+    """Save configuration to autoviron.toml for team syncing."""
+    toml_path = project_root / file_name
+    toml_path.write_text(dumps_toml(config))
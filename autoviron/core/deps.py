@@ -1,8 +1,10 @@
+import os
 import ast
 import pkgutil
 from pathlib import Path
-from typing import List, Set
-from autoviron.ux.console import log_info, log_warning, console
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from packaging.requirements import InvalidRequirement, Requirement
+from autoviron.ux.console import log_info, log_warning, console, emit
 
 # Mapping of common import names to their PyPI package names
 IMPORT_TO_PACKAGE = {
@@ -28,10 +30,50 @@ IMPORT_TO_PACKAGE = {
     "boto3": "boto3",
 }
 
+# Packages worth trying when the usual one for an import cannot be installed
+ALTERNATIVE_PACKAGES = {
+    "cv2": ["opencv-python-headless"],
+    "psycopg2": ["psycopg2"],
+}
+
 def get_package_name(import_name: str) -> str:
     """Map an import name to its PyPI package name."""
     return IMPORT_TO_PACKAGE.get(import_name, import_name)
 
+def package_candidates(import_name: str) -> List[str]:
+    """Packages that may provide an import, most likely first."""
+    return [get_package_name(import_name)] + ALTERNATIVE_PACKAGES.get(import_name, [])
+
+def read_requirements(req_file: Path, _seen: Optional[Set[Path]] = None) -> List[Requirement]:
+    """Parse a requirements file into requirements, following `-r` includes.
+
+    Editable installs, URLs and pip options are skipped since they cannot be
+    compared against installed metadata by name.
+    """
+    _seen = _seen if _seen is not None else set()
+    req_file = req_file.resolve()
+    if req_file in _seen or not req_file.is_file():
+        return []
+    _seen.add(req_file)
+
+    requirements = []
+    content = req_file.read_text().replace("\\\n", " ")
+    for raw in content.splitlines():
+        line = raw.split(" #", 1)[0].split(" --", 1)[0].strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith(("-r ", "--requirement ")):
+            include = line.split(None, 1)[1].strip()
+            requirements.extend(read_requirements(req_file.parent / include, _seen))
+            continue
+        if line.startswith("-"):
+            continue
+        try:
+            requirements.append(Requirement(line))
+        except InvalidRequirement:
+            continue
+    return requirements
+
 def get_stdlib_modules() -> Set[str]:
     """Return a set of standard library module names."""
     try:
@@ -40,31 +82,206 @@ def get_stdlib_modules() -> Set[str]:
     except AttributeError:
         return {m.name for m in pkgutil.iter_modules()}
 
-def detect_missing_imports(file_path: Path) -> List[str]:
-    """Scan a Python file for imports that might be missing."""
-    if not file_path.exists() or file_path.suffix != ".py":
-        return []
+# Import kinds, strongest first: only `required` third-party imports drive installs
+REQUIRED, CONDITIONAL, OPTIONAL, TYPE_ONLY = "required", "conditional", "optional", "type_only"
+_STRENGTH = {REQUIRED: 3, CONDITIONAL: 2, OPTIONAL: 1, TYPE_ONLY: 0}
+_IMPORT_ERRORS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+_PLATFORM_NAMES = {"sys.platform", "os.name", "sys.version_info", "platform.system", "platform.machine",
+                   "platform.python_implementation", "sys.implementation"}
+
+
+def _dotted(node: ast.AST) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        base = _dotted(node.value)
+        return f"{base}.{node.attr}" if base else ""
+    if isinstance(node, ast.Call):
+        return _dotted(node.func)
+    return ""
+
+
+class _ImportClassifier(ast.NodeVisitor):
+    """Tags every top-level module a file imports with the weakest guard around it."""
+
+    def __init__(self):
+        self.kinds: Dict[str, str] = {}
+        self.context = [REQUIRED]
+
+    def _add(self, module: str):
+        kind = self.context[-1]
+        if module not in self.kinds or _STRENGTH[kind] > _STRENGTH[self.kinds[module]]:
+            self.kinds[module] = kind
+
+    def _visit_in(self, kind: str, nodes: List[ast.AST]):
+        # A guard never strengthens an enclosing one (optional inside TYPE_CHECKING stays type-only)
+        if _STRENGTH[kind] > _STRENGTH[self.context[-1]]:
+            kind = self.context[-1]
+        self.context.append(kind)
+        for node in nodes:
+            self.visit(node)
+        self.context.pop()
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self._add(alias.name.split('.')[0])
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        if node.module and not node.level:
+            self._add(node.module.split('.')[0])
+
+    def visit_Try(self, node: ast.Try):
+        caught = set()
+        for handler in node.handlers:
+            types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+            caught.update("BaseException" if t is None else _dotted(t).split(".")[-1] for t in types)
+        guarded = bool(caught & _IMPORT_ERRORS)
+        self._visit_in(OPTIONAL if guarded else self.context[-1], node.body)
+        self._visit_in(self.context[-1], node.handlers + node.orelse + node.finalbody)
 
+    visit_TryStar = visit_Try
+
+    def visit_If(self, node: ast.If):
+        names = {_dotted(n) for n in ast.walk(node.test)}
+        if names & {"TYPE_CHECKING", "typing.TYPE_CHECKING"}:
+            self._visit_in(TYPE_ONLY, node.body)
+            self._visit_in(self.context[-1], node.orelse)
+        elif names & _PLATFORM_NAMES:
+            self._visit_in(CONDITIONAL, node.body + node.orelse)
+        else:
+            self.generic_visit(node)
+
+
+def _classify_notebook(file_path: Path) -> Dict[str, str]:
+    """Imports of every code cell, each cell parsed on its own so one bad cell does not hide the rest."""
+    from autoviron.core import notebooks
+    classifier = _ImportClassifier()
+    try:
+        for cell in notebooks.iter_cells(file_path):
+            if cell.cell_type != "code":
+                continue
+            try:
+                classifier.visit(ast.parse(notebooks.to_python(cell.source)))
+            except (SyntaxError, ValueError):
+                log_warning(f"Syntax error in cell {cell.index + 1} of {file_path}, skipping it.")
+    except notebooks.NotebookError as e:
+        log_warning(f"Cannot parse {file_path} ({e}), skipping dependency detection.")
+    except (OSError, UnicodeDecodeError):
+        pass
+    return classifier.kinds
+
+
+def classify_imports(file_path: Path) -> Dict[str, str]:
+    """Map each top-level module a Python file or notebook imports to required,
+    optional (`try/except ImportError`), type_only (`if TYPE_CHECKING:`) or
+    conditional (`sys.platform`/`os.name`/`sys.version_info` guards)."""
+    if file_path.suffix == ".ipynb":
+        return _classify_notebook(file_path)
     try:
         content = file_path.read_text()
         tree = ast.parse(content)
     except SyntaxError:
         log_warning(f"Syntax error in {file_path}, skipping dependency detection.")
-        return []
+        return {}
+    except (OSError, UnicodeDecodeError, ValueError):
+        return {}
+    classifier = _ImportClassifier()
+    classifier.visit(tree)
+    return classifier.kinds
+
+
+def scan_imports(file_path: Path, kinds: Optional[Iterable[str]] = None) -> Set[str]:
+    """Return the top-level module names a Python file imports (only those of `kinds`, if given)."""
+    classified = classify_imports(file_path)
+    if kinds is None:
+        return set(classified)
+    kinds = set(kinds)
+    return {module for module, kind in classified.items() if kind in kinds}
 
-    imported_modules = set()
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                imported_modules.add(alias.name.split('.')[0])
-        elif isinstance(node, ast.ImportFrom):
-            if node.module:
-                imported_modules.add(node.module.split('.')[0])
-
-    stdlib = get_stdlib_modules()
-    missing_candidates = []
-    for mod in imported_modules:
-        if mod not in stdlib:
-            missing_candidates.append(get_package_name(mod))
 
+def _pyproject_packages(project_root: Path) -> Tuple[Set[str], List[Path]]:
+    """Package names and source roots declared in pyproject.toml."""
+    from autoviron.core.config import read_config_file
+    data = read_config_file(project_root / "pyproject.toml")
+    tool = data.get("tool") or {}
+    names: Set[str] = set()
+    roots: List[Path] = []
+    project_name = (data.get("project") or {}).get("name") or (tool.get("poetry") or {}).get("name")
+    if project_name:
+        names.add(project_name.replace("-", "_").replace(".", "_").lower())
+    setuptools = tool.get("setuptools") or {}
+    packages = setuptools.get("packages")
+    if isinstance(packages, list):
+        names.update(p.split(".")[0] for p in packages if isinstance(p, str))
+    elif isinstance(packages, dict):
+        roots.extend(project_root / w for w in (packages.get("find") or {}).get("where") or [])
+    package_dir = setuptools.get("package-dir") or {}
+    roots.extend(project_root / d for d in package_dir.values() if isinstance(d, str))
+    for entry in (tool.get("poetry") or {}).get("packages") or []:
+        if isinstance(entry, dict) and entry.get("include"):
+            names.add(entry["include"].split("/")[0].split(".")[0])
+            if entry.get("from"):
+                roots.append(project_root / entry["from"])
+    wheel = ((tool.get("hatch") or {}).get("build") or {}).get("targets", {}).get("wheel") or {}
+    for package in wheel.get("packages") or []:
+        path = Path(package)
+        names.add(path.name)
+        if len(path.parts) > 1:
+            roots.append(project_root / path.parent)
+    flit = (tool.get("flit") or {}).get("module") or {}
+    if flit.get("name"):
+        names.add(flit["name"].split(".")[0])
+    return names, roots
+
+
+def first_party_modules(project_root: Path, extra_roots: Iterable[Path] = ()) -> Set[str]:
+    """Top-level modules that belong to the project: packages and modules in the
+    project root, `src/`, the package dirs pyproject.toml declares, and `extra_roots`
+    (a script's own directory)."""
+    names, roots = _pyproject_packages(project_root)
+    for root in [project_root, project_root / "src"] + roots + list(extra_roots):
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.endswith(".py") and entry.is_file():
+                names.add(entry.name[:-3])
+            elif entry.is_dir() and not entry.name.startswith(".") and entry.name.isidentifier():
+                # Namespace packages have no __init__.py, so any directory with Python files counts
+                path = Path(entry.path)
+                if (path / "__init__.py").exists() or any(path.glob("*.py")):
+                    names.add(entry.name)
+    return names
+
+
+def third_party_imports(file_path: Path, project_root: Optional[Path] = None,
+                        kinds: Iterable[str] = (REQUIRED,)) -> Dict[str, str]:
+    """Imports of `kinds` that are neither stdlib nor first-party, with their kind."""
+    project_root = project_root or file_path.parent
+    skip = get_stdlib_modules() | first_party_modules(project_root, [file_path.parent])
+    kinds = set(kinds)
+    return {m: k for m, k in classify_imports(file_path).items() if k in kinds and m not in skip}
+
+
+def detect_missing_imports(file_path: Path, project_root: Optional[Path] = None) -> List[str]:
+    """Packages for the required third-party imports of a Python file or notebook.
+
+    Optional, type-only and platform-conditional imports are reported in
+    the `imports` event but never returned, since installing them is at
+    best wasted work. For notebooks, packages named by `%pip install`
+    magics are included too.
+    """
+    if not file_path.exists() or file_path.suffix not in (".py", ".ipynb"):
+        return []
+    classified = third_party_imports(file_path, project_root, kinds=_STRENGTH)
+    missing_candidates = {get_package_name(m) for m, kind in classified.items() if kind == REQUIRED}
+    if file_path.suffix == ".ipynb":
+        from autoviron.core.notebooks import NotebookError, notebook_requirements
+        try:
+            missing_candidates.update(Requirement(req).name for req in notebook_requirements(file_path))
+        except (OSError, UnicodeDecodeError, NotebookError):
+            pass
+    missing_candidates = sorted(missing_candidates)
+    emit("imports", file=str(file_path), imports=classified, third_party=missing_candidates)
     return missing_candidates
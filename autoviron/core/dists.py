@@ -0,0 +1,260 @@
+"""
+In-process reader for the distributions installed in an environment.
+
+Everything here works from the `*.dist-info` metadata on disk, so it can
+inspect any venv without spawning its interpreter or pip.
+"""
+import os
+import re
+import sys
+import csv
+import base64
+import random
+import hashlib
+import platform
+from dataclasses import dataclass, field
+from email.parser import HeaderParser
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+# Files pip writes without a hash in RECORD
+UNHASHED_SUFFIXES = (".pyc", ".pyo")
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a distribution name (PEP 503)."""
+    return canonicalize_name(name)
+
+
+def bin_dir(env_path: Path) -> Path:
+    """Return the scripts directory of an environment."""
+    return env_path / ("Scripts" if os.name == "nt" else "bin")
+
+
+def python_executable(env_path: Path) -> Path:
+    """Return the interpreter path of an environment."""
+    return bin_dir(env_path) / ("python.exe" if os.name == "nt" else "python")
+
+
+def read_pyvenv_cfg(env_path: Path) -> Dict[str, str]:
+    """Parse `pyvenv.cfg` into a dict (empty if missing)."""
+    cfg = {}
+    try:
+        for line in (env_path / "pyvenv.cfg").read_text().splitlines():
+            if "=" in line:
+                k, v = line.split("=", 1)
+                cfg[k.strip()] = v.strip()
+    except OSError:
+        pass
+    return cfg
+
+
+def find_site_packages(env_path: Path) -> List[Path]:
+    """Return the site-packages directories of an environment."""
+    candidates = [env_path / "Lib" / "site-packages"]
+    candidates.extend(sorted(env_path.glob("lib/python*/site-packages")))
+    candidates.extend(sorted(env_path.glob("lib64/python*/site-packages")))
+    seen = set()
+    result = []
+    for path in candidates:
+        if path.is_dir():
+            real = path.resolve()
+            if real not in seen:
+                seen.add(real)
+                result.append(path)
+    return result
+
+
+@dataclass
+class RecordEntry:
+    path: str
+    hash: Optional[str]
+    size: Optional[int]
+
+
+@dataclass
+class Distribution:
+    """A single installed distribution, backed by its `.dist-info` directory."""
+    name: str
+    version: str
+    path: Path
+    site_packages: Path
+    _metadata: Optional[object] = field(default=None, repr=False)
+
+    @property
+    def key(self) -> str:
+        return normalize_name(self.name)
+
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            meta_file = self.path / ("METADATA" if self.path.suffix == ".dist-info" else "PKG-INFO")
+            try:
+                with open(meta_file, encoding="utf-8", errors="replace") as f:
+                    self._metadata = HeaderParser().parse(f)
+            except OSError:
+                self._metadata = HeaderParser().parsestr("")
+        return self._metadata
+
+    @property
+    def requires(self) -> List[str]:
+        return self.metadata.get_all("Requires-Dist") or []
+
+    @property
+    def summary(self) -> str:
+        return self.metadata.get("Summary") or ""
+
+    def requirements(self) -> List[Requirement]:
+        reqs = []
+        for raw in self.requires:
+            try:
+                reqs.append(Requirement(raw))
+            except InvalidRequirement:
+                continue
+        return reqs
+
+    def record(self) -> List[RecordEntry]:
+        """Parse RECORD; returns an empty list for distributions without one."""
+        record_file = self.path / "RECORD"
+        entries = []
+        try:
+            with open(record_file, newline="", encoding="utf-8") as f:
+                for row in csv.reader(f):
+                    if not row:
+                        continue
+                    path = row[0]
+                    digest = row[1] if len(row) > 1 and row[1] else None
+                    size = int(row[2]) if len(row) > 2 and row[2].isdigit() else None
+                    entries.append(RecordEntry(path, digest, size))
+        except OSError:
+            pass
+        return entries
+
+    def top_level(self) -> List[str]:
+        """Return the top-level names this distribution installs into site-packages."""
+        names = set()
+        for entry in self.record():
+            first = entry.path.replace("\\", "/").split("/", 1)[0]
+            if first and first not in ("..", "__pycache__") and not first.endswith((".dist-info", ".data")):
+                names.add(first[:-3] if first.endswith(".py") else first)
+        if not names:
+            try:
+                names.update(n.strip() for n in (self.path / "top_level.txt").read_text().splitlines() if n.strip())
+            except OSError:
+                pass
+        return sorted(names)
+
+
+_DIST_DIR_RE = re.compile(r"^(?P<name>.+?)-(?P<version>[^-]+?)\.(dist-info|egg-info)$")
+
+
+def iter_distributions(site_packages: Path) -> List[Distribution]:
+    """List the distributions installed in a site-packages directory."""
+    dists = []
+    try:
+        entries = list(os.scandir(site_packages))
+    except OSError:
+        return dists
+    for entry in entries:
+        match = _DIST_DIR_RE.match(entry.name)
+        if not match or not entry.is_dir():
+            continue
+        dist = Distribution(match.group("name"), match.group("version"), Path(entry.path), site_packages)
+        # The directory name is escaped; prefer the real name from METADATA
+        dist.name = dist.metadata.get("Name") or dist.name
+        dist.version = dist.metadata.get("Version") or dist.version
+        dists.append(dist)
+    return sorted(dists, key=lambda d: d.key)
+
+
+def env_distributions(env_path: Path) -> List[Distribution]:
+    """List every distribution installed in an environment."""
+    dists = []
+    for site_packages in find_site_packages(env_path):
+        dists.extend(iter_distributions(site_packages))
+    return dists
+
+
+def _hash_file(path: Path, algorithm: str) -> str:
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return base64.urlsafe_b64encode(h.digest()).rstrip(b"=").decode("ascii")
+
+
+def verify_record(dist: Distribution, sample: Optional[int] = None) -> List[str]:
+    """Verify the files listed in RECORD against their recorded size and hash.
+
+    Every file is stat'ed (missing and truncated files are cheap to spot);
+    with `sample`, only that many randomly chosen files per distribution are
+    hashed. Returns a list of human-readable problems; empty means intact.
+    """
+    entries = [e for e in dist.record() if e.hash and not e.path.endswith(UNHASHED_SUFFIXES)]
+    if not entries:
+        if dist.path.suffix == ".dist-info" and not (dist.path / "RECORD").exists():
+            return [f"{dist.name}: RECORD is missing"]
+        return []
+
+    problems = []
+    present = []
+    for entry in entries:
+        target = dist.site_packages / entry.path
+        try:
+            st = target.stat()
+        except OSError:
+            problems.append(f"{dist.name}: missing file {entry.path}")
+            continue
+        if entry.size is not None and st.st_size != entry.size:
+            problems.append(f"{dist.name}: size mismatch for {entry.path}")
+            continue
+        present.append((entry, target))
+
+    if sample is not None and len(present) > sample:
+        present = random.sample(present, sample)
+    for entry, target in present:
+        algorithm, _, expected = entry.hash.partition("=")
+        try:
+            if _hash_file(target, algorithm) != expected:
+                problems.append(f"{dist.name}: hash mismatch for {entry.path}")
+        except (ValueError, OSError) as e:
+            problems.append(f"{dist.name}: cannot verify {entry.path} ({e})")
+    return problems
+
+
+def marker_environment(env_path: Path) -> Dict[str, str]:
+    """Build a PEP 508 marker environment for an env without running it.
+
+    The Python version comes from `pyvenv.cfg`; platform keys come from the
+    host, which is where the environment lives.
+    """
+    cfg = read_pyvenv_cfg(env_path)
+    full_version = cfg.get("version_info") or cfg.get("version") or platform.python_version()
+    parts = full_version.split(".")
+    return {
+        "implementation_name": sys.implementation.name,
+        "implementation_version": full_version,
+        "os_name": os.name,
+        "platform_machine": platform.machine(),
+        "platform_python_implementation": platform.python_implementation(),
+        "platform_release": platform.release(),
+        "platform_system": platform.system(),
+        "platform_version": platform.version(),
+        "python_full_version": full_version,
+        "python_version": ".".join(parts[:2]),
+        "sys_platform": sys.platform,
+    }
+
+
+def requirement_applies(req: Requirement, marker_env: Dict[str, str], extras: Tuple[str, ...] = ()) -> bool:
+    """Return True if the requirement's marker holds (for the given extras)."""
+    if req.marker is None:
+        return True
+    for extra in extras or ("",):
+        env = dict(marker_env, extra=extra)
+        if req.marker.evaluate(env):
+            return True
+    return False
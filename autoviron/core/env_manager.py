@@ -1,10 +1,13 @@
 import os
 import sys
+import time
 import subprocess
 from pathlib import Path
 from typing import Optional, Tuple, List, Dict, Any
 from enum import Enum
-from autoviron.ux.console import log_info, log_success, log_error, console
+from autoviron.ux.console import log_info, log_success, log_error, log_warning, console, emit
+from autoviron.core.config import get_config
+from autoviron.core import locking
 
 class EnvironmentType(Enum):
     VENV = "venv"
@@ -16,9 +19,19 @@ class EnvironmentType(Enum):
 class EnvManager:
     def __init__(self, project_root: Path):
         self.project_root = project_root
-        # Try to load config or use defaults
-        self.python_versions = ["python3", "python", "python3.12", "python3.11", "python3.10", "py"]
-        self.venv_patterns = ["venv", "env", ".venv", ".env"]
+        self.config = get_config(project_root)
+        self.python_versions = self.config.get("python_versions") or ["python3", "python"]
+        self.venv_patterns = self.config.get("venv_patterns") or [".venv", "venv"]
+        self.venv_name = self.config.get("venv_name") or ".venv"
+        self.requirements_files = self.config.get("requirements_files") or ["requirements.txt"]
+        self.hooks = self.config.get("hooks") or {}
+        self.cache_settings = self.config.get("cache") or {}
+        self.lock_timeout = locking.timeout(self.config)
+
+    def env_lock(self, shared: bool = False):
+        """The project's env lock: exclusive for mutation, shared for a consistent read."""
+        from autoviron.core.locking import project_lock
+        return project_lock(self.project_root, "env", shared=shared, timeout=self.lock_timeout)
 
     def detect_environment(self) -> Optional[Tuple[EnvironmentType, Path]]:
         """Detect the type and location of the Python environment."""
@@ -76,54 +89,153 @@ class EnvManager:
             log_error("Could not find a suitable Python installation.")
             return None
         
-        venv_path = self.project_root / ".venv"
-        with console.status("[highlight]Creating virtual environment...[/highlight]"):
-            try:
-                subprocess.run([python_cmd, "-m", "venv", str(venv_path)], check=True, capture_output=True)
-                log_success(f"Virtual environment created at {venv_path}")
-            except subprocess.CalledProcessError as e:
-                log_error(f"Failed to create venv: {e}")
-                return None
-                
-        # Auto-install deps
-        self._auto_install_deps(venv_path)
-        return venv_path
-
-    def _auto_install_deps(self, venv_path: Path):
-        req_file = self.project_root / "requirements.txt"
-        if req_file.exists():
-            import hashlib
-            cache_file = self.project_root / ".autoviron_cache"
-            current_hash = hashlib.md5(req_file.read_bytes()).hexdigest()
-            
-            if cache_file.exists():
+        venv_path = self.project_root / self.venv_name
+        from autoviron.core.dists import python_executable
+        existed = python_executable(venv_path).exists()
+        lock = self.env_lock()
+        with console.status("[highlight]Waiting for other autoviron processes...[/highlight]", phase="lock_wait"):
+            lock.acquire()
+        try:
+            if not existed and python_executable(venv_path).exists():
+                # Another invocation built it while we waited
+                log_info(f"Reusing environment just created at {venv_path}")
+                return venv_path
+            self._run_hook("pre_create")
+            with console.status("[highlight]Creating virtual environment...[/highlight]", phase="create_venv",
+                                python=python_cmd):
                 try:
-                    import json
-                    cache = json.loads(cache_file.read_text())
-                    if cache.get("req_hash") == current_hash:
-                        log_info("Dependencies unchanged. Skipping reinstall.")
-                        return
-                except Exception:
-                    pass
+                    subprocess.run([python_cmd, "-m", "venv", str(venv_path)], check=True, capture_output=True)
+                    log_success(f"Virtual environment created at {venv_path}")
+                except subprocess.CalledProcessError as e:
+                    log_error(f"Failed to create venv: {e}")
+                    return None
+                    
+            # Auto-install deps
+            if self.config.get("install_requirements", True):
+                self._auto_install_deps(venv_path)
+            self._run_hook("post_create")
+            return venv_path
+        finally:
+            lock.release()
+
+    def _run_hook(self, name: str):
+        """Run a configured shell hook (e.g. `pre_create`), ignoring unset hooks."""
+        command = self.hooks.get(name)
+        if not command:
+            return
+        result = subprocess.run(command, shell=True, cwd=self.project_root)
+        if result.returncode != 0:
+            log_warning(f"Hook '{name}' exited with code {result.returncode}.")
+
+    def get_requirement_files(self) -> List[Path]:
+        """Return the configured requirement files that exist in the project."""
+        return [self.project_root / name for name in self.requirements_files if (self.project_root / name).is_file()]
+
+    def requirements_hash(self) -> Optional[str]:
+        """Hash the contents of the configured requirement files (None if there are none)."""
+        req_files = self.get_requirement_files()
+        if not req_files:
+            return None
+        import hashlib
+        digest = hashlib.md5()
+        for req_file in req_files:
+            digest.update(req_file.name.encode())
+            digest.update(req_file.read_bytes())
+        return digest.hexdigest()
+
+    def _auto_install_deps(self, venv_path: Path, force: bool = False):
+        # The sync hash is re-checked under the lock, so waiters reuse an install that just finished
+        with self.env_lock():
+            self._install_deps_locked(venv_path, force)
+
+    def _install_deps_locked(self, venv_path: Path, force: bool):
+        from autoviron.core import lockfile
+        req_files = self.get_requirement_files()
+        lock_path = lockfile.lockfile_path(self.project_root)
+        if req_files or lock_path.exists():
+            from autoviron.core.state import read_state, update_state
+            current_hash = self.requirements_hash()
+            
+            cache_enabled = self.cache_settings.get("enabled", True)
+            ttl = self.cache_settings.get("ttl")
+            if cache_enabled and not force:
+                cache = read_state(self.project_root)
+                fresh = not ttl or time.time() - cache.get("timestamp", 0) < ttl
+                if "req_hash" in cache and cache["req_hash"] == current_hash and fresh:
+                    log_info("Dependencies unchanged. Skipping reinstall.")
+                    emit("install", source="cache", ok=True, skipped=True)
+                    return
                     
-            pip_bin = venv_path / ("Scripts" if os.name == "nt" else "bin") / "pip"
-            with console.status("[highlight]Installing dependencies from requirements.txt...[/highlight]"):
-                subprocess.run([str(pip_bin), "install", "-r", "requirements.txt"], cwd=self.project_root, capture_output=True)
+            from autoviron.core import bytecode
+            before = bytecode.snapshot(venv_path)
+            # With no requirement files left, the lockfile is the only source there is
+            if lockfile.lock_is_current(self.project_root, current_hash) or not req_files:
+                # Resolver-free path: exact pins and hashes in one batch
+                started = time.monotonic()
+                with console.status(f"[highlight]Installing dependencies from {lockfile.LOCKFILE_NAME}...[/highlight]", phase="install"):
+                    result = lockfile.install_from_lock(venv_path, self.project_root, extra_args=bytecode.pip_flags(self.config))
+                emit("install", source="lockfile", files=[lockfile.LOCKFILE_NAME], ok=result.returncode == 0,
+                     duration=round(time.monotonic() - started, 6))
+                if result.returncode != 0:
+                    log_error(f"Install from {lockfile.LOCKFILE_NAME} failed: {result.stderr.strip()[-500:]}")
+                    return
+                log_success("Dependencies installed from lockfile.")
+            else:
+                pip_bin = venv_path / ("Scripts" if os.name == "nt" else "bin") / "pip"
+                names = ", ".join(f.name for f in req_files)
+                args = [str(pip_bin), "install"] + bytecode.pip_flags(self.config)
+                for req_file in req_files:
+                    args += ["-r", req_file.name]
+                started = time.monotonic()
+                with console.status(f"[highlight]Installing dependencies from {names}...[/highlight]", phase="install"):
+                    result = subprocess.run(args, cwd=self.project_root, capture_output=True, text=True)
+                emit("install", source="requirements", files=[f.name for f in req_files], ok=result.returncode == 0,
+                     duration=round(time.monotonic() - started, 6))
+                if result.returncode != 0:
+                    log_error(f"Install from {names} failed: {result.stderr.strip()[-500:]}")
+                    return
                 log_success("Dependencies installed.")
-                
+                if lock_path.exists():
+                    log_info("Requirement sources changed since the last lock. Re-locking...")
+                    self.lock(venv_path)
+            self.precompile(venv_path, before)
+            update_state(self.project_root, req_hash=current_hash, timestamp=time.time())
+
+    def precompile(self, venv_path: Path, before=None):
+        """Byte-compile the distributions changed since the `before` snapshot, across all cores."""
+        from autoviron.core import bytecode
+        if not bytecode.settings(self.config)["enabled"]:
+            return
+        with console.status("[highlight]Precompiling bytecode...[/highlight]", phase="precompile"):
+            count = bytecode.precompile(venv_path, self.project_root, self.config, before)
+        if count:
+            log_info(f"Precompiled {count} modules.")
+
+    def lock(self, venv_path: Path) -> bool:
+        """Write the installed set of `venv_path` to the project lockfile."""
+        from autoviron.core import lockfile
+        with self.env_lock(shared=True), console.status("[highlight]Locking installed packages...[/highlight]", phase="lock"):
             try:
-                import json
-                cache_file.write_text(json.dumps({"req_hash": current_hash}))
-            except Exception:
-                pass
+                packages = lockfile.generate_lock(venv_path, self.project_root, self.get_requirement_files())
+            except lockfile.LockError as e:
+                log_error(f"Could not lock environment: {e}")
+                return False
+            lockfile.write_lockfile(lockfile.lockfile_path(self.project_root), packages, self.requirements_hash())
+        log_success(f"Locked {len(packages)} packages in {lockfile.LOCKFILE_NAME}.")
+        return True
 
     def _find_python(self) -> Optional[str]:
-        for py in self.python_versions:
-            try:
-                if subprocess.run([py, "--version"], capture_output=True).returncode == 0:
-                    return py
-            except FileNotFoundError: continue
-        return None
+        python_path = self.config.get("python_path")
+        if python_path:
+            return python_path
+        from autoviron.core import interpreters
+        info = interpreters.select(self.project_root, self.python_versions, self.config)
+        if info is None:
+            spec = interpreters.requires_python(self.project_root)
+            if spec:
+                log_warning(f"No installed Python satisfies requires-python {spec}.")
+            return None
+        return info.executable
 
     def get_activation_command(self, env_type: EnvironmentType, env_path: Path) -> Optional[str]:
         if env_type == EnvironmentType.POETRY: return "poetry shell"
@@ -136,25 +248,10 @@ class EnvManager:
         return None
 
     def execute_in_env(self, env_type: EnvironmentType, env_path: Path, command: List[str]) -> int:
+        from autoviron.core.activation import prepare_command
         try:
-            if env_type == EnvironmentType.POETRY:
-                return subprocess.run(["poetry", "run"] + command, cwd=self.project_root).returncode
-            elif env_type == EnvironmentType.PIPENV:
-                return subprocess.run(["pipenv", "run"] + command, cwd=self.project_root).returncode
-            elif env_type == EnvironmentType.CONDA:
-                return subprocess.run(["conda", "run", "-n", env_path.name] + command, cwd=self.project_root).returncode
-            else:
-                python_bin = env_path / ("Scripts" if os.name == "nt" else "bin") / "python"
-                if command[0] == "python":
-                    command[0] = str(python_bin)
-                # If command is something else like pytest, we'd need to find it in the bin dir, 
-                # but for now we execute the command as is, assuming it will run via python -m or similar, 
-                # or we just prepend the bin dir to PATH.
-                env = os.environ.copy()
-                bin_dir = str(env_path / ("Scripts" if os.name == "nt" else "bin"))
-                env["PATH"] = f"{bin_dir}{os.pathsep}{env['PATH']}"
-                env["VIRTUAL_ENV"] = str(env_path)
-                return subprocess.run(command, cwd=self.project_root, env=env).returncode
+            cmd, env = prepare_command(env_type, env_path, command)
+            return subprocess.run(cmd, cwd=self.project_root, env=env).returncode
         except Exception as e:
             log_error(f"Error executing command: {e}")
             return 1
@@ -0,0 +1,497 @@
+"""
+Up-front environment variable collection for `autoviron run`.
+
+Before the first launch, the entry point and the first-party modules it
+reaches are scanned statically for the variables they read:
+`os.environ[...]`, `os.getenv`/`os.environ.get`, django-environ `env(...)`
+calls (as used in Django settings modules) and pydantic `BaseSettings`
+fields. Subscript reads guarded by `try/except KeyError` or an
+`if "X" in os.environ` check are optional. Values come from the real
+environment first, then `.env` files; template files (`.env.example`, ...)
+supply defaults. Whatever required variable is still missing is reported
+and filled in one batch: prompted for when interactive, listed in a
+warning otherwise (the run goes ahead and heals a `KeyError` as usual).
+Per-file scan results are cached by mtime in the user cache.
+"""
+import os
+import re
+import ast
+import sys
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from autoviron.core.config import cache_dir, project_key, section
+from autoviron.core.locking import atomic_write_text
+from autoviron.ux.console import log_info, log_warning
+
+TEMPLATE_SUFFIXES = ("example", "sample", "template", "dist", "defaults")
+SECRET_HINTS = ("SECRET", "PASSWORD", "TOKEN", "KEY", "CREDENTIAL")
+SCAN_CACHE_VERSION = 2
+# Handlers that swallow a missing os.environ key
+_KEY_ERROR_HANDLERS = {"KeyError", "LookupError", "Exception", "BaseException"}
+_DOTTED = re.compile(r"^[A-Za-z_]\w*(\.[A-Za-z_]\w*)*(:[A-Za-z_][\w.]*)?$")
+
+
+def settings(config: dict) -> dict:
+    return section(config, "env_vars")
+
+
+@dataclass
+class EnvVarUse:
+    """A variable the project reads, and whether it can run without it."""
+    name: str
+    required: bool
+    default: Optional[str] = None
+    locations: List[str] = field(default_factory=list)
+
+
+# ---------------------------------------------------------------------------
+# Static scan
+
+
+def _const_str(node: Optional[ast.AST]) -> Optional[str]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def _kwarg(call: ast.Call, *names: str) -> Optional[ast.AST]:
+    for kw in call.keywords:
+        if kw.arg in names:
+            return kw.value
+    return None
+
+
+class _EnvVarVisitor(ast.NodeVisitor):
+    """Collects (name, required, default, line) for every variable a module reads."""
+
+    def __init__(self):
+        self.uses: List[Tuple[str, bool, Optional[str], int]] = []
+        self.imports: Set[str] = set()
+        self.strings: Set[str] = set()
+        self._os = {"os"}
+        self._environ: Set[str] = set()
+        self._getenv: Set[str] = set()
+        self._env_factories = {"Env"}
+        self._env_objects: Set[str] = set()
+        # Reads inside `try/except KeyError`, and names checked with `"X" in os.environ`
+        self._in_key_error_try = 0
+        self._checked: List[str] = []
+
+    # -- bookkeeping of names bound to os / os.environ / environ.Env instances
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self.imports.add(alias.name)
+            if alias.name == "os":
+                self._os.add(alias.asname or "os")
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        if node.module and not node.level:
+            self.imports.add(node.module)
+            self.imports.update(f"{node.module}.{alias.name}" for alias in node.names)
+        if node.module == "os":
+            for alias in node.names:
+                if alias.name == "environ":
+                    self._environ.add(alias.asname or "environ")
+                elif alias.name == "getenv":
+                    self._getenv.add(alias.asname or "getenv")
+        if node.module == "environ":
+            self._env_factories.update(alias.asname or alias.name for alias in node.names if alias.name == "Env")
+
+    def visit_Assign(self, node: ast.Assign):
+        value = node.value
+        if isinstance(value, ast.Call) and self._is_env_factory(value.func):
+            self._env_objects.update(t.id for t in node.targets if isinstance(t, ast.Name))
+        self.generic_visit(node)
+
+    def visit_Constant(self, node: ast.Constant):
+        if isinstance(node.value, str) and len(node.value) < 200 and _DOTTED.match(node.value) and "." in node.value:
+            self.strings.add(node.value)
+
+    def _is_env_factory(self, func: ast.AST) -> bool:
+        if isinstance(func, ast.Name):
+            return func.id in self._env_factories
+        return isinstance(func, ast.Attribute) and func.attr == "Env" and isinstance(func.value, ast.Name) and func.value.id == "environ"
+
+    def _is_environ(self, node: ast.AST) -> bool:
+        if isinstance(node, ast.Name):
+            return node.id in self._environ
+        return isinstance(node, ast.Attribute) and node.attr == "environ" and isinstance(node.value, ast.Name) and node.value.id in self._os
+
+    # -- guards that make a subscript read optional
+    @staticmethod
+    def _catches_key_error(handler: ast.ExceptHandler) -> bool:
+        types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+        return any(t is None or (isinstance(t, ast.Name) and t.id in _KEY_ERROR_HANDLERS)
+                   or (isinstance(t, ast.Attribute) and t.attr in _KEY_ERROR_HANDLERS) for t in types)
+
+    def visit_Try(self, node: ast.Try):
+        guarded = any(self._catches_key_error(h) for h in node.handlers)
+        self._in_key_error_try += guarded
+        for stmt in node.body:
+            self.visit(stmt)
+        self._in_key_error_try -= guarded
+        for part in node.handlers + node.orelse + node.finalbody:
+            self.visit(part)
+
+    visit_TryStar = visit_Try
+
+    def _membership_checks(self, test: ast.AST) -> Tuple[List[str], List[str]]:
+        """Names a condition proves present when true (`in`) and when false (`not in`)."""
+        present, absent = [], []
+        for node in ast.walk(test):
+            if isinstance(node, ast.Compare) and len(node.ops) == 1 and self._is_environ(node.comparators[0]):
+                name = _const_str(node.left)
+                if name and isinstance(node.ops[0], ast.In):
+                    present.append(name)
+                elif name and isinstance(node.ops[0], ast.NotIn):
+                    absent.append(name)
+        return present, absent
+
+    def _visit_checked(self, nodes: Iterable[ast.AST], names: List[str]):
+        self._checked.extend(names)
+        for node in nodes:
+            self.visit(node)
+        del self._checked[len(self._checked) - len(names):]
+
+    def visit_If(self, node: ast.If):
+        present, absent = self._membership_checks(node.test)
+        self._visit_checked([node.test] + node.body, present)
+        self._visit_checked(node.orelse, absent)
+
+    def visit_IfExp(self, node: ast.IfExp):
+        present, absent = self._membership_checks(node.test)
+        self._visit_checked([node.test, node.body], present)
+        self._visit_checked([node.orelse], absent)
+
+    # -- reads
+    def visit_Subscript(self, node: ast.Subscript):
+        if self._is_environ(node.value) and isinstance(node.ctx, ast.Load):
+            name = _const_str(node.slice if not isinstance(node.slice, ast.Index) else node.slice.value)
+            if name:
+                required = not self._in_key_error_try and name not in self._checked
+                self.uses.append((name, required, None, node.lineno))
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call):
+        func = node.func
+        name = _const_str(node.args[0]) if node.args else None
+        if name:
+            default_node = node.args[1] if len(node.args) > 1 else _kwarg(node, "default")
+            if (isinstance(func, ast.Name) and func.id in self._getenv) or (
+                    isinstance(func, ast.Attribute) and func.attr == "getenv" and isinstance(func.value, ast.Name) and func.value.id in self._os):
+                self.uses.append((name, False, _const_str(default_node), node.lineno))
+            elif isinstance(func, ast.Attribute) and func.attr in ("get", "setdefault") and self._is_environ(func.value):
+                self.uses.append((name, False, _const_str(default_node), node.lineno))
+            elif self._is_env_object_call(func):
+                # django-environ: env("X") / env.str("X", default=...) raise ImproperlyConfigured without a default
+                default_node = _kwarg(node, "default")
+                self.uses.append((name, default_node is None, _const_str(default_node), node.lineno))
+        self.generic_visit(node)
+
+    def _is_env_object_call(self, func: ast.AST) -> bool:
+        if isinstance(func, ast.Name):
+            return func.id in self._env_objects
+        return isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in self._env_objects
+
+    # -- pydantic settings
+    def visit_ClassDef(self, node: ast.ClassDef):
+        if any(self._base_name(base).endswith("BaseSettings") for base in node.bases):
+            self._settings_fields(node)
+        self.generic_visit(node)
+
+    @staticmethod
+    def _base_name(base: ast.AST) -> str:
+        if isinstance(base, ast.Name):
+            return base.id
+        if isinstance(base, ast.Attribute):
+            return base.attr
+        return ""
+
+    def _settings_fields(self, node: ast.ClassDef):
+        prefix = ""
+        for stmt in node.body:
+            # pydantic v2: model_config = SettingsConfigDict(env_prefix=...); v1: class Config: env_prefix = ...
+            if isinstance(stmt, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "model_config" for t in stmt.targets):
+                if isinstance(stmt.value, ast.Call):
+                    prefix = _const_str(_kwarg(stmt.value, "env_prefix")) or prefix
+            elif isinstance(stmt, ast.ClassDef) and stmt.name == "Config":
+                for inner in stmt.body:
+                    if isinstance(inner, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "env_prefix" for t in inner.targets):
+                        prefix = _const_str(inner.value) or prefix
+        for stmt in node.body:
+            if not isinstance(stmt, ast.AnnAssign) or not isinstance(stmt.target, ast.Name):
+                continue
+            annotation = ast.dump(stmt.annotation)
+            if "ClassVar" in annotation or stmt.target.id == "model_config":
+                continue
+            name = f"{prefix}{stmt.target.id}".upper()
+            required = stmt.value is None
+            default = None
+            value = stmt.value
+            if isinstance(value, ast.Call) and self._base_name(value.func) == "Field":
+                alias = _const_str(_kwarg(value, "validation_alias", "alias", "env"))
+                if alias:
+                    name = alias.upper()
+                first = value.args[0] if value.args else _kwarg(value, "default")
+                has_factory = _kwarg(value, "default_factory") is not None
+                required = not has_factory and (first is None or (isinstance(first, ast.Constant) and first.value is Ellipsis))
+                default = _const_str(first)
+            elif value is not None:
+                default = _const_str(value)
+            self.uses.append((name, required, default, stmt.lineno))
+
+
+def scan_file(path: Path) -> dict:
+    """Scan one module: variables read, modules imported and dotted string constants."""
+    try:
+        tree = ast.parse(path.read_text(), filename=str(path))
+    except (OSError, SyntaxError, UnicodeDecodeError, ValueError):
+        return {"uses": [], "imports": [], "strings": []}
+    visitor = _EnvVarVisitor()
+    visitor.visit(tree)
+    return {"uses": visitor.uses, "imports": sorted(visitor.imports), "strings": sorted(visitor.strings)}
+
+
+class ScanCache:
+    """Per-project cache of `scan_file` results, keyed by each file's mtime and size."""
+
+    def __init__(self, project_root: Path):
+        self.path = cache_dir() / "envvars" / f"{project_key(project_root)}.json"
+        try:
+            data = json.loads(self.path.read_text())
+            self.entries = data["files"] if data.get("version") == SCAN_CACHE_VERSION else {}
+        except (OSError, ValueError, KeyError):
+            self.entries = {}
+        self.dirty = False
+
+    def scan(self, path: Path) -> dict:
+        try:
+            st = path.stat()
+        except OSError:
+            return {"uses": [], "imports": [], "strings": []}
+        stamp = [st.st_mtime_ns, st.st_size]
+        entry = self.entries.get(str(path))
+        if entry and entry["stamp"] == stamp:
+            return entry["scan"]
+        result = scan_file(path)
+        self.entries[str(path)] = {"stamp": stamp, "scan": result}
+        self.dirty = True
+        return result
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(self.path, json.dumps({"version": SCAN_CACHE_VERSION, "files": self.entries}))
+        except OSError:
+            pass
+
+
+def _resolve_module(dotted: str, roots: List[Path]) -> Optional[Path]:
+    """Find the project file for a dotted module name (None for third-party/stdlib)."""
+    parts = dotted.split(":", 1)[0].split(".")
+    for root in roots:
+        base = root.joinpath(*parts)
+        for candidate in (base.with_suffix(".py"), base / "__init__.py"):
+            if candidate.is_file():
+                return candidate
+    return None
+
+
+def entry_points(project_root: Path, command: List[str]) -> List[Path]:
+    """The project files a command starts from: a script, `-m module` or `module:attr` arguments."""
+    roots = [project_root, project_root / "src"]
+    args = list(command)
+    if args and Path(args[0]).name.startswith("python"):
+        args = args[1:]
+    entries = []
+    for index, arg in enumerate(args):
+        if arg.endswith(".py") and (project_root / arg).is_file():
+            entries.append(project_root / arg)
+        elif index > 0 and args[index - 1] == "-m" or ":" in arg:
+            module = _resolve_module(arg, roots) if _DOTTED.match(arg) else None
+            if module:
+                entries.append(module)
+    return entries
+
+
+def scan_environment_uses(project_root: Path, command: List[str], config: dict) -> Dict[str, EnvVarUse]:
+    """Variables read by the command's entry point and the first-party modules it reaches.
+
+    When the command names no project file (e.g. a console script) nothing is
+    scanned: guessing from every file in the project reports variables the
+    command never reads.
+    """
+    cache = ScanCache(project_root)
+    queue = entry_points(project_root, command)
+    seen: Set[Path] = set()
+    uses: Dict[str, EnvVarUse] = {}
+    while queue:
+        path = queue.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        result = cache.scan(path)
+        rel = os.path.relpath(path, project_root)
+        for name, required, default, line in result["uses"]:
+            use = uses.setdefault(name, EnvVarUse(name, required, default))
+            # Any read without a fallback makes the variable required
+            use.required = use.required or required
+            use.default = use.default if use.default is not None else default
+            use.locations.append(f"{rel}:{line}")
+        roots = [project_root, project_root / "src", path.parent]
+        # Imports, plus dotted strings such as "mysite.settings" or "main:app" that name project modules
+        for dotted in list(result["imports"]) + list(result["strings"]):
+            module = _resolve_module(dotted, roots)
+            if module and module not in seen:
+                queue.append(module)
+    cache.save()
+    return uses
+
+
+# ---------------------------------------------------------------------------
+# .env files
+
+
+def parse_dotenv(text: str, context: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Parse dotenv syntax: `KEY=value`, `export KEY=...`, quotes, comments and `${VAR}` expansion."""
+    values: Dict[str, str] = {}
+    lookup = dict(context or {})
+    lines = text.splitlines()
+    index = 0
+    while index < len(lines):
+        line = lines[index].strip()
+        index += 1
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("export "):
+            line = line[len("export "):].lstrip()
+        key, sep, value = line.partition("=")
+        key = key.strip()
+        if not sep or not re.match(r"^[A-Za-z_][A-Za-z0-9_.]*$", key):
+            continue
+        value = value.strip()
+        if value[:1] in ("'", '"'):
+            quote = value[0]
+            body = value[1:]
+            # Quoted values may span lines
+            while quote not in body.replace(f"\\{quote}", "") and index < len(lines):
+                body += "\n" + lines[index]
+                index += 1
+            end = body.rfind(quote)
+            body = body[:end] if end >= 0 else body
+            if quote == '"':
+                body = body.replace("\\n", "\n").replace('\\"', '"')
+                body = _expand(body, lookup)
+            value = body
+        else:
+            value = _expand(value.split(" #", 1)[0].strip(), lookup)
+        values[key] = value
+        lookup[key] = value
+    return values
+
+
+def _expand(value: str, lookup: Dict[str, str]) -> str:
+    return re.sub(r"\$\{([A-Za-z_][A-Za-z0-9_]*)(?::-([^}]*))?\}",
+                  lambda m: lookup.get(m.group(1)) or (m.group(2) or ""), value)
+
+
+def env_files(project_root: Path, opts: dict) -> List[Path]:
+    """The dotenv files to load, lowest precedence first."""
+    names = list(opts["files"] or [])
+    stage = os.environ.get(opts["environment_var"] or "")
+    if stage:
+        names += [f".env.{stage}", f".env.{stage}.local"]
+    return [project_root / name for name in names if (project_root / name).is_file()]
+
+
+def template_files(project_root: Path) -> List[Path]:
+    return [p for p in sorted(project_root.glob(".env.*")) if p.name.rsplit(".", 1)[-1] in TEMPLATE_SUFFIXES]
+
+
+def load_env_files(project_root: Path, opts: dict, base_env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Values from the project's dotenv files that the real environment does not already set."""
+    base = dict(os.environ if base_env is None else base_env)
+    values: Dict[str, str] = {}
+    for path in env_files(project_root, opts):
+        try:
+            values.update(parse_dotenv(path.read_text(), dict(base, **values)))
+        except (OSError, UnicodeDecodeError):
+            continue
+    return {k: v for k, v in values.items() if k not in base}
+
+
+def template_defaults(project_root: Path) -> Dict[str, str]:
+    defaults: Dict[str, str] = {}
+    for path in template_files(project_root):
+        try:
+            defaults.update({k: v for k, v in parse_dotenv(path.read_text()).items() if v})
+        except (OSError, UnicodeDecodeError):
+            continue
+    return defaults
+
+
+# ---------------------------------------------------------------------------
+# Collection
+
+
+def interactive() -> bool:
+    return sys.stdin.isatty() and not os.environ.get("CI")
+
+
+def _prompt(use: EnvVarUse) -> str:
+    import typer
+    secret = any(hint in use.name.upper() for hint in SECRET_HINTS)
+    return typer.prompt(f"Value for {use.name}", hide_input=secret)
+
+
+def _save_prompted(project_root: Path, values: Dict[str, str]):
+    path = project_root / ".env"
+    existing = path.read_text() if path.is_file() else ""
+    if existing and not existing.endswith("\n"):
+        existing += "\n"
+    lines = [f'{k}="{v}"' if any(c in v for c in " #'\"$") else f"{k}={v}" for k, v in values.items()]
+    atomic_write_text(path, existing + "\n".join(lines) + "\n")
+
+
+def collect_environment(project_root: Path, command: List[str], config: dict,
+                        base_env: Optional[Dict[str, str]] = None, ask: Optional[bool] = None) -> Dict[str, str]:
+    """Return the variables to add to the child's environment before it first starts.
+
+    That is the dotenv values plus every required variable that was missing,
+    filled from template defaults or by prompting. When prompting is not
+    possible the missing variables are only reported.
+    """
+    opts = settings(config)
+    if not opts["enabled"]:
+        return {}
+    base = dict(os.environ if base_env is None else base_env)
+    extra = load_env_files(project_root, opts, base)
+    missing = [use for name, use in sorted(scan_environment_uses(project_root, command, config).items())
+               if use.required and name not in base and name not in extra]
+    if not missing:
+        return extra
+
+    defaults = template_defaults(project_root)
+    for use in [u for u in missing if u.name in defaults]:
+        extra[use.name] = defaults[use.name]
+        log_info(f"Using the template default for {use.name}.")
+    missing = [u for u in missing if u.name not in defaults]
+    if not missing:
+        return extra
+
+    log_warning(f"{len(missing)} required environment variable(s) are not set:")
+    for use in missing:
+        log_info(f"  {use.name} (read at {', '.join(use.locations[:2])})")
+    if not (interactive() if ask is None else ask):
+        log_info("Set them in the environment or a .env file; running anyway.")
+        return extra
+    prompted = {use.name: _prompt(use) for use in missing}
+    extra.update(prompted)
+    if opts["save_prompted"]:
+        _save_prompted(project_root, prompted)
+        log_info(f"Saved {len(prompted)} value(s) to .env")
+    return extra
@@ -2,50 +2,84 @@ import sys
 import os
 import subprocess
 import re
+import time
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 import typer
-from autoviron.ux.console import console, log_info, log_error, log_warning, log_success
+from autoviron.ux.console import console, emit, log_debug, log_info, log_error, log_warning, log_success
 from autoviron.core.env_manager import EnvironmentType
-from autoviron.core.deps import get_package_name
+from autoviron.core.deps import package_candidates
 from autoviron.core.failure_db import FailureDB
+from autoviron.core.config import get_config
+from autoviron.core import bytecode, forkserver, envvars, resources
+from autoviron.core.negative_cache import NegativeCache, describe
+from autoviron.core.activation import prepare_command
 
-def self_healing_execute(env_type: EnvironmentType, env_path: Path, command: List[str], project_root: Path, max_retries: int = 3) -> int:
-    """Execute a command and self-heal by fixing runtime errors dynamically."""
+def self_healing_execute(env_type: EnvironmentType, env_path: Path, command: List[str], project_root: Path, max_retries: int = 3,
+                         fork_server: Optional[bool] = None, import_profiler=None,
+                         accounting: Optional[resources.Accounting] = None, refresh: bool = False,
+                         auto_install: bool = True) -> int:
+    """Execute a command and self-heal by fixing runtime errors dynamically.
+
+    With `fork_server` (default: the `forkserver.enabled` config key), python
+    attempts are forked from a pre-warmed server instead of a cold interpreter.
+    Environment variables the project needs are collected before the first
+    attempt (see `envvars.collect_environment`). An `import_profiler`
+    (`importtime.ImportTimeProfiler`) adds `-X importtime` to every attempt
+    and takes its output out of stderr; it implies a cold interpreter.
+    Every attempt's resource usage is recorded in `accounting`, which also
+    carries the limits to apply; attempts that hit them are not retried.
+    Installs that failed before are skipped (see `negative_cache`) unless
+    `refresh` is set. Without `auto_install` (cached script envs, whose
+    contents are their cache key) a missing module is reported instead.
+    """
     retries = 0
     failure_db = FailureDB(project_root)
+    config = get_config(project_root)
+    if fork_server is None:
+        fork_server = forkserver.settings(config)["enabled"]
+    if import_profiler is not None:
+        fork_server = False
+    if accounting is None:
+        accounting = resources.Accounting()
+    negative = NegativeCache(env_path, config, refresh=refresh)
     
     # We only auto-heal for python executions
     is_python_exec = command and command[0] in ("python", "python3") or command[0].endswith(".py")
-    
+
+    base_env = dict(os.environ, **envvars.collect_environment(project_root, command, config))
+
     while retries < max_retries:
         try:
-            if env_type == EnvironmentType.POETRY:
-                cmd = ["poetry", "run"] + command
-                result = subprocess.run(cmd, cwd=project_root, capture_output=True, text=True)
-            elif env_type == EnvironmentType.PIPENV:
-                cmd = ["pipenv", "run"] + command
-                result = subprocess.run(cmd, cwd=project_root, capture_output=True, text=True)
-            elif env_type == EnvironmentType.CONDA:
-                cmd = ["conda", "run", "-n", env_path.name] + command
-                result = subprocess.run(cmd, cwd=project_root, capture_output=True, text=True)
-            else:
-                python_bin = env_path / ("Scripts" if os.name == "nt" else "bin") / "python"
-                cmd = command.copy()
-                if cmd[0] in ("python", "python3"):
-                    cmd[0] = str(python_bin)
-                
-                env = os.environ.copy()
-                bin_dir = str(env_path / ("Scripts" if os.name == "nt" else "bin"))
-                env["PATH"] = f"{bin_dir}{os.pathsep}{env['PATH']}"
-                env["VIRTUAL_ENV"] = str(env_path)
-                
-                result = subprocess.run(cmd, cwd=project_root, capture_output=True, text=True, env=env)
+            cmd, env = prepare_command(env_type, env_path, command, base_env)
+            if import_profiler is not None:
+                cmd = import_profiler.prepare(cmd, env)
+            result = None
+            if fork_server:
+                started = time.monotonic()
+                result = forkserver.run_in_server(env_type, env_path, project_root, config, cmd, env,
+                                                  accounting.limits.to_dict())
+                if result is not None:
+                    accounting.record(result, time.monotonic() - started, getattr(result, "rusage", None))
+            if result is None:
+                result = accounting.run(cmd, project_root, env)
+            last = accounting.last
+            emit("timing", f"Attempt {last.attempt}", phase="attempt", attempt=last.attempt, duration=round(last.wall, 6),
+                 exit_code=result.returncode, outcome=last.outcome, fork_server=bool(fork_server))
+            if import_profiler is not None:
+                result.stderr = import_profiler.collect(result.stderr)
                 
             # If successful, print stdout and return
             if result.returncode == 0:
                 print(result.stdout, end="")
                 return 0
+
+            # Resource limits and OOM kills are not something a retry can fix
+            if accounting.last.outcome in resources.FATAL:
+                print(result.stdout, end="")
+                print(result.stderr, file=sys.stderr, end="")
+                log_error(accounting.describe(accounting.last.outcome))
+                return result.returncode
                 
             # If failed, analyze stderr for known patterns
             stderr = result.stderr
@@ -54,18 +88,28 @@ def self_healing_execute(env_type: EnvironmentType, env_path: Path, command: Lis
             mod_match = re.search(r"ModuleNotFoundError: No module named '([^']+)'", stderr)
             if is_python_exec and mod_match:
                 missing_module = mod_match.group(1)
-                package_name = get_package_name(missing_module)
+                candidates = package_candidates(missing_module)
+                if not auto_install:
+                    print(result.stdout, end="")
+                    print(result.stderr, file=sys.stderr, end="")
+                    log_error(f"'{missing_module}' is not installed in the script's cached environment.")
+                    log_info(f"Add '{candidates[0]}' to the script's `# /// script` dependencies; "
+                             "the next run builds an environment with it.")
+                    return result.returncode
                 log_warning(f"Smart Retry: Missing module '{missing_module}' detected.")
+                emit("heal", reason="missing_module", module=missing_module, package=candidates[0])
                 
                 # Check DB for past resolutions
                 past_res = failure_db.get_resolutions("ModuleNotFoundError")
                 if past_res:
                     log_info(f"🧠 Recalled past fix: {past_res[0]['resolution']}")
                 
-                if _auto_install_package(env_type, env_path, project_root, package_name):
+                package_name = _install_module(env_type, env_path, project_root, missing_module, candidates, negative)
+                if package_name:
                     failure_db.record_failure("ModuleNotFoundError", missing_module, f"Auto-installed {package_name}")
                     retries += 1
                     log_info(f"Retrying execution... (Attempt {retries}/{max_retries})")
+                    emit("retry", attempt=retries, max_retries=max_retries, reason="missing_module")
                     continue
                 else:
                     print(result.stdout, end="")
@@ -74,17 +118,22 @@ def self_healing_execute(env_type: EnvironmentType, env_path: Path, command: Lis
                     
             # 2. Check for KeyError (missing env var)
             key_match = re.search(r"KeyError: '([^']+)'", stderr)
-            if is_python_exec and key_match:
+            if is_python_exec and key_match and key_match.group(1) not in base_env:
                 missing_var = key_match.group(1)
                 log_warning(f"Smart Retry: Missing environment variable '{missing_var}' detected.")
-                
-                # Interactive prompt for missing variable
-                val = typer.prompt(f"Please provide a value for {missing_var}")
-                os.environ[missing_var] = val
+                emit("heal", reason="missing_env_var", var=missing_var)
+                if not envvars.interactive():
+                    print(result.stderr, file=sys.stderr, end="")
+                    log_error(f"Set {missing_var} in the environment or a .env file.")
+                    return result.returncode
+
+                # Interactive prompt for a variable the static scan could not see
+                base_env[missing_var] = typer.prompt(f"Please provide a value for {missing_var}")
                 
                 failure_db.record_failure("KeyError", missing_var, f"Injected ENV var {missing_var}")
                 retries += 1
                 log_info(f"Retrying execution... (Attempt {retries}/{max_retries})")
+                emit("retry", attempt=retries, max_retries=max_retries, reason="missing_env_var")
                 continue
 
             # Fallback: Not a known error, just print output and return
@@ -101,9 +150,66 @@ def self_healing_execute(env_type: EnvironmentType, env_path: Path, command: Lis
     log_error("Max smart-retry attempts reached. Aborting.")
     return 1
 
-def _auto_install_package(env_type: EnvironmentType, env_path: Path, project_root: Path, package_name: str) -> bool:
-    """Helper to install a package into the correct environment."""
-    with console.status(f"[highlight]Auto-installing '{package_name}'...[/highlight]"):
+def _install_module(env_type: EnvironmentType, env_path: Path, project_root: Path, module: str,
+                    candidates: List[str], negative: NegativeCache) -> Optional[str]:
+    """Install the first candidate package for `module` that works; None if none does."""
+    for package_name in candidates:
+        if _auto_install_package(env_type, env_path, project_root, package_name, module, negative):
+            return package_name
+    known = [entry for entry in (negative.lookup(module, package) for package in candidates) if entry]
+    if known:
+        log_error(f"No installable package provides '{module}' ({'; '.join(describe(e) for e in known)}). "
+                  "Use --refresh to try again.")
+    return None
+
+
+def _is_installed(env_path: Path, package_name: str) -> bool:
+    from autoviron.core import dists as dist_meta
+    key = dist_meta.normalize_name(re.split(r"[\[<>=!~;\s]", package_name, 1)[0])
+    return any(d.key == key for d in dist_meta.env_distributions(env_path))
+
+
+def _auto_install_package(env_type: EnvironmentType, env_path: Path, project_root: Path, package_name: str,
+                          module: Optional[str] = None, negative: Optional[NegativeCache] = None) -> bool:
+    """Helper to install a package into the correct environment.
+
+    Candidates in the `negative` cache fail immediately; new failures are added to it.
+    """
+    from autoviron.core.locking import project_lock, LockTimeout, timeout as lock_timeout
+    config = get_config(project_root)
+    known = negative.lookup(module, package_name) if negative is not None else None
+    if known:
+        log_debug(f"Skipping {describe(known)}")
+        emit("install", source="heal", packages=[package_name], ok=False, cached_failure=known["reason"])
+        return False
+    lock = project_lock(project_root, "env", timeout=lock_timeout(config))
+    try:
+        with console.status("[highlight]Waiting for other autoviron processes...[/highlight]", phase="lock_wait"):
+            lock.acquire()
+    except LockTimeout as e:
+        log_error(str(e))
+        return False
+    try:
+        if lock.waited and _is_installed(env_path, package_name):
+            # Another invocation installed it while we waited
+            log_info(f"'{package_name}' was just installed by another autoviron process.")
+            return True
+        error = _install_package_locked(env_type, env_path, project_root, package_name, config)
+    finally:
+        lock.release()
+    if negative is not None:
+        if error is None:
+            negative.forget(module, package_name)
+        else:
+            negative.record(module, package_name, error)
+    return error is None
+
+
+def _install_package_locked(env_type: EnvironmentType, env_path: Path, project_root: Path, package_name: str, config: dict) -> Optional[str]:
+    """Install one package; returns None on success and the installer's output on failure."""
+    before = bytecode.snapshot(env_path)
+    started = time.monotonic()
+    with console.status(f"[highlight]Auto-installing '{package_name}'...[/highlight]", phase="install", package=package_name):
         try:
             if env_type == EnvironmentType.POETRY:
                 subprocess.run(["poetry", "add", package_name], cwd=project_root, check=True, capture_output=True)
@@ -113,10 +219,18 @@ def _auto_install_package(env_type: EnvironmentType, env_path: Path, project_roo
                 subprocess.run(["conda", "install", "-y", "-n", env_path.name, package_name], cwd=project_root, check=True, capture_output=True)
             else:
                 pip_bin = env_path / ("Scripts" if os.name == "nt" else "bin") / "pip"
-                subprocess.run([str(pip_bin), "install", package_name], cwd=project_root, check=True, capture_output=True)
+                subprocess.run([str(pip_bin), "install"] + bytecode.pip_flags(config) + [package_name], cwd=project_root, check=True, capture_output=True)
             log_success(f"Successfully installed '{package_name}'.")
-            return True
+            emit("install", source="heal", packages=[package_name], ok=True,
+                 duration=round(time.monotonic() - started, 6))
         except subprocess.CalledProcessError as e:
-            log_error(f"Failed to install '{package_name}': {e.stderr if hasattr(e, 'stderr') else e}")
-            return False
+            output = (e.stderr or b"").decode(errors="replace") if isinstance(e.stderr, bytes) else str(e.stderr or e)
+            log_error(f"Failed to install '{package_name}': {output.strip()[-500:]}")
+            emit("install", source="heal", packages=[package_name], ok=False,
+                 duration=round(time.monotonic() - started, 6))
+            return output or str(e)
+    if bytecode.settings(config)["enabled"]:
+        with console.status("[highlight]Precompiling bytecode...[/highlight]", phase="precompile"):
+            bytecode.precompile(env_path, project_root, config, before)
+    return None
 
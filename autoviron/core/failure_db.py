@@ -1,11 +1,13 @@
 import json
 from pathlib import Path
 from typing import Dict, Any
+from autoviron.core.locking import project_lock, atomic_write_text
 
 class FailureDB:
     """Stores past execution failures and their resolutions to avoid repeating mistakes."""
     
     def __init__(self, project_root: Path):
+        self.project_root = project_root
         self.db_path = project_root / ".autoviron_failures.json"
         self._cache = self._load()
         
@@ -19,19 +21,23 @@ class FailureDB:
         
     def _save(self):
         try:
-            self.db_path.write_text(json.dumps(self._cache, indent=4))
+            atomic_write_text(self.db_path, json.dumps(self._cache, indent=4))
         except Exception:
             pass
             
     def record_failure(self, error_type: str, error_msg: str, resolution: str):
         """Record an error and what was done to fix it."""
-        if error_type not in self._cache:
-            self._cache[error_type] = []
-            
         entry = {"message": error_msg, "resolution": resolution}
-        if entry not in self._cache[error_type]:
-            self._cache[error_type].append(entry)
-            self._save()
+        try:
+            with project_lock(self.project_root, "failures", timeout=30):
+                # Merge with whatever other processes recorded since we loaded
+                self._cache = self._load()
+                entries = self._cache.setdefault(error_type, [])
+                if entry not in entries:
+                    entries.append(entry)
+                    self._save()
+        except TimeoutError:
+            self._cache.setdefault(error_type, []).append(entry)
             
     def get_resolutions(self, error_type: str) -> list:
         """Get past resolutions for a specific error type."""
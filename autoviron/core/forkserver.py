@@ -0,0 +1,368 @@
+"""
+Opt-in pre-warmed fork-server per environment (`run --fork-server`).
+
+A long-lived process started with the env's interpreter imports the heavy
+modules a project uses (configured, suggested by the project plugin, or
+learned from the import scan of the scripts it runs) and then forks a child
+for every run or heal retry, handing it argv, cwd, the activated environment
+and our stdio. The server is keyed by the env's activation metadata and the
+on-disk state of every preloaded module, so installs or upgrades that touch
+them start a fresh one; it also exits on its own after `idle_timeout`.
+Each server listens on a socket named after its key, and every run holds a
+shared lock on the server's clients file: replacing a server that another
+run is still using leaves it to that run, which stops it when it is done.
+See `forkserver_worker.py` for the server side.
+"""
+import os
+import json
+import time
+import signal
+import socket
+import struct
+import hashlib
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from autoviron.core.config import cache_dir, section
+from autoviron.core.env_manager import EnvironmentType
+from autoviron.core.deps import get_stdlib_modules, scan_imports
+from autoviron.core.locking import FileLock, LockTimeout, project_lock, atomic_write_text
+from autoviron.core import dists as dist_meta
+
+WORKER_SCRIPT = Path(__file__).resolve().parent / "forkserver_worker.py"
+HEADER = struct.Struct("!I")
+# Longest AF_UNIX path we rely on (Linux allows 107 bytes, macOS 103)
+MAX_SOCKET_PATH = 100
+
+
+def settings(config: dict) -> dict:
+    return section(config, "forkserver")
+
+
+def available() -> bool:
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+def _digest(env_path: Path) -> str:
+    return hashlib.sha1(str(env_path.resolve()).encode()).hexdigest()[:16]
+
+
+def _server_dir() -> Path:
+    path = cache_dir() / "forkserver"
+    path.mkdir(parents=True, exist_ok=True, mode=0o700)
+    return path
+
+
+def info_path(env_path: Path) -> Path:
+    return _server_dir() / f"{_digest(env_path)}.json"
+
+
+def _learned_path(env_path: Path) -> Path:
+    return _server_dir() / f"{_digest(env_path)}.learned.json"
+
+
+def socket_path(env_path: Path, key: str) -> Path:
+    name = f"{_digest(env_path)}-{key[:8]}.sock"
+    path = _server_dir() / name
+    if len(str(path)) > MAX_SOCKET_PATH:
+        path = Path(tempfile.gettempdir()) / f"autoviron-{os.getuid()}-{name}"
+    return path
+
+
+def site_modules(env_path: Path) -> Dict[str, int]:
+    """Map each top-level module in the env's site-packages to the mtime of its file or package dir."""
+    modules: Dict[str, int] = {}
+    for site in dist_meta.find_site_packages(env_path):
+        try:
+            entries = list(os.scandir(site))
+        except OSError:
+            continue
+        for entry in entries:
+            name = entry.name
+            if name.startswith((".", "__")) or name.endswith((".dist-info", ".egg-info", ".pth", ".data")):
+                continue
+            module = name.split(".", 1)[0]
+            if entry.is_dir() or name.endswith((".py", ".so", ".pyd")):
+                try:
+                    modules[module] = max(modules.get(module, 0), entry.stat().st_mtime_ns)
+                except OSError:
+                    continue
+    return modules
+
+
+def learned_modules(env_path: Path) -> List[str]:
+    try:
+        return list(json.loads(_learned_path(env_path).read_text()))
+    except (OSError, ValueError):
+        return []
+
+
+def learn(env_path: Path, sources: Iterable[Path], limit: int = 32) -> List[str]:
+    """Record the third-party modules `sources` import that the env provides."""
+    provided = site_modules(env_path)
+    stdlib = get_stdlib_modules()
+    learned = learned_modules(env_path)
+    for source in sources:
+        for module in sorted(scan_imports(source)):
+            if module in provided and module not in stdlib and module not in learned:
+                learned.append(module)
+    learned = learned[-limit:]
+    if learned != learned_modules(env_path):
+        try:
+            atomic_write_text(_learned_path(env_path), json.dumps(learned))
+        except OSError:
+            pass
+    return learned
+
+
+def preload_modules(env_path: Path, project_root: Path, opts: dict) -> List[str]:
+    """Configured modules, plus the plugin's suggestions and learned imports the env actually has."""
+    from autoviron.core.detector import get_active_plugin
+    plugin = get_active_plugin(project_root)
+    provided = site_modules(env_path)
+    suggested = (plugin.get_preload_modules() if plugin else []) + (learned_modules(env_path) if opts["learn"] else [])
+    modules = list(opts["preload"] or [])
+    for module in suggested:
+        if module in provided and module not in modules:
+            modules.append(module)
+    return modules
+
+
+def server_key(env_type: EnvironmentType, env_path: Path, modules: List[str]) -> str:
+    """Fingerprint of everything the warm server depends on."""
+    from autoviron.core.activation import _metadata_key
+    provided = site_modules(env_path)
+    key = [_metadata_key(env_type, env_path), WORKER_SCRIPT.stat().st_mtime_ns, [(m, provided.get(m, 0)) for m in modules]]
+    return hashlib.sha1(json.dumps(key).encode()).hexdigest()
+
+
+def server_argv(cmd: List[str], python: str) -> Optional[List[str]]:
+    """The argv a forked child runs for `cmd`, or None if the server cannot run it.
+
+    Only `python script.py ...`, `python -m module ...` and `python -c code ...`
+    are served; anything with interpreter options needs a real process.
+    """
+    if len(cmd) < 2 or cmd[0] != python:
+        return None
+    if cmd[1] in ("-m", "-c"):
+        return cmd[1:] if len(cmd) >= 3 else None
+    if cmd[1].startswith("-"):
+        return None
+    return cmd[1:]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_info(env_path: Path) -> Optional[dict]:
+    try:
+        return json.loads(info_path(env_path).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+class ForkServer:
+    """Client for a running fork-server."""
+
+    def __init__(self, info: dict, env_path: Path):
+        self.pid = info["pid"]
+        self.socket = info["socket"]
+        self.key = info["key"]
+        self.env_path = env_path
+        self.clients_lock = _server_dir() / f"{_digest(env_path)}-{self.pid}.clients.lock"
+
+    def _request(self, payload: dict, fds: List[int]) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket)
+            data = json.dumps(dict(payload, key=self.key)).encode()
+            ancillary = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, struct.pack(f"{len(fds)}i", *fds))] if fds else []
+            sock.sendmsg([HEADER.pack(len(data))], ancillary)
+            sock.sendall(data)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def ping(self) -> bool:
+        try:
+            with self._request({"ping": True}, []) as sock:
+                # The pid check makes sure it is still the process we started
+                return json.loads(sock.makefile("r").readline() or "{}").get("pong") == self.pid
+        except (OSError, ValueError):
+            return False
+
+    def retire(self):
+        """Stop the server unless a run is still using it; that run stops it when it is done."""
+        try:
+            with FileLock(self.clients_lock, timeout=0, description="fork-server clients"):
+                if self.ping():
+                    os.kill(self.pid, signal.SIGTERM)
+                try:
+                    self.clients_lock.unlink()
+                except OSError:
+                    pass
+        except LockTimeout:
+            pass
+
+    def run(self, argv: List[str], cwd: Path, env: Dict[str, str],
+            limits: Optional[dict] = None) -> Optional[subprocess.CompletedProcess]:
+        """Run `argv` in a forked child, capturing its output like `subprocess.run(capture_output=True)`.
+
+        The child's resource usage, as reaped by the server, is attached as
+        `rusage`. Returns None if the server turned out to be stale or unreachable.
+        """
+        clients = FileLock(self.clients_lock, shared=True, timeout=0, description="fork-server clients")
+        try:
+            clients.acquire()
+        except LockTimeout:
+            return None  # being stopped right now
+        try:
+            return self._run(argv, cwd, env, limits)
+        finally:
+            clients.release()
+            info = _read_info(self.env_path)
+            if not info or info.get("pid") != self.pid:
+                self.retire()  # replaced while we used it
+
+    def _run(self, argv: List[str], cwd: Path, env: Dict[str, str],
+             limits: Optional[dict]) -> Optional[subprocess.CompletedProcess]:
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        # Like subprocess, the child inherits fd 0 whatever sys.stdin currently is
+        try:
+            os.fstat(0)
+            in_fd = os.dup(0)
+        except OSError:
+            in_fd = os.open(os.devnull, os.O_RDONLY)
+        try:
+            sock = self._request({"argv": argv, "cwd": str(cwd), "env": env, "limits": limits or {}},
+                                 [in_fd, out_w, err_w])
+        except OSError:
+            for fd in (out_r, err_r):
+                os.close(fd)
+            return None
+        finally:
+            for fd in (in_fd, out_w, err_w):
+                os.close(fd)
+
+        chunks: Dict[int, List[bytes]] = {out_r: [], err_r: []}
+
+        def drain(fd: int):
+            with os.fdopen(fd, "rb") as pipe:
+                for block in iter(lambda: pipe.read(65536), b""):
+                    chunks[fd].append(block)
+
+        readers = [threading.Thread(target=drain, args=(fd,), daemon=True) for fd in (out_r, err_r)]
+        for reader in readers:
+            reader.start()
+        with sock, sock.makefile("r") as replies:
+            started = json.loads(replies.readline() or "{}")
+            if "pid" not in started:
+                for reader in readers:
+                    reader.join()
+                return None
+            while True:
+                try:
+                    finished = json.loads(replies.readline() or "{}")
+                    break
+                except KeyboardInterrupt:
+                    os.kill(started["pid"], signal.SIGINT)
+        for reader in readers:
+            reader.join()
+        stdout = b"".join(chunks[out_r]).decode(errors="replace")
+        stderr = b"".join(chunks[err_r]).decode(errors="replace")
+        result = subprocess.CompletedProcess(argv, finished.get("exit", 1), stdout, stderr)
+        result.rusage = finished.get("rusage")
+        return result
+
+
+def stop_server(env_path: Path):
+    """Stop the env's fork-server, if one is running, once no run is using it."""
+    info = _read_info(env_path)
+    try:
+        info_path(env_path).unlink()
+    except OSError:
+        pass
+    if info:
+        ForkServer(info, env_path).retire()
+
+
+def _start_server(env_type: EnvironmentType, env_path: Path, project_root: Path, modules: List[str],
+                  key: str, opts: dict) -> Optional[ForkServer]:
+    from autoviron.core.activation import resolve_activation
+    snapshot = resolve_activation(env_type, env_path)
+    if snapshot is None:
+        return None
+    sock_path = socket_path(env_path, key)
+    log_file = _server_dir() / f"{_digest(env_path)}.log"
+    with open(log_file, "ab") as log:
+        proc = subprocess.Popen(
+            [snapshot.python, str(WORKER_SCRIPT), str(sock_path), key, str(opts["idle_timeout"])] + modules,
+            cwd=project_root, env=snapshot.apply(), stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    info = {"pid": proc.pid, "socket": str(sock_path), "key": key, "modules": modules, "started": time.time()}
+    server = ForkServer(info, env_path)
+    deadline = time.monotonic() + float(opts["start_timeout"])
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return None
+        if sock_path.exists() and server.ping():
+            atomic_write_text(info_path(env_path), json.dumps(info))
+            return server
+        time.sleep(0.05)
+    proc.terminate()
+    return None
+
+
+def ensure_server(env_type: EnvironmentType, env_path: Path, project_root: Path, config: dict) -> Optional[ForkServer]:
+    """Return a fork-server for the env that matches its current state, starting one if needed."""
+    if not available():
+        return None
+    opts = settings(config)
+    modules = preload_modules(env_path, project_root, opts)
+    key = server_key(env_type, env_path, modules)
+
+    def current() -> Optional[ForkServer]:
+        info = _read_info(env_path)
+        if info and info.get("key") == key and _pid_alive(info["pid"]) and Path(info["socket"]).exists():
+            return ForkServer(info, env_path)
+        return None
+
+    server = current()
+    if server:
+        return server
+    with project_lock(project_root, f"forkserver-{_digest(env_path)}", timeout=float(opts["start_timeout"])):
+        server = current()
+        if server:
+            return server
+        stop_server(env_path)
+        return _start_server(env_type, env_path, project_root, modules, key, opts)
+
+
+def run_in_server(env_type: EnvironmentType, env_path: Path, project_root: Path, config: dict,
+                  cmd: List[str], env: Dict[str, str], limits: Optional[dict] = None) -> Optional[subprocess.CompletedProcess]:
+    """Run a prepared command through the fork-server; None means "run it normally"."""
+    from autoviron.core.activation import resolve_activation
+    snapshot = resolve_activation(env_type, env_path)
+    argv = server_argv(cmd, snapshot.python) if snapshot else None
+    if argv is None:
+        return None
+    opts = settings(config)
+    if opts["learn"] and argv[0] not in ("-m", "-c"):
+        learn(env_path, [project_root / argv[0]], int(opts["max_learned"]))
+    try:
+        server = ensure_server(env_type, env_path, project_root, config)
+        return server.run(argv, project_root, env, limits) if server else None
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,225 @@
+"""
+Fork-server process, run by an environment's own interpreter.
+
+Usage: python forkserver_worker.py <socket> <key> <idle_timeout> [module ...]
+
+Imports the given modules once, then listens on a Unix socket. Each request
+carries argv, cwd, the environment and the caller's stdin/stdout/stderr
+file descriptors; the server forks, the child takes over those fds and runs
+the script/-m/-c target as `__main__`, and the server reports the child's
+pid and exit status back over the connection. Standalone on purpose: it
+must import nothing from autoviron.
+"""
+import os
+import sys
+import json
+import array
+import runpy
+import signal
+import socket
+import struct
+import threading
+import traceback
+import importlib
+
+HEADER = struct.Struct("!I")
+MAX_FDS = 3
+
+
+def _recv_request(conn):
+    """Read one length-prefixed JSON request plus the fds passed alongside it."""
+    fds = array.array("i")
+    msg, ancdata, _, _ = conn.recvmsg(HEADER.size, socket.CMSG_LEN(MAX_FDS * fds.itemsize))
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - (len(data) % fds.itemsize)])
+    if len(msg) < HEADER.size:
+        msg += conn.recv(HEADER.size - len(msg))
+    (length,) = HEADER.unpack(msg)
+    payload = b""
+    while len(payload) < length:
+        chunk = conn.recv(length - len(payload))
+        if not chunk:
+            raise ConnectionError("truncated request")
+        payload += chunk
+    return json.loads(payload.decode()), list(fds)
+
+
+def _send(conn, message):
+    conn.sendall((json.dumps(message) + "\n").encode())
+
+
+def _exit_code(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _print_exc():
+    """Print the current traceback without the server's own frames, as a cold run would."""
+    etype, value, tb = sys.exc_info()
+    while tb is not None and tb.tb_frame.f_code.co_filename in (__file__, runpy.__file__, "<frozen runpy>"):
+        tb = tb.tb_next
+    traceback.print_exception(etype, value, tb)
+
+
+def _apply_limits(limits):
+    """Same limits as a cold run gets (see autoviron.core.resources.apply_limits)."""
+    import resource
+    if limits.get("max_rss"):
+        resource.setrlimit(resource.RLIMIT_AS, (int(limits["max_rss"]), int(limits["max_rss"])))
+    if limits.get("max_cpu"):
+        soft = max(1, int(float(limits["max_cpu"]) + 0.999))
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1))
+
+
+def _rusage(usage):
+    rss_scale = 1 if sys.platform == "darwin" else 1024
+    return {"user": usage.ru_utime, "sys": usage.ru_stime, "max_rss": usage.ru_maxrss * rss_scale,
+            "inblock": usage.ru_inblock, "oublock": usage.ru_oublock,
+            "nvcsw": usage.ru_nvcsw, "nivcsw": usage.ru_nivcsw}
+
+
+def _run_child(request, fds):
+    """Runs in the forked child; never returns."""
+    code = 0
+    try:
+        for target, fd in enumerate(fds[:3]):
+            os.dup2(fd, target)
+        for fd in fds:
+            os.close(fd)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        _apply_limits(request.get("limits") or {})
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", buffering=1 if os.isatty(1) else -1, closefd=False)
+        sys.stderr = open(2, "w", buffering=1, closefd=False)
+        sys.__stdin__, sys.__stdout__, sys.__stderr__ = sys.stdin, sys.stdout, sys.stderr
+        importlib.invalidate_caches()
+
+        argv = request["argv"]
+        if argv[0] == "-m":
+            sys.argv = argv[1:]
+            sys.path[0] = os.getcwd()
+            runpy.run_module(argv[1], run_name="__main__", alter_sys=True)
+        elif argv[0] == "-c":
+            sys.argv = ["-c"] + argv[2:]
+            sys.path[0] = ""
+            exec(compile(argv[1], "<string>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+        else:
+            sys.argv = list(argv)
+            sys.path[0] = os.path.dirname(os.path.abspath(argv[0]))
+            runpy.run_path(argv[0], run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except KeyboardInterrupt:
+        _print_exc()
+        code = 130
+    except BaseException:
+        _print_exc()
+        code = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+    os._exit(code)
+
+
+def _wait_and_report(conn, pid):
+    try:
+        _, status, usage = os.wait4(pid, 0)
+        _send(conn, {"exit": _exit_code(status), "rusage": _rusage(usage)})
+    except OSError:
+        pass
+    finally:
+        conn.close()
+
+
+def serve(sock_path, key, idle_timeout, modules):
+    # Started from the project root; never resolve imports against this script's directory
+    sys.path[0] = os.getcwd()
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except BaseException:
+            pass  # a module that fails to import is simply not preloaded
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Unwind through `finally` so running children still get their exit status reported
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        os.unlink(sock_path)
+    except OSError:
+        pass
+    old_umask = os.umask(0o077)
+    try:
+        server.bind(sock_path)
+    finally:
+        os.umask(old_umask)
+    inode = os.stat(sock_path).st_ino
+    server.listen(16)
+    server.settimeout(idle_timeout or None)
+    print(f"ready pid={os.getpid()} preloaded={','.join(m for m in modules if m in sys.modules)}", flush=True)
+
+    waiters = []
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                return  # idle; the next run will start a fresh server
+            conn.settimeout(None)
+            try:
+                request, fds = _recv_request(conn)
+            except (OSError, ValueError, ConnectionError):
+                conn.close()
+                continue
+            if request.get("key") != key:
+                for fd in fds:
+                    os.close(fd)
+                _send(conn, {"stale": True})
+                conn.close()
+                return
+            if request.get("ping"):
+                _send(conn, {"pong": os.getpid()})
+                conn.close()
+                continue
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                server.close()
+                conn.close()
+                _run_child(request, fds)
+            for fd in fds:
+                os.close(fd)
+            _send(conn, {"pid": pid})
+            waiter = threading.Thread(target=_wait_and_report, args=(conn, pid), daemon=True)
+            waiter.start()
+            waiters = [w for w in waiters if w.is_alive()] + [waiter]
+    finally:
+        server.close()
+        try:
+            # A replacement server may already have bound the same path
+            if os.stat(sock_path).st_ino == inode:
+                os.unlink(sock_path)
+        except OSError:
+            pass
+        for waiter in waiters:
+            waiter.join()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], sys.argv[2], float(sys.argv[3]), sys.argv[4:])
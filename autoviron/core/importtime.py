@@ -0,0 +1,200 @@
+"""
+Import-time profiling for `autoviron run --importtime`.
+
+The child runs with `-X importtime` (or `PYTHONPROFILEIMPORTTIME` for
+console scripts), and its stderr is split into the program's own output
+and the interpreter's `import time:` lines. Those are post-order, indented
+by depth, so they rebuild into a tree with self and cumulative time per
+module. Modules are attributed to the distribution that installs them, or
+to `stdlib`/`project`, and the tree is saved as JSON so the next profile
+of the same command can be compared against it.
+"""
+import re
+import json
+import time
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from autoviron.core.config import cache_dir, section
+from autoviron.core.deps import get_stdlib_modules
+from autoviron.core.locking import atomic_write_text
+from autoviron.core import dists as dist_meta
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)\s*$")
+_HEADER = "import time: self [us] | cumulative | imported package"
+
+
+def settings(config: dict) -> dict:
+    return section(config, "importtime")
+
+
+@dataclass
+class ImportNode:
+    """One module import: its own time and the time including everything it imported."""
+    module: str
+    self_us: int
+    cumulative_us: int
+    children: List["ImportNode"] = field(default_factory=list)
+    dist: str = ""
+
+    def to_dict(self) -> dict:
+        return {"module": self.module, "self_us": self.self_us, "cumulative_us": self.cumulative_us,
+                "dist": self.dist, "children": [child.to_dict() for child in self.children]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ImportNode":
+        return cls(data["module"], data["self_us"], data["cumulative_us"],
+                   [cls.from_dict(child) for child in data.get("children", [])], data.get("dist", ""))
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+def split_stderr(stderr: str) -> Tuple[List[ImportNode], str]:
+    """Separate `-X importtime` output from the program's stderr; returns (tree roots, the rest)."""
+    pending: Dict[int, List[ImportNode]] = {}
+    rest = []
+    for line in stderr.splitlines(keepends=True):
+        match = _LINE.match(line.rstrip("\n"))
+        if not match:
+            if not line.startswith(_HEADER):
+                rest.append(line)
+            continue
+        depth = (len(match.group(3)) - 1) // 2
+        node = ImportNode(match.group(4), int(match.group(1)), int(match.group(2)))
+        # Children are printed before their parent, one level deeper
+        node.children = pending.pop(depth + 1, [])
+        pending.setdefault(depth, []).append(node)
+    roots = pending.pop(0, [])
+    for depth in sorted(pending):
+        roots.extend(pending[depth])  # truncated output (e.g. the child was killed mid-import)
+    return roots, "".join(rest)
+
+
+def attribute(roots: List[ImportNode], env_path: Path, project_root: Path):
+    """Label every node with the distribution that provides its top-level module."""
+    owners: Dict[str, str] = {}
+    for dist in dist_meta.env_distributions(env_path):
+        for module in dist.top_level():
+            owners.setdefault(module, dist.name)
+    stdlib = get_stdlib_modules()
+    for root in roots:
+        for node in root.walk():
+            top = node.module.split(".", 1)[0]
+            if top in owners:
+                node.dist = owners[top]
+            elif top in stdlib or top.startswith("_") or top in ("sitecustomize", "usercustomize"):
+                node.dist = "stdlib"
+            elif (project_root / f"{top}.py").exists() or (project_root / top).is_dir() or (project_root / "src" / top).is_dir():
+                node.dist = "project"
+            else:
+                node.dist = "unknown"
+
+
+def flatten(roots: List[ImportNode]) -> Dict[str, ImportNode]:
+    return {node.module: node for root in roots for node in root.walk()}
+
+
+def by_distribution(roots: List[ImportNode]) -> Dict[str, int]:
+    """Total self time per distribution."""
+    totals: Dict[str, int] = {}
+    for node in flatten(roots).values():
+        totals[node.dist] = totals.get(node.dist, 0) + node.self_us
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def total_us(roots: List[ImportNode]) -> int:
+    return sum(root.cumulative_us for root in roots)
+
+
+def profile_path(project_root: Path, command: List[str]) -> Path:
+    key = json.dumps([str(project_root.resolve())] + list(command))
+    return cache_dir() / "importtime" / f"{hashlib.sha1(key.encode()).hexdigest()[:16]}.json"
+
+
+def save_profile(path: Path, command: List[str], roots: List[ImportNode]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(path, json.dumps({"command": command, "created": time.time(), "total_us": total_us(roots),
+                                        "tree": [root.to_dict() for root in roots]}, indent=1))
+
+
+def load_profile(path: Path) -> Optional[List[ImportNode]]:
+    try:
+        data = json.loads(path.read_text())
+        return [ImportNode.from_dict(node) for node in data["tree"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def regressions(current: List[ImportNode], baseline: List[ImportNode], opts: dict) -> List[Tuple[str, int, int]]:
+    """(module, before, after) cumulative times that grew past the configured thresholds.
+
+    Modules that are new since the baseline count as growing from zero.
+    """
+    before = flatten(baseline)
+    found = []
+    for module, node in flatten(current).items():
+        old = before[module].cumulative_us if module in before else 0
+        grown = node.cumulative_us - old
+        if grown >= opts["regression_min_us"] and (old == 0 or grown / old >= opts["regression_ratio"]):
+            found.append((module, old, node.cumulative_us))
+    found.sort(key=lambda item: item[1] - item[2])
+    # A parent's regression usually just repeats its child's; keep the deepest ones
+    modules = {item[0] for item in found}
+    return [item for item in found if not any(other.startswith(item[0] + ".") for other in modules)]
+
+
+class ImportTimeProfiler:
+    """Hooks into `self_healing_execute`: adds the flag to each attempt and keeps the last tree."""
+
+    def __init__(self):
+        self.roots: List[ImportNode] = []
+
+    def prepare(self, cmd: List[str], env: Dict[str, str]) -> List[str]:
+        if cmd and Path(cmd[0]).name.startswith("python"):
+            return [cmd[0], "-X", "importtime"] + cmd[1:]
+        # Console scripts: the env var has the same effect on whatever interpreter they start
+        env["PYTHONPROFILEIMPORTTIME"] = "1"
+        return cmd
+
+    def collect(self, stderr: str) -> str:
+        roots, rest = split_stderr(stderr or "")
+        if roots:
+            self.roots = roots
+        return rest
+
+
+def print_profile(roots: List[ImportNode], opts: dict, baseline: Optional[List[ImportNode]] = None):
+    """Print the slowest imports, the per-distribution totals and any regressions."""
+    from rich.table import Table
+    from autoviron.ux.console import console, log_success, log_warning
+    top = int(opts["top"])
+    nodes = sorted(flatten(roots).values(), key=lambda n: -n.cumulative_us)
+    table = Table(title=f"Slowest imports ({total_us(roots) / 1000:.1f} ms total)")
+    table.add_column("Module")
+    table.add_column("Distribution")
+    table.add_column("Cumulative", justify="right")
+    table.add_column("Self", justify="right")
+    for node in nodes[:top]:
+        table.add_row(node.module, node.dist, f"{node.cumulative_us / 1000:.1f} ms", f"{node.self_us / 1000:.1f} ms")
+    console.print(table)
+
+    dists = Table(title="Self time by distribution")
+    dists.add_column("Distribution")
+    dists.add_column("Self", justify="right")
+    for name, us in list(by_distribution(roots).items())[:top]:
+        dists.add_row(name, f"{us / 1000:.1f} ms")
+    console.print(dists)
+
+    if baseline is None:
+        return
+    found = regressions(roots, baseline, opts)
+    if not found:
+        log_success(f"No import regressions (baseline {total_us(baseline) / 1000:.1f} ms).")
+        return
+    for module, old, new in found[:top]:
+        change = "new" if old == 0 else f"+{(new - old) / old:.0%}"
+        log_warning(f"Import regression: {module} {old / 1000:.1f} ms -> {new / 1000:.1f} ms ({change})")
@@ -0,0 +1,281 @@
+"""
+Interpreter registry: which Pythons exist on this machine, and which one a
+project should use.
+
+Candidates come from PATH and the usual install roots (pyenv, asdf, uv,
+`/usr/bin/python3.*`, Homebrew, ...). Each one is probed once with a small
+script that reports version, implementation, ABI tag and prefix; probes run
+concurrently and results are cached by resolved path, mtime and size, so a
+warm lookup only lists directories and stats files. Selection honours
+`.python-version` and the project's `requires-python`, then the order of
+`python_versions`.
+"""
+import os
+import re
+import json
+import glob
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from autoviron.core.config import cache_dir, section
+from autoviron.core.locking import atomic_write_text
+
+CACHE_VERSION = 1
+PROBE_TIMEOUT = 30
+_NAME = re.compile(r"^python(3(\.\d+)?)?(\.exe)?$" if os.name == "nt" else r"^python(3(\.\d+)?)?$")
+_PROBE = (
+    "import sys, json, sysconfig, platform; print(json.dumps({"
+    "'executable': sys.executable, 'version': '%d.%d.%d' % sys.version_info[:3], "
+    "'implementation': sys.implementation.name, "
+    "'abi': sysconfig.get_config_var('SOABI') or sys.implementation.cache_tag or '', "
+    "'prefix': sys.prefix, 'base_prefix': getattr(sys, 'base_prefix', sys.prefix), "
+    "'machine': platform.machine()}))"
+)
+
+
+def settings(config: dict) -> dict:
+    return section(config, "interpreters")
+
+
+@dataclass
+class PythonInfo:
+    """A probed interpreter."""
+    executable: str
+    version: str
+    implementation: str
+    abi: str
+    prefix: str
+    base_prefix: str
+    machine: str = ""
+
+    @property
+    def minor(self) -> str:
+        return ".".join(self.version.split(".")[:2])
+
+    @property
+    def version_tuple(self):
+        return tuple(int(p) for p in self.version.split(".") if p.isdigit())
+
+    @property
+    def is_venv(self) -> bool:
+        return self.prefix != self.base_prefix
+
+
+def _install_roots(extra: Iterable[str] = ()) -> List[str]:
+    home = Path.home()
+    pyenv = os.environ.get("PYENV_ROOT") or str(home / ".pyenv")
+    asdf = os.environ.get("ASDF_DATA_DIR") or str(home / ".asdf")
+    patterns = [
+        f"{pyenv}/versions/*/bin",
+        f"{asdf}/installs/python/*/bin",
+        str(home / ".local/share/uv/python/*/bin"),
+        "/usr/bin", "/usr/local/bin", "/opt/homebrew/bin", "/opt/python/*/bin",
+        "/Library/Frameworks/Python.framework/Versions/*/bin",
+    ] + [os.path.expanduser(pattern) for pattern in extra]
+    roots = []
+    for pattern in patterns:
+        roots.extend(sorted(glob.glob(pattern)))
+    return roots
+
+
+def candidate_paths(extra_roots: Iterable[str] = ()) -> List[str]:
+    """Every `python`, `python3` and `python3.X` in PATH and the install roots, deduplicated."""
+    dirs = [d for d in os.environ.get("PATH", "").split(os.pathsep) if d] + _install_roots(extra_roots)
+    seen_dirs = set()
+    found: Dict[str, str] = {}
+    for directory in dirs:
+        # pyenv/asdf shims are dispatch scripts; the real installs are scanned under their roots
+        if directory in seen_dirs or _is_shim_dir(directory):
+            continue
+        seen_dirs.add(directory)
+        try:
+            entries = os.listdir(directory)
+        except OSError:
+            continue
+        for name in entries:
+            if _NAME.match(name):
+                path = os.path.join(directory, name)
+                real = os.path.realpath(path)
+                if real not in found and os.access(real, os.X_OK) and os.path.isfile(real):
+                    found[real] = path
+    return list(found.values())
+
+
+def _cache_path() -> Path:
+    return cache_dir() / "interpreters.json"
+
+
+def _stamp(path: str) -> Optional[List]:
+    real = os.path.realpath(path)
+    try:
+        st = os.stat(real)
+    except OSError:
+        return None
+    return [real, st.st_mtime_ns, st.st_size]
+
+
+def probe(path: str) -> Optional[PythonInfo]:
+    """Run the probe script with one interpreter."""
+    try:
+        out = subprocess.run([path, "-I", "-c", _PROBE], capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+        data = json.loads(out.stdout) if out.returncode == 0 else None
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+    if not data:
+        return None
+    return PythonInfo(**{k: data.get(k, "") for k in PythonInfo.__dataclass_fields__})
+
+
+class Registry:
+    """Probed interpreters, cached by executable path + mtime."""
+
+    def __init__(self):
+        try:
+            data = json.loads(_cache_path().read_text())
+            self.entries: Dict[str, dict] = data["entries"] if data.get("version") == CACHE_VERSION else {}
+        except (OSError, ValueError, KeyError):
+            self.entries = {}
+        self.dirty = False
+
+    def lookup(self, paths: Iterable[str]) -> Dict[str, Optional[PythonInfo]]:
+        """Info for each path; only paths whose stamp changed are probed, concurrently."""
+        results: Dict[str, Optional[PythonInfo]] = {}
+        to_probe = []
+        for path in paths:
+            stamp = _stamp(path)
+            if stamp is None:
+                results[path] = None
+                continue
+            entry = self.entries.get(path)
+            if entry and entry["stamp"] == stamp:
+                results[path] = PythonInfo(**entry["info"]) if entry["info"] else None
+            else:
+                to_probe.append((path, stamp))
+        if to_probe:
+            with ThreadPoolExecutor(max_workers=min(16, len(to_probe))) as pool:
+                probed = list(pool.map(probe, [path for path, _ in to_probe]))
+            for (path, stamp), info in zip(to_probe, probed):
+                results[path] = info
+                self.entries[path] = {"stamp": stamp, "info": asdict(info) if info else None}
+            self.dirty = True
+        return results
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            _cache_path().parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(_cache_path(), json.dumps({"version": CACHE_VERSION, "entries": self.entries}))
+        except OSError:
+            pass
+
+
+def clear_cache():
+    try:
+        _cache_path().unlink()
+    except OSError:
+        pass
+
+
+def _is_shim_dir(directory: str) -> bool:
+    return "shims" in Path(directory).parts
+
+
+def _resolve_name(name: str) -> Optional[str]:
+    """Like `shutil.which`, but past pyenv/asdf shims: what a shim runs depends on the cwd, not its mtime."""
+    if os.sep in name or (os.altsep and os.altsep in name):
+        return name if os.path.exists(name) else None
+    path = os.pathsep.join(d for d in os.environ.get("PATH", "").split(os.pathsep) if d and not _is_shim_dir(d))
+    return shutil.which(name, path=path)
+
+
+def discover(names: Iterable[str] = (), extra_roots: Iterable[str] = ()) -> List[PythonInfo]:
+    """All base (non-venv) interpreters found, newest first; `names` are resolved and included too."""
+    registry = Registry()
+    paths = candidate_paths(extra_roots)
+    for name in names:
+        path = _resolve_name(name)
+        if path and path not in paths:
+            paths.append(path)
+    infos = registry.lookup(paths)
+    registry.save()
+    unique: Dict[str, PythonInfo] = {}
+    for info in infos.values():
+        if info and not info.is_venv:
+            unique.setdefault(os.path.realpath(info.executable), info)
+    return sorted(unique.values(), key=lambda i: i.version_tuple, reverse=True)
+
+
+def resolve(names: Iterable[str]) -> List[PythonInfo]:
+    """Info for the given names/paths, in order, skipping ones that do not exist or run."""
+    registry = Registry()
+    paths = [p for p in (_resolve_name(n) for n in names) if p]
+    infos = registry.lookup(paths)
+    registry.save()
+    return [infos[p] for p in paths if infos.get(p)]
+
+
+def requires_python(project_root: Path) -> Optional[str]:
+    """The `requires-python` specifier from pyproject.toml, if any."""
+    from autoviron.core.config import read_config_file
+    data = read_config_file(project_root / "pyproject.toml")
+    spec = (data.get("project") or {}).get("requires-python")
+    if not spec:
+        spec = ((data.get("tool") or {}).get("poetry") or {}).get("dependencies", {}).get("python")
+        spec = _poetry_spec(spec) if isinstance(spec, str) else None
+    return spec or None
+
+
+def _poetry_spec(spec: str) -> Optional[str]:
+    """Translate the common Poetry forms (`^3.9`, `~3.10`, `>=3.8,<4`) to PEP 440."""
+    spec = spec.strip()
+    match = re.match(r"^\^(\d+)\.(\d+)", spec)
+    if match:
+        return f">={match.group(1)}.{match.group(2)},<{int(match.group(1)) + 1}"
+    match = re.match(r"^~(\d+)\.(\d+)", spec)
+    if match:
+        return f">={match.group(1)}.{match.group(2)},<{match.group(1)}.{int(match.group(2)) + 1}"
+    return spec if spec != "*" else None
+
+
+def matches(info: PythonInfo, spec: Optional[str]) -> bool:
+    if not spec:
+        return True
+    from packaging.specifiers import InvalidSpecifier, SpecifierSet
+    try:
+        return SpecifierSet(spec).contains(info.version, prereleases=True)
+    except InvalidSpecifier:
+        return True
+
+
+def pinned_version(project_root: Path) -> Optional[str]:
+    """The version in a `.python-version` file (pyenv/asdf/uv), if any."""
+    try:
+        lines = (project_root / ".python-version").read_text().split()
+    except OSError:
+        return None
+    return lines[0] if lines and lines[0][:1].isdigit() else None
+
+
+def select(project_root: Path, names: Iterable[str], config: Optional[dict] = None,
+           requires: Optional[str] = None) -> Optional[PythonInfo]:
+    """The interpreter a new env for the project should use.
+
+    A `.python-version` pin that satisfies `requires-python` (or `requires`,
+    when given) wins, then the first of `names` that does, then the newest
+    discovered interpreter that does.
+    """
+    spec = requires or requires_python(project_root)
+    pin = pinned_version(project_root)
+    roots = settings(config or {})["search_paths"]
+    if pin:
+        for info in discover(extra_roots=roots):
+            if (info.version == pin or info.version.startswith(pin + ".")) and matches(info, spec):
+                return info
+    for info in resolve(names):
+        if not info.is_venv and matches(info, spec):
+            return info
+    return next((info for info in discover(extra_roots=roots) if matches(info, spec)), None)
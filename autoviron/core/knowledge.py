@@ -0,0 +1,359 @@
+"""
+Offline package knowledge index behind `autoviron learn`.
+
+Built from the metadata (Summary, Keywords, classifiers, Requires-Dist) of
+every distribution in the environments autoviron has worked with, the
+interpreter autoviron itself runs on, and the wheels in pip's wheel cache
+plus any configured wheel directories. Each source is stamped (a
+site-packages dir by its mtime, a wheel by mtime and size), so a refresh
+only re-reads what changed. The derived inverted index (term -> packages)
+and reverse-dependency map are stored with the records in a marshal file,
+so searches and "why is this installed?" queries cost one load.
+"""
+import os
+import re
+import json
+import marshal
+import sysconfig
+import zipfile
+from email.parser import HeaderParser
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from packaging.requirements import InvalidRequirement, Requirement
+from autoviron.core.config import cache_dir, section
+from autoviron.core.locking import atomic_write_text
+from autoviron.core import dists as dist_meta
+
+INDEX_VERSION = 1
+# Field weights for search ranking
+WEIGHTS = {"name": 8, "keywords": 4, "topics": 2, "summary": 1}
+STOPWORDS = {"a", "an", "and", "for", "in", "of", "on", "the", "to", "with", "python", "library", "package", "your"}
+
+
+def settings(config: dict) -> dict:
+    return section(config, "knowledge")
+
+
+def _dir() -> Path:
+    return cache_dir() / "knowledge"
+
+
+def index_path() -> Path:
+    return _dir() / "index.marshal"
+
+
+def _records_path() -> Path:
+    return _dir() / "sources.marshal"
+
+
+def _load_marshal(path: Path) -> Optional[dict]:
+    try:
+        with open(path, "rb") as f:
+            data = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return data if isinstance(data, dict) and data.get("version") == INDEX_VERSION else None
+
+
+def _dump_marshal(path: Path, data: dict):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            marshal.dump(data, f)
+        os.replace(tmp, path)
+    except (OSError, ValueError):
+        pass
+
+
+def _envs_path() -> Path:
+    return _dir() / "envs.json"
+
+
+def known_envs() -> List[str]:
+    try:
+        return [p for p in json.loads(_envs_path().read_text()) if isinstance(p, str)]
+    except (OSError, ValueError, TypeError):
+        return []
+
+
+def remember_env(env_path: Path, limit: Optional[int] = None):
+    """Add an environment to the set the index is built from."""
+    limit = limit or int(settings({})["max_envs"])
+    envs = known_envs()
+    path = str(env_path.resolve())
+    if envs and envs[-1] == path:
+        return
+    envs = [p for p in envs if p != path and os.path.isdir(p)] + [path]
+    try:
+        _dir().mkdir(parents=True, exist_ok=True)
+        atomic_write_text(_envs_path(), json.dumps(envs[-limit:]))
+    except OSError:
+        pass
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, with stopwords dropped and plain plurals folded."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def _requirement_keys(raw: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """Split Requires-Dist into (always required, only via an extra) distribution keys."""
+    required, optional = [], []
+    for line in raw:
+        try:
+            req = Requirement(line)
+        except InvalidRequirement:
+            continue
+        key = dist_meta.normalize_name(req.name)
+        target = optional if req.marker and "extra" in str(req.marker) else required
+        if key not in target:
+            target.append(key)
+    return required, optional
+
+
+def env_requirements(env_path: Path) -> Dict[str, List[str]]:
+    """Installed distribution key -> the keys its own Requires-Dist always pulls in."""
+    return {dist.key: _requirement_keys(dist.metadata.get_all("Requires-Dist") or [])[0]
+            for dist in dist_meta.env_distributions(env_path)}
+
+
+def record_from_metadata(meta) -> Optional[dict]:
+    """The indexed fields of one METADATA/PKG-INFO message."""
+    name = meta.get("Name")
+    if not name:
+        return None
+    keywords = [k for k in re.split(r"[,\s]+", meta.get("Keywords") or "") if k]
+    topics = []
+    for classifier in meta.get_all("Classifier") or []:
+        parts = [p.strip() for p in classifier.split("::")]
+        if parts[0] in ("Topic", "Framework") and len(parts) > 1:
+            topics.append(" / ".join(parts[1:]))
+    urls = [tuple(part.strip() for part in url.split(",", 1)) for url in meta.get_all("Project-URL") or [] if "," in url]
+    preferred = [u for label, u in urls if label.lower() in ("homepage", "home", "source", "repository")]
+    home = meta.get("Home-page") or (preferred or [u for _, u in urls] or [""])[0]
+    requires, extras = _requirement_keys(meta.get_all("Requires-Dist") or [])
+    return {
+        "name": name, "version": meta.get("Version") or "", "summary": (meta.get("Summary") or "").strip(),
+        "keywords": keywords, "topics": topics, "home": home, "requires": requires, "extras": extras,
+    }
+
+
+def _read_site_packages(site: Path) -> Dict[str, dict]:
+    records = {}
+    for dist in dist_meta.iter_distributions(site):
+        record = record_from_metadata(dist.metadata)
+        if record:
+            records[dist.key] = record
+    return records
+
+
+def _read_wheel(path: Path) -> Dict[str, dict]:
+    try:
+        with zipfile.ZipFile(path) as wheel:
+            names = [n for n in wheel.namelist() if n.count("/") == 1 and n.endswith(".dist-info/METADATA")]
+            if not names:
+                return {}
+            meta = HeaderParser().parsestr(wheel.read(names[0]).decode("utf-8", errors="replace"))
+    except (OSError, zipfile.BadZipFile, KeyError):
+        return {}
+    record = record_from_metadata(meta)
+    return {dist_meta.normalize_name(record["name"]): record} if record else {}
+
+
+def _pip_cache_dir() -> Path:
+    if os.environ.get("PIP_CACHE_DIR"):
+        return Path(os.environ["PIP_CACHE_DIR"])
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "pip"
+
+
+def sources(opts: dict, extra_envs: Iterable[Path] = ()) -> Dict[str, Tuple[str, list]]:
+    """Map every metadata source to (kind, stamp)."""
+    found: Dict[str, Tuple[str, list]] = {}
+    sites = {Path(p) for p in {sysconfig.get_paths()["purelib"], sysconfig.get_paths()["platlib"]}}
+    for env in [Path(p) for p in known_envs()] + list(extra_envs):
+        sites.update(dist_meta.find_site_packages(env))
+    for site in sites:
+        try:
+            found[str(site)] = ("site", [site.stat().st_mtime_ns])
+        except OSError:
+            continue
+    wheel_dirs = [Path(os.path.expanduser(d)) for d in opts["wheel_dirs"] or []]
+    if opts["pip_cache"]:
+        wheel_dirs.append(_pip_cache_dir() / "wheels")
+    for directory in wheel_dirs:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(".whl"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found[path] = ("wheel", [st.st_mtime_ns, st.st_size])
+    return found
+
+
+def _version_key(version: str):
+    from packaging.version import InvalidVersion, Version
+    try:
+        return (1, Version(version))
+    except InvalidVersion:
+        return (0, version)
+
+
+class KnowledgeIndex:
+    """Package records plus the search and reverse-dependency indexes derived from them.
+
+    Per-source records live in a second file that is only read when a
+    source changed, so an up-to-date index loads just what queries need.
+    """
+
+    def __init__(self, data: Optional[dict] = None):
+        data = data or {}
+        self.stamps: Dict[str, list] = data.get("stamps", {})
+        self.packages: Dict[str, dict] = data.get("packages", {})
+        self.terms: Dict[str, Dict[str, int]] = data.get("terms", {})
+        self.rdeps: Dict[str, List[str]] = data.get("rdeps", {})
+
+    @classmethod
+    def load(cls) -> "KnowledgeIndex":
+        data = _load_marshal(index_path())
+        return cls(data) if data is not None else cls()
+
+    def save(self, source_records: Dict[str, dict]):
+        _dump_marshal(_records_path(), {"version": INDEX_VERSION, "sources": source_records})
+        _dump_marshal(index_path(), {"version": INDEX_VERSION, "stamps": self.stamps, "packages": self.packages,
+                                     "terms": self.terms, "rdeps": self.rdeps})
+
+    def refresh(self, opts: dict, extra_envs: Iterable[Path] = (), rebuild: bool = False) -> int:
+        """Re-read changed sources; returns how many were (re)read or dropped."""
+        current = sources(opts, extra_envs)
+        stale = [path for path, stamp in self.stamps.items()
+                 if rebuild or path not in current or stamp != current[path][1]]
+        added = [path for path in current if path not in self.stamps or path in stale]
+        if not stale and not added:
+            return 0
+        stored = None if rebuild else _load_marshal(_records_path())
+        records: Dict[str, dict] = stored["sources"] if stored else {}
+        if stored is None:
+            # Without the per-source records every source has to be read again
+            added = list(current)
+        for path in stale:
+            records.pop(path, None)
+            self.stamps.pop(path, None)
+        for path in added:
+            kind, stamp = current[path]
+            records[path] = _read_site_packages(Path(path)) if kind == "site" else _read_wheel(Path(path))
+            self.stamps[path] = stamp
+        records = {path: records[path] for path in self.stamps if path in records}
+        self._derive(records)
+        self.save(records)
+        return len(set(stale) | set(added))
+
+    def _derive(self, source_records: Dict[str, dict]):
+        """Merge the per-source records (newest version wins) and rebuild both indexes."""
+        packages: Dict[str, dict] = {}
+        for path in sorted(source_records):
+            for key, record in source_records[path].items():
+                best = packages.get(key)
+                if best is None or _version_key(record["version"]) > _version_key(best["version"]):
+                    packages[key] = record
+        terms: Dict[str, Dict[str, int]] = {}
+        rdeps: Dict[str, List[str]] = {}
+        for key, record in packages.items():
+            fields = {
+                "name": [key, record["name"]] + key.split("-"),
+                "keywords": record["keywords"],
+                "topics": record["topics"],
+                "summary": [record["summary"]],
+            }
+            for field_name, values in fields.items():
+                for token in set(tokenize(" ".join(values))):
+                    postings = terms.setdefault(token, {})
+                    postings[key] = postings.get(key, 0) + WEIGHTS[field_name]
+            for dep in record["requires"]:
+                rdeps.setdefault(dep, []).append(key)
+        self.packages, self.terms, self.rdeps = packages, terms, {k: sorted(v) for k, v in rdeps.items()}
+
+    def get(self, name: str) -> Optional[dict]:
+        return self.packages.get(dist_meta.normalize_name(name))
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Rank packages matching every query term (or, failing that, any of them)."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        postings = [self._postings(token) for token in tokens]
+        keys = set.intersection(*(set(p) for p in postings)) or set().union(*(set(p) for p in postings))
+        scored = [(key, sum(p.get(key, 0) for p in postings)) for key in keys]
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+    def _postings(self, token: str) -> Dict[str, int]:
+        exact = self.terms.get(token)
+        if exact is not None or len(token) < 4:
+            return exact or {}
+        # Prefix fallback ("async" -> "asyncio") for terms that never appear verbatim
+        merged: Dict[str, int] = {}
+        for term, postings in self.terms.items():
+            if term.startswith(token):
+                for key, weight in postings.items():
+                    merged[key] = max(merged.get(key, 0), weight)
+        return merged
+
+    def required_by(self, name: str, among: Optional[Iterable[str]] = None,
+                    requires: Optional[Dict[str, List[str]]] = None) -> List[str]:
+        """Packages that depend on `name`, optionally restricted to a set of installed keys.
+
+        `requires` (see `env_requirements`) replaces the index's edges with
+        those of the distributions actually installed, whose versions may
+        differ from the newest one indexed.
+        """
+        key = dist_meta.normalize_name(name)
+        if requires is not None:
+            dependents = sorted(parent for parent, deps in requires.items() if key in deps)
+        else:
+            dependents = self.rdeps.get(key, [])
+        if among is None:
+            return dependents
+        allowed = set(among)
+        return [key for key in dependents if key in allowed]
+
+    def why(self, name: str, installed: Iterable[str], direct: Iterable[str],
+            requires: Optional[Dict[str, List[str]]] = None) -> List[List[str]]:
+        """Dependency chains from the project's direct requirements down to `name`."""
+        installed = set(installed)
+        roots = set(direct)
+        target = dist_meta.normalize_name(name)
+        chains: List[List[str]] = []
+        frontier = [[target]]
+        seen = {target}
+        while frontier and len(chains) < 5:
+            next_frontier = []
+            for chain in frontier:
+                head = chain[0]
+                if head in roots and len(chain) > 1:
+                    chains.append(chain)
+                    continue
+                for parent in self.required_by(head, installed, requires):
+                    if parent not in seen:
+                        seen.add(parent)
+                        next_frontier.append([parent] + chain)
+            frontier = next_frontier
+        return chains
+
+
+def load_index(config: dict, extra_envs: Iterable[Path] = (), rebuild: bool = False) -> KnowledgeIndex:
+    """Load the index, bringing it up to date with its sources first."""
+    index = KnowledgeIndex() if rebuild else KnowledgeIndex.load()
+    index.refresh(settings(config), extra_envs, rebuild=rebuild)
+    return index
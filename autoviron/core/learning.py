@@ -1,29 +1,74 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 from autoviron.ux.console import console
+from autoviron.core.knowledge import KnowledgeIndex
+from autoviron.core import dists as dist_meta
 
-# Simulated AI Knowledge Base
-PACKAGE_KNOWLEDGE = {
-    "requests": "A simple, elegant HTTP library for Python, built for human beings. It allows you to send HTTP/1.1 requests extremely easily.",
-    "fastapi": "A modern, fast (high-performance), web framework for building APIs with Python 3.7+ based on standard Python type hints.",
-    "django": "A high-level Python web framework that encourages rapid development and clean, pragmatic design.",
-    "pandas": "A fast, powerful, flexible and easy to use open source data analysis and manipulation tool.",
-    "numpy": "The fundamental package for scientific computing with Python. It provides a multidimensional array object.",
-    "scikit-learn": "Simple and efficient tools for predictive data analysis, built on NumPy, SciPy, and matplotlib.",
-    "beautifulsoup4": "A library for pulling data out of HTML and XML files. It provides idiomatic ways of navigating, searching, and modifying the parse tree.",
-    "uvicorn": "A lightning-fast ASGI server implementation, using uvloop and httptools. It runs async web frameworks like FastAPI.",
-    "pytest": "A framework that makes building simple and scalable tests easy.",
-}
-
-def explain_dependency(package_name: str):
-    """Explain what a package does and why it is typically used."""
-    package_name = package_name.lower()
-    
+
+def direct_requirements(project_root: Path, requirement_files: Iterable[str]) -> List[str]:
+    from autoviron.core.deps import read_requirements
+    keys = []
+    for name in requirement_files:
+        path = project_root / name
+        if path.exists():
+            keys.extend(dist_meta.normalize_name(req.name) for req in read_requirements(path))
+    return keys
+
+
+def explain_dependency(package_name: str, index: KnowledgeIndex, installed: Optional[Dict[str, List[str]]] = None,
+                       direct: Optional[List[str]] = None):
+    """Explain what a package does, what it needs and what pulls it in.
+
+    `installed` maps the env's distributions to their own requirements, so
+    "why" follows the installed versions rather than the newest indexed one.
+    """
     console.print(f"\n[bold magenta]Learning Mode: {package_name}[/bold magenta]")
     console.print("-" * 50)
-    
-    explanation = PACKAGE_KNOWLEDGE.get(package_name)
-    if explanation:
-        console.print(f"📚 [bold]{package_name}[/bold]: {explanation}")
-        console.print("\n[dim]Tip: You can use `autoviron run` to auto-install it if missing.[/dim]")
+
+    record = index.get(package_name)
+    if record is None:
+        console.print(f"🤷 `{package_name}` is not in any environment or wheel cache AutoViron has seen.")
+        matches = index.search(package_name, limit=5)
+        if matches:
+            console.print(f"Did you mean: {', '.join(index.packages[key]['name'] for key, _ in matches)}?")
+        return
+
+    console.print(f"📚 [bold]{record['name']}[/bold] {record['version']}: {record['summary'] or '(no summary)'}")
+    if record["topics"]:
+        console.print(f"[dim]Topics:[/dim] {'; '.join(record['topics'][:4])}")
+    if record["keywords"]:
+        console.print(f"[dim]Keywords:[/dim] {', '.join(record['keywords'][:10])}")
+    if record["home"]:
+        console.print(f"[dim]Home:[/dim] {record['home']}")
+    if record["requires"]:
+        console.print(f"[dim]Depends on:[/dim] {', '.join(record['requires'])}")
+
+    if installed is not None:
+        key = dist_meta.normalize_name(package_name)
+        if key not in installed:
+            console.print("\n[dim]Not installed in this project's environment; `autoviron run` installs it on first import.[/dim]")
+            return
+        reasons = []
+        if key in (direct or []):
+            reasons.append("it is listed in your requirements")
+        chains = index.why(key, installed, direct or [], requires=installed)
+        reasons.extend(" → ".join(chain) for chain in chains)
+        if not reasons:
+            dependents = index.required_by(key, installed, requires=installed)
+            reasons.extend(f"required by {name}" for name in dependents)
+        console.print(f"\n🔗 [bold]Why it's installed:[/bold] {'; '.join(reasons) if reasons else 'nothing in the environment requires it'}")
     else:
-        console.print(f"🤷 AutoViron doesn't have an offline explanation for `{package_name}` yet.")
-        console.print("In a future version connected to an LLM, a dynamic explanation would be generated here.")
+        dependents = index.required_by(package_name)
+        if dependents:
+            console.print(f"[dim]Required by:[/dim] {', '.join(dependents[:15])}")
+
+
+def print_search(query: str, index: KnowledgeIndex, limit: int = 10):
+    """Print the best index matches for a free-text query."""
+    matches = index.search(query, limit=limit)
+    if not matches:
+        console.print(f"🤷 No indexed package matches `{query}`.")
+        return
+    for key, _ in matches:
+        record = index.packages[key]
+        console.print(f"📦 [bold]{record['name']}[/bold] [dim]{record['version']}[/dim] - {record['summary']}")
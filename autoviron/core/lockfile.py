@@ -0,0 +1,414 @@
+"""
+Fully pinned, hashed lockfile support (`autoviron lock`).
+
+The lockfile is a pip requirements file, so it can be installed with
+`pip install --no-deps --require-hashes -r autoviron.lock` without running
+the resolver. Each pin carries the hashes of every file the configured
+indexes publish for it (all wheels and the sdist), so the lock installs on
+other platforms too; the hash of the installed archive is the fallback when
+no index lists any. A header records a hash of the requirement sources it
+was generated from, so callers can tell when it needs to be re-locked.
+"""
+import os
+import re
+import json
+import html
+import hashlib
+import tempfile
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlparse
+from urllib.request import url2pathname
+from packaging.markers import Marker
+from packaging.utils import InvalidSdistFilename, InvalidWheelFilename, parse_sdist_filename, parse_wheel_filename
+from packaging.version import InvalidVersion, Version
+from autoviron.core import dists as dist_meta
+from autoviron.core.deps import read_requirements
+from autoviron.core.locking import atomic_write_text
+
+LOCKFILE_NAME = "autoviron.lock"
+SOURCES_HEADER = "# autoviron-sources: "
+# Installer tooling that a fresh venv already ships with
+BOOTSTRAP_PACKAGES = {"pip", "setuptools", "wheel", "distribute"}
+DEFAULT_INDEX_URL = "https://pypi.org/simple"
+INDEX_TIMEOUT = 15
+INDEX_WORKERS = 8
+_ANCHOR = re.compile(r"<a\s[^>]*?href=\"([^\"]+)\"[^>]*>([^<]*)</a>", re.IGNORECASE)
+
+
+@dataclass
+class LockedPackage:
+    name: str
+    version: str
+    hashes: List[str] = field(default_factory=list)
+    marker: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return dist_meta.normalize_name(self.name)
+
+    def to_line(self) -> str:
+        line = f"{self.name}=={self.version}"
+        if self.marker:
+            line += f" ; {self.marker}"
+        for digest in self.hashes:
+            line += f" \\\n    --hash={digest}"
+        return line
+
+
+class LockError(Exception):
+    """Raised when the installed set cannot be locked."""
+
+
+def lockfile_path(project_root: Path) -> Path:
+    return project_root / LOCKFILE_NAME
+
+
+def _combine_markers(parent: Optional[str], edge: Optional[str]) -> Optional[str]:
+    if parent and edge and edge in parent:
+        return parent  # already constrained; also keeps dependency cycles finite
+    if parent and edge:
+        return f"({parent}) and ({edge})"
+    return parent or edge
+
+
+def _format_term(term) -> str:
+    return " ".join(node.serialize() for node in term)
+
+
+def _reduce_marker(items: list, extras: Tuple[str, ...]):
+    """Decide the `extra` clauses of a parsed marker for `extras`.
+
+    Returns True or False when the marker is settled by them, otherwise the
+    environment part that is left, as a marker string.
+    """
+    groups: List[list] = [[]]
+    for item in items:
+        if item == "or":
+            groups.append([])
+        elif item != "and":
+            groups[-1].append(item)
+    alternatives = []
+    for group in groups:
+        terms: Optional[List[str]] = []
+        for item in group:
+            if isinstance(item, list):
+                value = _reduce_marker(item, extras)
+            elif any(getattr(node, "value", None) == "extra" and type(node).__name__ == "Variable" for node in item):
+                marker = Marker(_format_term(item))
+                value = any(marker.evaluate({"extra": extra}) for extra in extras or ("",))
+            else:
+                value = _format_term(item)
+            if value is False:
+                terms = None
+                break
+            if value is not True:
+                terms.append(value)
+        if terms is None:
+            continue
+        if not terms:
+            return True
+        if len(terms) > 1:
+            terms = [f"({term})" if " or " in term else term for term in terms]
+        alternatives.append(" and ".join(terms))
+    return " or ".join(alternatives) if alternatives else False
+
+
+def _environment_marker(req, extras: Tuple[str, ...]) -> Optional[str]:
+    """The marker a dependency edge adds to the lock: its own, minus the `extra` clauses."""
+    if req.marker is None:
+        return None
+    if "extra" not in str(req.marker):
+        return str(req.marker)
+    # Marker keeps its parsed form private, but it has been stable since packaging 16
+    reduced = _reduce_marker(req.marker._markers, extras)
+    return reduced if isinstance(reduced, str) else None
+
+
+def resolve_locked_set(dists: List[dist_meta.Distribution], roots: List, marker_env: Dict[str, str]) -> Dict[str, Optional[Set[str]]]:
+    """Walk the installed dependency graph from `roots`.
+
+    Returns {dist key: markers}, where markers is None if the package is
+    needed unconditionally and otherwise the set of markers under which it
+    is reached.
+    """
+    installed = {d.key: d for d in dists}
+    markers: Dict[str, Optional[Set[str]]] = {}
+    queue: List[Tuple[str, Optional[str], Tuple[str, ...]]] = []
+    for req in roots:
+        marker = str(req.marker) if req.marker is not None else None
+        queue.append((dist_meta.normalize_name(req.name), marker, tuple(sorted(req.extras))))
+
+    visited: Set[Tuple[str, Optional[str], Tuple[str, ...]]] = set()
+    while queue:
+        key, marker, extras = queue.pop()
+        if (key, marker, extras) in visited or key not in installed:
+            continue
+        visited.add((key, marker, extras))
+        if marker is None:
+            markers[key] = None
+        elif key not in markers:
+            markers[key] = {marker}
+        elif markers[key] is not None:
+            markers[key].add(marker)
+
+        for req in installed[key].requirements():
+            if not dist_meta.requirement_applies(req, marker_env, extras):
+                continue
+            edge = _environment_marker(req, extras)
+            queue.append((dist_meta.normalize_name(req.name), _combine_markers(marker, edge), tuple(sorted(req.extras))))
+    return markers
+
+
+def _direct_url(dist: dist_meta.Distribution) -> dict:
+    try:
+        return json.loads((dist.path / "direct_url.json").read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _archive_release(filename: str) -> Optional[Tuple[str, Version]]:
+    """The (normalized name, version) a wheel or sdist file name is for."""
+    try:
+        if filename.endswith(".whl"):
+            name, version, _, _ = parse_wheel_filename(filename)
+        else:
+            name, version = parse_sdist_filename(filename)
+    except (InvalidWheelFilename, InvalidSdistFilename, InvalidVersion):
+        return None
+    return dist_meta.normalize_name(name), version
+
+
+def index_urls(python_bin: Path, project_root: Path) -> List[str]:
+    """The index URLs pip uses in the env (config files and PIP_* variables)."""
+    try:
+        output = subprocess.run([str(python_bin), "-m", "pip", "config", "list"], cwd=project_root,
+                                capture_output=True, text=True).stdout
+    except OSError:
+        output = ""
+    primary, extra = [], []
+    for line in output.splitlines():
+        key, _, value = line.partition("=")
+        urls = value.strip().strip("'\"").split()
+        if key.endswith(".extra-index-url"):
+            extra += urls
+        elif key.endswith(".index-url"):
+            primary += urls
+    urls = (primary or [DEFAULT_INDEX_URL]) + extra
+    return list(dict.fromkeys(url.rstrip("/") for url in urls))
+
+
+def _index_files(index_url: str, name: str) -> List[Tuple[str, str, Optional[str]]]:
+    """(filename, url, sha256 or None) for every file a PEP 503/691 simple index lists for `name`."""
+    page = f"{index_url}/{dist_meta.normalize_name(name)}/"
+    if page.startswith("file:"):
+        directory = Path(url2pathname(urlparse(page).path))
+        body, content_type = (directory / "index.html").read_text(), "text/html"
+    else:
+        request = urllib.request.Request(page, headers={"Accept": "application/vnd.pypi.simple.v1+json, text/html;q=0.1"})
+        with urllib.request.urlopen(request, timeout=INDEX_TIMEOUT) as response:
+            content_type = response.headers.get("Content-Type", "")
+            body = response.read().decode("utf-8", "replace")
+    if "json" in content_type:
+        return [(f["filename"], urljoin(page, f["url"]), (f.get("hashes") or {}).get("sha256"))
+                for f in json.loads(body).get("files", [])]
+    files = []
+    for href, text in _ANCHOR.findall(body):
+        url = urljoin(page, html.unescape(href))
+        fragment = urlparse(url).fragment
+        digest = fragment[len("sha256="):] if fragment.startswith("sha256=") else None
+        files.append((html.unescape(text).strip(), url.split("#", 1)[0], digest))
+    return files
+
+
+def published_hashes(urls: List[str], name: str, version: str) -> List[str]:
+    """sha256 hashes of every file the indexes publish for `name==version`.
+
+    Local (`file:`) indexes that list no hashes are hashed from disk;
+    unreachable indexes are skipped.
+    """
+    wanted = (dist_meta.normalize_name(name), Version(version))
+    digests = set()
+    for index_url in urls:
+        try:
+            files = _index_files(index_url, name)
+        except (OSError, ValueError, KeyError):
+            continue
+        for filename, url, digest in files:
+            if _archive_release(filename) != wanted:
+                continue
+            if digest is None and url.startswith("file:"):
+                try:
+                    digest = hashlib.sha256(Path(url2pathname(urlparse(url).path)).read_bytes()).hexdigest()
+                except OSError:
+                    continue
+            if digest:
+                digests.add(f"sha256:{digest}")
+    return sorted(digests)
+
+
+def _fetch_hashes(python_bin: Path, pins: List[str], project_root: Path) -> Dict[str, List[str]]:
+    """Look up archive hashes for exact pins without installing anything.
+
+    Uses `pip install --dry-run --report`, which takes the hash from the
+    index link; anything the report lacks is downloaded and hashed locally.
+    """
+    hashes: Dict[str, List[str]] = {}
+    if not pins:
+        return hashes
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = Path(tmp) / "report.json"
+        subprocess.run(
+            [str(python_bin), "-m", "pip", "install", "--dry-run", "--ignore-installed", "--no-deps",
+             "--quiet", "--report", str(report_path)] + pins,
+            cwd=project_root, capture_output=True, text=True,
+        )
+        try:
+            report = json.loads(report_path.read_text())
+        except (OSError, ValueError):
+            report = {"install": []}
+        for item in report.get("install", []):
+            archive = item.get("download_info", {}).get("archive_info", {})
+            digests = [f"{algo}:{value}" for algo, value in sorted(archive.get("hashes", {}).items()) if algo == "sha256"]
+            if not digests and archive.get("hash"):
+                digests = [archive["hash"].replace("=", ":", 1)]
+            if digests:
+                hashes[dist_meta.normalize_name(item["metadata"]["name"])] = digests
+
+        missing = [pin for pin in pins if dist_meta.normalize_name(pin.split("==")[0]) not in hashes]
+        if missing:
+            download_dir = Path(tmp) / "dl"
+            subprocess.run(
+                [str(python_bin), "-m", "pip", "download", "--no-deps", "--quiet", "-d", str(download_dir)] + missing,
+                cwd=project_root, capture_output=True, text=True,
+            )
+            for archive_file in sorted(download_dir.glob("*")) if download_dir.exists() else []:
+                release = _archive_release(archive_file.name)
+                if release is None:
+                    continue
+                digest = hashlib.sha256(archive_file.read_bytes()).hexdigest()
+                hashes.setdefault(release[0], []).append(f"sha256:{digest}")
+    return hashes
+
+
+def generate_lock(env_path: Path, project_root: Path, requirement_files: Iterable[Path]) -> List[LockedPackage]:
+    """Capture the installed set reachable from the requirement sources as pinned, hashed packages."""
+    dists = dist_meta.env_distributions(env_path)
+    marker_env = dist_meta.marker_environment(env_path)
+    roots = []
+    for req_file in requirement_files:
+        roots.extend(read_requirements(req_file))
+    if not roots:
+        # No requirement sources: lock everything that was installed on top of the bootstrap tooling
+        from packaging.requirements import Requirement
+        roots = [Requirement(d.name) for d in dists if d.key not in BOOTSTRAP_PACKAGES]
+
+    markers = resolve_locked_set(dists, roots, marker_env)
+    installed = {d.key: d for d in dists}
+    python_bin = dist_meta.python_executable(env_path)
+    urls = index_urls(python_bin, project_root)
+    with ThreadPoolExecutor(max_workers=INDEX_WORKERS) as pool:
+        published = dict(zip(markers, pool.map(lambda key: published_hashes(urls, installed[key].name, installed[key].version),
+                                                markers)))
+    packages, pins = [], []
+    for key in sorted(markers):
+        dist = installed[key]
+        if key == "pip":
+            continue
+        direct = _direct_url(dist)
+        if "dir_info" in direct or "vcs_info" in direct:
+            raise LockError(f"{dist.name} is installed from {direct.get('url')} and cannot be pinned by hash")
+        marker_set = markers[key]
+        marker = None
+        if marker_set:
+            marker = next(iter(marker_set)) if len(marker_set) == 1 else " or ".join(f"({m})" for m in sorted(marker_set))
+        package = LockedPackage(dist.name, dist.version, published[key], marker)
+        archive_hashes = direct.get("archive_info", {}).get("hashes", {})
+        if "sha256" in archive_hashes:
+            package.hashes = sorted(set(package.hashes) | {f"sha256:{archive_hashes['sha256']}"})
+        elif not package.hashes:
+            pins.append(f"{dist.name}=={dist.version}")
+        packages.append(package)
+
+    fetched = _fetch_hashes(python_bin, pins, project_root)
+    unhashed = []
+    for package in packages:
+        if not package.hashes:
+            package.hashes = fetched.get(package.key, [])
+            if not package.hashes:
+                unhashed.append(f"{package.name}=={package.version}")
+    if unhashed:
+        raise LockError(f"Could not determine archive hashes for: {', '.join(unhashed)}")
+    return packages
+
+
+def write_lockfile(path: Path, packages: List[LockedPackage], sources_hash: Optional[str]):
+    """Write the lockfile atomically."""
+    lines = [
+        "# This file is generated by `autoviron lock`. Do not edit by hand.",
+        "# Install with: pip install --no-deps --require-hashes -r autoviron.lock",
+        f"{SOURCES_HEADER}{sources_hash or 'none'}",
+        "",
+    ]
+    lines.extend(p.to_line() for p in packages)
+    atomic_write_text(path, "\n".join(lines) + "\n")
+
+
+def read_lockfile(path: Path) -> Tuple[List[LockedPackage], Optional[str]]:
+    """Parse a lockfile written by `write_lockfile`."""
+    packages: List[LockedPackage] = []
+    sources_hash = None
+    content = path.read_text()
+    for line in content.splitlines():
+        if line.startswith(SOURCES_HEADER):
+            value = line[len(SOURCES_HEADER):].strip()
+            sources_hash = None if value == "none" else value
+    for entry in content.replace("\\\n", " ").splitlines():
+        entry = entry.strip()
+        if not entry or entry.startswith("#"):
+            continue
+        parts = entry.split(" --hash=")
+        spec, hashes = parts[0].strip(), [h.strip() for h in parts[1:]]
+        spec, _, marker = spec.partition(";")
+        name, _, version = spec.strip().partition("==")
+        packages.append(LockedPackage(name, version, hashes, marker.strip() or None))
+    return packages, sources_hash
+
+
+def lock_is_current(project_root: Path, sources_hash: Optional[str]) -> bool:
+    """True if the lockfile exists and was generated from the current requirement sources."""
+    path = lockfile_path(project_root)
+    if not path.exists():
+        return False
+    try:
+        _, locked_hash = read_lockfile(path)
+    except OSError:
+        return False
+    return locked_hash == sources_hash
+
+
+def install_from_lock(env_path: Path, project_root: Path, only: Optional[Iterable[str]] = None,
+                      force: bool = False, extra_args: Optional[List[str]] = None) -> subprocess.CompletedProcess:
+    """Install the locked set (or a subset of it) in a single resolver-free pip call."""
+    path = lockfile_path(project_root)
+    if only is not None:
+        wanted = {dist_meta.normalize_name(n) for n in only}
+        packages, sources_hash = read_lockfile(path)
+        subset = [p for p in packages if p.key in wanted]
+        fd, tmp_name = tempfile.mkstemp(suffix=".lock", prefix="autoviron-")
+        os.close(fd)
+        path = Path(tmp_name)
+        write_lockfile(path, subset, sources_hash)
+    args = [str(dist_meta.python_executable(env_path)), "-m", "pip", "install", "--no-deps", "--require-hashes"]
+    if force:
+        args.append("--force-reinstall")
+    args.extend(extra_args or [])
+    try:
+        return subprocess.run(args + ["-r", str(path)], cwd=project_root, capture_output=True, text=True)
+    finally:
+        if only is not None:
+            path.unlink()
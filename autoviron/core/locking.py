@@ -0,0 +1,218 @@
+"""
+Project-level advisory locks and atomic state-file writes.
+
+Several `autoviron` processes can work on one checkout at the same time
+(pytest shards, parallel make targets). Env mutation (creating the venv,
+installing packages, repairs) takes the project's exclusive `env` lock;
+anything that only needs a consistent view of the env takes it shared.
+Lock files live in the user cache, so the checkout itself stays clean.
+
+Locks are re-entrant within a process: nested acquisitions of the same
+lock reuse the held one. Asking for exclusive while holding it shared
+upgrades it, but flock cannot convert a lock atomically, so the shared
+lock is released first and another process may get in before the
+exclusive one is granted. A forked child starts out holding nothing.
+"""
+import os
+import time
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+from autoviron.core.config import cache_dir, project_key, section
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_TIMEOUT = 600.0
+POLL_INTERVAL = 0.05
+
+
+class LockTimeout(TimeoutError):
+    """Raised when a project lock cannot be acquired in time."""
+
+
+# path -> [fd, exclusive, depth] for locks held by this process
+_held: Dict[str, List] = {}
+_held_guard = threading.RLock()
+_OPEN_FLAGS = os.O_RDWR | os.O_CREAT | getattr(os, "O_CLOEXEC", 0) | getattr(os, "O_NOINHERIT", 0)
+
+
+def timeout(config: dict) -> float:
+    """The configured `locks.timeout`: how long to wait for another process's lock."""
+    return section(config, "locks")["timeout"]
+
+
+def lock_path(project_root: Path, name: str) -> Path:
+    return cache_dir() / "locks" / f"{project_key(project_root)}-{name}.lock"
+
+
+def _try_lock(fd: int, exclusive: bool) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+        else:
+            # msvcrt has no shared mode, so readers serialize on Windows
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd: int):
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    except OSError:
+        pass
+
+
+def _forget_inherited_locks():
+    """In a forked child: the parent's locks are not ours to reuse or release."""
+    global _held_guard
+    _held_guard = threading.RLock()
+    for fd, _, _ in _held.values():
+        try:
+            # Closing never unlocks: the parent's descriptor keeps the lock alive
+            os.close(fd)
+        except OSError:
+            pass
+    _held.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_inherited_locks)
+
+
+def is_locked(path: Path) -> bool:
+    """True if some process (this one included) holds a lock on `path`."""
+    try:
+        fd = os.open(str(path), os.O_RDWR | getattr(os, "O_CLOEXEC", 0) | getattr(os, "O_NOINHERIT", 0))
+    except OSError:
+        return False
+    try:
+        # A separate open file description, so even our own locks conflict with it
+        if not _try_lock(fd, False):
+            return True
+        _unlock(fd)
+        return False
+    finally:
+        os.close(fd)
+
+
+class FileLock:
+    """An advisory lock on `path`, shared or exclusive, with a timeout."""
+
+    def __init__(self, path: Path, shared: bool = False, timeout: Optional[float] = DEFAULT_TIMEOUT,
+                 description: str = ""):
+        self.path = path
+        self.shared = shared
+        self.timeout = timeout
+        self.description = description or path.name
+        self.waited = 0.0
+
+    def _wait_for(self, fd: int, exclusive: bool):
+        """Poll for the lock; `waited` stays 0 if it was free straight away."""
+        start = time.monotonic()
+        self.waited = 0.0
+        while not _try_lock(fd, exclusive):
+            if self.timeout is not None and self.waited >= self.timeout:
+                raise LockTimeout(f"Timed out after {self.timeout:.0f}s waiting for the {self.description} lock "
+                                  f"held by another autoviron process ({self.path})")
+            time.sleep(POLL_INTERVAL)
+            self.waited = time.monotonic() - start
+
+    def acquire(self) -> "FileLock":
+        key = str(self.path)
+        with _held_guard:
+            held = _held.get(key)
+            if held is not None and (self.shared or held[1]):
+                self.waited = 0.0
+                held[2] += 1
+                return self
+            if held is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(key, _OPEN_FLAGS, 0o644)
+            else:
+                # Upgrade: release the shared lock, then queue for the exclusive one like anyone else
+                fd = held[0]
+                _unlock(fd)
+        # Waiting happens outside the guard so other threads can release meanwhile
+        try:
+            self._wait_for(fd, not self.shared)
+        except BaseException:
+            if held is None:
+                os.close(fd)
+            else:
+                self._restore_shared(fd)
+            raise
+        with _held_guard:
+            current = _held.get(key)
+            if held is not None:
+                held[1] = True
+                held[2] += 1
+            elif current is not None:
+                # Another thread registered the same lock while we waited; ours is redundant
+                current[2] += 1
+                _unlock(fd)
+                os.close(fd)
+            else:
+                _held[key] = [fd, not self.shared, 1]
+        return self
+
+    def _restore_shared(self, fd: int):
+        """Take back the shared lock an upgrade gave up; outer holders still count on it."""
+        while not _try_lock(fd, False):
+            time.sleep(POLL_INTERVAL)
+
+    def release(self):
+        key = str(self.path)
+        with _held_guard:
+            held = _held.get(key)
+            if held is None:
+                return
+            held[2] -= 1
+            if held[2] == 0:
+                del _held[key]
+                _unlock(held[0])
+                os.close(held[0])
+
+    def __enter__(self) -> "FileLock":
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def project_lock(project_root: Path, name: str = "env", shared: bool = False,
+                 timeout: Optional[float] = DEFAULT_TIMEOUT) -> FileLock:
+    """Return the named lock for a project (use it as a context manager)."""
+    return FileLock(lock_path(project_root, name), shared=shared, timeout=timeout, description=name)
+
+
+def atomic_write_text(path: Path, text: str):
+    """Write `text` to `path` via a temp file and rename, so readers never see a partial file."""
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        mode = path.stat().st_mode & 0o777
+    except OSError:
+        mode = 0o644
+    try:
+        with os.fdopen(fd, "w") as f:
+            os.chmod(tmp, mode)
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
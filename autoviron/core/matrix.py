@@ -0,0 +1,166 @@
+"""
+Interpreter matrix for `autoviron run --matrix`.
+
+Every interpreter in `python_versions` (or `matrix.pythons`) that exists and
+satisfies `requires-python` is looked up in the interpreter registry; one
+venv per Python minor version is kept beside the main one (`.venv-py3.11`,
+...) and synced from the requirement files. The command
+then runs in all of them concurrently with a bounded pool, each output line
+prefixed with its version, followed by a pass/fail and timing table.
+
+Matrix runs are plain runs: nothing is auto-installed or retried, since a
+missing dependency is exactly what a compatibility matrix should report.
+"""
+import os
+import sys
+import time
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+from autoviron.core.config import section
+from autoviron.core import dists as dist_meta, interpreters
+from autoviron.core.env_manager import EnvManager, EnvironmentType
+from autoviron.core.interpreters import PythonInfo
+from autoviron.core.locking import project_lock
+
+_print_lock = threading.Lock()
+
+
+def settings(config: dict) -> dict:
+    return section(config, "matrix")
+
+
+@dataclass
+class MatrixResult:
+    interpreter: PythonInfo
+    env_path: Path
+    exit_code: Optional[int] = None
+    setup_time: float = 0.0
+    run_time: float = 0.0
+    error: str = ""
+
+    @property
+    def passed(self) -> bool:
+        return self.exit_code == 0
+
+
+def discover(candidates: List[str], spec: Optional[str] = None) -> List[PythonInfo]:
+    """Look the candidates up in the interpreter registry; keep the first one
+    found for each minor version that satisfies `spec` (requires-python)."""
+    found: Dict[str, PythonInfo] = {}
+    for interp in interpreters.resolve(candidates):
+        if interp.minor not in found and interp.version_tuple >= (3,) and interpreters.matches(interp, spec):
+            found[interp.minor] = interp
+    return sorted(found.values(), key=lambda i: i.version_tuple)
+
+
+def env_path_for(manager: EnvManager, interp: PythonInfo, opts: dict) -> Path:
+    name = opts["env_name"].format(venv_name=manager.venv_name, version=interp.minor)
+    return manager.project_root / name
+
+
+def _requirements_marker(env_path: Path) -> Path:
+    return env_path / ".autoviron-requirements"
+
+
+def ensure_env(manager: EnvManager, interp: PythonInfo, env_path: Path) -> str:
+    """Create the interpreter's env if needed and sync it with the requirement files; returns an error or ''."""
+    from autoviron.core import bytecode
+    req_files = manager.get_requirement_files()
+    digest = hashlib.sha1(interp.executable.encode())
+    for req_file in req_files:
+        digest.update(req_file.name.encode())
+        digest.update(req_file.read_bytes())
+    wanted = digest.hexdigest()
+    # One lock per matrix env, so matrix runs never wait on the main env's lock
+    with project_lock(manager.project_root, f"matrix-{env_path.name}", timeout=manager.lock_timeout):
+        python = dist_meta.python_executable(env_path)
+        if not python.exists():
+            result = subprocess.run([interp.executable, "-m", "venv", str(env_path)], capture_output=True, text=True)
+            if result.returncode != 0:
+                return f"venv creation failed: {result.stderr.strip()[-300:]}"
+        marker = _requirements_marker(env_path)
+        if req_files and (not marker.exists() or marker.read_text() != wanted):
+            # Lockfile pins are specific to the interpreter they were made with, so resolve per version
+            args = [str(python), "-m", "pip", "install", "--quiet"] + bytecode.pip_flags(manager.config)
+            for req_file in req_files:
+                args += ["-r", req_file.name]
+            result = subprocess.run(args, cwd=manager.project_root, capture_output=True, text=True)
+            if result.returncode != 0:
+                return f"dependency install failed: {result.stderr.strip()[-300:]}"
+            marker.write_text(wanted)
+    return ""
+
+
+def _pump(stream, prefix: str, sink):
+    for line in iter(stream.readline, ""):
+        with _print_lock:
+            sink.write(f"{prefix} {line}" if line.endswith("\n") else f"{prefix} {line}\n")
+            sink.flush()
+    stream.close()
+
+
+def run_one(result: MatrixResult, command: List[str], project_root: Path, base_env: Dict[str, str]):
+    """Run the command in one matrix env, streaming prefixed output."""
+    from autoviron.core.activation import prepare_command
+    cmd, env = prepare_command(EnvironmentType.VENV, result.env_path, command, base_env)
+    prefix = f"[py{result.interpreter.minor}]"
+    start = time.monotonic()
+    try:
+        proc = subprocess.Popen(cmd, cwd=project_root, env=env, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
+    except OSError as e:
+        result.error = str(e)
+        return
+    pumps = [threading.Thread(target=_pump, args=(proc.stdout, prefix, sys.stdout), daemon=True),
+             threading.Thread(target=_pump, args=(proc.stderr, prefix, sys.stderr), daemon=True)]
+    for pump in pumps:
+        pump.start()
+    result.exit_code = proc.wait()
+    for pump in pumps:
+        pump.join()
+    result.run_time = time.monotonic() - start
+
+
+def run_matrix(manager: EnvManager, command: List[str], interpreters: List[PythonInfo], opts: dict,
+               base_env: Optional[Dict[str, str]] = None) -> List[MatrixResult]:
+    """Set up and run every interpreter's env, at most `jobs` at a time."""
+    base_env = dict(os.environ if base_env is None else base_env)
+    results = [MatrixResult(interp, env_path_for(manager, interp, opts)) for interp in interpreters]
+
+    def job(result: MatrixResult):
+        start = time.monotonic()
+        result.error = ensure_env(manager, result.interpreter, result.env_path)
+        result.setup_time = time.monotonic() - start
+        if not result.error:
+            run_one(result, command, manager.project_root, base_env)
+
+    jobs = int(opts["jobs"]) or len(results) or 1
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(job, results))
+    return results
+
+
+def print_results(results: List[MatrixResult]):
+    from rich.table import Table
+    from autoviron.ux.console import console
+    table = Table(title="Interpreter matrix")
+    table.add_column("Python")
+    table.add_column("Interpreter")
+    table.add_column("Setup", justify="right")
+    table.add_column("Run", justify="right")
+    table.add_column("Result")
+    for result in results:
+        if result.error:
+            status = f"[error]error[/error] {result.error.splitlines()[0][:60]}"
+        elif result.passed:
+            status = "[success]pass[/success]"
+        else:
+            status = f"[error]fail ({result.exit_code})[/error]"
+        table.add_row(result.interpreter.version, result.interpreter.executable, f"{result.setup_time:.1f}s",
+                      f"{result.run_time:.1f}s" if result.exit_code is not None else "-", status)
+    console.print(table)
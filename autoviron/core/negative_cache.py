@@ -0,0 +1,152 @@
+"""
+Negative cache of failed dependency installs.
+
+When a heal or background install fails because the package is not on the
+index or does not build, the failure is remembered in the user cache, keyed
+by module, candidate package, interpreter and index configuration, so later
+runs (and other projects, and CI jobs sharing the cache) skip the candidate
+at once instead of repeating a slow failing `pip install`. Entries expire
+after `negative_cache.ttl` seconds; `run --refresh` ignores them. Only
+those two outcomes are cached: network errors and any other failure
+(permissions, a full disk, a broken env, a dependency conflict with what
+the project pinned) say nothing about the package, or only about one
+project's env, and must not block it everywhere for a day.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import platform
+from pathlib import Path
+from typing import Dict, List, Optional
+from autoviron.core.config import cache_dir, section
+from autoviron.core.locking import FileLock, LockTimeout, atomic_write_text
+
+NOT_FOUND, BUILD_FAILED = "not_found", "build_failed"
+_NOT_FOUND = ("No matching distribution found", "Could not find a version that satisfies",
+              "PackagesNotFoundError", "not found in the package registry", "could not be found")
+_BUILD_FAILED = ("Failed building wheel", "subprocess-exited-with-error", "metadata-generation-failed",
+                 "Failed to build", "error: command")
+_TRANSIENT = ("NewConnectionError", "ConnectionError", "Temporary failure in name resolution", "Read timed out",
+              "ConnectTimeout", "Could not fetch URL", "SSLError", "ProxyError", "HTTP error 5")
+_INDEX_ENV = ("PIP_INDEX_URL", "PIP_EXTRA_INDEX_URL", "PIP_FIND_LINKS", "PIP_NO_INDEX", "PIP_CONFIG_FILE",
+              "PIP_PRE", "PIP_ONLY_BINARY", "PIP_NO_BINARY", "CONDA_CHANNELS")
+
+
+def settings(config: dict) -> dict:
+    return section(config, "negative_cache")
+
+
+def classify(output: str) -> Optional[str]:
+    """Why an install failed, from its output; None for failures that must not be cached."""
+    if any(marker in output for marker in _TRANSIENT):
+        return None
+    if any(marker in output for marker in _NOT_FOUND):
+        return NOT_FOUND
+    if any(marker in output for marker in _BUILD_FAILED):
+        return BUILD_FAILED
+    return None
+
+
+def _pip_config_files(env_path: Path) -> List[Path]:
+    home = Path.home()
+    files = [Path("/etc/pip.conf"), home / ".pip" / "pip.conf", home / ".config" / "pip" / "pip.conf",
+             env_path / "pip.conf", env_path / "pip.ini"]
+    if os.environ.get("APPDATA"):
+        files.append(Path(os.environ["APPDATA"]) / "pip" / "pip.ini")
+    if os.environ.get("PIP_CONFIG_FILE"):
+        files.append(Path(os.environ["PIP_CONFIG_FILE"]))
+    return files
+
+
+def index_key(env_path: Path) -> str:
+    """Fingerprint of where installs resolve from: pip/conda index env vars and pip config files."""
+    digest = hashlib.sha1()
+    for name in _INDEX_ENV:
+        digest.update(f"{name}={os.environ.get(name, '')}\n".encode())
+    for path in _pip_config_files(env_path):
+        try:
+            digest.update(path.read_bytes())
+        except OSError:
+            pass
+    return digest.hexdigest()[:12]
+
+
+def interpreter_key(env_path: Path) -> str:
+    """The env's Python version and platform, which decide what wheels exist for it."""
+    from autoviron.core import dists as dist_meta
+    cfg = dist_meta.read_pyvenv_cfg(env_path)
+    version = cfg.get("version_info") or cfg.get("version")
+    if not version:
+        version = os.path.realpath(dist_meta.python_executable(env_path))
+    return f"{version}-{sys.platform}-{platform.machine()}"
+
+
+class NegativeCache:
+    """Failed (module, package) installs per interpreter and index, with expiry."""
+
+    def __init__(self, env_path: Path, config: Optional[dict] = None, refresh: bool = False):
+        opts = settings(config or {})
+        self.enabled = bool(opts["enabled"])
+        self.ttl = float(opts["ttl"] or 0)
+        self.refresh = refresh
+        self.path = cache_dir() / "negative-cache.json"
+        self.scope = f"{interpreter_key(env_path)}|{index_key(env_path)}"
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _key(self, module: Optional[str], package: str) -> str:
+        return f"{self.scope}|{module or ''}|{package.lower()}"
+
+    def lookup(self, module: Optional[str], package: str) -> Optional[dict]:
+        """The recorded failure for this candidate, unless it expired or `refresh` is set."""
+        if not self.enabled or self.refresh:
+            return None
+        entry = self._load().get(self._key(module, package))
+        if entry is None or (self.ttl and time.time() - entry["failed_at"] > self.ttl):
+            return None
+        if entry.get("reason") not in (NOT_FOUND, BUILD_FAILED):
+            return None  # written by a version that also cached other failures
+        return entry
+
+    def _update(self, mutate):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with FileLock(self.path.with_suffix(".lock"), timeout=10, description="negative cache"):
+                entries = self._load()
+                mutate(entries)
+                now = time.time()
+                if self.ttl:
+                    entries = {k: v for k, v in entries.items() if now - v["failed_at"] <= self.ttl}
+                atomic_write_text(self.path, json.dumps(entries, indent=2))
+        except (OSError, LockTimeout):
+            pass
+
+    def record(self, module: Optional[str], package: str, output: str) -> Optional[dict]:
+        """Remember a failed install; returns the entry, or None if the failure is not cacheable."""
+        reason = classify(output)
+        if not self.enabled or reason is None:
+            return None
+        lines = [line.strip() for line in output.strip().splitlines() if line.strip()]
+        entry = {"module": module, "package": package, "reason": reason,
+                 "message": lines[-1][:300] if lines else "", "failed_at": time.time()}
+        self._update(lambda entries: entries.__setitem__(self._key(module, package), entry))
+        return entry
+
+    def forget(self, module: Optional[str], package: str):
+        """Drop an entry, e.g. after the package installed fine."""
+        key = self._key(module, package)
+        if key in self._load():
+            self._update(lambda entries: entries.pop(key, None))
+
+
+def describe(entry: dict) -> str:
+    age = time.time() - entry["failed_at"]
+    when = f"{age / 3600:.0f}h ago" if age >= 3600 else (f"{age / 60:.0f}m ago" if age >= 60 else "just now")
+    reason = "not on the index" if entry["reason"] == NOT_FOUND else "failed to build"
+    return f"'{entry['package']}' {reason} {when}: {entry['message']}"
@@ -0,0 +1,235 @@
+"""
+Headless notebook runner, run by an environment's own interpreter.
+
+Usage: python notebook_worker.py <notebook> [arg ...]
+
+Reads the plan (code cells already rewritten into plain Python) as one
+JSON line on stdin and runs the cells in a single `__main__` namespace,
+reporting progress as JSON lines on the channel named by
+`AUTOVIRON_NOTEBOOK_CHANNEL`. When a cell raises, the error is reported and
+the runner waits on stdin for `retry` (run the same cell again, after the
+parent installed a package or sent variables) or `abort`; cells that
+already ran are never re-run, so their state survives a heal. Standalone
+on purpose: it must import nothing from autoviron.
+"""
+import os
+import re
+import sys
+import ast
+import json
+import time
+import shlex
+import runpy
+import builtins
+import linecache
+import importlib
+import importlib.util
+import subprocess
+import traceback
+
+CHANNEL_VAR = "AUTOVIRON_NOTEBOOK_CHANNEL"
+# Output-only cell magics: nothing to run headlessly
+_DISPLAY_MAGICS = {"html", "HTML", "markdown", "latex", "javascript", "js", "svg"}
+_NOOP_MAGICS = {"matplotlib", "load_ext", "reload_ext", "autoreload", "config", "precision", "pylab"}
+_EXPAND = re.compile(r"\{([^{}]+)\}")
+
+
+def _open_channel(spec):
+    kind, _, value = spec.partition(":")
+    if kind == "handle":
+        import msvcrt
+        fd = msvcrt.open_osfhandle(int(value), 0)
+    else:
+        fd = int(value)
+    return os.fdopen(fd, "w", buffering=1, encoding="utf-8")
+
+
+def _importable(module):
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class Runner:
+    def __init__(self, channel, commands, display=True):
+        self.channel = channel
+        self.commands = commands
+        self.display = display
+        self.namespace = {
+            "__name__": "__main__",
+            "__builtins__": builtins,
+            "__autoviron_magic__": self.magic,
+            "__autoviron_shell__": self.shell,
+            "__autoviron_cell_magic__": self.cell_magic,
+        }
+
+    def send(self, **message):
+        self.channel.write(json.dumps(message, default=str) + "\n")
+
+    def receive(self):
+        line = self.commands.readline()
+        return json.loads(line) if line else {"action": "abort"}
+
+    def warn(self, message):
+        self.send(event="warning", message=message)
+
+    def _expand(self, command):
+        """IPython-style `{expr}` interpolation from the notebook's namespace."""
+        def value(match):
+            try:
+                return str(eval(match.group(1), self.namespace))
+            except Exception:
+                return match.group(0)
+        return _EXPAND.sub(value, command)
+
+    def shell(self, command, capture=False):
+        command = self._expand(command)
+        if capture:
+            result = subprocess.run(command, shell=True, stdout=subprocess.PIPE, text=True)
+            return result.stdout.splitlines()
+        sys.stdout.flush()
+        subprocess.run(command, shell=True)
+        if re.match(r"\s*(pip3?|python3?\s+-m\s+pip|conda|mamba)\s", command):
+            importlib.invalidate_caches()
+
+    def magic(self, name, line):
+        line = self._expand(line)
+        if name == "pip":
+            sys.stdout.flush()
+            subprocess.run([sys.executable, "-m", "pip"] + shlex.split(line))
+            importlib.invalidate_caches()
+        elif name in ("conda", "mamba"):
+            self.shell(f"{name} {line}")
+        elif name in ("sx", "system"):
+            return self.shell(line, capture=True)
+        elif name == "cd":
+            os.chdir(os.path.expanduser(line or "~"))
+        elif name == "env":
+            if "=" in line:
+                key, _, value = line.partition("=")
+                os.environ[key.strip()] = value.strip()
+            elif " " in line.strip():
+                key, value = line.split(None, 1)
+                os.environ[key] = value
+            elif line:
+                return os.environ.get(line.strip())
+            else:
+                return dict(os.environ)
+        elif name in ("time", "timeit"):
+            started = time.perf_counter()
+            try:
+                return eval(line, self.namespace)
+            except SyntaxError:
+                exec(line, self.namespace)
+            finally:
+                print(f"Wall time: {time.perf_counter() - started:.3f}s")
+        elif name == "run":
+            args = shlex.split(line)
+            saved = sys.argv
+            sys.argv = args
+            try:
+                self.namespace.update(runpy.run_path(args[0], run_name="__main__"))
+            finally:
+                sys.argv = saved
+        elif name not in _NOOP_MAGICS:
+            self.warn(f"Skipping unsupported magic %{name}")
+
+    def cell_magic(self, name, line, body):
+        sys.stdout.flush()
+        if name in ("bash", "sh"):
+            subprocess.run([name], input=body, text=True)
+        elif name == "script":
+            subprocess.run(shlex.split(line), input=body, text=True)
+        elif name in ("python", "python3"):
+            subprocess.run([sys.executable], input=body, text=True)
+        elif name == "writefile":
+            args = shlex.split(line)
+            append = "-a" in args or "--append" in args
+            path = [a for a in args if not a.startswith("-")][0]
+            with open(path, "a" if append else "w", encoding="utf-8") as f:
+                f.write(body + "\n")
+        elif name not in _DISPLAY_MAGICS:
+            self.warn(f"Skipping unsupported cell magic %%{name}")
+
+    def run_cell(self, cell):
+        filename = f"<cell {cell['index'] + 1}>"
+        code = cell["code"]
+        linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+        tree = ast.parse(code, filename)
+        last = None
+        if self.display and tree.body and isinstance(tree.body[-1], ast.Expr):
+            last = ast.Expression(tree.body.pop().value)
+        exec(compile(tree, filename, "exec"), self.namespace)
+        if last is not None:
+            value = eval(compile(last, filename, "eval"), self.namespace)
+            if value is not None:
+                print(repr(value))
+
+    def describe(self, error):
+        """The error as the parent needs it, with a traceback free of the runner's own frames."""
+        tb = error.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename == __file__:
+            tb = tb.tb_next
+        info = {"ename": type(error).__name__, "evalue": str(error),
+                "traceback": "".join(traceback.format_exception(type(error), error, tb))}
+        if isinstance(error, ModuleNotFoundError):
+            info["module"] = error.name
+        elif isinstance(error, KeyError) and error.args and isinstance(error.args[0], str):
+            info["key"] = error.args[0]
+        return info
+
+    def run(self, plan):
+        if plan.get("preflight") is not None:
+            self.send(event="preflight", missing=[m for m in plan["preflight"] if not _importable(m)])
+            if self.receive().get("action") != "start":
+                return 1
+            importlib.invalidate_caches()
+        cells = plan["cells"]
+        i = 0
+        while i < len(cells):
+            cell = cells[i]
+            self.send(event="cell_start", cell=cell["index"])
+            started = time.monotonic()
+            try:
+                self.run_cell(cell)
+            except SystemExit as e:
+                sys.stdout.flush()
+                return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except KeyboardInterrupt:
+                raise
+            except BaseException as e:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                self.send(event="error", cell=cell["index"], duration=time.monotonic() - started, **self.describe(e))
+                command = self.receive()
+                if command.get("action") != "retry":
+                    return 1
+                os.environ.update(command.get("env") or {})
+                importlib.invalidate_caches()
+                continue
+            sys.stdout.flush()
+            self.send(event="cell_end", cell=cell["index"], duration=time.monotonic() - started)
+            i += 1
+        self.send(event="done")
+        return 0
+
+
+def main():
+    notebook = os.path.abspath(sys.argv[1])
+    channel = _open_channel(os.environ.pop(CHANNEL_VAR))
+    # Commands arrive on stdin; the cells themselves get an empty one, as in a headless kernel
+    commands = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    plan = json.loads(commands.readline())
+    directory = os.path.dirname(notebook)
+    os.chdir(directory)
+    sys.path[0] = directory
+    sys.argv = [notebook] + sys.argv[2:]
+    sys.exit(Runner(channel, commands, plan.get("display", True)).run(plan))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+"""
+Jupyter notebooks: dependency scanning and headless, self-healing runs.
+
+Notebooks are read with a small streaming JSON reader that decodes only
+each cell's type and source and skips everything else (outputs, embedded
+images, attachments) in constant memory, so multi-hundred-megabyte
+notebooks scan as fast as their code. IPython syntax (`%magic`, `!shell`,
+`%%cell` magics) is rewritten into plain calls so the cells parse as
+Python for the import scan, and `%pip install` lines are read as
+requirements.
+
+`autoviron run notebook.ipynb` runs the code cells in order in one
+interpreter of the env (see `notebook_worker.py`). When a cell fails with
+a healable error (a missing module or environment variable), the fix is
+applied and the run resumes from that cell with every earlier result still
+in memory, instead of starting the notebook over.
+"""
+import os
+import re
+import sys
+import json
+import shlex
+import subprocess
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import typer
+from autoviron.core import resources
+from autoviron.core.config import section
+from autoviron.ux.console import emit, log_debug, log_error, log_info, log_warning
+
+WORKER_SCRIPT = Path(__file__).resolve().parent / "notebook_worker.py"
+# Where the worker writes its progress messages: `fd:N`, or `handle:N` on Windows
+CHANNEL_VAR = "AUTOVIRON_NOTEBOOK_CHANNEL"
+_CHUNK = 1 << 16
+_NON_WS = re.compile(r"\S")
+_SCALAR_END = re.compile(r'[\s,:\]}]')
+# Cell magics whose body is ordinary Python
+_PYTHON_CELL_MAGICS = {"time", "timeit", "capture", "prun"}
+_MAGIC_LINE = re.compile(r"^(?P<indent>\s*)(?:(?P<target>[\w.]+(?:\s*,\s*[\w.]+)*)\s*=\s*)?"
+                         r"(?:%(?P<magic>\w+)|!(?P<shell>.*))(?P<rest>.*)$")
+_HELP_LINE = re.compile(r"^\s*(?:\?\??[\w.]+|[\w.]+\?\??)\s*$")
+_PIP_LINE = re.compile(r"^\s*[%!]\s*(?:pip3?|python3?\s+-m\s+pip|conda|mamba)\s+install\s+(?P<args>.*)$")
+# pip/conda install options that take a value
+_VALUE_OPTIONS = {"-r", "--requirement", "-c", "--constraint", "-e", "--editable", "-i", "--index-url",
+                  "--extra-index-url", "-f", "--find-links", "-t", "--target", "--prefix", "--root",
+                  "--channel", "-n", "--name", "-p", "--platform", "--python-version"}
+
+
+def settings(config: dict) -> dict:
+    return section(config, "notebooks")
+
+
+class NotebookError(ValueError):
+    pass
+
+
+@dataclass
+class Cell:
+    index: int
+    cell_type: str
+    source: str
+
+
+class _Reader:
+    """Just enough of a streaming JSON reader to walk a notebook: the values
+    asked for are decoded, everything else is skipped without being kept."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buf = ""
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        data = self.stream.read(_CHUNK)
+        if not data:
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            match = _NON_WS.search(self.buf, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self._fill():
+                raise NotebookError("unexpected end of file")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise NotebookError(f"expected {char!r} at {self.buf[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+
+    def _string_end(self, keep: bool) -> int:
+        """Index just past the string starting at `pos`; without `keep`, scanned text is dropped as it goes."""
+        if self.peek() != '"':
+            raise NotebookError(f"expected a string at {self.buf[self.pos:self.pos + 20]!r}")
+        i = self.pos + 1
+        while True:
+            # str.find is much faster than a regex over long base64 outputs
+            quote = self.buf.find('"', i)
+            escape = self.buf.find("\\", i, len(self.buf) if quote < 0 else quote)
+            if escape < 0 and quote >= 0:
+                return quote + 1
+            if 0 <= escape < len(self.buf) - 1:
+                i = escape + 2  # an escape and the character it escapes
+                continue
+            resume = escape if escape >= 0 else len(self.buf)
+            if not keep:
+                self.pos = resume
+            offset = self.pos
+            if not self._fill():
+                raise NotebookError("unterminated string")
+            i = resume - offset
+
+    def read_string(self) -> str:
+        end = self._string_end(keep=True)
+        value = json.loads(self.buf[self.pos:end])
+        self.pos = end
+        return value
+
+    def read_text(self) -> str:
+        """A string, or a list of strings joined, as nbformat stores sources."""
+        char = self.peek()
+        if char == '"':
+            return self.read_string()
+        if char == "[":
+            return "".join(self.read_string() for _ in self.items())
+        self.skip_value()
+        return ""
+
+    def skip_value(self):
+        depth = 0
+        while True:
+            char = self.peek()
+            if char == '"':
+                self.pos = self._string_end(keep=False)
+            elif char in "[{":
+                depth += 1
+                self.pos += 1
+            elif char in "]}":
+                depth -= 1
+                self.pos += 1
+            elif char in ",:":
+                self.pos += 1
+            else:
+                while not _SCALAR_END.search(self.buf, self.pos) and self._fill():
+                    pass
+                match = _SCALAR_END.search(self.buf, self.pos)
+                self.pos = match.start() if match else len(self.buf)
+            if depth == 0:
+                return
+
+    def members(self) -> Iterator[str]:
+        """Keys of the object at `pos`; the caller consumes each value before the next key."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_string()
+            self.expect(":")
+            yield key
+            if self._separator("}") == "}":
+                return
+
+    def items(self) -> Iterator[None]:
+        """Steps through the array at `pos`; the caller consumes each element."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self._separator("]") == "]":
+                return
+
+    def _separator(self, close: str) -> str:
+        char = self.peek()
+        if char not in ("," + close):
+            raise NotebookError(f"expected ',' or {close!r} at {self.buf[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+        return char
+
+
+def iter_cells(path: Path) -> Iterator[Cell]:
+    """Every cell of an nbformat 4 notebook, in order, without reading outputs into memory."""
+    with open(path, encoding="utf-8") as stream:
+        reader = _Reader(stream)
+        for key in reader.members():
+            if key != "cells":
+                reader.skip_value()
+                continue
+            for index, _ in enumerate(reader.items()):
+                cell_type, source = "", ""
+                for name in reader.members():
+                    if name == "cell_type":
+                        cell_type = reader.read_string()
+                    elif name == "source":
+                        source = reader.read_text()
+                    else:
+                        reader.skip_value()
+                yield Cell(index, cell_type, source)
+
+
+def code_cells(path: Path) -> List[Cell]:
+    return [cell for cell in iter_cells(path) if cell.cell_type == "code"]
+
+
+def to_python(source: str) -> str:
+    """Rewrite IPython syntax into plain Python, keeping line numbers.
+
+    `%magic args` becomes `__autoviron_magic__("magic", "args")`, `!cmd`
+    becomes `__autoviron_shell__("cmd")` (both also on the right of an
+    assignment), other cell magics become one `__autoviron_cell_magic__`
+    call and `obj?` help lines become `pass`.
+    """
+    lines = source.splitlines()
+    if lines and lines[0].lstrip().startswith("%%"):
+        name, _, args = lines[0].lstrip()[2:].partition(" ")
+        body = "\n".join(lines[1:])
+        if name not in _PYTHON_CELL_MAGICS:
+            call = f"__autoviron_cell_magic__({name!r}, {args.strip()!r}, {body!r})"
+            return call + "\n" * len(lines[1:])
+        lines = [""] + lines[1:]
+    out = []
+    for line in lines:
+        match = _MAGIC_LINE.match(line)
+        if _HELP_LINE.match(line):
+            line = f"{line[:len(line) - len(line.lstrip())]}pass"
+        elif match and (match.group("magic") or match.group("shell") is not None):
+            target = f"{match.group('target')} = " if match.group("target") else ""
+            if match.group("magic"):
+                call = f"__autoviron_magic__({match.group('magic')!r}, {match.group('rest').strip()!r})"
+            else:
+                capture = ", capture=True" if target else ""
+                call = f"__autoviron_shell__({match.group('shell').strip()!r}{capture})"
+            line = match.group("indent") + target + call
+        out.append(line)
+    return "\n".join(out) + ("\n" if source.endswith("\n") else "")
+
+
+def pip_requirements(source: str) -> List[str]:
+    """Requirements named by `%pip install`/`!pip install`/`%conda install` lines."""
+    from packaging.requirements import InvalidRequirement, Requirement
+    requirements = []
+    for line in source.splitlines():
+        match = _PIP_LINE.match(line)
+        if not match:
+            continue
+        try:
+            args = shlex.split(match.group("args"), comments=True)
+        except ValueError:
+            continue
+        skip_next = False
+        for arg in args:
+            if skip_next:
+                skip_next = False
+            elif arg.startswith("-"):
+                skip_next = arg in _VALUE_OPTIONS
+            else:
+                try:
+                    Requirement(arg)
+                except InvalidRequirement:
+                    continue  # a path, URL or `{variable}`
+                requirements.append(arg)
+    return requirements
+
+
+def notebook_requirements(path: Path) -> List[str]:
+    return [req for cell in code_cells(path) for req in pip_requirements(cell.source)]
+
+
+def notebook_target(command: List[str]) -> Optional[Path]:
+    """The notebook `command` runs (`x.ipynb ...`), if it is an existing file."""
+    if command and command[0].endswith(".ipynb"):
+        path = Path(command[0])
+        return path if path.is_file() else None
+    return None
+
+
+class _Worker:
+    """The env interpreter running the cells, and the two pipes to talk to it."""
+
+    def __init__(self, cmd: List[str], env: Dict[str, str], cwd: Path, limits: Optional[resources.Limits] = None):
+        read_fd, write_fd = os.pipe()
+        kwargs = {}
+        self.usage: Optional[dict] = None
+        if os.name == "nt":
+            import msvcrt
+            os.set_inheritable(write_fd, True)
+            handle = msvcrt.get_osfhandle(write_fd)
+            kwargs["startupinfo"] = subprocess.STARTUPINFO(lpAttributeList={"handle_list": [handle]})
+            channel = f"handle:{handle}"
+        else:
+            kwargs["pass_fds"] = (write_fd,)
+            kwargs["preexec_fn"] = limits.apply if limits else None
+            channel = f"fd:{write_fd}"
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, env=dict(env, **{CHANNEL_VAR: channel}),
+                                         cwd=cwd, text=True, **kwargs)
+        finally:
+            os.close(write_fd)
+        self.messages = os.fdopen(read_fd, encoding="utf-8")
+
+    def send(self, **command):
+        self.proc.stdin.write(json.dumps(command) + "\n")
+        self.proc.stdin.flush()
+
+    def receive(self) -> Optional[dict]:
+        line = self.messages.readline()
+        return json.loads(line) if line else None
+
+    def close(self) -> int:
+        for stream in (self.proc.stdin, self.messages):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        code = self._reap(10)
+        if code is None:
+            self.proc.kill()
+            code = self._reap(None)
+        return code
+
+    def _reap(self, timeout: Optional[float]) -> Optional[int]:
+        """Wait for the worker, keeping its rusage in `usage` where `wait4` exists; None on timeout."""
+        if not hasattr(os, "wait4"):
+            try:
+                return self.proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                return None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            pid, status, usage = os.wait4(self.proc.pid, os.WNOHANG)
+            if pid:
+                # Reaped here, so tell Popen not to wait for it again
+                self.proc.returncode = resources._exit_code(status)
+                self.usage = resources.rusage_dict(usage)
+                return self.proc.returncode
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(0.05)
+
+
+def _heal(error: dict, env_type, env_path: Path, project_root: Path, base_env: Dict[str, str],
+          negative, failure_db) -> Optional[dict]:
+    """Fix a failed cell if possible; returns the `retry` command to send, or None."""
+    from autoviron.core import envvars
+    from autoviron.core.deps import package_candidates
+    from autoviron.core.execution import _install_module
+    cell = error["cell"] + 1
+    if error["ename"] == "ModuleNotFoundError" and error.get("module"):
+        module = error["module"].split(".")[0]
+        candidates = package_candidates(module)
+        log_warning(f"Smart Retry: Missing module '{module}' detected in cell {cell}.")
+        emit("heal", reason="missing_module", module=module, package=candidates[0], cell=cell)
+        package = _install_module(env_type, env_path, project_root, module, candidates, negative)
+        if package is None:
+            return None
+        failure_db.record_failure("ModuleNotFoundError", module, f"Auto-installed {package}")
+        return {"action": "retry"}
+    if error["ename"] == "KeyError" and error.get("key") and error["key"] not in base_env:
+        var = error["key"]
+        log_warning(f"Smart Retry: Missing environment variable '{var}' detected in cell {cell}.")
+        emit("heal", reason="missing_env_var", var=var, cell=cell)
+        if not envvars.interactive():
+            log_error(f"Set {var} in the environment or a .env file.")
+            return None
+        base_env[var] = typer.prompt(f"Please provide a value for {var}")
+        failure_db.record_failure("KeyError", var, f"Injected ENV var {var}")
+        return {"action": "retry", "env": {var: base_env[var]}}
+    return None
+
+
+def _preinstall(requirements: List[str], env_type, env_path: Path, project_root: Path, negative):
+    """Install what the notebook's `%pip install` lines and imports need before the first cell."""
+    from autoviron.core.execution import _auto_install_package, _is_installed
+    for requirement in requirements:
+        if not _is_installed(env_path, requirement):
+            _auto_install_package(env_type, env_path, project_root, requirement, None, negative)
+
+
+def run_notebook(env_type, env_path: Path, notebook: Path, args: List[str], project_root: Path,
+                 max_retries: int = 3, refresh: bool = False,
+                 accounting: Optional[resources.Accounting] = None) -> int:
+    """Run a notebook's code cells headlessly in the env, healing and resuming from the failing cell.
+
+    With `notebooks.preflight`, `%pip install` requirements and required
+    third-party imports the env cannot import are installed before the
+    first cell runs. A cell is retried at most `max_retries` times.
+    The worker runs under `accounting`'s limits and its usage is recorded
+    there as a single attempt, since resuming happens in the same process.
+    """
+    from autoviron.core import envvars
+    from autoviron.core.activation import prepare_command
+    from autoviron.core.config import get_config
+    from autoviron.core.deps import REQUIRED, package_candidates, third_party_imports
+    from autoviron.core.execution import _install_module
+    from autoviron.core.failure_db import FailureDB
+    from autoviron.core.negative_cache import NegativeCache
+    config = get_config(project_root)
+    opts = settings(config)
+    try:
+        cells = code_cells(notebook)
+    except (OSError, UnicodeDecodeError, NotebookError) as e:
+        log_error(f"Cannot read {notebook}: {e}")
+        return 1
+    base_env = dict(os.environ, **envvars.collect_environment(project_root, [str(notebook)] + args, config))
+    base_env.setdefault("MPLBACKEND", "Agg")
+    negative = NegativeCache(env_path, config, refresh=refresh)
+    failure_db = FailureDB(project_root)
+
+    plan = {"cells": [{"index": cell.index, "code": to_python(cell.source)} for cell in cells],
+            "display": bool(opts["display"]), "preflight": None}
+    if opts["preflight"]:
+        _preinstall([req for cell in cells for req in pip_requirements(cell.source)],
+                    env_type, env_path, project_root, negative)
+        plan["preflight"] = sorted(third_party_imports(notebook, project_root, kinds=(REQUIRED,)))
+
+    cmd, env = prepare_command(env_type, env_path, ["python", str(WORKER_SCRIPT), str(notebook.resolve())] + args,
+                               base_env)
+    if accounting is None:
+        accounting = resources.Accounting()
+    started = time.monotonic()
+    worker = _Worker(cmd, env, notebook.resolve().parent, accounting.limits)
+    retries: Dict[int, int] = {}
+    failed: Optional[dict] = None
+    try:
+        worker.send(**plan)
+        while True:
+            message = worker.receive()
+            if message is None:
+                break
+            event = message["event"]
+            if event == "preflight":
+                for module in message["missing"]:
+                    _install_module(env_type, env_path, project_root, module, package_candidates(module), negative)
+                worker.send(action="start")
+            elif event == "cell_start":
+                log_debug(f"Running cell {message['cell'] + 1}")
+            elif event == "cell_end":
+                emit("timing", f"Cell {message['cell'] + 1}", phase="cell", cell=message["cell"] + 1,
+                     duration=round(message["duration"], 6))
+            elif event == "warning":
+                log_warning(message["message"])
+            elif event == "error":
+                cell = message["cell"]
+                command = None
+                if retries.get(cell, 0) < max_retries:
+                    command = _heal(message, env_type, env_path, project_root, base_env, negative, failure_db)
+                if command is None:
+                    failed = message
+                    worker.send(action="abort")
+                    continue
+                retries[cell] = retries.get(cell, 0) + 1
+                log_info(f"Resuming from cell {cell + 1}... (Attempt {retries[cell]}/{max_retries})")
+                emit("retry", attempt=retries[cell], max_retries=max_retries, reason="resume", cell=cell + 1)
+                worker.send(**command)
+            elif event == "done":
+                log_debug(f"Ran {len(cells)} code cells")
+    except KeyboardInterrupt:
+        worker.proc.terminate()
+        worker.close()
+        return 130
+    except BrokenPipeError:
+        pass
+    code = worker.close()
+    stderr = failed["traceback"] if failed is not None else ""
+    attempt = accounting.record(subprocess.CompletedProcess(cmd, code, "", stderr), time.monotonic() - started,
+                                worker.usage)
+    if attempt.outcome in resources.FATAL:
+        if failed is not None:
+            print(failed["traceback"], file=sys.stderr, end="")
+        log_error(accounting.describe(attempt.outcome))
+        return code or 1
+    if failed is not None:
+        print(failed["traceback"], file=sys.stderr, end="")
+        if retries.get(failed["cell"], 0) >= max_retries:
+            log_error("Max smart-retry attempts reached. Aborting.")
+        log_error(f"Cell {failed['cell'] + 1} failed: {failed['ename']}: {failed['evalue']}")
+        return code or 1
+    return code
@@ -0,0 +1,130 @@
+"""
+Zero-overhead exec passthrough for warm projects (`autoviron run --exec`).
+
+After a successful run, the detected environment and a stat fingerprint of
+everything that could invalidate it (requirement sources, lockfile, config
+layers, `.env` files, the env's interpreter and site-packages, the script
+itself) are recorded in the project state. A later `--exec` run only
+re-stats those paths; if nothing moved it replaces itself with the target
+interpreter via `os.execve`, so no supervisor process stays behind. Any
+mismatch falls back to the normal self-healing path.
+"""
+import os
+import sys
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from autoviron.core.env_manager import EnvManager, EnvironmentType
+from autoviron.core.config import config_sources, get_config
+from autoviron.core.state import read_state, update_state
+from autoviron.core import dists as dist_meta
+from autoviron.core import lockfile, envvars
+
+STATE_KEY = "warm"
+
+# (path, st_mtime_ns, st_size); missing paths are recorded as (path, 0, -1)
+Fingerprint = List[Tuple[str, int, int]]
+
+
+def _stat(path: str) -> Tuple[str, int, int]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, 0, -1)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _script_paths(project_root: Path, command: List[str]) -> List[Path]:
+    """The `.py` files named on the command line; their imports are part of the dependency state."""
+    return [project_root / arg for arg in command if arg.endswith(".py") and (project_root / arg).is_file()]
+
+
+def watched_paths(manager: EnvManager, env_path: Path) -> List[Path]:
+    """Every path whose change means the environment has to be re-checked."""
+    project_root = manager.project_root
+    paths = [project_root / name for name in manager.requirements_files]
+    paths += [lockfile.lockfile_path(project_root), project_root / "pyproject.toml"]
+    paths += config_sources(project_root)
+    paths += [project_root / name for name in envvars.settings(manager.config)["files"]]
+    paths += [env_path / "pyvenv.cfg", dist_meta.python_executable(env_path)]
+    paths += dist_meta.find_site_packages(env_path)
+    return paths
+
+
+def fingerprint(paths: List[Path]) -> Fingerprint:
+    return [_stat(str(p)) for p in paths]
+
+
+def record_warm_state(manager: EnvManager, env_type: EnvironmentType, env_path: Path, command: List[str]):
+    """Remember that `command` just ran cleanly in this environment."""
+    state = read_state(manager.project_root).get(STATE_KEY) or {}
+    scripts = dict(state.get("scripts") or {}) if state.get("env_path") == str(env_path) else {}
+    for script in _script_paths(manager.project_root, command):
+        scripts[str(script)] = _stat(str(script))
+    update_state(manager.project_root, **{STATE_KEY: {
+        "env_type": env_type.value,
+        "env_path": str(env_path),
+        "req_hash": manager.requirements_hash(),
+        "paths": fingerprint(watched_paths(manager, env_path)),
+        "scripts": scripts,
+    }})
+
+
+def validate_warm_state(project_root: Path, command: List[str]) -> Optional[Tuple[EnvironmentType, Path]]:
+    """Return the cached (env type, env path) if nothing it depends on changed, else None.
+
+    Costs one JSON read and a stat per watched path; no detection, no
+    subprocesses.
+    """
+    state = read_state(project_root)
+    warm = state.get(STATE_KEY)
+    if not warm or ("req_hash" in state and state["req_hash"] != warm.get("req_hash")):
+        return None
+    try:
+        env_type = EnvironmentType(warm["env_type"])
+        env_path = Path(warm["env_path"])
+        recorded = [tuple(entry) for entry in warm["paths"]]
+        scripts = {path: tuple(entry) for path, entry in warm.get("scripts", {}).items()}
+    except (KeyError, TypeError, ValueError):
+        return None
+    if any(_stat(entry[0]) != entry for entry in recorded):
+        return None
+    for script in _script_paths(project_root, command):
+        entry = scripts.get(str(script))
+        if entry is None or _stat(str(script)) != entry:
+            return None
+    return env_type, env_path
+
+
+def exec_command(env_type: EnvironmentType, env_path: Path, command: List[str],
+                 base_env: Optional[Dict[str, str]] = None):
+    """Replace the current process with `command` running inside the env. Does not return."""
+    from autoviron.core.activation import prepare_command
+    cmd, env = prepare_command(env_type, env_path, command, base_env)
+    executable = cmd[0] if os.sep in cmd[0] else shutil.which(cmd[0], path=env.get("PATH"))
+    if not executable:
+        raise FileNotFoundError(cmd[0])
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.execve(executable, cmd, env)
+
+
+def try_exec(project_root: Path, command: List[str]) -> bool:
+    """Exec `command` directly if the warm state is valid.
+
+    Only returns (False) when the fast path cannot be taken; Windows always
+    falls back since `execve` there does not replace the process.
+    """
+    if os.name == "nt" or not command:
+        return False
+    cached = validate_warm_state(project_root, command)
+    if cached is None:
+        return False
+    # The last clean run had every variable it needed; only the .env overlay is re-applied
+    opts = envvars.settings(get_config(project_root))
+    base_env = dict(os.environ, **envvars.load_env_files(project_root, opts)) if opts["enabled"] else None
+    try:
+        exec_command(cached[0], cached[1], command, base_env)
+    except OSError:
+        pass
+    return False
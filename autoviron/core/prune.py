@@ -0,0 +1,170 @@
+"""
+Unused-dependency pruning (`autoviron prune`).
+
+The distributions the project needs are the ones that own a module its
+code imports or that a runtime requirement file lists (servers such as
+gunicorn are never imported), plus everything those require according to
+the installed metadata (the same graph `lock` walks). Packaging tools,
+editable installs of the project itself and anything in `prune.keep` are
+always kept, and so are development requirements unless
+`prune.keep_dev_requirements` is off. Everything else in the env is reported and, with `--apply`,
+uninstalled; `--update-requirements` also drops the matching lines from
+the requirement files. Since runtime requirements are always needed, only
+dev requirement files can lose lines that way.
+"""
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from packaging.requirements import InvalidRequirement, Requirement
+from autoviron.core.config import excluded_patterns, section
+from autoviron.core import dists as dist_meta
+from autoviron.core.deps import first_party_modules, get_stdlib_modules, scan_imports, read_requirements
+from autoviron.core.env_manager import EnvironmentType
+from autoviron.core.locking import atomic_write_text
+
+
+
+def settings(config: dict) -> dict:
+    return section(config, "prune")
+
+
+@dataclass
+class PrunePlan:
+    """What the project needs and what could be removed from its env."""
+    needed: Dict[str, str] = field(default_factory=dict)
+    unused: List[dist_meta.Distribution] = field(default_factory=list)
+    unattributed_imports: List[str] = field(default_factory=list)
+
+    def size(self, dist: dist_meta.Distribution) -> int:
+        return sum(entry.size or 0 for entry in dist.record())
+
+    @property
+    def reclaimable(self) -> int:
+        return sum(self.size(dist) for dist in self.unused)
+
+
+def project_imports(project_root: Path, config: dict) -> Set[str]:
+    """Top-level third-party modules imported anywhere in the project."""
+    from autoviron.core.bytecode import project_sources
+    sources = [Path(p) for p in project_sources(project_root, excluded_patterns(config))]
+    stdlib = get_stdlib_modules()
+    # A script in a plain subdirectory imports its siblings directly; modules inside a
+    # package (mysite/celery.py) are only importable through it, so they name nothing
+    script_dirs = {source.parent for source in sources if not (source.parent / "__init__.py").exists()}
+    first_party = first_party_modules(project_root, script_dirs)
+    modules: Set[str] = set()
+    for source in sources:
+        modules.update(scan_imports(source))
+    return {m for m in modules if m not in stdlib and m not in first_party}
+
+
+def _is_editable(dist: dist_meta.Distribution) -> bool:
+    from autoviron.core.lockfile import _direct_url
+    return bool(_direct_url(dist).get("dir_info", {}).get("editable"))
+
+
+def _is_dev_requirement_file(name: str) -> bool:
+    return "dev" in Path(name).name.lower()
+
+
+def plan_prune(env_path: Path, project_root: Path, config: dict, requirement_files: Iterable[str]) -> PrunePlan:
+    """Work out which installed distributions the project's imports do not need."""
+    opts = settings(config)
+    dists = dist_meta.env_distributions(env_path)
+    installed = {d.key: d for d in dists}
+    owners: Dict[str, List[str]] = {}
+    for dist in dists:
+        for module in dist.top_level():
+            owners.setdefault(module, []).append(dist.key)
+
+    plan = PrunePlan()
+    roots: List[Tuple[str, Tuple[str, ...], str]] = []
+    for module in sorted(project_imports(project_root, config)):
+        if module not in owners:
+            plan.unattributed_imports.append(module)
+        roots.extend((key, (), f"imported as `{module}`") for key in owners.get(module, []))
+    for name in opts["keep"] or []:
+        roots.append((dist_meta.normalize_name(name), (), "kept by config"))
+    for name in requirement_files:
+        if _is_dev_requirement_file(name) and not opts["keep_dev_requirements"]:
+            continue
+        for req in read_requirements(project_root / name):
+            roots.append((dist_meta.normalize_name(req.name), tuple(sorted(req.extras)), f"listed in {name}"))
+    for dist in dists:
+        if _is_editable(dist):
+            roots.append((dist.key, (), "editable install"))
+        elif not dist.top_level():
+            roots.append((dist.key, (), "installs no modules we can attribute"))
+
+    # Breadth-first so each package is explained by its shortest path
+    marker_env = dist_meta.marker_environment(env_path)
+    queue = list(roots)
+    seen: Set[Tuple[str, Tuple[str, ...]]] = set()
+    while queue:
+        key, extras, reason = queue.pop(0)
+        if (key, extras) in seen or key not in installed:
+            continue
+        seen.add((key, extras))
+        plan.needed.setdefault(key, reason)
+        for req in installed[key].requirements():
+            if dist_meta.requirement_applies(req, marker_env, extras):
+                queue.append((dist_meta.normalize_name(req.name), tuple(sorted(req.extras)), f"required by {installed[key].name}"))
+    plan.unused = [dist for dist in dists if dist.key not in plan.needed]
+    return plan
+
+
+def uninstall(env_type: EnvironmentType, env_path: Path, project_root: Path, names: List[str]) -> bool:
+    """Remove distributions from the env with the tool that manages it."""
+    if not names:
+        return True
+    from autoviron.core import bytecode
+    before = bytecode.snapshot(env_path)
+    if env_type == EnvironmentType.POETRY:
+        cmd = ["poetry", "run", "pip", "uninstall", "-y"] + names
+    elif env_type == EnvironmentType.PIPENV:
+        cmd = ["pipenv", "uninstall"] + names
+    elif env_type == EnvironmentType.CONDA:
+        cmd = ["conda", "remove", "-y", "-n", env_path.name] + names
+    else:
+        cmd = [str(dist_meta.python_executable(env_path)), "-m", "pip", "uninstall", "-y"] + names
+    try:
+        subprocess.run(cmd, cwd=project_root, check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    bytecode.purge_removed(before)
+    return True
+
+
+def _requirement_key(line: str) -> Optional[str]:
+    text = line.split(" #", 1)[0].split(" --", 1)[0].strip()
+    if not text or text.startswith(("#", "-")):
+        return None
+    try:
+        return dist_meta.normalize_name(Requirement(text).name)
+    except InvalidRequirement:
+        return None
+
+
+def update_requirement_files(project_root: Path, requirement_files: Iterable[str], removed: Iterable[str]) -> List[str]:
+    """Drop the lines for `removed` distributions; returns the files that changed."""
+    removed = {dist_meta.normalize_name(name) for name in removed}
+    changed = []
+    for name in requirement_files:
+        path = project_root / name
+        if not path.is_file():
+            continue
+        lines = path.read_text().splitlines(keepends=True)
+        kept = [line for line in lines if _requirement_key(line) not in removed]
+        if len(kept) != len(lines):
+            atomic_write_text(path, "".join(kept))
+            changed.append(name)
+    return changed
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
@@ -0,0 +1,270 @@
+"""
+Per-attempt resource accounting and limits for `autoviron run`.
+
+Each attempt's child is reaped with `os.wait4`, which gives its wall time,
+user/sys CPU, peak RSS, block I/O and context switches (the fork-server
+reports the same from its side). `--max-rss`/`--max-cpu` become `setrlimit`
+calls in the child. A run that hits a limit or is killed by the OOM killer
+is classified as such and never retried: no healing step can fix it.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import threading
+import subprocess
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+from autoviron.core.config import section
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Outcomes the heal loop must not retry
+FATAL = ("memory_limit", "cpu_limit", "oom_killed")
+# Peak RSS at this fraction of --max-rss counts as "at the limit" for a signal death
+NEAR_LIMIT = 0.9
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def settings(config: dict) -> dict:
+    return section(config, "resources")
+
+
+def parse_size(value) -> Optional[int]:
+    """Parse `512M`, `2G`, `1.5g` or a plain byte count."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().upper().rstrip("B").rstrip("I")
+    unit = text[-1] if text and text[-1] in _SIZE_UNITS else ""
+    number = text[:-1] if unit else text
+    try:
+        return int(float(number) * _SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size: {value!r} (use e.g. 512M or 2G)")
+
+
+def format_bytes(size: Optional[int]) -> str:
+    if size is None:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+@dataclass
+class Limits:
+    """Limits applied to every attempt's child process."""
+    max_rss: Optional[int] = None
+    max_cpu: Optional[float] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.max_rss or self.max_cpu)
+
+    def to_dict(self) -> dict:
+        return {"max_rss": self.max_rss, "max_cpu": self.max_cpu}
+
+    def apply(self):
+        """Set the limits on the current process (run in the child, before exec)."""
+        apply_limits(self.to_dict())
+
+
+def apply_limits(limits: dict):
+    if resource is None:
+        return
+    if limits.get("max_rss"):
+        # RLIMIT_RSS is not enforced by modern kernels; the address-space limit is what makes
+        # allocations fail with MemoryError instead of the machine swapping
+        resource.setrlimit(resource.RLIMIT_AS, (int(limits["max_rss"]), int(limits["max_rss"])))
+    if limits.get("max_cpu"):
+        soft = max(1, int(float(limits["max_cpu"]) + 0.999))
+        # SIGXCPU at the soft limit, SIGKILL one second later if it is ignored
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1))
+
+
+@dataclass
+class AttemptUsage:
+    """What one attempt's child process used."""
+    attempt: int
+    exit_code: int
+    wall: float
+    user: Optional[float] = None
+    sys: Optional[float] = None
+    max_rss: Optional[int] = None
+    inblock: Optional[int] = None
+    oublock: Optional[int] = None
+    nvcsw: Optional[int] = None
+    nivcsw: Optional[int] = None
+    outcome: str = "ok"
+
+    @property
+    def cpu(self) -> Optional[float]:
+        return None if self.user is None else self.user + (self.sys or 0.0)
+
+
+def rusage_dict(usage) -> dict:
+    """The fields we report from a `resource.struct_rusage`, with peak RSS in bytes."""
+    rss_scale = 1 if sys.platform == "darwin" else 1024
+    return {"user": usage.ru_utime, "sys": usage.ru_stime, "max_rss": usage.ru_maxrss * rss_scale,
+            "inblock": usage.ru_inblock, "oublock": usage.ru_oublock,
+            "nvcsw": usage.ru_nvcsw, "nivcsw": usage.ru_nivcsw}
+
+
+def _exit_code(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def final_exception(stderr: str) -> str:
+    """The exception line that ends the last traceback in `stderr`, or its last line without one.
+
+    Out of memory, Python may print a bare `MemoryError` with no traceback.
+    """
+    lines = stderr.splitlines()
+    starts = [i for i, line in enumerate(lines) if line.startswith("Traceback (most recent call last):")]
+    if not starts:
+        last = next((line for line in reversed(lines) if line.strip()), "")
+        return "" if last[:1].isspace() else last.strip()
+    for line in lines[starts[-1] + 1:]:
+        if line and not line[0].isspace():
+            return line.strip()
+    return ""
+
+
+def classify(result: subprocess.CompletedProcess, usage: AttemptUsage, limits: Limits) -> str:
+    """Tell resource failures apart from ordinary (possibly healable) errors."""
+    code = result.returncode
+    if code == 0:
+        return "ok"
+    stderr = result.stderr or ""
+    xcpu = getattr(signal, "SIGXCPU", None)
+    if xcpu is not None and code == -xcpu:
+        return "cpu_limit"
+    if limits.max_cpu and usage.cpu is not None and usage.cpu >= limits.max_cpu and code < 0:
+        return "cpu_limit"
+    if limits.max_rss:
+        error = final_exception(stderr)
+        if error.split(":", 1)[0] == "MemoryError" or "[Errno 12]" in error:
+            return "memory_limit"
+        # Allocations that fail outside Python (C extensions, the interpreter itself) die by signal
+        fatal_signals = (getattr(signal, "SIGKILL", 9), getattr(signal, "SIGSEGV", 11))
+        if -code in fatal_signals and usage.max_rss and usage.max_rss >= NEAR_LIMIT * limits.max_rss:
+            return "memory_limit"
+    if code == -getattr(signal, "SIGKILL", 9) or code == 137:
+        # Nobody here sent SIGKILL; on Linux that is almost always the (cgroup) OOM killer
+        return "oom_killed"
+    return "error"
+
+
+class Accounting:
+    """Runs attempts with limits applied and keeps their resource usage."""
+
+    def __init__(self, limits: Optional[Limits] = None):
+        self.limits = limits or Limits()
+        self.attempts: List[AttemptUsage] = []
+
+    def run(self, cmd: List[str], cwd: Path, env: Dict[str, str]) -> subprocess.CompletedProcess:
+        """Like `subprocess.run(capture_output=True, text=True)`, but reaped with `wait4`."""
+        start = time.monotonic()
+        if not hasattr(os, "wait4"):
+            result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, env=env)
+            self.record(result, time.monotonic() - start, None)
+            return result
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                preexec_fn=self.limits.apply if self.limits else None)
+        output = {}
+
+        def drain(name, stream):
+            output[name] = stream.read()
+            stream.close()
+
+        readers = [threading.Thread(target=drain, args=(name, stream), daemon=True)
+                   for name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr))]
+        for reader in readers:
+            reader.start()
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        except KeyboardInterrupt:
+            proc.kill()
+            proc.wait()
+            raise
+        # Reaped here, so tell Popen not to wait for it again
+        proc.returncode = _exit_code(status)
+        for reader in readers:
+            reader.join()
+        result = subprocess.CompletedProcess(cmd, proc.returncode, output.get("stdout", ""), output.get("stderr", ""))
+        self.record(result, time.monotonic() - start, rusage_dict(usage))
+        return result
+
+    def record(self, result: subprocess.CompletedProcess, wall: float, usage: Optional[dict]) -> AttemptUsage:
+        attempt = AttemptUsage(len(self.attempts) + 1, result.returncode, wall, **(usage or {}))
+        attempt.outcome = classify(result, attempt, self.limits)
+        self.attempts.append(attempt)
+        return attempt
+
+    @property
+    def last(self) -> Optional[AttemptUsage]:
+        return self.attempts[-1] if self.attempts else None
+
+    def describe(self, outcome: str) -> str:
+        if outcome == "memory_limit":
+            return f"The program hit the memory limit ({format_bytes(self.limits.max_rss)}); not retrying."
+        if outcome == "cpu_limit":
+            return f"The program hit the CPU-time limit ({self.limits.max_cpu:g}s); not retrying."
+        return "The program was killed (SIGKILL), most likely by the out-of-memory killer; not retrying."
+
+    def to_dict(self) -> dict:
+        return {
+            "limits": self.limits.to_dict(),
+            "attempts": [dict(asdict(a), cpu=a.cpu) for a in self.attempts],
+            "peak_rss": max((a.max_rss or 0 for a in self.attempts), default=0) or None,
+            "cpu": sum(a.cpu or 0.0 for a in self.attempts),
+            "wall": sum(a.wall for a in self.attempts),
+        }
+
+    def write_json(self, path: Path):
+        path.write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+
+
+def print_summary(accounting: Accounting):
+    """End-of-run table of every attempt's usage."""
+    from rich.table import Table
+    from autoviron.ux.console import console
+    table = Table(title="Resource usage")
+    for column in ("#", "Outcome", "Exit", "Wall", "CPU", "Peak RSS", "Blocks in/out", "Ctx sw"):
+        table.add_column(column, justify="left" if column == "Outcome" else "right")
+    for a in accounting.attempts:
+        table.add_row(
+            str(a.attempt), a.outcome, str(a.exit_code), f"{a.wall:.2f}s",
+            "-" if a.cpu is None else f"{a.cpu:.2f}s", format_bytes(a.max_rss),
+            "-" if a.inblock is None else f"{a.inblock}/{a.oublock}",
+            "-" if a.nvcsw is None else str(a.nvcsw + a.nivcsw),
+        )
+    console.print(table)
+
+
+def check_rss_regression(project_root: Path, command: List[str], accounting: Accounting, opts: dict) -> Optional[str]:
+    """Compare a clean run's peak RSS with the last clean run of the same command; remember the new one."""
+    from autoviron.core.state import read_state, update_state
+    last = accounting.last
+    if last is None or last.outcome != "ok" or not last.max_rss:
+        return None
+    key = " ".join(command)
+    history = dict(read_state(project_root).get("peak_rss") or {})
+    previous = history.get(key)
+    history[key] = last.max_rss
+    update_state(project_root, peak_rss=history)
+    ratio = opts["rss_regression_ratio"]
+    if previous and ratio is not None and last.max_rss > previous * (1 + float(ratio)):
+        return (f"Peak memory grew from {format_bytes(previous)} to {format_bytes(last.max_rss)} "
+                f"(+{last.max_rss / previous - 1:.0%}) since the last clean run.")
+    return None
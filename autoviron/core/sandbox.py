@@ -0,0 +1,130 @@
+"""
+Dockerfile generation for `autoviron sandbox`.
+
+Builds are multi-stage: a builder stage turns the requirement sources (or
+the lockfile) into wheels with a BuildKit pip cache, and a slim runtime
+stage installs those wheels with `--no-index`, precompiles bytecode and
+only then copies the project sources, so editing code never invalidates
+the dependency layer.
+"""
+import json
+from pathlib import Path
+from typing import List, Optional
+from autoviron.core import lockfile
+from autoviron.core.config import excluded_patterns, get_config, read_config_file
+from autoviron.plugins.base import ProjectHandlerPlugin
+
+DEFAULT_PYTHON_VERSION = "3.11"
+PIP_CACHE_MOUNT = "--mount=type=cache,target=/root/.cache/pip"
+# Always kept out of the build context, on top of the configured exclude patterns
+DOCKERIGNORE_BASE = [
+    ".git",
+    ".dockerignore",
+    "Dockerfile",
+    "__pycache__",
+    "*.py[cod]",
+    ".autoviron_cache",
+    ".autoviron_failures.json",
+    ".vscode",
+    ".idea",
+]
+
+
+def _runtime_requirement_files(project_root: Path) -> List[str]:
+    """Configured requirement files that exist, minus development-only ones."""
+    names = get_config(project_root).get("requirements_files") or ["requirements.txt"]
+    return [n for n in names if (project_root / n).is_file() and "dev" not in n.lower()]
+
+
+def _pyproject_dependencies(project_root: Path) -> List[str]:
+    pyproject = project_root / "pyproject.toml"
+    if not pyproject.is_file():
+        return []
+    return list(read_config_file(pyproject).get("project", {}).get("dependencies", []))
+
+
+def _quote(args: List[str]) -> str:
+    return " ".join(f'"{a}"' if any(c in a for c in " <>=!~;[") else a for a in args)
+
+
+def _continued(lines: List[str]) -> str:
+    return " \\\n    ".join(lines)
+
+
+def generate_dockerfile(project_root: Path, plugin: Optional[ProjectHandlerPlugin] = None,
+                        python_version: str = DEFAULT_PYTHON_VERSION) -> str:
+    """Render a multi-stage, layer-cache friendly Dockerfile for the project."""
+    image = f"python:{python_version}-slim"
+    proj_type = plugin.name if plugin else "Standard Python"
+    cmd = plugin.get_docker_cmd(project_root) if plugin else ["python", "main.py"]
+    port = plugin.get_docker_port() if plugin else None
+
+    lock_path = lockfile.lockfile_path(project_root)
+    req_files = _runtime_requirement_files(project_root)
+    pyproject_deps = [] if (lock_path.exists() or req_files) else _pyproject_dependencies(project_root)
+    extra_packages = plugin.get_docker_packages(project_root) if plugin else []
+
+    lines = [
+        "# syntax=docker/dockerfile:1",
+        f"# Generated by `autoviron sandbox` for a {proj_type} project.",
+        "",
+    ]
+
+    builder = []
+    if lock_path.exists():
+        builder.append(f"COPY {lockfile.LOCKFILE_NAME} ./")
+        builder.append(_continued([f"RUN {PIP_CACHE_MOUNT}",
+                                   f"pip wheel --wheel-dir /wheels --no-deps --require-hashes -r {lockfile.LOCKFILE_NAME}"]))
+        if extra_packages:
+            # Unhashed extras cannot join the locked set, so they are resolved with their dependencies,
+            # held to the locked versions (hashes stripped: pip rejects unhashed extras next to them)
+            builder.append(_continued([
+                f"RUN {PIP_CACHE_MOUNT}",
+                f"sed -e '/--hash=/d' -e 's/ *\\\\$//' {lockfile.LOCKFILE_NAME} > constraints.txt",
+                f"&& pip wheel --wheel-dir /wheels --constraint constraints.txt {_quote(extra_packages)}",
+            ]))
+    elif req_files or pyproject_deps or extra_packages:
+        # One resolver run, so the wheel set never holds two versions of a package
+        sources = " ".join(f"-r {f}" for f in req_files)
+        if req_files:
+            builder.append(f"COPY {' '.join(req_files)} ./")
+        packages = _quote(pyproject_deps + extra_packages)
+        builder.append(_continued([f"RUN {PIP_CACHE_MOUNT}", " ".join(filter(None, ["pip wheel --wheel-dir /wheels", sources, packages]))]))
+
+    if builder:
+        lines += [f"FROM {image} AS builder", "WORKDIR /build"] + builder + [""]
+
+    lines += [
+        f"FROM {image}",
+        _continued(["ENV PYTHONUNBUFFERED=1", "PIP_DISABLE_PIP_VERSION_CHECK=1"]),
+        "RUN useradd --create-home --uid 1000 app",
+        "WORKDIR /app",
+    ]
+    if builder:
+        # Bind-mount the wheels so they never become part of an image layer
+        lines.append(_continued([
+            "RUN --mount=type=bind,from=builder,source=/wheels,target=/wheels",
+            "pip install --no-index --no-deps --no-compile /wheels/*.whl",
+            f"&& python -m compileall -q -j 0 /usr/local/lib/python{python_version}/site-packages",
+        ]))
+    lines += [
+        "COPY . .",
+        "RUN python -m compileall -q -j 0 /app",
+        "# Bytecode is precompiled above; never write it at runtime (read-only friendly)",
+        "ENV PYTHONDONTWRITEBYTECODE=1",
+        "USER app",
+    ]
+    if port:
+        lines.append(f"EXPOSE {port}")
+    lines.append(f"CMD {json.dumps(cmd)}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_dockerignore(project_root: Path) -> str:
+    """Render a .dockerignore that keeps envs, caches and VCS data out of the build context."""
+    config = get_config(project_root)
+    entries = []
+    for pattern in DOCKERIGNORE_BASE + excluded_patterns(config):
+        if pattern not in entries:
+            entries.append(pattern)
+    return "\n".join(entries) + "\n"
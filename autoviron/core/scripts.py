@@ -0,0 +1,251 @@
+"""
+Cached ephemeral environments for single-file scripts.
+
+A script's dependencies come from its PEP 723 inline metadata
+(`# /// script` with `dependencies` and `requires-python`) or, failing that,
+from its third-party imports. The env is built once in the user cache,
+keyed by the normalized dependency set and the interpreter, and shared by
+every script with the same key, so a directory of ops scripts needs neither
+a venv per script nor one venv holding everything. Least recently used envs
+are evicted past `scripts.max_envs` or `scripts.max_size`.
+"""
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+from autoviron.core.config import cache_dir, section
+from autoviron.core.locking import FileLock, LockTimeout, atomic_write_text
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+META_NAME = "autoviron-script-env.json"
+# The reference regex from PEP 723
+_BLOCK = re.compile(r"(?m)^# /// (?P<type>[a-zA-Z0-9-]+)$\s(?P<content>(^#(| .*)$\s)+)^# ///$")
+
+
+def settings(config: dict) -> dict:
+    return section(config, "scripts")
+
+
+class ScriptMetadataError(ValueError):
+    pass
+
+
+@dataclass
+class ScriptSpec:
+    """What a script needs: its requirements, Python constraint and where they came from."""
+    path: Path
+    dependencies: List[str] = field(default_factory=list)
+    requires_python: Optional[str] = None
+    source: str = "imports"
+
+    def key(self, python: str) -> str:
+        """Cache key: normalized, sorted requirements plus the interpreter's real path."""
+        payload = json.dumps([normalize_requirements(self.dependencies), os.path.realpath(python)])
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def script_target(command: List[str]) -> Optional[Path]:
+    """The script `command` runs (`x.py ...` or `python x.py ...`), if it is an existing file."""
+    if not command:
+        return None
+    if command[0].endswith(".py"):
+        candidate = command[0]
+    elif command[0] in ("python", "python3") and len(command) > 1 and command[1].endswith(".py"):
+        candidate = command[1]
+    else:
+        return None
+    path = Path(candidate)
+    return path if path.is_file() else None
+
+
+def read_metadata(source: str) -> Optional[dict]:
+    """Parse the `script` metadata block of a PEP 723 script, if it has one."""
+    blocks = [m for m in _BLOCK.finditer(source) if m.group("type") == "script"]
+    if len(blocks) > 1:
+        raise ScriptMetadataError("Multiple `# /// script` blocks")
+    if not blocks:
+        return None
+    content = "".join(line[2:] if line.startswith("# ") else line[1:]
+                      for line in blocks[0].group("content").splitlines(keepends=True))
+    try:
+        return tomllib.loads(content)
+    except tomllib.TOMLDecodeError as e:
+        raise ScriptMetadataError(f"Invalid `# /// script` block: {e}")
+
+
+def normalize_requirements(requirements: List[str]) -> List[str]:
+    """Canonical, sorted, de-duplicated requirement strings, so equivalent sets share an env."""
+    from packaging.requirements import InvalidRequirement, Requirement
+    from autoviron.core.dists import normalize_name
+    normalized = set()
+    for line in requirements:
+        try:
+            req = Requirement(line)
+        except InvalidRequirement:
+            raise ScriptMetadataError(f"Invalid requirement in script metadata: {line!r}")
+        req.name = normalize_name(req.name)
+        normalized.add(str(req))
+    return sorted(normalized)
+
+
+def script_spec(script: Path) -> ScriptSpec:
+    """Inline metadata when present, the script's third-party imports otherwise."""
+    from autoviron.core.deps import get_package_name, third_party_imports
+    try:
+        metadata = read_metadata(script.read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError):
+        metadata = None
+    if metadata is not None:
+        return ScriptSpec(script, list(metadata.get("dependencies") or []), metadata.get("requires-python"), "pep723")
+    packages = sorted({get_package_name(mod) for mod in third_party_imports(script, script.parent)})
+    return ScriptSpec(script, packages)
+
+
+def has_inline_metadata(command: List[str]) -> bool:
+    script = script_target(command)
+    if script is None:
+        return False
+    try:
+        return "# /// script" in script.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def envs_root() -> Path:
+    return cache_dir() / "script-envs"
+
+
+def _read_meta(env_path: Path) -> Optional[dict]:
+    try:
+        return json.loads((env_path / META_NAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def cached_envs() -> List[Dict]:
+    """Metadata of every complete cached env, least recently used first."""
+    envs = []
+    try:
+        entries = list(envs_root().iterdir())
+    except OSError:
+        return []
+    for env_path in entries:
+        meta = _read_meta(env_path) if env_path.is_dir() else None
+        if meta:
+            envs.append(dict(meta, path=env_path))
+    return sorted(envs, key=lambda meta: meta.get("last_used", 0))
+
+
+def touch(env_path: Path):
+    """Record a use for the LRU order."""
+    meta = _read_meta(env_path)
+    if meta is not None:
+        meta["last_used"] = time.time()
+        meta["uses"] = meta.get("uses", 0) + 1
+        atomic_write_text(env_path / META_NAME, json.dumps(meta, indent=2))
+
+
+def evict(opts: dict, keep: Optional[Path] = None) -> List[Path]:
+    """Remove least recently used envs until within `max_envs` and `max_size`; returns what was removed."""
+    from autoviron.core.resources import parse_size
+    max_envs = opts.get("max_envs")
+    max_size = parse_size(opts.get("max_size"))
+    envs = cached_envs()
+    total = sum(meta.get("size", 0) for meta in envs)
+    removed = []
+    for meta in envs:
+        over_count = max_envs is not None and len(envs) - len(removed) > int(max_envs)
+        over_size = max_size and total > max_size
+        if not (over_count or over_size):
+            break
+        if keep is not None and meta["path"] == keep:
+            continue
+        lock = FileLock(meta["path"].with_suffix(".lock"), timeout=0, description="script env")
+        try:
+            lock.acquire()
+        except LockTimeout:
+            continue  # being built or used right now
+        try:
+            shutil.rmtree(meta["path"], ignore_errors=True)
+        finally:
+            lock.release()
+        total -= meta.get("size", 0)
+        removed.append(meta["path"])
+    return removed
+
+
+def hold(env_path: Path) -> FileLock:
+    """Shared lock held while a script runs in the env, so eviction elsewhere skips it."""
+    return FileLock(env_path.with_suffix(".lock"), shared=True, timeout=None, description="script env").acquire()
+
+
+def clear() -> int:
+    """Remove every cached env not in use; returns how many were removed."""
+    return len(evict({"max_envs": 0, "max_size": None}))
+
+
+def ensure_env(spec: ScriptSpec, python: str, config: dict, lock_timeout: Optional[float] = 600) -> Path:
+    """Return the cached env for `spec` on `python`, building it first if needed.
+
+    On return the env is held (see `hold`) and its use recorded, so eviction
+    elsewhere cannot remove it while the script runs.
+    """
+    env_path = envs_root() / spec.key(python)
+    env_path.parent.mkdir(parents=True, exist_ok=True)
+    for _ in range(3):
+        with FileLock(env_path.with_suffix(".lock"), timeout=lock_timeout, description="script env"):
+            _build(env_path, spec, python, config)
+        # flock cannot downgrade atomically, so an eviction may slip in before the hold
+        held = hold(env_path)
+        if _read_meta(env_path) is not None:
+            touch(env_path)
+            return env_path
+        held.release()
+    raise RuntimeError("the environment kept being evicted while it was being prepared")
+
+
+def _build(env_path: Path, spec: ScriptSpec, python: str, config: dict):
+    """Create and populate the env unless it is already complete (call with its lock held)."""
+    from autoviron.core import bytecode
+    from autoviron.core.dists import python_executable
+    if _read_meta(env_path) is not None:
+        return
+    # No metadata means a build was interrupted; start over
+    shutil.rmtree(env_path, ignore_errors=True)
+    result = subprocess.run([python, "-m", "venv", str(env_path)], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"venv creation failed: {result.stderr.strip()[-300:]}")
+    requirements = normalize_requirements(spec.dependencies)
+    if requirements:
+        args = [str(python_executable(env_path)), "-m", "pip", "install", "--quiet"] + bytecode.pip_flags(config)
+        result = subprocess.run(args + requirements, capture_output=True, text=True)
+        if result.returncode != 0:
+            shutil.rmtree(env_path, ignore_errors=True)
+            raise RuntimeError(f"dependency install failed: {result.stderr.strip()[-500:]}")
+        # pip_flags skipped pip's own compile step
+        bytecode.precompile(env_path, spec.path.parent, config, include_project=False)
+    now = time.time()
+    meta = {"dependencies": requirements, "python": python, "source": spec.source,
+            "created": now, "last_used": now, "uses": 0, "size": _dir_size(env_path)}
+    atomic_write_text(env_path / META_NAME, json.dumps(meta, indent=2))
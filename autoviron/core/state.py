@@ -0,0 +1,42 @@
+"""
+Project state stored in `.autoviron_cache`.
+
+The file is a single JSON object shared by several features (dependency
+sync hash, warm-run state, ...); callers update their own keys and leave
+the others untouched. Updates are serialized with the project's `state`
+lock and written atomically, so concurrent invocations never lose each
+other's keys or read a torn file.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict
+from autoviron.core.locking import project_lock, atomic_write_text
+
+STATE_FILE = ".autoviron_cache"
+# Read-modify-write is quick; never wait long for it
+STATE_LOCK_TIMEOUT = 30.0
+
+
+def state_path(project_root: Path) -> Path:
+    return project_root / STATE_FILE
+
+
+def read_state(project_root: Path) -> Dict[str, Any]:
+    """Return the project state (empty if missing or unreadable)."""
+    try:
+        data = json.loads(state_path(project_root).read_text())
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def update_state(project_root: Path, **fields: Any) -> Dict[str, Any]:
+    """Merge `fields` into the project state and write it back."""
+    with project_lock(project_root, "state", timeout=STATE_LOCK_TIMEOUT):
+        state = read_state(project_root)
+        state.update(fields)
+        try:
+            atomic_write_text(state_path(project_root), json.dumps(state))
+        except OSError:
+            pass
+    return state
@@ -0,0 +1,274 @@
+"""
+Supervised dev servers (`run --serve`).
+
+The supervisor binds the listening socket itself and hands it to each
+server worker (uvicorn `--fd`, gunicorn `fd://`, or a custom command's
+`{fd}`), so the port stays bound while workers come and go: connections
+that arrive during a restart wait in the backlog instead of being refused.
+The worker's stderr is streamed through and watched. A missing module, at
+startup or in a request, is installed and the worker restarted at once; a
+missing environment variable is asked for (or picked up from `.env` on the
+next start). Other crashes restart with exponential backoff, which resets
+once a worker stays up for `serve.backoff_reset` seconds.
+"""
+import os
+import re
+import sys
+import time
+import queue
+import socket
+import threading
+import subprocess
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+import typer
+from autoviron.core import envvars
+from autoviron.core.activation import prepare_command
+from autoviron.core.config import get_config, section
+from autoviron.core.deps import package_candidates
+from autoviron.core.env_manager import EnvironmentType
+from autoviron.core.failure_db import FailureDB
+from autoviron.core.negative_cache import NegativeCache
+from autoviron.ux.console import emit, log_error, log_info, log_success, log_warning
+
+DEFAULT_PORT = 8000
+# The traceback form, and `python -m x` failing to find `x` itself
+_MISSING_MODULE = re.compile(r"ModuleNotFoundError: No module named '([^']+)'|^\S+: No module named ([\w.]+)$")
+_KEY_ERROR = re.compile(r"KeyError: '([^']+)'")
+# stderr lines kept to explain a crash
+TAIL_LINES = 200
+
+
+def settings(config: dict) -> dict:
+    return section(config, "serve")
+
+
+def backoff_delay(failures: int, opts: dict) -> float:
+    """Seconds to wait before the next start after `failures` consecutive crashes."""
+    if failures <= 0:
+        return 0.0
+    return min(float(opts["backoff_initial"]) * 2 ** (failures - 1), float(opts["backoff_max"]))
+
+
+def substitute(command: List[str], fd: Optional[int], host: str, port: int) -> List[str]:
+    """Fill the `{fd}`, `{host}` and `{port}` placeholders of a custom server command."""
+    values = {"{fd}": "" if fd is None else str(fd), "{host}": host, "{port}": str(port)}
+    out = []
+    for arg in command:
+        for placeholder, value in values.items():
+            arg = arg.replace(placeholder, value)
+        out.append(arg)
+    return out
+
+
+def listen(host: str, port: int) -> socket.socket:
+    """A listening TCP socket workers can inherit."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.create_server((host, port), family=family, backlog=128)
+    sock.set_inheritable(True)
+    return sock
+
+
+class _StderrReader(threading.Thread):
+    """Copies a worker's stderr through, keeping a tail and reporting missing modules as they appear."""
+
+    def __init__(self, stream, findings: "queue.Queue[str]"):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.findings = findings
+        self.tail: Deque[str] = deque(maxlen=TAIL_LINES)
+
+    def run(self):
+        for line in self.stream:
+            sys.stderr.write(line)
+            sys.stderr.flush()
+            self.tail.append(line)
+            match = _MISSING_MODULE.search(line)
+            if match:
+                self.findings.put(match.group(1) or match.group(2))
+        self.stream.close()
+
+
+class Supervisor:
+    """Runs one server worker at a time on a socket it keeps bound across restarts."""
+
+    def __init__(self, env_type: EnvironmentType, env_path: Path, project_root: Path, command: Optional[List[str]] = None,
+                 host: Optional[str] = None, port: Optional[int] = None, refresh: bool = False):
+        from autoviron.core.detector import get_active_plugin
+        self.env_type = env_type
+        self.env_path = env_path
+        self.project_root = project_root
+        self.config = get_config(project_root)
+        self.opts = settings(self.config)
+        self.command = list(command or [])
+        self.plugin = get_active_plugin(project_root)
+        self.host = host or self.opts["host"]
+        default_port = self.plugin.get_docker_port() if self.plugin else None
+        self.port = port if port is not None else (self.opts["port"] or default_port or DEFAULT_PORT)
+        self.negative = NegativeCache(env_path, self.config, refresh=refresh)
+        self.failure_db = FailureDB(project_root)
+        self.extra_env: Dict[str, str] = {}
+        self.healed: set = set()
+        self.sock: Optional[socket.socket] = None
+        self.argv: List[str] = []
+        self.proc: Optional[subprocess.Popen] = None
+        self.stopping = threading.Event()
+
+    def resolve(self) -> Optional[List[str]]:
+        """Bind the socket and pick the worker command; the socket is dropped if the server cannot inherit it."""
+        self.sock = listen(self.host, self.port)
+        self.port = self.sock.getsockname()[1]
+        fd = self.sock.fileno() if os.name != "nt" else None
+        if self.command:
+            if fd is not None and any("{fd}" in arg for arg in self.command):
+                return substitute(self.command, fd, self.host, self.port)
+            argv = substitute(self.command, None, self.host, self.port)
+        elif self.plugin is None:
+            argv = None
+        else:
+            argv = self.plugin.get_serve_cmd(self.project_root, self.env_path, fd, self.host, self.port) if fd is not None else None
+            if argv is not None:
+                return argv
+            argv = self.plugin.get_serve_cmd(self.project_root, self.env_path, None, self.host, self.port)
+        self.sock.close()
+        self.sock = None
+        return argv
+
+    def _start(self) -> Tuple[subprocess.Popen, _StderrReader, "queue.Queue[str]"]:
+        extra = envvars.collect_environment(self.project_root, self.argv, self.config,
+                                            base_env=dict(os.environ, **self.extra_env))
+        self.extra_env.update(extra)
+        cmd, env = prepare_command(self.env_type, self.env_path, self.argv, dict(os.environ, **self.extra_env))
+        pass_fds = (self.sock.fileno(),) if self.sock is not None else ()
+        proc = subprocess.Popen(cmd, cwd=self.project_root, env=env, stdin=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, errors="replace", pass_fds=pass_fds)
+        findings: "queue.Queue[str]" = queue.Queue()
+        reader = _StderrReader(proc.stderr, findings)
+        reader.start()
+        emit("serve", state="started", pid=proc.pid, host=self.host, port=self.port, holds_socket=self.sock is not None)
+        return proc, reader, findings
+
+    def _stop(self, proc: subprocess.Popen):
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=float(self.opts["stop_timeout"]))
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+    def _heal_module(self, module: str, during: str) -> bool:
+        module = module.split(".")[0]
+        if module in self.healed:
+            log_warning(f"'{module}' is still missing after installing it; not retrying.")
+            return False
+        from autoviron.core.execution import _install_module
+        candidates = package_candidates(module)
+        log_warning(f"Smart Retry: Missing module '{module}' detected {during}.")
+        emit("heal", reason="missing_module", module=module, package=candidates[0], during=during)
+        package = _install_module(self.env_type, self.env_path, self.project_root, module, candidates, self.negative)
+        if package is None:
+            return False
+        self.healed.add(module)
+        self.failure_db.record_failure("ModuleNotFoundError", module, f"Auto-installed {package}")
+        return True
+
+    def _heal_env_var(self, tail: List[str]) -> bool:
+        keys = [m.group(1) for m in (_KEY_ERROR.search(line) for line in tail) if m]
+        if not keys or keys[-1] in os.environ or keys[-1] in self.extra_env:
+            return False
+        var = keys[-1]
+        log_warning(f"Smart Retry: Missing environment variable '{var}' detected at startup.")
+        emit("heal", reason="missing_env_var", var=var, during="startup")
+        if not envvars.interactive():
+            log_error(f"Set {var} in the environment or a .env file; it is read again on the next restart.")
+            return False
+        self.extra_env[var] = typer.prompt(f"Please provide a value for {var}")
+        self.failure_db.record_failure("KeyError", var, f"Injected ENV var {var}")
+        return True
+
+    def _supervise(self, proc: subprocess.Popen, reader: _StderrReader, findings: "queue.Queue[str]") -> str:
+        """Wait for the worker to exit or to need a restart: returns `healed`, `exited` or `stopped`."""
+        while True:
+            try:
+                module = findings.get(timeout=0.25)
+            except queue.Empty:
+                if self.stopping.is_set():
+                    return "stopped"
+                if proc.poll() is None:
+                    continue
+                reader.join(timeout=5)
+                if findings.empty():
+                    return "exited"
+                continue
+            try:
+                # A worker that cannot start exits right after printing the error
+                proc.wait(timeout=1)
+                during = "at startup"
+            except subprocess.TimeoutExpired:
+                during = "at runtime"
+            if self._heal_module(module, during):
+                self._stop(proc)
+                reader.join(timeout=5)
+                return "healed"
+
+    def serve(self) -> int:
+        """Supervise workers until Ctrl-C, `stop()`, a clean worker exit or `max_restarts` restarts."""
+        try:
+            self.argv = self.resolve()
+        except OSError as e:
+            log_error(f"Cannot listen on {self.host}:{self.port}: {e}")
+            return 1
+        if not self.argv:
+            log_error("No dev server is known for this project. Pass the command, e.g. "
+                      "`autoviron run --serve -- uvicorn app:app --fd {fd}`.")
+            return 2
+        if self.sock is None:
+            log_warning("The server binds the port itself, so it is released while the server restarts.")
+        log_success(f"Serving on http://{self.host}:{self.port} ({' '.join(self.argv)})")
+        emit("serve", state="listening", host=self.host, port=self.port, holds_socket=self.sock is not None)
+        failures = restarts = 0
+        max_restarts = self.opts["max_restarts"]
+        try:
+            while not self.stopping.is_set():
+                self.proc, reader, findings = self._start()
+                started = time.monotonic()
+                outcome = self._supervise(self.proc, reader, findings)
+                uptime = time.monotonic() - started
+                if outcome == "stopped":
+                    break
+                if outcome == "exited":
+                    code = self.proc.returncode
+                    if code == 0:
+                        log_info("The server exited cleanly.")
+                        return 0
+                    if self._heal_env_var(list(reader.tail)):
+                        outcome = "healed"
+                if max_restarts is not None and restarts >= int(max_restarts):
+                    log_error(f"Giving up after {restarts} restarts.")
+                    return self.proc.returncode or 1
+                restarts += 1
+                if outcome == "healed":
+                    failures = 0
+                    delay = 0.0
+                    log_info("Restarting the server...")
+                else:
+                    failures = 1 if uptime >= float(self.opts["backoff_reset"]) else failures + 1
+                    delay = backoff_delay(failures, self.opts)
+                    log_warning(f"The server exited with code {self.proc.returncode} after {uptime:.1f}s; "
+                                f"restarting in {delay:.1f}s.")
+                emit("restart", reason=outcome, exit_code=self.proc.returncode, uptime=round(uptime, 3),
+                     delay=delay, restarts=restarts)
+                self.stopping.wait(delay)
+        except KeyboardInterrupt:
+            log_info("Stopping the server...")
+        finally:
+            if self.proc is not None:
+                self._stop(self.proc)
+            if self.sock is not None:
+                self.sock.close()
+        return 0
+
+    def stop(self):
+        self.stopping.set()
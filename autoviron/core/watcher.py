@@ -0,0 +1,404 @@
+"""
+Background dependency sync for `autoviron watch`.
+
+Requirement sources, pyproject/lockfiles and the project's Python sources
+are watched with inotify (falling back to stat polling elsewhere). Changes
+are debounced into batches; each batch re-syncs the requirement sources if
+they changed and re-runs the import scan over the edited files, installing
+only the modules the env is missing. Progress is published to a status
+file in the user cache so `autoviron watch --status` (and `run`) can see
+what the watcher is doing. A running watcher holds an exclusive lock next
+to the status file for its whole life: that lock is what says it is alive
+(a recorded pid can be stale or reused), and taking it is what keeps a
+second watcher from starting.
+"""
+import os
+import sys
+import json
+import time
+import errno
+import fnmatch
+import select
+import signal
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from autoviron.core.config import cache_dir, excluded_patterns, project_key, section
+from autoviron.core.env_manager import EnvManager, EnvironmentType
+from autoviron.core.deps import REQUIRED, first_party_modules, get_package_name, get_stdlib_modules, scan_imports
+from autoviron.core.locking import FileLock, LockTimeout, atomic_write_text, is_locked
+from autoviron.core import dists as dist_meta
+from autoviron.core import lockfile
+from autoviron.ux.console import log_info, log_success, log_warning, log_error
+
+# Dependency sources besides the configured requirement files
+DEPENDENCY_SOURCES = ["pyproject.toml", "setup.cfg", "setup.py", "Pipfile", "Pipfile.lock", "poetry.lock",
+                      "environment.yml", lockfile.LOCKFILE_NAME]
+# Files whose imports are scanned
+SOURCE_SUFFIXES = (".py", ".ipynb")
+ALWAYS_SKIPPED_DIRS = ["__pycache__", "node_modules"]
+MAX_REPORTED_CHANGES = 20
+
+
+def settings(config: dict) -> dict:
+    return section(config, "watch")
+
+
+def status_path(project_root: Path) -> Path:
+    return cache_dir() / "watch" / f"{project_key(project_root)}.json"
+
+
+def log_path(project_root: Path) -> Path:
+    return status_path(project_root).with_suffix(".log")
+
+
+def lock_path(project_root: Path) -> Path:
+    return status_path(project_root).with_suffix(".lock")
+
+
+def read_status(project_root: Path) -> Optional[dict]:
+    """Return the watcher status for a project, marking it stopped unless a watcher holds its lock."""
+    try:
+        status = json.loads(status_path(project_root).read_text())
+    except (OSError, ValueError):
+        return None
+    if status.get("state") != "stopped" and not is_locked(lock_path(project_root)):
+        status["state"] = "stopped"
+    return status
+
+
+class WatchFilter:
+    """Decides which directories to watch and which changed files matter."""
+
+    def __init__(self, project_root: Path, config: dict):
+        self.project_root = project_root
+        requirement_files = config.get("requirements_files") or ["requirements.txt"]
+        self.dependency_sources = {str(Path(name)) for name in list(requirement_files) + DEPENDENCY_SOURCES}
+        self.exclude = ALWAYS_SKIPPED_DIRS + excluded_patterns(config)
+
+    def skip_dir(self, path: Path) -> bool:
+        name = path.name
+        return (name.startswith(".") or any(fnmatch.fnmatch(name, pat) for pat in self.exclude)
+                or (path / "pyvenv.cfg").exists())
+
+    def is_dependency_source(self, path: Path) -> bool:
+        try:
+            return str(path.relative_to(self.project_root)) in self.dependency_sources
+        except ValueError:
+            return False
+
+    def relevant(self, path: Path) -> bool:
+        return path.suffix in SOURCE_SUFFIXES or self.is_dependency_source(path)
+
+    def iter_dirs(self, top: Optional[Path] = None) -> Iterator[Path]:
+        for root, dirs, _ in os.walk(top or self.project_root):
+            dirs[:] = [d for d in dirs if not self.skip_dir(Path(root) / d)]
+            yield Path(root)
+
+    def iter_files(self, top: Optional[Path] = None) -> Iterator[Path]:
+        for directory in self.iter_dirs(top):
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_file() and self.relevant(Path(entry.path)):
+                    yield Path(entry.path)
+
+
+class PollingBackend:
+    """Portable fallback: rescan the watched files' mtimes every `interval` seconds."""
+    name = "polling"
+
+    def __init__(self, filt: WatchFilter, interval: float = 1.0):
+        self.filter = filt
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for path in self.filter.iter_files():
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def poll(self, timeout: Optional[float]) -> Set[Path]:
+        """Return the files changed within `timeout` seconds (None: wait for a change)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = self.interval if deadline is None else max(0.0, deadline - time.monotonic())
+            time.sleep(min(self.interval, remaining))
+            current = self._scan()
+            changed = {p for p in set(current) | set(self._snapshot) if current.get(p) != self._snapshot.get(p)}
+            self._snapshot = current
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+class InotifyBackend:
+    """Linux inotify through libc, watching every project directory."""
+    name = "inotify"
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, filt: WatchFilter):
+        import ctypes
+        import ctypes.util
+        self.filter = filt
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._wds: Dict[int, Path] = {}
+        try:
+            for directory in filt.iter_dirs():
+                self._add(directory)
+        except OSError:
+            self.close()
+            raise
+
+    def _add(self, directory: Path):
+        import ctypes
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(err, f"inotify_add_watch({directory}): {os.strerror(err)}")
+        self._wds[wd] = directory
+
+    def _read_events(self) -> Set[Path]:
+        changed: Set[Path] = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                offset += self.EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were dropped; treat every watched file as changed
+                    changed.update(self.filter.iter_files())
+                    continue
+                if mask & self.IN_IGNORED:
+                    self._wds.pop(wd, None)
+                    continue
+                parent = self._wds.get(wd)
+                if parent is None or not name:
+                    continue
+                path = parent / name
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO) and not self.filter.skip_dir(path):
+                        for directory in self.filter.iter_dirs(path):
+                            self._add(directory)
+                        changed.update(self.filter.iter_files(path))
+                elif self.filter.relevant(path):
+                    changed.add(path)
+
+    def poll(self, timeout: Optional[float]) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            changed = self._read_events() if ready else set()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def open_backend(filt: WatchFilter, opts: dict):
+    """Use inotify where available, otherwise (or if it fails) poll."""
+    if opts["backend"] in ("auto", "inotify") and sys.platform.startswith("linux"):
+        try:
+            return InotifyBackend(filt)
+        except OSError as e:
+            log_warning(f"inotify unavailable ({e}); falling back to polling.")
+    return PollingBackend(filt, float(opts["poll_interval"]))
+
+
+def missing_packages(project_root: Path, env_path: Path, sources: Iterable[Path]) -> List[str]:
+    """Packages for the required third-party modules `sources` import that the env does not provide.
+
+    Optional, type-only and platform-conditional imports never trigger an install.
+    """
+    skip = get_stdlib_modules() | first_party_modules(project_root)
+    for dist in dist_meta.env_distributions(env_path):
+        skip.update(dist.top_level())
+    missing = set()
+    local_modules: Dict[Path, Set[str]] = {project_root: set()}
+    for source in sources:
+        if source.parent not in local_modules:
+            local_modules[source.parent] = first_party_modules(source.parent)
+        local = local_modules[source.parent]
+        for module in scan_imports(source, kinds=[REQUIRED]):
+            if module not in skip and module not in local:
+                missing.add(get_package_name(module))
+    return sorted(missing)
+
+
+class Watcher:
+    """Watches one project and keeps its environment in sync in the background."""
+
+    def __init__(self, project_root: Path):
+        self.project_root = project_root
+        self.manager = EnvManager(project_root)
+        self.settings = settings(self.manager.config)
+        self.filter = WatchFilter(project_root, self.manager.config)
+        self.backend = None
+        self.failed: Set[str] = set()
+        self.status = {"pid": os.getpid(), "state": "starting", "started": time.time(), "backend": None,
+                       "last_sync": None, "changes": [], "installed": [], "failed": [], "error": None}
+
+    def _publish(self, **fields):
+        self.status.update(fields, updated=time.time())
+        path = status_path(self.project_root)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(path, json.dumps(self.status))
+        except OSError:
+            pass
+
+    def _environment(self) -> Optional[Tuple[EnvironmentType, Path]]:
+        with self.manager.env_lock(shared=True):
+            env_info = self.manager.detect_environment()
+        if env_info or not self.manager.config.get("auto_create", True):
+            return env_info
+        log_info("No existing environment found. Creating one...")
+        env_path = self.manager.create_venv()
+        return (EnvironmentType.VENV, env_path) if env_path else None
+
+    def sync(self, changed: Set[Path], initial: bool = False):
+        """Bring the env up to date with one debounced batch of changes.
+
+        The whole batch runs under the exclusive env lock, so `autoviron run`
+        waits for it rather than starting between two of its installs.
+        """
+        try:
+            with self.manager.env_lock():
+                self._sync(changed, initial)
+        except Exception as e:  # keep watching; the next change may fix it
+            log_error(f"Background sync failed: {e}")
+            self._publish(state="error", error=str(e))
+
+    def _sync(self, changed: Set[Path], initial: bool):
+        from autoviron.core.execution import _auto_install_package
+        from autoviron.core.negative_cache import NegativeCache
+        rel = sorted(os.path.relpath(p, self.project_root) for p in changed)
+        self._publish(state="syncing", changes=rel[:MAX_REPORTED_CHANGES], error=None)
+        env_info = self._environment()
+        if env_info is None:
+            self._publish(state="error", error="No environment to sync")
+            return
+        env_type, env_path = env_info
+        if initial or any(self.filter.is_dependency_source(p) for p in changed):
+            self.manager._auto_install_deps(env_path)
+            self.failed.clear()
+        sources = [p for p in changed if p.suffix in SOURCE_SUFFIXES and p.is_file()]
+        installed = []
+        negative = NegativeCache(env_path, self.manager.config)
+        for package in missing_packages(self.project_root, env_path, sources):
+            if package in self.failed:
+                continue
+            if _auto_install_package(env_type, env_path, self.project_root, package, negative=negative):
+                installed.append(package)
+            else:
+                self.failed.add(package)
+        if installed:
+            log_success(f"Background sync installed: {', '.join(installed)}")
+        self._publish(state="idle", last_sync=time.time(), installed=installed, failed=sorted(self.failed))
+
+    def run(self, once: bool = False):
+        """Watch until interrupted (or, with `once`, do a single full sync)."""
+        self.backend = open_backend(self.filter, self.settings)
+        self._publish(state="idle", backend=self.backend.name)
+        log_info(f"Watching {self.project_root} ({self.backend.name})...")
+        debounce = float(self.settings["debounce"])
+        try:
+            self.sync(set(self.filter.iter_files()), initial=True)
+            while not once:
+                changed = self.backend.poll(None)
+                # Debounce: keep collecting until the tree has been quiet for `debounce` seconds
+                while True:
+                    more = self.backend.poll(debounce)
+                    if not more:
+                        break
+                    changed |= more
+                self.sync(changed)
+        finally:
+            self.backend.close()
+            self._publish(state="stopped")
+
+
+def _terminate(signum, frame):
+    raise SystemExit(0)
+
+
+def watch(project_root: Path, once: bool = False):
+    """Run a watcher in the foreground, refusing to start a second one for the project."""
+    lock = FileLock(lock_path(project_root), timeout=0, description="watcher")
+    try:
+        lock.acquire()
+    except LockTimeout:
+        status = read_status(project_root) or {}
+        log_warning(f"A watcher is already running for this project (pid {status.get('pid', '?')}).")
+        return False
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        watcher = Watcher(project_root)
+        # Replace any stale status before anyone can see the lock held next to it
+        watcher._publish()
+        watcher.run(once=once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lock.release()
+    return True
+
+
+def start_detached(project_root: Path) -> int:
+    """Start `autoviron watch` in a new session, logging to the user cache. Returns its pid."""
+    import subprocess
+    log_file = log_path(project_root)
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, "ab") as out:
+        proc = subprocess.Popen([sys.executable, "-c", "from autoviron.cli import main; main()", "watch"], cwd=project_root,
+                                stdin=subprocess.DEVNULL, stdout=out, stderr=subprocess.STDOUT,
+                                start_new_session=True)
+    return proc.pid
+
+
+def stop(project_root: Path) -> bool:
+    """Signal a running watcher to stop. Returns False if none is running."""
+    status = read_status(project_root)
+    pid = int((status or {}).get("pid") or 0)
+    # The lock proves a watcher is alive, and it wrote the status it holds the lock for
+    if not status or status["state"] == "stopped" or pid <= 0:
+        return False
+    os.kill(pid, signal.SIGTERM)
+    return True
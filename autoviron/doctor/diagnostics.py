@@ -1,30 +1,373 @@
+import os
+import json
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
 from autoviron.core.env_manager import EnvironmentType
-from autoviron.ux.console import log_info, log_error, log_warning, log_success
+from autoviron.core import dists as dist_meta
+from autoviron.core.state import read_state
+from autoviron.ux.console import console, log_info, log_error, log_warning, log_success
+
+# Files hashed per distribution when RECORD verification runs in sample mode
+DEFAULT_RECORD_SAMPLE = 8
 
 def check_env_health(env_type: EnvironmentType, env_path: Path) -> bool:
     """Check if the environment is healthy."""
     is_healthy = True
-    
+
     if not env_path.exists():
         log_error(f"Environment path {env_path} does not exist.")
         return False
-        
+
     if env_type == EnvironmentType.VENV:
         # Check if python executable exists
-        import os
         python_bin = env_path / ("Scripts" if os.name == "nt" else "bin") / ("python.exe" if os.name == "nt" else "python")
         if not python_bin.exists():
             log_error(f"Python executable missing in venv: {python_bin}")
             is_healthy = False
-            
+
         # Check if the python executable is a broken symlink (on Unix)
         if os.name != "nt":
             if python_bin.is_symlink() and not python_bin.resolve().exists():
                 log_error(f"Python executable is a broken symlink: {python_bin}")
                 is_healthy = False
-                
+
     if is_healthy:
         log_success("Environment passed health checks.")
-        
+
     return is_healthy
+
+
+@dataclass
+class CheckResult:
+    """Outcome of a single deep check."""
+    name: str
+    status: str = "ok"  # ok | warning | error
+    problems: List[str] = field(default_factory=list)
+    details: Dict[str, Any] = field(default_factory=dict)
+    duration: float = 0.0
+    # Findings worth knowing that are not problems and never change the status
+    notes: List[str] = field(default_factory=list)
+
+    def fail(self, problem: str):
+        self.status = "error"
+        self.problems.append(problem)
+
+    def warn(self, problem: str):
+        if self.status == "ok":
+            self.status = "warning"
+        self.problems.append(problem)
+
+    def note(self, finding: str):
+        self.notes.append(finding)
+
+
+@dataclass
+class HealthReport:
+    """Structured result of `run_deep_checks`."""
+    env_type: Optional[str]
+    env_path: Optional[str]
+    checks: List[CheckResult] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return all(c.status != "error" for c in self.checks)
+
+    def get(self, name: str) -> Optional[CheckResult]:
+        return next((c for c in self.checks if c.name == name), None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["healthy"] = self.healthy
+        return data
+
+
+@dataclass
+class CheckContext:
+    """Shared, read-only inputs for the deep checks."""
+    env_type: EnvironmentType
+    env_path: Path
+    project_root: Path
+    dists: List[dist_meta.Distribution]
+    record_sample: Optional[int]
+    workers: int
+
+
+def check_interpreter(ctx: CheckContext, result: CheckResult):
+    """The interpreter exists, runs, and matches the version recorded in pyvenv.cfg."""
+    python_bin = dist_meta.python_executable(ctx.env_path)
+    cfg = dist_meta.read_pyvenv_cfg(ctx.env_path)
+    result.details["expected_version"] = cfg.get("version_info") or cfg.get("version")
+    if not python_bin.exists():
+        if python_bin.is_symlink():
+            result.fail(f"Python executable is a broken symlink: {python_bin} -> {os.readlink(python_bin)}")
+        else:
+            result.fail(f"Python executable missing: {python_bin}")
+        return
+
+    home = cfg.get("home")
+    if home and not Path(home).exists():
+        result.fail(f"Base interpreter directory from pyvenv.cfg no longer exists: {home}")
+
+    probe = "import sys, json; print(json.dumps([sys.version.split()[0], sys.prefix]))"
+    try:
+        proc = subprocess.run([str(python_bin), "-I", "-c", probe], capture_output=True, text=True, timeout=15)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        result.fail(f"Interpreter failed to start: {e}")
+        return
+    if proc.returncode != 0:
+        result.fail(f"Interpreter exited with {proc.returncode}: {proc.stderr.strip()[-200:]}")
+        return
+
+    version, prefix = json.loads(proc.stdout)
+    result.details.update({"runs": True, "version": version, "prefix": prefix})
+    expected = cfg.get("version_info") or cfg.get("version")
+    if expected and expected.split(".")[:3] != version.split(".")[:3]:
+        result.fail(f"Interpreter reports {version} but pyvenv.cfg records {expected}")
+
+
+def _requirement_spec(req) -> str:
+    """Render a requirement without its marker, ready to hand to pip."""
+    extras = f"[{','.join(sorted(req.extras))}]" if req.extras else ""
+    return f"{req.name}{extras}{req.specifier}"
+
+
+def check_dependencies(ctx: CheckContext, result: CheckResult):
+    """Every installed distribution's requirements are installed at a matching version (pip check)."""
+    installed: Dict[str, List[dist_meta.Distribution]] = {}
+    for dist in ctx.dists:
+        installed.setdefault(dist.key, []).append(dist)
+    for key, copies in installed.items():
+        if len(copies) > 1:
+            versions = ", ".join(d.version for d in copies)
+            result.fail(f"{copies[0].name} is installed more than once ({versions})")
+
+    marker_env = dist_meta.marker_environment(ctx.env_path)
+    parsed = {dist.key: dist.requirements() for dist in ctx.dists}
+
+    # Extras requested by dependents enable the extra-only requirements of their targets
+    requested_extras: Dict[str, set] = {}
+    for reqs in parsed.values():
+        for req in reqs:
+            if req.extras and dist_meta.requirement_applies(req, marker_env):
+                requested_extras.setdefault(dist_meta.normalize_name(req.name), set()).update(req.extras)
+
+    checked = 0
+    missing, conflicts = [], []
+    for dist in ctx.dists:
+        extras = tuple(sorted(requested_extras.get(dist.key, ())))
+        for req in parsed[dist.key]:
+            if not dist_meta.requirement_applies(req, marker_env, extras):
+                continue
+            checked += 1
+            target = installed.get(dist_meta.normalize_name(req.name))
+            if not target:
+                missing.append(_requirement_spec(req))
+                result.fail(f"{dist.name} {dist.version} requires {req.name}, which is not installed")
+            elif req.specifier and not req.specifier.contains(target[0].version, prereleases=True):
+                conflicts.append(_requirement_spec(req))
+                result.fail(f"{dist.name} {dist.version} requires {req}, but {target[0].version} is installed")
+    result.details.update({
+        "distributions": len(ctx.dists),
+        "requirements_checked": checked,
+        "missing": sorted(set(missing)),
+        "conflicts": sorted(set(conflicts)),
+    })
+
+
+def check_records(ctx: CheckContext, result: CheckResult):
+    """Installed files match the size and hash recorded in each distribution's RECORD."""
+    with ThreadPoolExecutor(max_workers=ctx.workers) as pool:
+        outcomes = list(pool.map(lambda d: dist_meta.verify_record(d, ctx.record_sample), ctx.dists))
+    broken, reinstall = [], []
+    for dist, problems in zip(ctx.dists, outcomes):
+        if problems:
+            broken.append(dist.name)
+            reinstall.append(f"{dist.name}=={dist.version}")
+            for problem in problems:
+                result.fail(problem)
+    result.details.update({
+        "mode": "full" if ctx.record_sample is None else f"sample({ctx.record_sample})",
+        "distributions": len(ctx.dists),
+        "broken": broken,
+        "reinstall": reinstall,
+    })
+
+
+def _pyc_source(pyc: Path) -> Path:
+    """Map `pkg/__pycache__/mod.cpython-311.pyc` to `pkg/mod.py`."""
+    return pyc.parent.parent / (pyc.name.split(".", 1)[0] + ".py")
+
+
+def _pyc_is_stale(pyc: Path, source: Path) -> bool:
+    try:
+        with open(pyc, "rb") as f:
+            header = f.read(16)
+        if len(header) < 16:
+            return True
+        flags = int.from_bytes(header[4:8], "little")
+        if flags & 0b1:
+            return False  # hash-based pyc, validated by the interpreter itself
+        st = source.stat()
+        mtime = int.from_bytes(header[8:12], "little")
+        size = int.from_bytes(header[12:16], "little")
+        return mtime != (int(st.st_mtime) & 0xFFFFFFFF) or size != (st.st_size & 0xFFFFFFFF)
+    except OSError:
+        return False
+
+
+def check_bytecode(ctx: CheckContext, result: CheckResult):
+    """No stale or orphaned `.pyc` files, and no site-packages entries owned by no distribution."""
+    stale, orphaned_pyc, orphaned = [], [], []
+    owned = set()
+    for dist in ctx.dists:
+        owned.update(dist.top_level())
+
+    for site_packages in dist_meta.find_site_packages(ctx.env_path):
+        for root, dirs, files in os.walk(site_packages):
+            if os.path.basename(root) != "__pycache__":
+                continue
+            for name in files:
+                if not name.endswith(".pyc"):
+                    continue
+                pyc = Path(root) / name
+                source = _pyc_source(pyc)
+                if not source.exists():
+                    orphaned_pyc.append(str(pyc.relative_to(site_packages)))
+                elif _pyc_is_stale(pyc, source):
+                    stale.append(str(pyc.relative_to(site_packages)))
+
+        for entry in os.scandir(site_packages):
+            name = entry.name
+            if name == "__pycache__" or name.endswith((".dist-info", ".egg-info", ".egg-link")) or name.startswith("_virtualenv"):
+                continue
+            stem = name[:-3] if name.endswith(".py") else name
+            if stem not in owned and name not in owned:
+                orphaned.append(name)
+
+    for pyc in stale[:20]:
+        result.warn(f"Stale bytecode: {pyc}")
+    # Leftovers are harmless to imports, so they are summarized rather than warned about one by one
+    if orphaned_pyc:
+        result.note(f"{len(orphaned_pyc)} orphaned bytecode file(s) whose source was removed, "
+                    f"e.g. {', '.join(orphaned_pyc[:3])}")
+    if orphaned:
+        more = f" and {len(orphaned) - 10} more" if len(orphaned) > 10 else ""
+        result.note(f"Not owned by any installed distribution: {', '.join(orphaned[:10])}{more}")
+    result.details.update({"stale_pyc": len(stale), "orphaned_pyc": len(orphaned_pyc), "orphaned_entries": orphaned})
+
+
+def check_requirement_drift(ctx: CheckContext, result: CheckResult):
+    """The project's requirement sources are satisfied by the environment and synced since their last change."""
+    from autoviron.core.env_manager import EnvManager
+    from autoviron.core.deps import read_requirements
+
+    manager = EnvManager(ctx.project_root)
+    req_files = manager.get_requirement_files()
+    if not req_files:
+        result.details["sources"] = []
+        return
+
+    installed = {d.key: d for d in ctx.dists}
+    marker_env = dist_meta.marker_environment(ctx.env_path)
+    unsatisfied = []
+    for req_file in req_files:
+        for req in read_requirements(req_file):
+            if not dist_meta.requirement_applies(req, marker_env):
+                continue
+            dist = installed.get(dist_meta.normalize_name(req.name))
+            if dist is None:
+                unsatisfied.append(_requirement_spec(req))
+                result.fail(f"{req_file.name}: {req} is not installed")
+            elif req.specifier and not req.specifier.contains(dist.version, prereleases=True):
+                unsatisfied.append(_requirement_spec(req))
+                result.fail(f"{req_file.name}: {req} is not satisfied by installed {dist.version}")
+
+    synced_hash = read_state(ctx.project_root).get("req_hash")
+    if synced_hash != manager.requirements_hash():
+        result.warn("Requirement sources changed since the environment was last synced")
+    result.details["sources"] = [f.name for f in req_files]
+    result.details["unsatisfied"] = sorted(set(unsatisfied))
+
+
+DEEP_CHECKS: Dict[str, Callable[[CheckContext, CheckResult], None]] = {
+    "interpreter": check_interpreter,
+    "dependencies": check_dependencies,
+    "records": check_records,
+    "bytecode": check_bytecode,
+    "requirements": check_requirement_drift,
+}
+
+
+def _timed(check: Callable[[CheckContext, CheckResult], None], name: str, ctx: CheckContext) -> CheckResult:
+    result = CheckResult(name)
+    start = time.perf_counter()
+    try:
+        check(ctx, result)
+    except Exception as e:
+        result.fail(f"Check crashed: {e}")
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def run_deep_checks(env_type: EnvironmentType, env_path: Path, project_root: Path, full: bool = False,
+                    checks: Optional[List[str]] = None, workers: Optional[int] = None) -> HealthReport:
+    """Run the independent deep checks concurrently and collect a structured report."""
+    start = time.perf_counter()
+    report = HealthReport(env_type.value, str(env_path))
+    if not env_path.exists():
+        report.checks.append(CheckResult("interpreter", "error", [f"Environment path {env_path} does not exist."]))
+        return report
+
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    ctx = CheckContext(
+        env_type=env_type,
+        env_path=env_path,
+        project_root=project_root,
+        dists=dist_meta.env_distributions(env_path),
+        record_sample=None if full else DEFAULT_RECORD_SAMPLE,
+        workers=workers,
+    )
+    selected = [name for name in DEEP_CHECKS if checks is None or name in checks]
+    with ThreadPoolExecutor(max_workers=len(selected) or 1) as pool:
+        futures = [pool.submit(_timed, DEEP_CHECKS[name], name, ctx) for name in selected]
+        report.checks = [f.result() for f in futures]
+    report.duration = time.perf_counter() - start
+    return report
+
+
+def missing_env_report() -> HealthReport:
+    """The report for a project with no environment yet: a finding, not a failure."""
+    check = CheckResult("environment")
+    check.note("No environment detected; `autoviron run` creates one.")
+    return HealthReport(None, None, [check])
+
+
+def print_report(report: HealthReport):
+    """Render a HealthReport as a table followed by the problems found."""
+    from rich.table import Table
+    from rich.markup import escape
+
+    icons = {"ok": "[success]ok[/success]", "warning": "[warning]warning[/warning]", "error": "[error]error[/error]"}
+    table = Table(title=f"Deep diagnostics ({report.duration:.2f}s)")
+    table.add_column("Check")
+    table.add_column("Status")
+    table.add_column("Problems", justify="right")
+    table.add_column("Time", justify="right")
+    for check in report.checks:
+        table.add_row(check.name, icons.get(check.status, check.status), str(len(check.problems)), f"{check.duration * 1000:.0f} ms")
+    console.print(table)
+
+    for check in report.checks:
+        for problem in check.problems[:25]:
+            (log_error if check.status == "error" else log_warning)(f"({check.name}) {escape(problem)}")
+        if len(check.problems) > 25:
+            log_info(f"({check.name}) ... and {len(check.problems) - 25} more")
+        for finding in check.notes:
+            log_info(f"({check.name}) {escape(finding)}")
+    if report.healthy and report.env_path is not None:
+        log_success("Environment passed deep health checks.")
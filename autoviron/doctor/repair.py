@@ -0,0 +1,190 @@
+import subprocess
+from enum import Enum
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Set
+from autoviron.core.env_manager import EnvManager, EnvironmentType
+from autoviron.core import dists as dist_meta
+from autoviron.core import bytecode, lockfile
+from autoviron.doctor.diagnostics import HealthReport, run_deep_checks
+from autoviron.ux.console import console, log_info, log_error, log_warning, log_success
+
+# Checks that decide what `fix` has to repair
+REPAIR_CHECKS = ["interpreter", "dependencies", "records", "requirements"]
+
+
+class RepairResult(Enum):
+    REPAIRED = "repaired"
+    HEALTHY = "healthy"
+    REBUILD = "rebuild"
+
+
+@dataclass
+class RepairPlan:
+    """What needs to be done to bring an environment back to health."""
+    relink: bool = False
+    recreate: bool = False
+    reinstall: List[str] = field(default_factory=list)
+    install: List[str] = field(default_factory=list)
+    reasons: List[str] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.relink or self.recreate or self.reinstall or self.install)
+
+
+def _base_python(manager: EnvManager, env_path: Path, expected_version: Optional[str]) -> Optional[str]:
+    """Find a base interpreter with the same major.minor the env was built with."""
+    if not expected_version:
+        return None
+    major_minor = ".".join(expected_version.split(".")[:2])
+    home = dist_meta.read_pyvenv_cfg(env_path).get("home")
+    candidates = []
+    if home:
+        candidates += [str(Path(home) / f"python{major_minor}"), str(Path(home) / "python3")]
+    candidates += [f"python{major_minor}"] + list(manager.python_versions)
+    for candidate in candidates:
+        try:
+            proc = subprocess.run([candidate, "-c", "import sys; print('%d.%d' % sys.version_info[:2])"],
+                                  capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        if proc.returncode == 0 and proc.stdout.strip() == major_minor:
+            return candidate
+    return None
+
+
+def plan_repair(report: HealthReport) -> RepairPlan:
+    """Turn a deep-check report into the smallest set of repair actions."""
+    plan = RepairPlan()
+    interpreter = report.get("interpreter")
+    if interpreter and interpreter.status == "error":
+        # Without a recorded version there is nothing to relink against
+        if interpreter.details.get("expected_version"):
+            plan.relink = True
+        else:
+            plan.recreate = True
+        plan.reasons.extend(interpreter.problems)
+
+    records = report.get("records")
+    if records and records.status == "error":
+        plan.reinstall.extend(records.details.get("reinstall", []))
+        plan.reasons.append(f"{len(plan.reinstall)} corrupted distribution(s)")
+
+    for name, key in (("dependencies", "missing"), ("dependencies", "conflicts"), ("requirements", "unsatisfied")):
+        check = report.get(name)
+        if check:
+            for spec in check.details.get(key, []):
+                if spec not in plan.install:
+                    plan.install.append(spec)
+    if plan.install:
+        plan.reasons.append(f"{len(plan.install)} missing or conflicting requirement(s)")
+    return plan
+
+
+def _pip(env_path: Path, args: List[str], project_root: Path) -> subprocess.CompletedProcess:
+    python_bin = dist_meta.python_executable(env_path)
+    return subprocess.run([str(python_bin), "-m", "pip"] + args, cwd=project_root, capture_output=True, text=True)
+
+
+def relink_interpreter(manager: EnvManager, env_path: Path, expected_version: Optional[str]) -> bool:
+    """Point the env back at a working base interpreter via `venv --upgrade`."""
+    base = _base_python(manager, env_path, expected_version)
+    if not base:
+        return False
+    # venv refuses to overwrite dangling interpreter links, so drop them first
+    for link in dist_meta.bin_dir(env_path).glob("python*"):
+        if link.is_symlink():
+            link.unlink()
+    proc = subprocess.run([base, "-m", "venv", "--upgrade", str(env_path)], capture_output=True, text=True)
+    return proc.returncode == 0
+
+
+def apply_repair(manager: EnvManager, env_type: EnvironmentType, env_path: Path, plan: RepairPlan,
+                 expected_version: Optional[str] = None) -> bool:
+    """Apply a repair plan in place. Returns False if the env needs a full rebuild."""
+    project_root = manager.project_root
+    if plan.recreate:
+        return False
+    if plan.relink:
+        if env_type != EnvironmentType.VENV:
+            log_warning(f"Cannot relink the interpreter of a {env_type.value} environment.")
+            return False
+        with console.status("[highlight]Relinking interpreter...[/highlight]"):
+            if not relink_interpreter(manager, env_path, expected_version):
+                log_warning("No matching base interpreter found to relink against.")
+                return False
+        log_success("Interpreter relinked.")
+
+    if any(spec.split("==")[0].lower() == "pip" for spec in plan.reinstall):
+        python_bin = dist_meta.python_executable(env_path)
+        subprocess.run([str(python_bin), "-m", "ensurepip", "--upgrade"], capture_output=True)
+
+    locked = _locked_pins(manager)
+    flags = bytecode.pip_flags(manager.config)
+    before = bytecode.snapshot(env_path)
+    if plan.reinstall:
+        names = ", ".join(plan.reinstall)
+        from_lock = [spec.split("==")[0] for spec in plan.reinstall if spec.lower() in locked]
+        rest = [spec for spec in plan.reinstall if spec.lower() not in locked]
+        with console.status(f"[highlight]Reinstalling {names}...[/highlight]"):
+            if from_lock:
+                proc = lockfile.install_from_lock(env_path, project_root, only=from_lock, force=True, extra_args=flags)
+                if proc.returncode != 0:
+                    log_error(f"Reinstall from lockfile failed: {proc.stderr.strip()[-500:]}")
+                    return False
+            if rest:
+                proc = _pip(env_path, ["install", "--force-reinstall", "--no-deps"] + flags + rest, project_root)
+                if proc.returncode != 0:
+                    log_error(f"Reinstall failed: {proc.stderr.strip()[-500:]}")
+                    return False
+        log_success(f"Reinstalled {len(plan.reinstall)} corrupted distribution(s).")
+
+    if plan.install:
+        with console.status(f"[highlight]Installing {', '.join(plan.install)}...[/highlight]"):
+            if locked:
+                # The lockfile is current, so it already pins everything the sources need
+                proc = lockfile.install_from_lock(env_path, project_root, extra_args=flags)
+            else:
+                proc = _pip(env_path, ["install"] + flags + plan.install, project_root)
+        if proc.returncode != 0:
+            log_error(f"Install failed: {proc.stderr.strip()[-500:]}")
+            return False
+        log_success(f"Installed {len(plan.install)} missing requirement(s).")
+    if plan.reinstall or plan.install:
+        manager.precompile(env_path, before)
+    return True
+
+
+def _locked_pins(manager: EnvManager) -> Set[str]:
+    """Return the lowercase `name==version` pins of a current lockfile (empty if stale or absent)."""
+    if not lockfile.lock_is_current(manager.project_root, manager.requirements_hash()):
+        return set()
+    packages, _ = lockfile.read_lockfile(lockfile.lockfile_path(manager.project_root))
+    return {f"{p.name}=={p.version}".lower() for p in packages}
+
+
+def repair_environment(manager: EnvManager, env_type: EnvironmentType, env_path: Path) -> RepairResult:
+    """Diagnose, repair only what is broken, and verify; REBUILD means a full rebuild is required."""
+    with console.status("[highlight]Diagnosing environment...[/highlight]"):
+        report = run_deep_checks(env_type, env_path, manager.project_root, full=True, checks=REPAIR_CHECKS)
+    plan = plan_repair(report)
+    if plan.empty:
+        log_success("Environment is healthy. Nothing to repair.")
+        return RepairResult.HEALTHY
+
+    for reason in plan.reasons:
+        log_info(f"Repair needed: {reason}")
+    interpreter = report.get("interpreter")
+    expected_version = interpreter.details.get("expected_version") if interpreter else None
+    if not apply_repair(manager, env_type, env_path, plan, expected_version):
+        return RepairResult.REBUILD
+
+    with console.status("[highlight]Verifying repair...[/highlight]"):
+        report = run_deep_checks(env_type, env_path, manager.project_root, full=True, checks=REPAIR_CHECKS)
+    if not report.healthy:
+        for check in report.checks:
+            for problem in check.problems[:10]:
+                log_warning(f"Still broken ({check.name}): {problem}")
+        return RepairResult.REBUILD
+    return RepairResult.REPAIRED
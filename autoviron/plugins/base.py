@@ -1,5 +1,23 @@
+import re
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
+from autoviron.core.dists import normalize_name
+
+# The project name at the start of a requirement line, optionally quoted (pyproject.toml arrays)
+_REQUIREMENT_NAME = re.compile(r"^\s*[\"']?([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+def declares_dependency(project_root: Path, name: str) -> bool:
+    """Return True if a requirement source or the lockfile lists `name` (compared as normalized names)."""
+    wanted = normalize_name(name)
+    for source in ("requirements.txt", "pyproject.toml", "autoviron.lock"):
+        path = project_root / source
+        if not path.is_file():
+            continue
+        for line in path.read_text().splitlines():
+            match = _REQUIREMENT_NAME.match(line)
+            if match and normalize_name(match.group(1)) == wanted:
+                return True
+    return False
 
 class ProjectHandlerPlugin:
     """Base class for project handler plugins."""
@@ -19,3 +37,28 @@ class ProjectHandlerPlugin:
     def get_missing_files(self, project_root: Path) -> Dict[str, str]:
         """Return a dict of filename -> content that should be generated."""
         return {}
+        
+    def get_docker_cmd(self, project_root: Path) -> List[str]:
+        """Return the CMD (exec form) the sandbox image should run."""
+        return ["python", "main.py"]
+        
+    def get_docker_packages(self, project_root: Path) -> List[str]:
+        """Return extra packages the sandbox image needs to run `get_docker_cmd`."""
+        return []
+        
+    def get_preload_modules(self) -> List[str]:
+        """Return heavy modules worth preloading in a fork-server for this project type."""
+        return []
+        
+    def get_docker_port(self) -> Optional[int]:
+        """Return the port the sandbox image exposes, if any."""
+        return None
+        
+    def get_serve_cmd(self, project_root: Path, env_path: Path, fd: Optional[int], host: str, port: int) -> Optional[List[str]]:
+        """Return the dev-server command `run --serve` supervises, or None.
+        
+        With `fd`, the server must accept on that inherited, already listening
+        socket; return None if it cannot, and it is asked again with `fd=None`
+        to bind `host:port` itself.
+        """
+        return None
@@ -1,5 +1,7 @@
+import re
 from pathlib import Path
-from autoviron.plugins.base import ProjectHandlerPlugin
+from typing import Optional
+from autoviron.plugins.base import ProjectHandlerPlugin, declares_dependency
 
 class DjangoPlugin(ProjectHandlerPlugin):
     @property
@@ -25,3 +27,39 @@ class DjangoPlugin(ProjectHandlerPlugin):
         if not (project_root / ".env").exists():
             files[".env"] = "DJANGO_SECRET_KEY=dev-secret-key\nDEBUG=True"
         return files
+        
+    def find_settings_package(self, project_root: Path) -> Optional[str]:
+        """Return the project package named by DJANGO_SETTINGS_MODULE in manage.py."""
+        manage = project_root / "manage.py"
+        if not manage.is_file():
+            return None
+        match = re.search(r"DJANGO_SETTINGS_MODULE['\"]\s*,\s*['\"]([\w.]+)\.settings", manage.read_text(errors="ignore"))
+        return match.group(1) if match else None
+        
+    def get_docker_cmd(self, project_root: Path) -> list:
+        package = self.find_settings_package(project_root)
+        if not package:
+            return ["python", "manage.py", "runserver", "0.0.0.0:8000"]
+        # Sync workers: the usual 2 * cores + 1; WEB_CONCURRENCY overrides at run time
+        return ["sh", "-c", (
+            f"exec gunicorn {package}.wsgi:application --bind 0.0.0.0:8000 "
+            "--workers ${WEB_CONCURRENCY:-$(( $(nproc) * 2 + 1 ))}"
+        )]
+        
+    def get_docker_packages(self, project_root: Path) -> list:
+        if not self.find_settings_package(project_root) or declares_dependency(project_root, "gunicorn"):
+            return []
+        return ["gunicorn"]
+        
+    def get_docker_port(self) -> int:
+        return 8000
+        
+    def get_serve_cmd(self, project_root: Path, env_path: Path, fd: Optional[int], host: str, port: int) -> Optional[list]:
+        if fd is None:
+            return ["python", "manage.py", "runserver", "--noreload", f"{host}:{port}"]
+        # runserver always binds its own socket; gunicorn can take over ours
+        from autoviron.core import dists as dist_meta
+        package = self.find_settings_package(project_root)
+        if not package or not any(d.key == "gunicorn" for d in dist_meta.env_distributions(env_path)):
+            return None
+        return ["python", "-m", "gunicorn", f"{package}.wsgi:application", "--bind", f"fd://{fd}"]
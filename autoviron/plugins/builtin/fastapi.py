@@ -1,5 +1,9 @@
+import re
 from pathlib import Path
-from autoviron.plugins.base import ProjectHandlerPlugin
+from autoviron.plugins.base import ProjectHandlerPlugin, declares_dependency
+
+# Candidate modules holding the `FastAPI()` instance, in lookup order
+APP_MODULES = ["main", "app", "app.main", "src.main", "api.main"]
 
 class FastAPIPlugin(ProjectHandlerPlugin):
     @property
@@ -26,5 +30,37 @@ class FastAPIPlugin(ProjectHandlerPlugin):
         if not (project_root / ".env").exists():
             files[".env"] = "DATABASE_URL=sqlite:///./test.db\nSECRET_KEY=dev-secret"
         if not (project_root / "Dockerfile").exists():
-            files["Dockerfile"] = "FROM python:3.11-slim\nWORKDIR /app\nCOPY requirements.txt .\nRUN pip install -r requirements.txt\nCOPY . .\nCMD [\"uvicorn\", \"main:app\", \"--host\", \"0.0.0.0\", \"--port\", \"8000\"]"
+            from autoviron.core.sandbox import generate_dockerfile
+            files["Dockerfile"] = generate_dockerfile(project_root, self)
+        if not (project_root / ".dockerignore").exists():
+            from autoviron.core.sandbox import generate_dockerignore
+            files[".dockerignore"] = generate_dockerignore(project_root)
         return files
+        
+    def find_app(self, project_root: Path) -> str:
+        """Return the `module:attribute` of the FastAPI application."""
+        for module in APP_MODULES:
+            path = project_root / (module.replace(".", "/") + ".py")
+            if path.is_file():
+                match = re.search(r"^(\w+)\s*(?::[^=]+)?=\s*FastAPI\(", path.read_text(errors="ignore"), re.M)
+                if match:
+                    return f"{module}:{match.group(1)}"
+        return "main:app"
+        
+    def get_docker_cmd(self, project_root: Path) -> list:
+        # Async workers are CPU bound per core; WEB_CONCURRENCY overrides at run time
+        return ["sh", "-c", (
+            f"exec gunicorn {self.find_app(project_root)} --worker-class uvicorn.workers.UvicornWorker "
+            "--bind 0.0.0.0:8000 --workers ${WEB_CONCURRENCY:-$(nproc)}"
+        )]
+        
+    def get_docker_packages(self, project_root: Path) -> list:
+        return [p for p in ("gunicorn", "uvicorn") if not declares_dependency(project_root, p)]
+        
+    def get_docker_port(self) -> int:
+        return 8000
+        
+    def get_serve_cmd(self, project_root: Path, env_path: Path, fd, host: str, port: int) -> list:
+        if fd is not None:
+            return ["python", "-m", "uvicorn", self.find_app(project_root), "--fd", str(fd)]
+        return ["python", "-m", "uvicorn", self.find_app(project_root), "--host", host, "--port", str(port)]
@@ -25,6 +25,9 @@ class MLPlugin(ProjectHandlerPlugin):
             "Consider tracking datasets with DVC (Data Version Control)."
         ]
         
+    def get_preload_modules(self) -> list:
+        return ["numpy", "pandas", "scipy", "sklearn", "matplotlib", "torch", "tensorflow"]
+        
     def get_missing_files(self, project_root: Path) -> dict:
         files = {}
         if not (project_root / ".gitignore").exists():
@@ -1,65 +1,67 @@
 from pathlib import Path
+from typing import List, Optional
 import json
 
-def generate_zsh_hook() -> str:
+def _activation_block(venv_patterns: Optional[List[str]]) -> str:
+    """Build the shell snippet that activates the first matching venv directory."""
+    patterns = " ".join(f'"{p}"' for p in (venv_patterns or [".venv"]))
+    return f"""    for _av_dir in {patterns}; do
+        if [ -f "$_av_dir/bin/activate" ]; then
+            if [ "$VIRTUAL_ENV" != "$(pwd)/$_av_dir" ]; then
+                source "$_av_dir/bin/activate"
+                echo "🚀 AutoViron activated $_av_dir"
+            fi
+            break
+        fi
+    done"""
+
+def generate_zsh_hook(venv_patterns: Optional[List[str]] = None) -> str:
     """Generate ZSH hook for AutoViron."""
-    return """
+    return f"""
 # AutoViron ZSH Hook
-_autoviron_hook() {
-    # Only run if there is a venv or similar that we might want to activate
-    # For now, we just print a message, but in a real shell script, we'd source the env.
-    # A full implementation would check if an env exists, and if so, source it.
-    if [ -d ".venv" ]; then
-        if [ "$VIRTUAL_ENV" != "$(pwd)/.venv" ]; then
-            source .venv/bin/activate
-            echo "🚀 AutoViron activated .venv"
-        fi
-    fi
-}
+_autoviron_hook() {{
+{_activation_block(venv_patterns)}
+}}
 
 add-zsh-hook chpwd _autoviron_hook
 # Run once on initial shell load
 _autoviron_hook
 """
 
-def generate_bash_hook() -> str:
+def generate_bash_hook(venv_patterns: Optional[List[str]] = None) -> str:
     """Generate Bash hook for AutoViron."""
-    return """
+    return f"""
 # AutoViron Bash Hook
-_autoviron_hook() {
-    if [ -d ".venv" ]; then
-        if [ "$VIRTUAL_ENV" != "$(pwd)/.venv" ]; then
-            source .venv/bin/activate
-            echo "🚀 AutoViron activated .venv"
-        fi
-    fi
-}
+_autoviron_hook() {{
+{_activation_block(venv_patterns)}
+}}
 
 PROMPT_COMMAND="_autoviron_hook; $PROMPT_COMMAND"
 """
 
 def update_vscode_settings(env_path: Path, project_root: Path):
     """Update VSCode settings.json to use the AutoViron environment."""
+    from autoviron.core.locking import project_lock, atomic_write_text
     vscode_dir = project_root / ".vscode"
     vscode_dir.mkdir(exist_ok=True)
     
     settings_file = vscode_dir / "settings.json"
-    settings = {}
     
-    if settings_file.exists():
-        try:
-            with open(settings_file, "r") as f:
-                settings = json.load(f)
-        except json.JSONDecodeError:
-            pass
-            
     # Assuming standard venv layout for simplicity
     python_path = str(env_path / "bin" / "python")
     import os
     if os.name == "nt":
         python_path = str(env_path / "Scripts" / "python.exe")
         
-    settings["python.defaultInterpreterPath"] = python_path
-    
-    with open(settings_file, "w") as f:
-        json.dump(settings, f, indent=4)
+    with project_lock(project_root, "vscode", timeout=30):
+        settings = {}
+        if settings_file.exists():
+            try:
+                with open(settings_file, "r") as f:
+                    settings = json.load(f)
+            except json.JSONDecodeError:
+                pass
+        if settings.get("python.defaultInterpreterPath") == python_path:
+            return
+        settings["python.defaultInterpreterPath"] = python_path
+        atomic_write_text(settings_file, json.dumps(settings, indent=4))
@@ -1,9 +1,12 @@
 """
-Console UX utilities for AutoViron using Rich.
+Console UX utilities for AutoViron.
+
+Everything here reports through the event bus in `autoviron.ux.events`, so
+the same calls render with rich on a terminal, as plain lines in CI, or as
+NDJSON; rich itself is only imported by the rich sink.
 """
 import sys
-from rich.console import Console
-from rich.theme import Theme
+from autoviron.ux.events import bus
 
 # Ensure UTF-8 output for emojis on Windows
 if sys.platform == "win32":
@@ -13,39 +16,50 @@ if sys.platform == "win32":
     except AttributeError:
         pass
 
-# Define a custom theme for AutoViron
-autoviron_theme = Theme({
-    "info": "dim cyan",
-    "warning": "yellow",
-    "error": "bold red",
-    "success": "bold green",
-    "highlight": "bold magenta",
-})
+
+class _Console:
+    """The part of rich's Console the code base uses, routed through the bus."""
+
+    def print(self, *objects, **kwargs):
+        bus.output(*objects, **kwargs)
+
+    def status(self, message: str, phase: str = None, **fields):
+        """Spinner on a terminal; a timed phase_start/phase_end pair everywhere."""
+        return bus.phase(message, phase, **fields)
+
 
 # Global console instance
-console = Console(theme=autoviron_theme)
+console = _Console()
+
+def emit(kind: str, message: str = "", level: str = "info", **fields):
+    """Emit a structured event (install, heal, retry, timing, ...)."""
+    bus.emit(kind, message, level, **fields)
 
 def print_welcome():
     """Print the welcome message."""
-    console.print("[highlight]AutoViron[/highlight] - Universal Python Environment Launcher", justify="center")
-    console.print("=" * 50, justify="center")
+    from autoviron import __version__
+    bus.emit("start", version=__version__, argv=sys.argv[1:])
 
 def log_info(msg: str):
     """Log an info message."""
-    console.print(f"ℹ️ [info]{msg}[/info]")
+    bus.emit("log", msg, "info")
 
 def log_success(msg: str):
     """Log a success message."""
-    console.print(f"✅ [success]{msg}[/success]")
+    bus.emit("log", msg, "success")
 
 def log_warning(msg: str):
     """Log a warning message."""
-    console.print(f"⚠️ [warning]{msg}[/warning]")
+    bus.emit("log", msg, "warning")
 
 def log_error(msg: str):
     """Log an error message."""
-    console.print(f"❌ [error]{msg}[/error]")
+    bus.emit("log", msg, "error")
+
+def log_debug(msg: str):
+    """Log a message only shown with `verbose`."""
+    bus.emit("log", msg, "debug")
 
 def print_step(msg: str):
     """Print a step indicator."""
-    console.print(f"🚀 [highlight]{msg}[/highlight]")
+    bus.emit("log", msg, "step")
@@ -0,0 +1,275 @@
+"""
+Event bus for everything AutoViron reports.
+
+The CLI, `EnvManager`, `deps` and `execution` emit typed events (log lines,
+phase start/end with durations, installs, heals, retries, timings) and one
+or more sinks render them:
+
+- `RichSink`: the coloured TTY output with spinners (rich is imported here
+  and nowhere on the plain/JSON paths);
+- `PlainSink`: unstyled lines, for CI logs and pipes;
+- `JsonSink`: newline-delimited JSON to a file, an fd or stdout, for
+  orchestrators.
+
+`configure()` picks the sinks from `--output`/`--events` (or
+`AUTOVIRON_OUTPUT`/`AUTOVIRON_EVENTS`) and the `quiet`/`verbose` config keys.
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+OUTPUT_MODES = ("auto", "rich", "plain", "json")
+# Levels the human sinks hide under `quiet`, and the one they only show under `verbose`
+_CHATTY = ("info", "success", "step", "debug")
+_STYLES = r"(?:bold|dim|italic|underline|info|warning|error|success|highlight|red|green|yellow|blue|magenta|cyan|white)"
+_MARKUP = re.compile(r"\[(?:/%s?|%s(?: %s)*)\]" % (_STYLES, _STYLES, _STYLES))
+_ICONS = {"info": "ℹ️", "success": "✅", "warning": "⚠️", "error": "❌", "step": "🚀", "debug": "·"}
+
+
+def strip_markup(text: str) -> str:
+    """Drop the rich style tags this code base uses, keeping any other brackets."""
+    return _MARKUP.sub("", text).replace("\\[", "[")
+
+
+@dataclass
+class Event:
+    """One thing that happened. `kind` is log, phase_start, phase_end, install, heal, retry, timing, start or output."""
+    kind: str
+    message: str = ""
+    level: str = "info"
+    fields: Dict[str, Any] = field(default_factory=dict)
+    ts: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        data = {"ts": round(self.ts, 6), "event": self.kind, "level": self.level}
+        if self.message:
+            data["message"] = strip_markup(self.message)
+        data.update(self.fields)
+        return data
+
+
+class Sink:
+    """Receives every event; subclasses render the ones they care about."""
+    quiet = False
+    verbose = False
+
+    def handle(self, event: Event):
+        raise NotImplementedError
+
+    def output(self, objects: tuple, kwargs: dict):
+        """Command output (tables, hook scripts, ...) as opposed to progress."""
+
+    def close(self):
+        pass
+
+    def shown(self, event: Event) -> bool:
+        if event.level == "debug" and not self.verbose:
+            return False
+        return not (self.quiet and event.level in _CHATTY)
+
+
+class RichSink(Sink):
+    """Coloured output and spinners on a terminal."""
+
+    def __init__(self, quiet: bool = False, verbose: bool = False):
+        from rich.console import Console
+        from rich.theme import Theme
+        self.console = Console(theme=Theme({
+            "info": "dim cyan",
+            "warning": "yellow",
+            "error": "bold red",
+            "success": "bold green",
+            "highlight": "bold magenta",
+        }))
+        self.quiet, self.verbose = quiet, verbose
+        self._status = None
+        self._phases: List[str] = []
+
+    def handle(self, event: Event):
+        if event.kind == "start" and not self.quiet:
+            self.console.print("[highlight]AutoViron[/highlight] - Universal Python Environment Launcher", justify="center")
+            self.console.print("=" * 50, justify="center")
+        elif event.kind == "log" and self.shown(event):
+            style = "dim" if event.level == "debug" else ("highlight" if event.level == "step" else event.level)
+            self.console.print(f"{_ICONS[event.level]} [{style}]{event.message}[/{style}]")
+        elif event.kind == "phase_start" and not self.quiet:
+            # rich allows one live display at a time, so nested phases share the spinner
+            if self._status is None:
+                self._status = self.console.status(event.message)
+                self._status.start()
+            else:
+                self._status.update(event.message)
+            self._phases.append(event.message)
+        elif event.kind == "phase_end":
+            if self._phases:
+                self._phases.pop()
+                if self._phases:
+                    self._status.update(self._phases[-1])
+                else:
+                    self.close()
+            if self.verbose:
+                self.console.print(f"[dim]  {strip_markup(event.message)} took {event.fields['duration']:.2f}s[/dim]")
+        elif event.kind == "timing" and self.verbose:
+            self.console.print(f"[dim]  {event.message}: {event.fields['duration']:.2f}s[/dim]")
+
+    def output(self, objects: tuple, kwargs: dict):
+        self.console.print(*objects, **kwargs)
+
+    def close(self):
+        if self._status is not None:
+            self._status.stop()
+            self._status = None
+        self._phases = []
+
+
+class PlainSink(Sink):
+    """Unstyled lines: progress on `stream`, command output on stdout."""
+
+    def __init__(self, stream=None, quiet: bool = False, verbose: bool = False):
+        self.stream = stream
+        self.quiet, self.verbose = quiet, verbose
+
+    def _write(self, text: str):
+        stream = self.stream or sys.stdout
+        stream.write(text + "\n")
+        stream.flush()
+
+    def handle(self, event: Event):
+        if event.kind == "log" and self.shown(event):
+            prefix = "" if event.level in ("info", "step", "success") else f"{event.level}: "
+            self._write(prefix + strip_markup(event.message))
+        elif event.kind == "phase_start" and not self.quiet:
+            self._write(strip_markup(event.message))
+        elif event.kind == "phase_end" and self.verbose:
+            self._write(f"  {strip_markup(event.message)} took {event.fields['duration']:.2f}s")
+        elif event.kind == "timing" and self.verbose:
+            self._write(f"  {strip_markup(event.message)}: {event.fields['duration']:.2f}s")
+
+    def output(self, objects: tuple, kwargs: dict):
+        sys.stdout.write(render_plain(objects, kwargs.get("end", "\n")))
+        sys.stdout.flush()
+
+
+class JsonSink(Sink):
+    """One JSON object per line for every event."""
+
+    def __init__(self, target: str = "-"):
+        self._lock = threading.Lock()
+        self._owned = False
+        if target == "-":
+            self.stream = sys.stdout
+        elif target.startswith("fd:"):
+            self.stream = os.fdopen(int(target[3:]), "w", buffering=1, closefd=False)
+        else:
+            self.stream = open(target, "a", buffering=1, encoding="utf-8")
+            self._owned = True
+
+    def handle(self, event: Event):
+        line = json.dumps(event.to_dict(), default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def output(self, objects: tuple, kwargs: dict):
+        self.handle(Event("output", render_plain(objects, kwargs.get("end", "\n")).rstrip("\n")))
+
+    def close(self):
+        if self._owned:
+            self.stream.close()
+
+
+def render_plain(objects: tuple, end: str = "\n") -> str:
+    """Text for `console.print` arguments without colour; rich is only loaded for non-string renderables."""
+    if all(isinstance(obj, str) for obj in objects):
+        return " ".join(strip_markup(obj) for obj in objects) + end
+    from rich.console import Console
+    buffer = io.StringIO()
+    Console(file=buffer, no_color=True, highlight=False, width=120).print(*objects, end=end)
+    return buffer.getvalue()
+
+
+class Bus:
+    """Fans events out to the configured sinks."""
+
+    def __init__(self):
+        self.sinks: List[Sink] = []
+        self.configured = False
+
+    def add(self, sink: Sink):
+        self.sinks.append(sink)
+
+    def _ensure(self):
+        if not self.configured:
+            configure()
+
+    def emit(self, kind: str, message: str = "", level: str = "info", **fields):
+        self._ensure()
+        event = Event(kind, message, level, fields)
+        for sink in self.sinks:
+            sink.handle(event)
+
+    def output(self, *objects, **kwargs):
+        self._ensure()
+        for sink in self.sinks:
+            sink.output(objects, kwargs)
+
+    @contextmanager
+    def phase(self, message: str, name: Optional[str] = None, **fields):
+        """Emit phase_start/phase_end around a block; the end carries the duration and whether it raised."""
+        name = name or strip_markup(message).rstrip(".")
+        self.emit("phase_start", message, phase=name, **fields)
+        started = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.emit("phase_end", message, phase=name, duration=round(time.monotonic() - started, 6), ok=ok, **fields)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+        self.configured = False
+
+
+bus = Bus()
+
+
+def resolve_mode(mode: Optional[str] = None) -> str:
+    mode = (mode or os.environ.get("AUTOVIRON_OUTPUT") or "auto").lower()
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {mode!r} (choose from {', '.join(OUTPUT_MODES)})")
+    if mode == "auto":
+        interactive = sys.stdout.isatty() and os.environ.get("TERM") != "dumb" and not os.environ.get("CI")
+        return "rich" if interactive else "plain"
+    return mode
+
+
+def configure(mode: Optional[str] = None, events: Optional[str] = None, quiet: bool = False, verbose: bool = False) -> str:
+    """(Re)build the sinks; returns the resolved mode.
+
+    `json` mode writes the event stream to `events` (default stderr, which
+    keeps the program's own stdout clean) and nothing else; other modes add
+    a JSON sink only when `events` is given.
+    """
+    bus.close()
+    mode = resolve_mode(mode)
+    events = events or os.environ.get("AUTOVIRON_EVENTS")
+    if mode == "rich":
+        bus.add(RichSink(quiet, verbose))
+    elif mode == "plain":
+        bus.add(PlainSink(quiet=quiet, verbose=verbose))
+    if mode == "json":
+        bus.add(JsonSink(events or "fd:2"))
+    elif events:
+        bus.add(JsonSink(events))
+    bus.configured = True
+    return mode
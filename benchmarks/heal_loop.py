@@ -0,0 +1,335 @@
+"""
+End-to-end benchmark of the `autoviron run` heal loop.
+
+Builds a file-based package index of tiny synthetic wheels and one fixture
+project per scenario (missing modules, a renamed import, an env var from
+`.env`, an install failure with and without the negative cache, a cold
+start), then runs `autoviron run` on each one repeatedly with pip pointed
+at the local index only. No network access is needed.
+
+Each run is measured from the outside: wall time to exit, attempts, heals
+and installs from the NDJSON event stream (`--events`), and subprocesses
+spawned anywhere in the process tree, counted by a `sitecustomize` hook.
+Medians are compared with a stored baseline:
+
+    python benchmarks/heal_loop.py                     # all scenarios, 3 runs each
+    python benchmarks/heal_loop.py -s missing_1 -r 10
+    python benchmarks/heal_loop.py --save-baseline     # after a deliberate change
+    python benchmarks/heal_loop.py --check             # exit 1 on a regression
+
+Timings in the baseline are only comparable on the machine that wrote it;
+attempts, installs and subprocess counts are comparable anywhere.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import shutil
+import hashlib
+import zipfile
+import argparse
+import tempfile
+import statistics
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+# A median this much slower than the baseline counts as a regression
+TIME_TOLERANCE = 0.25
+
+SITECUSTOMIZE = '''
+import os, subprocess
+_log = os.environ.get("AUTOVIRON_BENCH_SPAWNS")
+if _log:
+    _popen_init = subprocess.Popen.__init__
+
+    def _counting_init(self, args, *a, **kw):
+        with open(_log, "a") as f:
+            f.write("%d %s\\n" % (os.getpid(), os.path.basename(str(args[0] if isinstance(args, (list, tuple)) else args))))
+        _popen_init(self, args, *a, **kw)
+
+    subprocess.Popen.__init__ = _counting_init
+'''
+
+
+@dataclass
+class Package:
+    """A synthetic distribution: `name` on the index, providing module `module`."""
+    name: str
+    module: str
+    version: str = "1.0.0"
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    files: Dict[str, str]
+    preinstalled: List[str] = field(default_factory=list)
+    command: List[str] = field(default_factory=lambda: ["python", "main.py"])
+    # Run once untimed first, keeping the user cache (e.g. to warm the negative cache)
+    warmup: bool = False
+    # No venv is prepared, so the run includes detection, creation and the requirements install
+    cold: bool = False
+
+
+PACKAGES = [Package("alpha", "alpha"), Package("beta", "beta"), Package("gamma", "gamma"),
+            Package("pyyaml", "yaml", "6.0.99")]
+
+SCENARIOS = [
+    Scenario("baseline", "everything installed; one clean attempt",
+             {"main.py": "import alpha\nprint(alpha.VALUE)\n"}, preinstalled=["alpha"]),
+    Scenario("missing_1", "one missing module, healed by one install",
+             {"main.py": "import alpha\nprint(alpha.VALUE)\n"}),
+    Scenario("missing_3", "three missing modules, one per attempt (exceeds the default max_retries)",
+             {"main.py": "import alpha, beta, gamma\nprint(alpha.VALUE + beta.VALUE + gamma.VALUE)\n"}),
+    Scenario("renamed_import", "import name differs from the distribution (yaml -> pyyaml)",
+             {"main.py": "import yaml\nprint(yaml.VALUE)\n"}),
+    Scenario("env_var_dotenv", "required env var supplied by .env",
+             {"main.py": "import os, alpha\nprint(os.environ['BENCH_TOKEN'], alpha.VALUE)\n",
+              ".env": "BENCH_TOKEN=secret\n"}, preinstalled=["alpha"]),
+    Scenario("install_failure", "missing module no package provides",
+             {"main.py": "import nosuchmodule\n"}),
+    Scenario("install_failure_cached", "same failure with the negative cache already warm",
+             {"main.py": "import nosuchmodule\n"}, warmup=True),
+    Scenario("cold_start", "no env yet: create it and install requirements.txt, then run",
+             {"main.py": "import alpha, beta\nprint(alpha.VALUE + beta.VALUE)\n",
+              "requirements.txt": "alpha\nbeta\n"}, cold=True),
+]
+
+
+def _record_hash(data: bytes) -> str:
+    return "sha256=" + base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode()
+
+
+def build_wheel(package: Package, index_dir: Path) -> Path:
+    """Write a minimal, valid pure-Python wheel for `package` into `index_dir`."""
+    dist_info = f"{package.name}-{package.version}.dist-info"
+    files = {
+        f"{package.module}/__init__.py": f"VALUE = {len(package.name)}\n".encode(),
+        f"{dist_info}/METADATA": (f"Metadata-Version: 2.1\nName: {package.name}\nVersion: {package.version}\n"
+                                  f"Summary: Synthetic benchmark package\n").encode(),
+        f"{dist_info}/WHEEL": b"Wheel-Version: 1.0\nGenerator: autoviron-bench\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+        f"{dist_info}/top_level.txt": f"{package.module}\n".encode(),
+    }
+    record = "".join(f"{path},{_record_hash(data)},{len(data)}\n" for path, data in files.items())
+    files[f"{dist_info}/RECORD"] = (record + f"{dist_info}/RECORD,,\n").encode()
+    wheel = index_dir / f"{package.name}-{package.version}-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path, data in files.items():
+            zf.writestr(path, data)
+    return wheel
+
+
+def isolated_env(workdir: Path, index_dir: Path, cache_home: Path, spawn_log: Path, events: Path) -> Dict[str, str]:
+    """Environment for a run: pip sees only the local index, caches and config are private."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("PIP_", "AUTOVIRON_", "VIRTUAL_ENV", "CONDA_"))}
+    env.update({
+        "PIP_NO_INDEX": "1",
+        "PIP_FIND_LINKS": str(index_dir),
+        "PIP_CONFIG_FILE": os.devnull,
+        "PIP_DISABLE_PIP_VERSION_CHECK": "1",
+        "PIP_NO_CACHE_DIR": "1",
+        "XDG_CACHE_HOME": str(cache_home),
+        "AUTOVIRON_RC": str(workdir / "autovironrc.toml"),
+        "AUTOVIRON_EVENTS": str(events),
+        "AUTOVIRON_OUTPUT": "plain",
+        "AUTOVIRON_BENCH_SPAWNS": str(spawn_log),
+        "PYTHONPATH": os.pathsep.join([str(workdir / "site"), str(REPO_ROOT)]),
+        "CI": "1",
+    })
+    return env
+
+
+@dataclass
+class RunResult:
+    ok: bool
+    wall: float
+    attempts: int
+    heals: int
+    installs: int
+    subprocesses: int
+
+
+class Harness:
+    def __init__(self, workdir: Path):
+        self.workdir = workdir
+        self.index_dir = workdir / "index"
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        (workdir / "site").mkdir(exist_ok=True)
+        (workdir / "site" / "sitecustomize.py").write_text(SITECUSTOMIZE)
+        for package in PACKAGES:
+            build_wheel(package, self.index_dir)
+
+    def _base_env(self, tag: str) -> Dict[str, str]:
+        scratch = self.workdir / "scratch" / tag
+        scratch.mkdir(parents=True, exist_ok=True)
+        return isolated_env(self.workdir, self.index_dir, scratch / "cache", scratch / "spawns.log", scratch / "events.ndjson")
+
+    def prepare(self, scenario: Scenario) -> Path:
+        """Build the fixture project (and its env, unless cold) once; later runs restore from it."""
+        template = self.workdir / "templates" / scenario.name
+        if template.exists():
+            return template
+        project = self.workdir / "projects" / scenario.name
+        shutil.rmtree(project, ignore_errors=True)
+        project.mkdir(parents=True)
+        for rel, content in scenario.files.items():
+            (project / rel).write_text(content)
+        (project / "autoviron.toml").write_text(f'python_path = {json.dumps(sys.executable)}\n')
+        if not scenario.cold:
+            subprocess.run([sys.executable, "-m", "venv", str(project / ".venv")], check=True)
+            if scenario.preinstalled:
+                python = project / ".venv" / ("Scripts" if os.name == "nt" else "bin") / "python"
+                subprocess.run([str(python), "-m", "pip", "install", "--quiet"] + scenario.preinstalled,
+                               check=True, env=self._base_env("prepare"))
+        template.parent.mkdir(parents=True, exist_ok=True)
+        # The project always runs from the same path, since venvs hard-code their location
+        shutil.copytree(project, template, symlinks=True)
+        return template
+
+    def _restore(self, scenario: Scenario, template: Path) -> Path:
+        project = self.workdir / "projects" / scenario.name
+        shutil.rmtree(project, ignore_errors=True)
+        shutil.copytree(template, project, symlinks=True)
+        return project
+
+    def _invoke(self, project: Path, scenario: Scenario, env: Dict[str, str]) -> float:
+        cmd = [sys.executable, "-c", "from autoviron.cli import main; main()", "run"] + scenario.command
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=project, env=env, stdin=subprocess.DEVNULL,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wall = time.perf_counter() - start
+        self.last_exit = proc.returncode
+        return wall
+
+    def run(self, scenario: Scenario, repeat: int) -> List[RunResult]:
+        template = self.prepare(scenario)
+        results = []
+        for i in range(repeat):
+            tag = f"{scenario.name}-{i}"
+            shutil.rmtree(self.workdir / "scratch" / tag, ignore_errors=True)
+            env = self._base_env(tag)
+            if scenario.warmup:
+                self._invoke(self._restore(scenario, template), scenario, env)
+            for name in ("AUTOVIRON_EVENTS", "AUTOVIRON_BENCH_SPAWNS"):
+                if os.path.exists(env[name]):
+                    os.remove(env[name])
+            wall = self._invoke(self._restore(scenario, template), scenario, env)
+            results.append(self._measure(env, wall))
+        return results
+
+    def _measure(self, env: Dict[str, str], wall: float) -> RunResult:
+        events = []
+        try:
+            events = [json.loads(line) for line in Path(env["AUTOVIRON_EVENTS"]).read_text().splitlines() if line]
+        except OSError:
+            pass
+        try:
+            spawns = len(Path(env["AUTOVIRON_BENCH_SPAWNS"]).read_text().splitlines())
+        except OSError:
+            spawns = 0
+        end = [e for e in events if e["event"] == "end"]
+        ok = (end[-1]["exit_code"] == 0) if end else self.last_exit == 0
+        return RunResult(
+            ok=ok, wall=wall,
+            attempts=sum(1 for e in events if e["event"] == "timing" and e.get("phase") == "attempt"),
+            heals=sum(1 for e in events if e["event"] == "heal"),
+            installs=sum(1 for e in events if e["event"] == "install"
+                         and not e.get("skipped") and not e.get("cached_failure")),
+            subprocesses=spawns,
+        )
+
+
+def summarize(results: List[RunResult]) -> dict:
+    return {
+        "ok": all(r.ok for r in results),
+        "wall": round(statistics.median(r.wall for r in results), 4),
+        "wall_min": round(min(r.wall for r in results), 4),
+        "attempts": max(r.attempts for r in results),
+        "heals": max(r.heals for r in results),
+        "installs": max(r.installs for r in results),
+        "subprocesses": max(r.subprocesses for r in results),
+        "runs": len(results),
+    }
+
+
+def compare(name: str, current: dict, baseline: Optional[dict]) -> List[str]:
+    """Regressions of `current` against `baseline` for one scenario."""
+    if not baseline:
+        return []
+    problems = []
+    if baseline["ok"] and not current["ok"]:
+        problems.append(f"{name}: used to succeed, now fails")
+    for key in ("attempts", "installs", "subprocesses"):
+        if current[key] > baseline[key]:
+            problems.append(f"{name}: {key} {baseline[key]} -> {current[key]}")
+    if current["wall"] > baseline["wall"] * (1 + TIME_TOLERANCE):
+        problems.append(f"{name}: median {baseline['wall']:.2f}s -> {current['wall']:.2f}s")
+    return problems
+
+
+def _delta(current: float, baseline: Optional[float]) -> str:
+    if not baseline:
+        return ""
+    return f"{(current / baseline - 1) * 100:+.0f}%"
+
+
+def print_report(summary: Dict[str, dict], baseline: Dict[str, dict]):
+    header = f"{'scenario':<24}{'result':<8}{'median':>9}{'vs base':>9}{'min':>9}{'attempts':>10}{'heals':>7}{'installs':>10}{'procs':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, s in summary.items():
+        base = baseline.get(name) or {}
+        print(f"{name:<24}{'ok' if s['ok'] else 'FAIL':<8}{s['wall']:>8.2f}s{_delta(s['wall'], base.get('wall')):>9}"
+              f"{s['wall_min']:>8.2f}s{s['attempts']:>10}{s['heals']:>7}{s['installs']:>10}{s['subprocesses']:>7}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("-s", "--scenario", action="append", choices=[s.name for s in SCENARIOS],
+                        help="Scenario to run (repeatable; default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per scenario (default: 3)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any scenario regressed against the baseline")
+    parser.add_argument("--workdir", type=Path, help="Keep fixtures here (reused between runs) instead of a temp dir")
+    parser.add_argument("--json", type=Path, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="autoviron-bench-"))
+    try:
+        baseline = json.loads(args.baseline.read_text()).get("scenarios", {})
+    except (OSError, ValueError):
+        baseline = {}
+    try:
+        harness = Harness(workdir.resolve())
+        summary = {}
+        for scenario in scenarios:
+            print(f"{scenario.name}: {scenario.description}", file=sys.stderr)
+            summary[scenario.name] = summarize(harness.run(scenario, args.repeat))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(summary, baseline)
+    result = {"python": sys.version.split()[0], "platform": sys.platform, "scenarios": summary}
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2) + "\n")
+    if args.save_baseline:
+        merged = dict(baseline, **summary)
+        args.baseline.write_text(json.dumps(dict(result, scenarios=merged), indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+    problems = [p for name, s in summary.items() for p in compare(name, s, baseline.get(name))]
+    for problem in problems:
+        print(f"regression: {problem}")
+    return 1 if args.check and problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
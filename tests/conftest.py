@@ -0,0 +1,51 @@
+import base64
+import hashlib
+import pytest
+from pathlib import Path
+
+
+def _record_hash(data: bytes) -> str:
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode()
+    return f"sha256={digest}"
+
+
+class FakeEnv:
+    """A venv-shaped directory whose site-packages can be populated with fake dists."""
+
+    def __init__(self, root: Path):
+        self.path = root
+        self.site_packages = root / "lib" / "python3.11" / "site-packages"
+        self.site_packages.mkdir(parents=True)
+        (root / "bin").mkdir()
+        (root / "pyvenv.cfg").write_text("home = /usr/bin\nversion = 3.11.7\n")
+
+    def add_dist(self, name: str, version: str = "1.0", requires=(), files=None, extra_metadata: str = ""):
+        files = files if files is not None else {f"{name}/__init__.py": b"VALUE = 1\n"}
+        dist_info = self.site_packages / f"{name}-{version}.dist-info"
+        dist_info.mkdir()
+        metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n{extra_metadata}"
+        metadata += "".join(f"Requires-Dist: {r}\n" for r in requires)
+        (dist_info / "METADATA").write_text(metadata)
+        rows = []
+        for rel, data in files.items():
+            target = self.site_packages / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(data)
+            rows.append(f"{rel},{_record_hash(data)},{len(data)}")
+        rows.append(f"{dist_info.name}/METADATA,,")
+        rows.append(f"{dist_info.name}/RECORD,,")
+        (dist_info / "RECORD").write_text("\n".join(rows) + "\n")
+        return dist_info
+
+
+@pytest.fixture
+def fake_env(tmp_path):
+    return FakeEnv(tmp_path / ".venv")
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    """Point the user cache at the test's tmp dir so no test reads or writes the real one."""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(path))
+    return path
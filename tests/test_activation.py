@@ -0,0 +1,31 @@
+import os
+from autoviron.core import activation
+from autoviron.core.env_manager import EnvironmentType
+
+def test_poetry_env_runs_interpreter_directly(fake_env):
+    python_bin = fake_env.path / "bin" / "python"
+    python_bin.write_text("")
+    cmd, env = activation.prepare_command(EnvironmentType.POETRY, fake_env.path, ["python", "-V"], {"PATH": "/usr/bin", "PYTHONHOME": "/x"})
+    assert cmd == [str(python_bin), "-V"]
+    assert env["PATH"] == f"{fake_env.path / 'bin'}{os.pathsep}/usr/bin"
+    assert env["VIRTUAL_ENV"] == str(fake_env.path)
+    assert env["POETRY_ACTIVE"] == "1"
+    assert "PYTHONHOME" not in env
+
+def test_conda_env_sets_prefix_and_scripts_run_with_python(fake_env):
+    (fake_env.path / "bin" / "python").write_text("")
+    cmd, env = activation.prepare_command(EnvironmentType.CONDA, fake_env.path, ["train.py"], {"PATH": "/usr/bin"})
+    assert cmd == [str(fake_env.path / "bin" / "python"), "train.py"]
+    assert env["CONDA_PREFIX"] == str(fake_env.path)
+
+def test_snapshot_is_cached_until_env_changes(fake_env, monkeypatch):
+    (fake_env.path / "bin" / "python").write_text("")
+    first = activation.resolve_activation(EnvironmentType.VENV, fake_env.path)
+    builds = []
+    monkeypatch.setattr(activation, "_build_snapshot", lambda *a: builds.append(a))
+    assert activation.resolve_activation(EnvironmentType.VENV, fake_env.path) == first
+    assert builds == []
+
+def test_falls_back_to_wrapper_without_interpreter(fake_env):
+    cmd, _ = activation.prepare_command(EnvironmentType.PIPENV, fake_env.path, ["pytest"])
+    assert cmd == ["pipenv", "run", "pytest"]
@@ -0,0 +1,42 @@
+import os
+import sys
+import importlib.util
+from autoviron.core import bytecode
+
+def test_settings_accepts_single_level():
+    opts = bytecode.settings({"bytecode": {"optimize": 2}})
+    assert opts["optimize"] == [2]
+    assert bytecode.pip_flags({"bytecode": {"enabled": False}}) == []
+    assert bytecode.pip_flags({}) == ["--no-compile"]
+
+def test_only_changed_distributions_are_compiled(fake_env, tmp_path):
+    os.symlink(sys.executable, fake_env.path / "bin" / "python")
+    (fake_env.path / "pyvenv.cfg").write_text(f"home = {os.path.dirname(sys.executable)}\n")
+    fake_env.add_dist("old", files={"old.py": b"A = 1\n"})
+    before = bytecode.snapshot(fake_env.path)
+    fake_env.add_dist("new", files={"newpkg/__init__.py": b"B = 2\n", "newpkg/mod.py": b"C = 3\n"})
+
+    count = bytecode.precompile(fake_env.path, tmp_path, {"bytecode": {"optimize": [0, 1]}}, before)
+    assert count == 2
+    for rel in ("newpkg/__init__.py", "newpkg/mod.py"):
+        source = str(fake_env.site_packages / rel)
+        assert os.path.exists(importlib.util.cache_from_source(source, optimization=""))
+        assert os.path.exists(importlib.util.cache_from_source(source, optimization=1))
+    assert not os.path.exists(importlib.util.cache_from_source(str(fake_env.site_packages / "old.py"), optimization=""))
+
+def test_bytecode_of_removed_modules_is_purged_and_failures_are_reported(fake_env, tmp_path, monkeypatch):
+    os.symlink(sys.executable, fake_env.path / "bin" / "python")
+    (fake_env.path / "pyvenv.cfg").write_text(f"home = {os.path.dirname(sys.executable)}\n")
+    gone = fake_env.add_dist("gone", files={"gone.py": b"A = 1\n"})
+    fake_env.add_dist("kept", files={"kept.py": b"B = 2\n"})
+    bytecode.precompile(fake_env.path, tmp_path, {})
+    before = bytecode.snapshot(fake_env.path)
+    for path in (gone / "METADATA", gone / "RECORD", fake_env.site_packages / "gone.py"):
+        path.unlink()
+    gone.rmdir()
+    fake_env.add_dist("broken", files={"broken.py": b"def (:\n"})
+    warnings = []
+    monkeypatch.setattr(bytecode, "log_warning", warnings.append)
+    assert bytecode.precompile(fake_env.path, tmp_path, {}, before) == 1
+    assert [p.name.split(".")[0] for p in (fake_env.site_packages / "__pycache__").iterdir()] == ["kept"]
+    assert warnings and warnings[0].startswith("1 of 1 files failed")
@@ -0,0 +1,76 @@
+import json
+import pytest
+from pathlib import Path
+from autoviron.core import config as config_mod
+from autoviron.core.config import get_config, load_config, save_config, read_config_file
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.delenv("AUTOVIRON_RC", raising=False)
+    config_mod._MEMO.clear()
+    project = tmp_path / "project"
+    project.mkdir()
+    return project
+
+def test_defaults_are_loaded(isolated):
+    config = get_config(isolated)
+    assert ".venv" in config["venv_patterns"]
+    assert config["cache"]["ttl"] == 3600
+
+def test_layers_override_in_order(isolated):
+    (Path.home() / ".autovironrc").write_text(json.dumps({"venv_name": "userenv", "cache": {"ttl": 10}}))
+    (isolated / "autoviron.toml").write_text('venv_name = "projenv"\npython_versions = ["python3.12"]\n\n[cache]\nenabled = false\n')
+    config = get_config(isolated)
+    assert config["venv_name"] == "projenv"
+    assert config["python_versions"] == ["python3.12"]
+    assert config["cache"] == {"enabled": False, "ttl": 10, "file": "~/.autoviron_cache.json"}
+
+def test_env_overrides(isolated, monkeypatch):
+    monkeypatch.setenv("AUTOVIRON_CACHE__TTL", "60")
+    monkeypatch.setenv("AUTOVIRON_VENV_PATTERNS", "a,b")
+    config = get_config(isolated)
+    assert config["cache"]["ttl"] == 60
+    assert config["venv_patterns"] == ["a", "b"]
+
+def test_env_overrides_only_touch_known_keys(isolated, monkeypatch):
+    monkeypatch.setenv("AUTOVIRON_OUTPUT", "json")
+    monkeypatch.setenv("AUTOVIRON_NOTEBOOK_CHANNEL", "fd:3")
+    monkeypatch.setenv("AUTOVIRON_QUIET", "TRUE")
+    monkeypatch.setenv("AUTOVIRON_BYTECODE__ENABLED", "0")
+    config = get_config(isolated)
+    assert "output" not in config and "notebook_channel" not in config
+    assert config["quiet"] is True and config["bytecode"]["enabled"] is False
+
+def test_snapshot_is_reused_until_sources_change(isolated, monkeypatch):
+    get_config(isolated)
+    config_mod._MEMO.clear()
+    calls = []
+    monkeypatch.setattr(config_mod, "compile_config", lambda root: calls.append(root) or {})
+    get_config(isolated)
+    assert calls == []
+
+    (isolated / "autoviron.json").write_text('{"venv_name": "x"}')
+    get_config(isolated)
+    assert calls == [isolated]
+
+def test_save_config_round_trips_arrays_and_tables(tmp_path):
+    config = {"auto_create": True, "python_versions": ["python3", "python"], "cache": {"ttl": 5}}
+    save_config(tmp_path, config)
+    assert load_config(tmp_path) == config
+    assert read_config_file(tmp_path / "autoviron.toml") == config
+
+def test_section_merges_a_table_over_the_packaged_defaults_without_touching_them():
+    assert config_mod.section({"cache": {"ttl": 5}}, "cache") == {"enabled": True, "ttl": 5, "file": "~/.autoviron_cache.json"}
+    section = config_mod.section({"cache": None}, "cache")
+    section["enabled"] = False
+    assert config_mod.section({}, "cache")["enabled"] is True
+
+def test_env_overrides_keep_string_keys_as_strings(isolated, monkeypatch):
+    monkeypatch.setenv("AUTOVIRON_VENV_NAME", "1")
+    monkeypatch.setenv("AUTOVIRON_SCRIPTS__MAX_SIZE", "null")
+    config = get_config(isolated)
+    assert config["venv_name"] == "1"
+    assert config["scripts"]["max_size"] == "null"
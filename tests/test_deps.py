@@ -10,3 +10,32 @@ def test_get_package_name_alias_mapping():
     assert get_package_name("PIL") == "Pillow"
     assert get_package_name("dotenv") == "python-dotenv"
     assert get_package_name("yaml") == "pyyaml"
+
+def test_classify_imports_tags_guards(tmp_path):
+    from autoviron.core.deps import classify_imports
+    source = tmp_path / "app.py"
+    source.write_text(
+        "import sys\nfrom typing import TYPE_CHECKING\nimport requests\n"
+        "try:\n    import ujson as json\nexcept ImportError:\n    import json\n"
+        "if TYPE_CHECKING:\n    from mypy_boto3_s3 import S3Client\n"
+        "if sys.platform == 'win32':\n    import winreg, pywin32_ctypes\n"
+        "def lazy():\n    import numpy\n"
+        "try:\n    import yaml\nfinally:\n    pass\n"
+    )
+    kinds = classify_imports(source)
+    assert kinds["requests"] == kinds["numpy"] == kinds["yaml"] == "required"
+    assert kinds["ujson"] == "optional" and kinds["json"] == "required"
+    assert kinds["mypy_boto3_s3"] == "type_only"
+    assert kinds["pywin32_ctypes"] == "conditional"
+
+def test_detect_missing_imports_skips_first_party(tmp_path):
+    from autoviron.core.deps import detect_missing_imports
+    (tmp_path / "pyproject.toml").write_text('[tool.setuptools.packages.find]\nwhere = ["lib"]\n')
+    (tmp_path / "lib" / "corelib").mkdir(parents=True)
+    (tmp_path / "lib" / "corelib" / "__init__.py").write_text("")
+    (tmp_path / "src" / "nspkg").mkdir(parents=True)
+    (tmp_path / "src" / "nspkg" / "mod.py").write_text("")
+    (tmp_path / "utils.py").write_text("")
+    script = tmp_path / "main.py"
+    script.write_text("import utils, corelib, nspkg.mod, yaml\ntry:\n    import orjson\nexcept ImportError:\n    orjson = None\n")
+    assert detect_missing_imports(script, tmp_path) == ["pyyaml"]
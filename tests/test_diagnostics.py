@@ -0,0 +1,44 @@
+from autoviron.core.env_manager import EnvironmentType
+from autoviron.doctor.diagnostics import run_deep_checks
+
+CHECKS = ["dependencies", "records", "bytecode"]
+
+def test_healthy_env_passes(fake_env, tmp_path):
+    fake_env.add_dist("alpha", requires=["beta>=1.0"])
+    fake_env.add_dist("beta", "1.2")
+    report = run_deep_checks(EnvironmentType.VENV, fake_env.path, tmp_path, full=True, checks=CHECKS)
+    assert report.healthy
+    assert [c.name for c in report.checks] == CHECKS
+    assert all(c.duration >= 0 for c in report.checks)
+
+def test_missing_and_mismatched_requirements(fake_env, tmp_path):
+    fake_env.add_dist("alpha", requires=["beta>=2.0", "gamma", "winonly; sys_platform == 'nonexistent'"])
+    fake_env.add_dist("beta", "1.2")
+    report = run_deep_checks(EnvironmentType.VENV, fake_env.path, tmp_path, checks=["dependencies"])
+    problems = report.get("dependencies").problems
+    assert not report.healthy
+    assert len(problems) == 2
+    assert any("gamma" in p for p in problems)
+    assert any("beta>=2.0" in p for p in problems)
+
+def test_record_hash_mismatch_detected(fake_env, tmp_path):
+    fake_env.add_dist("alpha", files={"alpha.py": b"x = 1\n"})
+    (fake_env.site_packages / "alpha.py").write_bytes(b"x = 2\n")
+    report = run_deep_checks(EnvironmentType.VENV, fake_env.path, tmp_path, full=True, checks=["records"])
+    records = report.get("records")
+    assert records.status == "error"
+    assert records.details["broken"] == ["alpha"]
+
+def test_orphaned_files_are_summarized_as_findings(fake_env, tmp_path):
+    fake_env.add_dist("alpha")
+    (fake_env.site_packages / "leftover").mkdir()
+    pycache = fake_env.site_packages / "alpha" / "__pycache__"
+    pycache.mkdir()
+    (pycache / "gone.cpython-311.pyc").write_bytes(b"\0" * 16)
+    report = run_deep_checks(EnvironmentType.VENV, fake_env.path, tmp_path, checks=["bytecode"])
+    bytecode = report.get("bytecode")
+    assert report.healthy
+    assert bytecode.status == "ok" and bytecode.problems == []
+    assert len(bytecode.notes) == 2 and bytecode.notes[1].endswith(": leftover")
+    assert bytecode.details["orphaned_entries"] == ["leftover"]
+    assert bytecode.details["orphaned_pyc"] == 1
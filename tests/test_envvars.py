@@ -0,0 +1,74 @@
+import pytest
+from autoviron.core import envvars
+
+SETTINGS = '''
+import os
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic import Field
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="APP_")
+    database_url: str
+    debug: bool = False
+    token: str = Field(..., alias="API_TOKEN")
+
+SECRET = os.environ["SECRET_KEY"]
+'''
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    for name in ("SECRET_KEY", "APP_DATABASE_URL", "API_TOKEN", "REGION", "HOME_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    (tmp_path / "app.py").write_text(
+        "import os\nfrom config import settings\nregion = os.getenv('REGION', 'eu')\n"
+        "os.environ.get('UNUSED')\n"
+    )
+    (tmp_path / "config").mkdir()
+    (tmp_path / "config" / "__init__.py").write_text("")
+    (tmp_path / "config" / "settings.py").write_text(SETTINGS)
+    (tmp_path / "unreached.py").write_text("import os\nos.environ['NOT_NEEDED']\n")
+    return tmp_path
+
+def test_scan_follows_first_party_imports(project):
+    uses = envvars.scan_environment_uses(project, ["python", "app.py"], {})
+    required = sorted(name for name, use in uses.items() if use.required)
+    assert required == ["API_TOKEN", "APP_DATABASE_URL", "SECRET_KEY"]
+    assert uses["REGION"].default == "eu" and not uses["APP_DEBUG"].required
+    assert "NOT_NEEDED" not in uses
+    assert uses["SECRET_KEY"].locations == ["config/settings.py:12"]
+
+def test_dotenv_parsing():
+    text = 'export A=1\nB="two words" # note\nC=\'${A}\'\nD=${A}-x # comment\n# skip\nE="l1\nl2"\n'
+    assert envvars.parse_dotenv(text) == {"A": "1", "B": "two words", "C": "${A}", "D": "1-x", "E": "l1\nl2"}
+
+def test_missing_variables_are_reported_without_prompting(project, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(envvars, "log_info", warnings.append)
+    (project / ".env").write_text("SECRET_KEY=from-dotenv\n")
+    extra = envvars.collect_environment(project, ["python", "app.py"], {}, ask=False)
+    assert extra == {"SECRET_KEY": "from-dotenv"}
+    assert [w.split()[0] for w in warnings[:2]] == ["API_TOKEN", "APP_DATABASE_URL"]
+
+def test_guarded_reads_are_optional(project):
+    (project / "guarded.py").write_text(
+        "import os\ntry:\n    a = os.environ['A']\nexcept KeyError:\n    a = None\n"
+        "if 'B' in os.environ:\n    b = os.environ['B'] + os.environ['C']\n"
+        "d = os.environ['D'] if 'D' not in os.environ else os.environ['D']\n"
+        "try:\n    e = os.environ['E']\nexcept ValueError:\n    pass\n"
+    )
+    uses = envvars.scan_environment_uses(project, ["python", "guarded.py"], {})
+    assert sorted(name for name, use in uses.items() if use.required) == ["C", "D", "E"]
+
+def test_console_scripts_are_not_scanned(project):
+    assert envvars.scan_environment_uses(project, ["pytest"], {}) == {}
+
+def test_dotenv_and_template_defaults_fill_the_environment(project):
+    (project / ".env").write_text("SECRET_KEY=from-dotenv\n")
+    (project / ".env.example").write_text("APP_DATABASE_URL=sqlite://\nAPI_TOKEN=\n")
+    extra = envvars.collect_environment(project, ["python", "app.py"], {}, base_env={"API_TOKEN": "t"}, ask=False)
+    assert extra == {"SECRET_KEY": "from-dotenv", "APP_DATABASE_URL": "sqlite://"}
+
+def test_scan_results_are_cached_by_mtime(project, monkeypatch):
+    envvars.scan_environment_uses(project, ["python", "app.py"], {})
+    monkeypatch.setattr(envvars, "scan_file", lambda path: pytest.fail(f"rescanned {path}"))
+    envvars.scan_environment_uses(project, ["python", "app.py"], {})
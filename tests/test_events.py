@@ -0,0 +1,37 @@
+import sys
+import json
+import subprocess
+import pytest
+from autoviron.ux import events
+from autoviron.ux.console import console, log_info, log_warning, emit
+
+@pytest.fixture(autouse=True)
+def reset_bus():
+    yield
+    events.bus.close()
+
+def test_json_sink_writes_one_event_per_line(tmp_path):
+    target = tmp_path / "events.ndjson"
+    events.configure("json", str(target))
+    log_info("Installing [highlight]six[/highlight]")
+    with console.status("[highlight]Creating virtual environment...[/highlight]", phase="create_venv"):
+        emit("install", source="heal", packages=["six"], ok=True)
+    events.bus.close()
+    lines = [json.loads(line) for line in target.read_text().splitlines()]
+    assert [e["event"] for e in lines] == ["log", "phase_start", "install", "phase_end"]
+    assert lines[0]["message"] == "Installing six"
+    assert lines[3]["phase"] == "create_venv" and lines[3]["ok"] is True and lines[3]["duration"] >= 0
+
+def test_plain_sink_honours_quiet(capsys):
+    events.configure("plain", quiet=True)
+    log_info("chatter")
+    log_warning("[bold]careful[/bold] with [brackets]")
+    console.print("table row")
+    assert capsys.readouterr().out == "warning: careful with [brackets]\ntable row\n"
+
+def test_json_mode_does_not_import_rich():
+    code = ("import sys; from autoviron.ux import events; from autoviron.ux.console import log_info, console; "
+            "events.configure('json', '-'); log_info('hi'); console.print('out'); "
+            "print(any(m == 'rich' or m.startswith('rich.') for m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.splitlines()
+    assert json.loads(out[0])["message"] == "hi" and out[-1] == "False"
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import multiprocessing
+import pytest
+from autoviron.core import forkserver
+from autoviron.core.env_manager import EnvironmentType
+
+pytestmark = pytest.mark.skipif(not forkserver.available(), reason="needs fork and Unix sockets")
+
+@pytest.fixture
+def warm_env(fake_env):
+    os.symlink(sys.executable, fake_env.path / "bin" / "python")
+    (fake_env.path / "pyvenv.cfg").write_text(f"home = {os.path.dirname(sys.executable)}\n")
+    fake_env.add_dist("heavymod", files={"heavymod.py": b"LOADED_AT = __import__('time').time()\n"})
+    yield fake_env
+    forkserver.stop_server(fake_env.path)
+
+def test_server_argv_only_serves_plain_python_runs():
+    assert forkserver.server_argv(["/env/python", "app.py", "-v"], "/env/python") == ["app.py", "-v"]
+    assert forkserver.server_argv(["/env/python", "-m", "pkg"], "/env/python") == ["-m", "pkg"]
+    assert forkserver.server_argv(["/env/python", "-X", "importtime", "app.py"], "/env/python") is None
+    assert forkserver.server_argv(["pytest"], "/env/python") is None
+
+def test_learns_imports_the_env_provides(warm_env, tmp_path):
+    script = tmp_path / "job.py"
+    script.write_text("import os, heavymod, notinstalled\n")
+    assert forkserver.learn(warm_env.path, [script]) == ["heavymod"]
+    assert forkserver.preload_modules(warm_env.path, tmp_path, forkserver.settings({})) == ["heavymod"]
+
+def test_children_run_with_preloaded_modules_and_restart_on_change(warm_env, tmp_path):
+    script = tmp_path / "job.py"
+    script.write_text("import sys, os\nprint('heavymod' in sys.modules, os.getcwd(), sys.argv)\n"
+                      "print('oops', file=sys.stderr)\nsys.exit(4)\n")
+    config = {"forkserver": {"preload": ["heavymod"], "learn": False}}
+    python_bin = str(warm_env.path / "bin" / "python")
+    env = dict(os.environ, MARKER="1")
+    result = forkserver.run_in_server(EnvironmentType.VENV, warm_env.path, tmp_path, config,
+                                      [python_bin, "job.py", "x"], env)
+    assert result.returncode == 4
+    assert result.stdout == f"True {tmp_path} ['job.py', 'x']\n"
+    assert result.stderr == "oops\n"
+
+    first = forkserver.ensure_server(EnvironmentType.VENV, warm_env.path, tmp_path, config)
+    time.sleep(0.01)
+    (warm_env.site_packages / "heavymod.py").write_text("LOADED_AT = 0\n")
+    second = forkserver.ensure_server(EnvironmentType.VENV, warm_env.path, tmp_path, config)
+    assert first.pid != second.pid and first.key != second.key
+
+def _use_server(lock_path, ready, release):
+    with forkserver.FileLock(lock_path, shared=True):
+        ready.set()
+        release.wait(10)
+
+def _stopped(server, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while server.ping():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+def test_replaced_server_outlives_runs_still_using_it(warm_env, tmp_path):
+    config = {"forkserver": {"preload": ["heavymod"], "learn": False}}
+    first = forkserver.ensure_server(EnvironmentType.VENV, warm_env.path, tmp_path, config)
+    ctx = multiprocessing.get_context("fork")
+    ready, release = ctx.Event(), ctx.Event()
+    client = ctx.Process(target=_use_server, args=(first.clients_lock, ready, release))
+    client.start()
+    try:
+        assert ready.wait(10)
+        time.sleep(0.01)
+        (warm_env.site_packages / "heavymod.py").write_text("LOADED_AT = 0\n")
+        second = forkserver.ensure_server(EnvironmentType.VENV, warm_env.path, tmp_path, config)
+        assert second.socket != first.socket
+        assert first.ping() and second.ping()
+    finally:
+        release.set()
+        client.join()
+    assert first.run(["-c", "print(1)"], tmp_path, dict(os.environ)).stdout == "1\n"
+    assert _stopped(first) and second.ping()
@@ -0,0 +1,34 @@
+from autoviron.core import importtime
+
+STDERR = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   _io
+import time:       300 |        400 | _frozen_importlib_external
+import time:       200 |        200 |       fastlib._speedups
+import time:       500 |        700 |     fastlib.core
+import time:       100 |        800 |   fastlib
+import time:      1000 |       1800 | app
+Traceback (most recent call last):
+KeyError: 'X'
+"""
+
+def test_split_stderr_rebuilds_the_tree():
+    roots, rest = importtime.split_stderr(STDERR)
+    assert rest == "Traceback (most recent call last):\nKeyError: 'X'\n"
+    assert [r.module for r in roots] == ["_frozen_importlib_external", "app"]
+    app = roots[1]
+    assert [c.module for c in app.children] == ["fastlib"]
+    assert app.children[0].children[0].children[0].module == "fastlib._speedups"
+    assert importtime.total_us(roots) == 2200
+
+def test_attribution_and_regressions(tmp_path, fake_env):
+    fake_env.add_dist("fastlib")
+    (tmp_path / "app.py").write_text("import fastlib\n")
+    roots, _ = importtime.split_stderr(STDERR)
+    importtime.attribute(roots, fake_env.path, tmp_path)
+    assert importtime.by_distribution(roots) == {"project": 1000, "fastlib": 800, "stdlib": 400}
+
+    baseline, _ = importtime.split_stderr(STDERR.replace("       700 |     fastlib.core", "       200 |     fastlib.core"))
+    importtime.save_profile(tmp_path / "base.json", ["app.py"], baseline)
+    baseline = importtime.load_profile(tmp_path / "base.json")
+    opts = dict(importtime.settings({}), regression_min_us=400)
+    assert importtime.regressions(roots, baseline, opts) == [("fastlib.core", 200, 700)]
@@ -0,0 +1,44 @@
+import os
+import pytest
+from autoviron.core import interpreters
+
+def _info(path, version, prefix="/usr"):
+    return interpreters.PythonInfo(path, version, "cpython", f"cpython-{version.replace('.', '')[:3]}", prefix, prefix)
+
+@pytest.fixture
+def fake_pythons(tmp_path, monkeypatch):
+    monkeypatch.setattr(interpreters, "_install_roots", lambda extra=(): [])
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    versions = {"python3": "3.11.2", "python3.9": "3.9.18", "python3.12": "3.12.1"}
+    for name in list(versions) + ["python3-config"]:
+        (bin_dir / name).write_text("#!/bin/sh\n")
+        (bin_dir / name).chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir))
+    probes = []
+
+    def probe(path):
+        probes.append(os.path.basename(path))
+        return _info(path, versions[os.path.basename(path)])
+
+    monkeypatch.setattr(interpreters, "probe", probe)
+    return bin_dir, probes
+
+def test_discovery_is_cached_by_path_and_mtime(fake_pythons):
+    bin_dir, probes = fake_pythons
+    assert [i.version for i in interpreters.discover()] == ["3.12.1", "3.11.2", "3.9.18"]
+    assert sorted(probes) == ["python3", "python3.12", "python3.9"]
+    probes.clear()
+    interpreters.discover()
+    assert probes == []
+    os.utime(bin_dir / "python3.9", ns=(1, 1))
+    interpreters.discover()
+    assert probes == ["python3.9"]
+
+def test_select_follows_requires_python_then_preference_order(fake_pythons, tmp_path):
+    assert interpreters.select(tmp_path, ["python3", "python3.12"]).version == "3.11.2"
+    (tmp_path / "pyproject.toml").write_text('[project]\nname = "x"\nrequires-python = ">=3.12"\n')
+    assert interpreters.select(tmp_path, ["python3"]).version == "3.12.1"
+    (tmp_path / "pyproject.toml").write_text('[tool.poetry.dependencies]\npython = "~3.9"\n')
+    assert interpreters.requires_python(tmp_path) == ">=3.9,<3.10"
+    assert interpreters.select(tmp_path, ["python3"]).version == "3.9.18"
@@ -0,0 +1,45 @@
+import os
+import pytest
+from autoviron.core import knowledge
+
+OPTS = {"wheel_dirs": [], "pip_cache": False, "max_envs": 64}
+
+@pytest.fixture
+def env(fake_env):
+    fake_env.add_dist("httpkit", "2.0", requires=["certkit>=1", "socks-kit; extra == 'socks'"],
+                      extra_metadata="Summary: An HTTP client for humans\nKeywords: http,requests\n"
+                                     "Classifier: Topic :: Internet :: WWW/HTTP\n")
+    fake_env.add_dist("certkit", "1.0", extra_metadata="Summary: CA certificates bundle\n")
+    fake_env.add_dist("webframe", "0.1", requires=["httpkit"], extra_metadata="Summary: A web server framework\n")
+    knowledge.remember_env(fake_env.path)
+    return fake_env
+
+def test_search_and_reverse_dependencies(env):
+    index = knowledge.load_index({"knowledge": OPTS})
+    assert index.search("http clients")[0][0] == "httpkit"
+    assert index.search("certificates") == [("certkit", 1)]
+    assert index.required_by("certkit") == ["httpkit"]
+    assert index.get("httpkit")["extras"] == ["socks-kit"]
+    assert index.why("certkit", ["webframe", "httpkit", "certkit"], ["webframe"]) == [["webframe", "httpkit", "certkit"]]
+
+def test_refresh_only_rereads_changed_sources(env, monkeypatch):
+    index = knowledge.load_index({"knowledge": OPTS})
+    assert index.refresh(OPTS) == 0
+    env.add_dist("newpkg", "1.0", extra_metadata="Summary: Freshly installed\n")
+    os.utime(env.site_packages, ns=(1, 1))
+    reread = []
+    original = knowledge._read_site_packages
+    monkeypatch.setattr(knowledge, "_read_site_packages", lambda site: reread.append(site) or original(site))
+    index = knowledge.load_index({"knowledge": OPTS})
+    assert reread == [env.site_packages]
+    assert index.search("freshly") == [("newpkg", 1)]
+
+def test_why_follows_the_installed_versions_requirements(env, tmp_path):
+    newer = type(env)(tmp_path / "other")
+    newer.add_dist("webframe", "0.2", extra_metadata="Summary: Dropped its HTTP client\n")
+    knowledge.remember_env(newer.path)
+    index = knowledge.load_index({"knowledge": OPTS})
+    installed = knowledge.env_requirements(env.path)
+    assert installed["webframe"] == ["httpkit"]
+    assert index.why("certkit", installed, ["webframe"]) == []
+    assert index.why("certkit", installed, ["webframe"], requires=installed) == [["webframe", "httpkit", "certkit"]]
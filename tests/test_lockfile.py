@@ -0,0 +1,53 @@
+from packaging.requirements import Requirement
+from packaging.version import Version
+from autoviron.core import dists as dist_meta
+from autoviron.core.lockfile import (LockedPackage, _archive_release, lock_is_current, published_hashes, read_lockfile,
+                                     resolve_locked_set, write_lockfile)
+
+def test_lockfile_round_trip(tmp_path):
+    packages = [
+        LockedPackage("alpha", "1.0", ["sha256:aaa"]),
+        LockedPackage("beta", "2.1", ["sha256:bbb", "sha256:ccc"], 'sys_platform == "win32"'),
+    ]
+    write_lockfile(tmp_path / "autoviron.lock", packages, "abc123")
+    loaded, sources_hash = read_lockfile(tmp_path / "autoviron.lock")
+    assert loaded == packages
+    assert sources_hash == "abc123"
+    assert lock_is_current(tmp_path, "abc123")
+    assert not lock_is_current(tmp_path, "changed")
+
+def test_locked_set_follows_installed_graph(fake_env):
+    fake_env.add_dist("app", requires=["lib", "extra-only; extra == 'fast'", "gone; python_version < '3'",
+                                       "fastlib; (sys_platform == 'linux' or os_name == 'nt') and extra == 'fast'"])
+    fake_env.add_dist("lib", requires=["core"])
+    fake_env.add_dist("core")
+    fake_env.add_dist("extra-only")
+    fake_env.add_dist("fastlib")
+    fake_env.add_dist("unrelated")
+    fake_env.add_dist("winlib")
+    dists = dist_meta.env_distributions(fake_env.path)
+    marker_env = dist_meta.marker_environment(fake_env.path)
+    roots = [Requirement("app"), Requirement('winlib; sys_platform == "linux"')]
+    markers = resolve_locked_set(dists, roots, marker_env)
+    assert set(markers) == {"app", "lib", "core", "winlib"}
+    assert markers["core"] is None
+    assert markers["winlib"] == {'sys_platform == "linux"'}
+    marker_env["sys_platform"] = "linux"
+    markers = resolve_locked_set(dists, [Requirement("app[fast]")], marker_env)
+    # The extra is settled by the lock's root; the platform part of the marker is kept
+    assert markers["fastlib"] == {'sys_platform == "linux" or os_name == "nt"'}
+
+def test_published_hashes_cover_every_file_of_the_release(tmp_path):
+    files = tmp_path / "files"
+    files.mkdir()
+    links = []
+    for name in ("my_pkg-1.0-py3-none-any.whl", "my_pkg-1.0-cp311-cp311-win_amd64.whl", "my-pkg-1.0.tar.gz",
+                 "my_pkg-1.1-py3-none-any.whl"):
+        (files / name).write_bytes(name.encode())
+        links.append(f'<a href="../../files/{name}">{name}</a>')
+    page = tmp_path / "simple" / "my-pkg"
+    page.mkdir(parents=True)
+    (page / "index.html").write_text("<br/>".join(links))
+    assert _archive_release("my-pkg-1.0.tar.gz") == ("my-pkg", Version("1.0"))
+    hashes = published_hashes([(tmp_path / "simple").as_uri(), "http://127.0.0.1:9/simple"], "My.Pkg", "1.0")
+    assert len(hashes) == 3
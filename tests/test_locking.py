@@ -0,0 +1,85 @@
+import json
+import multiprocessing
+import pytest
+from autoviron.core import locking
+from autoviron.core.state import read_state, update_state
+from autoviron.core.failure_db import FailureDB
+
+def _write_key(root, index):
+    update_state(root, **{f"worker{index}": index})
+    FailureDB(root).record_failure("ModuleNotFoundError", f"mod{index}", "installed")
+
+def test_concurrent_updates_keep_every_key(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_write_key, args=(tmp_path, i)) for i in range(8)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert read_state(tmp_path) == {f"worker{i}": i for i in range(8)}
+    failures = json.loads((tmp_path / ".autoviron_failures.json").read_text())
+    assert len(failures["ModuleNotFoundError"]) == 8
+    assert not list(tmp_path.glob(".*.tmp"))
+
+def _hold_exclusive(root, ready, release):
+    with locking.project_lock(root):
+        ready.set()
+        release.wait(10)
+
+def test_exclusive_lock_times_out_and_shared_nests(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    ready, release = ctx.Event(), ctx.Event()
+    holder = ctx.Process(target=_hold_exclusive, args=(tmp_path, ready, release))
+    holder.start()
+    try:
+        assert ready.wait(10)
+        with pytest.raises(locking.LockTimeout):
+            locking.project_lock(tmp_path, shared=True, timeout=0.2).acquire()
+    finally:
+        release.set()
+        holder.join()
+    with locking.project_lock(tmp_path, shared=True) as outer:
+        with locking.project_lock(tmp_path):
+            pass
+        assert outer.waited == 0.0
+
+def _hold_shared(root, ready, release):
+    with locking.project_lock(root, shared=True):
+        ready.set()
+        release.wait(10)
+
+def _acquire_in_child(root, results):
+    try:
+        locking.project_lock(root, timeout=0.2).acquire()
+        results.put("acquired")
+    except locking.LockTimeout:
+        results.put("timed out")
+
+def test_failed_upgrade_keeps_the_shared_lock(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    ready, release = ctx.Event(), ctx.Event()
+    other = ctx.Process(target=_hold_shared, args=(tmp_path, ready, release))
+    other.start()
+    try:
+        assert ready.wait(10)
+        with locking.project_lock(tmp_path, shared=True):
+            with pytest.raises(locking.LockTimeout):
+                locking.project_lock(tmp_path, timeout=0.2).acquire()
+            held = locking._held[str(locking.lock_path(tmp_path, "env"))]
+            assert held[1:] == [False, 1]
+    finally:
+        release.set()
+        other.join()
+
+def test_forked_child_does_not_reuse_held_locks(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    with locking.project_lock(tmp_path):
+        child = ctx.Process(target=_acquire_in_child, args=(tmp_path, results))
+        child.start()
+        child.join()
+        assert results.get(timeout=5) == "timed out"
+
+def test_timeout_comes_from_the_locks_table():
+    assert locking.timeout({}) == 600
+    assert locking.timeout({"locks": {"timeout": 5}}) == 5
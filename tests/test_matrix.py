@@ -0,0 +1,29 @@
+import os
+import sys
+from autoviron.core import matrix
+from autoviron.core.env_manager import EnvManager
+from autoviron.core.interpreters import PythonInfo
+
+def test_discover_keeps_one_interpreter_per_minor_version(monkeypatch):
+    found = {
+        "python3": PythonInfo("/usr/bin/python3.11", "3.11.2", "cpython", "", "/usr", "/usr"),
+        "python3.11": PythonInfo("/opt/py/bin/python3.11", "3.11.7", "cpython", "", "/opt/py", "/opt/py"),
+        "python3.9": PythonInfo("/opt/py/bin/python3.9", "3.9.18", "cpython", "", "/opt/py", "/opt/py"),
+        "python3.8": PythonInfo("/opt/py/bin/python3.8", "3.8.18", "cpython", "", "/opt/py", "/opt/py"),
+        "python2": PythonInfo("/usr/bin/python2", "2.7.18", "cpython", "", "/usr", "/usr"),
+    }
+    monkeypatch.setattr(matrix.interpreters, "resolve", lambda names: [found[n] for n in names if n in found])
+    interpreters = matrix.discover(["python3", "python3.11", "missing", "python3.9", "python3.8", "python2"], ">=3.9")
+    assert [(i.minor, i.executable) for i in interpreters] == [("3.9", "/opt/py/bin/python3.9"), ("3.11", "/usr/bin/python3.11")]
+
+def test_run_matrix_prefixes_output_and_reports(tmp_path, fake_env, monkeypatch, capfd):
+    monkeypatch.setenv("AUTOVIRON_RC", str(tmp_path / "rc.toml"))
+    os.symlink(sys.executable, fake_env.path / "bin" / "python")
+    (tmp_path / "app.py").write_text("import sys\nprint('out')\nsys.exit(3)\n")
+    manager = EnvManager(tmp_path)
+    interp = PythonInfo(sys.executable, "3.11.7", "cpython", "", sys.prefix, sys.prefix)
+    opts = dict(matrix.settings({}), env_name=".venv")
+    monkeypatch.setattr(matrix, "ensure_env", lambda manager, interp, env_path: "")
+    [result] = matrix.run_matrix(manager, ["python", "app.py"], [interp], opts)
+    assert result.env_path == fake_env.path and result.exit_code == 3 and not result.passed
+    assert "[py3.11] out" in capfd.readouterr().out
@@ -0,0 +1,22 @@
+import time
+from autoviron.core import negative_cache
+
+def test_failures_are_cached_per_scope_until_they_expire(monkeypatch, fake_env):
+    cache = negative_cache.NegativeCache(fake_env.path, {"negative_cache": {"ttl": 60}})
+    entry = cache.record("yaml", "pyyaml", "ERROR: Could not find a version\nERROR: No matching distribution found for pyyaml\n")
+    assert entry["reason"] == "not_found"
+    assert cache.lookup("yaml", "PyYAML")["message"].endswith("found for pyyaml")
+    assert cache.lookup("yaml", "other") is None
+    assert negative_cache.NegativeCache(fake_env.path, refresh=True).lookup("yaml", "pyyaml") is None
+    monkeypatch.setenv("PIP_INDEX_URL", "https://mirror.example/simple")
+    assert negative_cache.NegativeCache(fake_env.path, {"negative_cache": {"ttl": 60}}).lookup("yaml", "pyyaml") is None
+    monkeypatch.delenv("PIP_INDEX_URL")
+    monkeypatch.setattr(time, "time", lambda: entry["failed_at"] + 61)
+    assert cache.lookup("yaml", "pyyaml") is None
+
+def test_only_missing_and_unbuildable_packages_are_cached(fake_env):
+    cache = negative_cache.NegativeCache(fake_env.path)
+    assert cache.record("x", "x", "WARNING: Retrying ... NewConnectionError(...)") is None
+    assert negative_cache.classify("  error: subprocess-exited-with-error") == "build_failed"
+    assert cache.record("x", "x", "ERROR: Could not install packages due to an OSError: [Errno 28] No space left") is None
+    assert cache.lookup("x", "x") is None
@@ -0,0 +1,84 @@
+import io
+import json
+import sys
+import subprocess
+import pytest
+from autoviron.core import notebooks
+from autoviron.core.deps import classify_imports, detect_missing_imports
+from autoviron.core.env_manager import EnvironmentType
+
+
+def _notebook(path, *sources, outputs=None):
+    cells = [{"cell_type": "markdown", "metadata": {}, "source": ["# Notes \\\"quoted\\\"\n"]}]
+    for source in sources:
+        cells.append({"cell_type": "code", "execution_count": None, "metadata": {"tags": []},
+                      "outputs": outputs or [], "source": source.splitlines(keepends=True)})
+    path.write_text(json.dumps({"cells": cells, "metadata": {"kernelspec": {"name": "python3"}},
+                                "nbformat": 4, "nbformat_minor": 5}, indent=1))
+    return path
+
+def test_reader_streams_cells_past_large_outputs(tmp_path, monkeypatch):
+    big = [{"output_type": "display_data", "data": {"image/png": "QUJD\\" * 50000, "text/plain": ["[1, 2]"]},
+            "metadata": {"width": 1.5e3, "ok": True, "none": None}}]
+    nb = _notebook(tmp_path / "a.ipynb", "import numpy as np\n", 'print("\\u00e9 \\\\ \\"")\n', outputs=big)
+    monkeypatch.setattr(notebooks, "_CHUNK", 7)
+    cells = list(notebooks.iter_cells(nb))
+    assert [c.cell_type for c in cells] == ["markdown", "code", "code"]
+    assert [c.source for c in cells] == [c["source"] if isinstance(c["source"], str) else "".join(c["source"])
+                                         for c in json.loads(nb.read_text())["cells"]]
+    # Skipped values are not accumulated in the buffer
+    reader = notebooks._Reader(io.StringIO('"' + "x" * 100000 + '" 1'))
+    reader.skip_value()
+    assert len(reader.buf) < 2 * notebooks._CHUNK
+
+def test_magics_become_python_and_pip_lines_requirements():
+    source = "%pip install -q 'pandas>=2' -r req.txt polars\nfiles = !ls\nif files:\n    %time fit()\ndf?\n!pip install ./local\n"
+    code = notebooks.to_python(source)
+    compile(code, "<cell>", "exec")
+    assert code.count("\n") == source.count("\n")
+    assert "files = __autoviron_shell__('ls', capture=True)" in code
+    assert notebooks.pip_requirements(source) == ["pandas>=2", "polars"]
+    cell_magic = notebooks.to_python("%%bash\necho hi\n")
+    assert cell_magic.startswith("__autoviron_cell_magic__('bash', '', 'echo hi')")
+    assert notebooks.to_python("%%time\nimport torch\n") == "\nimport torch\n"
+
+def test_notebook_imports_are_scanned(tmp_path):
+    nb = _notebook(tmp_path / "a.ipynb", "import pandas\n%matplotlib inline\n", "this is ( not python\n",
+                   "try:\n    import ujson\nexcept ImportError:\n    ujson = None\n", "%pip install polars\n")
+    assert classify_imports(nb) == {"pandas": "required", "ujson": "optional"}
+    assert detect_missing_imports(nb, tmp_path) == ["pandas", "polars"]
+
+def test_run_resumes_from_failing_cell(tmp_path, monkeypatch):
+    env_path = tmp_path / ".venv"
+    subprocess.run([sys.executable, "-m", "venv", "--without-pip", str(env_path)], check=True)
+    nb = _notebook(tmp_path / "a.ipynb", "open('ran.log', 'a').write('x')\nvalue = 41\n",
+                   "import healme\nprint(value + healme.ONE)\n")
+    (tmp_path / "autoviron.toml").write_text("[notebooks]\npreflight = false\n")
+    installed = []
+
+    def fake_install(env_type, env_path, project_root, module, candidates, negative):
+        site = next(env_path.glob("lib/python*/site-packages"))
+        (site / "healme.py").write_text("ONE = 1\n")
+        installed.append(module)
+        return candidates[0]
+
+    monkeypatch.setattr("autoviron.core.execution._install_module", fake_install)
+    monkeypatch.chdir(tmp_path)
+    code = notebooks.run_notebook(EnvironmentType.VENV, env_path, nb, [], tmp_path)
+    assert code == 0 and installed == ["healme"]
+    # The first cell's state survived the heal instead of the notebook starting over
+    assert (tmp_path / "ran.log").read_text() == "x"
+
+@pytest.mark.skipif(sys.platform == "win32", reason="wait4/setrlimit are POSIX-only")
+def test_run_applies_limits_and_records_usage(tmp_path, monkeypatch):
+    from autoviron.core import resources
+    env_path = tmp_path / ".venv"
+    subprocess.run([sys.executable, "-m", "venv", "--without-pip", str(env_path)], check=True)
+    nb = _notebook(tmp_path / "a.ipynb", "value = 1\n", "block = bytearray(1 << 30)\n")
+    (tmp_path / "autoviron.toml").write_text("[notebooks]\npreflight = false\n")
+    monkeypatch.chdir(tmp_path)
+    accounting = resources.Accounting(resources.Limits(max_rss=512 * 1024 ** 2, max_cpu=30))
+    code = notebooks.run_notebook(EnvironmentType.VENV, env_path, nb, [], tmp_path, accounting=accounting)
+    assert code != 0
+    [attempt] = accounting.attempts
+    assert attempt.outcome == "memory_limit" and attempt.max_rss
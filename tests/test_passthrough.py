@@ -0,0 +1,33 @@
+import os
+import pytest
+from autoviron.core import passthrough
+from autoviron.core.env_manager import EnvManager, EnvironmentType
+
+@pytest.fixture
+def warm_project(tmp_path, fake_env, monkeypatch):
+    monkeypatch.setenv("AUTOVIRON_RC", str(tmp_path / "rc.toml"))
+    (fake_env.path / "bin" / "python").write_text("")
+    (tmp_path / "requirements.txt").write_text("six\n")
+    (tmp_path / "app.py").write_text("import six\n")
+    manager = EnvManager(tmp_path)
+    passthrough.record_warm_state(manager, EnvironmentType.VENV, fake_env.path, ["app.py"])
+    return tmp_path
+
+def test_warm_state_is_valid_until_a_source_changes(warm_project, fake_env):
+    assert passthrough.validate_warm_state(warm_project, ["app.py"]) == (EnvironmentType.VENV, fake_env.path)
+    (warm_project / "requirements.txt").write_text("six\nrequests\n")
+    assert passthrough.validate_warm_state(warm_project, ["app.py"]) is None
+
+def test_unseen_or_edited_script_is_not_warm(warm_project):
+    (warm_project / "other.py").write_text("")
+    assert passthrough.validate_warm_state(warm_project, ["other.py"]) is None
+    (warm_project / "app.py").write_text("import six, requests\n")
+    assert passthrough.validate_warm_state(warm_project, ["app.py"]) is None
+
+def test_try_exec_replaces_process_with_env_interpreter(warm_project, fake_env, monkeypatch):
+    calls = []
+    monkeypatch.setattr(os, "execve", lambda path, argv, env: calls.append((path, argv, env)))
+    passthrough.try_exec(warm_project, ["app.py"])
+    python_bin = str(fake_env.path / "bin" / "python")
+    assert calls and calls[0][:2] == (python_bin, [python_bin, "app.py"])
+    assert calls[0][2]["VIRTUAL_ENV"] == str(fake_env.path)
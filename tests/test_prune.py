@@ -0,0 +1,36 @@
+from autoviron.core import prune
+
+def test_plan_keeps_the_import_closure(tmp_path, fake_env):
+    fake_env.add_dist("webkit", requires=["corelib", "extralib; extra == 'fast'"])
+    fake_env.add_dist("corelib")
+    fake_env.add_dist("extralib")
+    fake_env.add_dist("stale")
+    fake_env.add_dist("pytest")
+    fake_env.add_dist("pip")
+    (tmp_path / "app.py").write_text("import os\nimport webkit\nimport helpers\n")
+    (tmp_path / "helpers.py").write_text("")
+    (tmp_path / "requirements-dev.txt").write_text("pytest\n")
+    plan = prune.plan_prune(fake_env.path, tmp_path, {"venv_patterns": [".venv"]}, ["requirements.txt", "requirements-dev.txt"])
+    assert sorted(d.key for d in plan.unused) == ["extralib", "stale"]
+    assert plan.needed["corelib"] == "required by webkit"
+    assert plan.needed["pytest"] == "listed in requirements-dev.txt"
+    assert plan.unattributed_imports == []
+
+def test_package_modules_and_runtime_requirements_are_not_unused(tmp_path, fake_env):
+    fake_env.add_dist("celery")
+    fake_env.add_dist("gunicorn")
+    fake_env.add_dist("stale")
+    (tmp_path / "mysite").mkdir()
+    (tmp_path / "mysite" / "__init__.py").write_text("from .celery import app\n")
+    # mysite/celery.py is `mysite.celery`; it must not hide the celery distribution it imports
+    (tmp_path / "mysite" / "celery.py").write_text("from celery import Celery\napp = Celery()\n")
+    (tmp_path / "requirements.txt").write_text("gunicorn\n")
+    plan = prune.plan_prune(fake_env.path, tmp_path, {}, ["requirements.txt"])
+    assert [d.key for d in plan.unused] == ["stale"]
+    assert plan.needed["celery"] == "imported as `celery`"
+    assert plan.needed["gunicorn"] == "listed in requirements.txt"
+
+def test_update_requirement_files(tmp_path):
+    (tmp_path / "requirements.txt").write_text("# deps\nWebKit>=1\nStale_Pkg==2  # old\n-r other.txt\n")
+    assert prune.update_requirement_files(tmp_path, ["requirements.txt", "missing.txt"], ["stale-pkg"]) == ["requirements.txt"]
+    assert (tmp_path / "requirements.txt").read_text() == "# deps\nWebKit>=1\n-r other.txt\n"
@@ -0,0 +1,32 @@
+import pytest
+from types import SimpleNamespace
+from autoviron.core.env_manager import EnvironmentType
+from autoviron.doctor.diagnostics import CheckResult, HealthReport, run_deep_checks
+from autoviron.doctor.repair import plan_repair
+
+def test_plan_targets_only_broken_distributions(fake_env, tmp_path):
+    fake_env.add_dist("alpha", files={"alpha.py": b"x = 1\n"}, requires=["gamma>=2"])
+    fake_env.add_dist("beta", files={"beta.py": b"y = 1\n"})
+    (fake_env.site_packages / "alpha.py").write_bytes(b"x = 2\n")
+    report = run_deep_checks(EnvironmentType.VENV, fake_env.path, tmp_path, full=True, checks=["dependencies", "records"])
+    plan = plan_repair(report)
+    assert plan.reinstall == ["alpha==1.0"]
+    assert plan.install == ["gamma>=2"]
+    assert not plan.relink and not plan.recreate
+
+def test_plan_relinks_or_recreates_interpreter():
+    broken = CheckResult("interpreter", "error", ["Python executable missing"], {"expected_version": "3.11.7"})
+    assert plan_repair(HealthReport("venv", "/x", [broken])).relink
+
+    unknown = CheckResult("interpreter", "error", ["Python executable missing"], {"expected_version": None})
+    assert plan_repair(HealthReport("venv", "/x", [unknown])).recreate
+
+def test_healthy_report_needs_no_repair():
+    assert plan_repair(HealthReport("venv", "/x", [CheckResult("records")])).empty
+
+def test_healthy_env_is_reported_as_healthy_not_repaired(fake_env, tmp_path, monkeypatch):
+    from autoviron.doctor import repair
+    monkeypatch.setattr(repair, "run_deep_checks", lambda *args, **kwargs: HealthReport("venv", "/x", [CheckResult("records")]))
+    monkeypatch.setattr(repair, "apply_repair", lambda *args: pytest.fail("nothing to apply"))
+    manager = SimpleNamespace(project_root=tmp_path)
+    assert repair.repair_environment(manager, EnvironmentType.VENV, fake_env.path) == repair.RepairResult.HEALTHY
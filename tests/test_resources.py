@@ -0,0 +1,45 @@
+import sys
+import subprocess
+import pytest
+from autoviron.core import resources
+
+def test_parse_size():
+    assert resources.parse_size("512M") == 512 * 1024 ** 2
+    assert resources.parse_size("1.5g") == int(1.5 * 1024 ** 3)
+    assert resources.parse_size("2GiB") == 2 * 1024 ** 3
+    assert resources.parse_size(4096) == 4096
+    assert resources.parse_size(None) is None
+    with pytest.raises(ValueError):
+        resources.parse_size("lots")
+
+def test_classify_separates_resource_failures():
+    limits = resources.Limits(max_rss=1024 ** 3)
+    usage = resources.AttemptUsage(1, 1, 0.1, user=0.1, sys=0.0)
+    oom = subprocess.CompletedProcess([], 1, "", "Traceback...\nMemoryError\n")
+    assert resources.classify(oom, usage, limits) == "memory_limit"
+    assert resources.classify(oom, usage, resources.Limits()) == "error"
+    assert resources.classify(subprocess.CompletedProcess([], -9, "", ""), usage, resources.Limits()) == "oom_killed"
+
+def test_memory_limit_needs_a_final_memory_error_or_a_signal_at_the_limit():
+    limits = resources.Limits(max_rss=1024 ** 3)
+    usage = resources.AttemptUsage(1, 1, 0.1, max_rss=100 * 1024 ** 2)
+    handled = "Traceback (most recent call last):\n  ...\nMemoryError\n\nDuring handling...\n" \
+              "Traceback (most recent call last):\n  File \"app.py\", line 3\nKeyError: 'x'\n"
+    assert resources.classify(subprocess.CompletedProcess([], 1, "", handled), usage, limits) == "error"
+    assert resources.classify(subprocess.CompletedProcess([], 1, "", "log: MemoryError seen\n"), usage, limits) == "error"
+    segv = subprocess.CompletedProcess([], -11, "", "")
+    assert resources.classify(segv, usage, limits) == "error"
+    assert resources.classify(subprocess.CompletedProcess([], -15, "", ""), usage, limits) == "error"
+    usage.max_rss = 1000 * 1024 ** 2
+    assert resources.classify(segv, usage, limits) == "memory_limit"
+
+@pytest.mark.skipif(sys.platform == "win32", reason="wait4/setrlimit are POSIX-only")
+def test_accounting_measures_and_limits_the_child(tmp_path):
+    accounting = resources.Accounting(resources.Limits(max_rss=resources.parse_size("300M")))
+    result = accounting.run([sys.executable, "-c", "x = bytearray(50 * 1024 * 1024); print('ok')"], tmp_path, {})
+    assert result.returncode == 0 and result.stdout == "ok\n"
+    assert accounting.last.outcome == "ok" and accounting.last.max_rss > 50 * 1024 * 1024
+    result = accounting.run([sys.executable, "-c", "x = bytearray(600 * 1024 * 1024)"], tmp_path, {})
+    assert "MemoryError" in result.stderr
+    assert accounting.last.outcome == "memory_limit" and accounting.last.attempt == 2
+    assert accounting.to_dict()["peak_rss"] == accounting.attempts[0].max_rss
@@ -0,0 +1,41 @@
+import pytest
+from pathlib import Path
+from autoviron.core import config as config_mod
+from autoviron.core.sandbox import generate_dockerfile, generate_dockerignore
+from autoviron.plugins.base import declares_dependency
+from autoviron.plugins.builtin import DjangoPlugin, FastAPIPlugin
+
+GOLDEN = Path(__file__).parent / "golden"
+
+@pytest.fixture(autouse=True)
+def isolated_config(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    config_mod._MEMO.clear()
+
+def _assert_golden(name: str, content: str):
+    assert content == (GOLDEN / name).read_text()
+
+def test_fastapi_dockerfile(tmp_path):
+    project = tmp_path / "api"
+    project.mkdir()
+    (project / "requirements.txt").write_text("fastapi\nuvicorn[standard]\n")
+    (project / "requirements-dev.txt").write_text("pytest\n")
+    (project / "app.py").write_text("from fastapi import FastAPI\n\napi = FastAPI()\n")
+    _assert_golden("fastapi.Dockerfile", generate_dockerfile(project, FastAPIPlugin(), "3.12"))
+
+def test_django_dockerfile_from_lockfile(tmp_path):
+    project = tmp_path / "site"
+    project.mkdir()
+    (project / "manage.py").write_text("os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')\n")
+    (project / "autoviron.lock").write_text("django==5.0 \\\n    --hash=sha256:abc\n")
+    _assert_golden("django.Dockerfile", generate_dockerfile(project, DjangoPlugin()))
+
+def test_declared_dependency_matches_whole_names(tmp_path):
+    (tmp_path / "requirements.txt").write_text("gunicorn-extras==1.0\nUvicorn[standard]>=0.20\n")
+    assert declares_dependency(tmp_path, "uvicorn")
+    assert not declares_dependency(tmp_path, "gunicorn")
+
+def test_dockerignore_excludes_envs(tmp_path):
+    content = generate_dockerignore(tmp_path).splitlines()
+    assert ".venv" in content and ".git" in content and "__pycache__" in content
+    assert len(content) == len(set(content))
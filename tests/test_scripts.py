@@ -0,0 +1,85 @@
+import json
+import multiprocessing
+import pytest
+from autoviron.core import scripts
+
+SCRIPT = '''# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#   "Requests>=2",
+#   "rich",
+# ]
+# ///
+import requests
+'''
+
+def test_inline_metadata_and_key_normalization(tmp_path):
+    (tmp_path / "a.py").write_text(SCRIPT)
+    spec = scripts.script_spec(tmp_path / "a.py")
+    assert spec.source == "pep723" and spec.requires_python == ">=3.10"
+    assert spec.dependencies == ["Requests>=2", "rich"]
+    same = scripts.ScriptSpec(tmp_path / "b.py", ["rich", "requests >= 2"])
+    assert spec.key("/usr/bin/python3") == same.key("/usr/bin/python3") != spec.key("/opt/py/bin/python3")
+    with pytest.raises(scripts.ScriptMetadataError):
+        scripts.read_metadata(SCRIPT + SCRIPT)
+
+def test_import_fallback_skips_stdlib_and_local_modules(tmp_path):
+    (tmp_path / "helper.py").write_text("")
+    (tmp_path / "tool.py").write_text("import os\nimport yaml\nimport helper\nfrom bs4 import BeautifulSoup\n")
+    spec = scripts.script_spec(tmp_path / "tool.py")
+    assert spec.source == "imports" and spec.dependencies == ["beautifulsoup4", "pyyaml"]
+    assert scripts.script_target(["python", str(tmp_path / "tool.py"), "--flag"]) == tmp_path / "tool.py"
+
+def test_evict_removes_least_recently_used():
+    for name, last_used in (("old", 1), ("mid", 2), ("new", 3)):
+        env = scripts.envs_root() / name
+        env.mkdir(parents=True)
+        (env / scripts.META_NAME).write_text(json.dumps({"last_used": last_used, "size": 1024 ** 2}))
+    removed = scripts.evict({"max_envs": 2, "max_size": None})
+    assert [p.name for p in removed] == ["old"]
+    removed = scripts.evict({"max_envs": None, "max_size": "1M"}, keep=scripts.envs_root() / "mid")
+    assert [p.name for p in removed] == ["new"]
+    assert [meta["path"].name for meta in scripts.cached_envs()] == ["mid"]
+
+def test_missing_modules_are_reported_not_installed_into_script_envs(tmp_path, monkeypatch, capsys):
+    import sys
+    import subprocess
+    from autoviron.core.env_manager import EnvironmentType
+    from autoviron.core.execution import self_healing_execute
+    env_path = tmp_path / "env"
+    subprocess.run([sys.executable, "-m", "venv", "--without-pip", str(env_path)], check=True)
+    (tmp_path / "job.py").write_text("import yaml\n")
+    monkeypatch.setattr("autoviron.core.execution._install_module", lambda *args: pytest.fail("installed into a script env"))
+    monkeypatch.chdir(tmp_path)
+    code = self_healing_execute(EnvironmentType.VENV, env_path, ["python", "job.py"], tmp_path,
+                                fork_server=False, auto_install=False)
+    assert code == 1
+    assert "Add 'pyyaml'" in capsys.readouterr().out
+
+def test_env_evicted_before_the_hold_is_rebuilt_and_held(tmp_path, monkeypatch):
+    builds = []
+
+    def build(env_path, spec, python, config):
+        if scripts._read_meta(env_path) is None:
+            builds.append(env_path)
+            env_path.mkdir(parents=True, exist_ok=True)
+            (env_path / scripts.META_NAME).write_text(json.dumps({"last_used": 0, "uses": 0}))
+
+    real_hold = scripts.hold
+
+    def racing_hold(env_path):
+        if len(builds) == 1:
+            scripts.evict({"max_envs": 0, "max_size": None})
+        return real_hold(env_path)
+
+    monkeypatch.setattr(scripts, "_build", build)
+    monkeypatch.setattr(scripts, "hold", racing_hold)
+    env_path = scripts.ensure_env(scripts.ScriptSpec(tmp_path / "a.py"), "/usr/bin/python3", {})
+    assert len(builds) == 2
+    assert scripts._read_meta(env_path)["uses"] == 1
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    other = ctx.Process(target=lambda: results.put(scripts.clear()))
+    other.start()
+    other.join()
+    assert results.get(timeout=5) == 0 and env_path.exists()
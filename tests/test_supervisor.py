@@ -0,0 +1,66 @@
+import sys
+import socket
+import threading
+import subprocess
+from autoviron.core import supervisor
+from autoviron.core.env_manager import EnvironmentType
+from autoviron.plugins.builtin.django import DjangoPlugin
+from autoviron.plugins.builtin.fastapi import FastAPIPlugin
+
+SERVER = '''import socket, sys
+import healme
+sock = socket.socket(fileno=int(sys.argv[1]))
+while True:
+    conn, _ = sock.accept()
+    conn.sendall(b"pong " + healme.NAME)
+    conn.close()
+'''
+
+def test_backoff_and_placeholders():
+    opts = dict(supervisor.settings({}), backoff_initial=0.5, backoff_max=3)
+    assert [supervisor.backoff_delay(n, opts) for n in range(5)] == [0.0, 0.5, 1.0, 2.0, 3]
+    assert supervisor.substitute(["uvicorn", "app:app", "--fd", "{fd}", "--port={port}"], 5, "0.0.0.0", 80) == \
+        ["uvicorn", "app:app", "--fd", "5", "--port=80"]
+
+def test_plugin_serve_commands(tmp_path, fake_env):
+    (tmp_path / "main.py").write_text("from fastapi import FastAPI\napi = FastAPI()\n")
+    assert FastAPIPlugin().get_serve_cmd(tmp_path, fake_env.path, 7, "127.0.0.1", 8000) == \
+        ["python", "-m", "uvicorn", "main:api", "--fd", "7"]
+    (tmp_path / "manage.py").write_text("os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'site.settings')\n")
+    django = DjangoPlugin()
+    # runserver cannot take over a socket, so without gunicorn the server binds the port itself
+    assert django.get_serve_cmd(tmp_path, fake_env.path, 7, "127.0.0.1", 8000) is None
+    assert django.get_serve_cmd(tmp_path, fake_env.path, None, "127.0.0.1", 8000)[-2:] == ["--noreload", "127.0.0.1:8000"]
+    fake_env.add_dist("gunicorn")
+    assert django.get_serve_cmd(tmp_path, fake_env.path, 7, "127.0.0.1", 8000)[-2:] == ["--bind", "fd://7"]
+
+def test_heals_startup_crash_and_keeps_the_port(tmp_path, monkeypatch):
+    env_path = tmp_path / ".venv"
+    subprocess.run([sys.executable, "-m", "venv", "--without-pip", str(env_path)], check=True)
+    (tmp_path / "server.py").write_text(SERVER)
+    installed = []
+
+    def fake_install(env_type, env_path, project_root, module, candidates, negative):
+        site = next(env_path.glob("lib/python*/site-packages"))
+        (site / "healme.py").write_text("NAME = b'healed'\n")
+        installed.append(module)
+        return candidates[0]
+
+    monkeypatch.setattr("autoviron.core.execution._install_module", fake_install)
+    monkeypatch.chdir(tmp_path)
+    sup = supervisor.Supervisor(EnvironmentType.VENV, env_path, tmp_path, ["python", "server.py", "{fd}"], port=0)
+    thread = threading.Thread(target=sup.serve, daemon=True)
+    thread.start()
+    try:
+        # Connecting works as soon as the socket is bound; the reply comes once the healed worker runs
+        for _ in range(100):
+            if sup.port:
+                break
+            threading.Event().wait(0.05)
+        with socket.create_connection(("127.0.0.1", sup.port), timeout=20) as conn:
+            assert conn.recv(64) == b"pong healed"
+        assert installed == ["healme"]
+    finally:
+        sup.stop()
+        thread.join(timeout=20)
+    assert not thread.is_alive() and sup.proc.poll() is not None
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import multiprocessing
+import pytest
+from autoviron.core import watcher
+
+CONFIG = {"requirements_files": ["requirements.txt"], "venv_patterns": [".venv"], "exclude_patterns": []}
+
+def test_filter_watches_sources_but_not_envs(tmp_path, fake_env):
+    (tmp_path / "app.py").write_text("")
+    (tmp_path / "requirements.txt").write_text("six\n")
+    (tmp_path / "notes.txt").write_text("")
+    fake_env.add_dist("six", files={"six.py": b""})
+    filt = watcher.WatchFilter(tmp_path, CONFIG)
+    assert sorted(p.name for p in filt.iter_files()) == ["app.py", "requirements.txt"]
+
+@pytest.mark.parametrize("backend", ["polling", "inotify"])
+def test_backends_report_changed_files(tmp_path, backend):
+    if backend == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux-only")
+    (tmp_path / "pkg").mkdir()
+    filt = watcher.WatchFilter(tmp_path, CONFIG)
+    impl = watcher.PollingBackend(filt, interval=0.05) if backend == "polling" else watcher.InotifyBackend(filt)
+    try:
+        (tmp_path / "pkg" / "mod.py").write_text("import requests\n")
+        (tmp_path / "pkg" / "data.bin").write_text("")
+        assert impl.poll(2.0) == {tmp_path / "pkg" / "mod.py"}
+        assert impl.poll(0.1) == set()
+    finally:
+        impl.close()
+
+def test_missing_packages_skips_installed_stdlib_and_first_party(tmp_path, fake_env):
+    fake_env.add_dist("six", files={"six.py": b""})
+    (tmp_path / "helpers.py").write_text("")
+    source = tmp_path / "app.py"
+    source.write_text("import os, six, helpers, yaml\nfrom . import sibling\n")
+    assert watcher.missing_packages(tmp_path, fake_env.path, [source]) == ["pyyaml"]
+
+def test_status_of_dead_watcher_reads_as_stopped(tmp_path):
+    path = watcher.status_path(tmp_path)
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps({"pid": 2 ** 22 + 1, "state": "syncing"}))
+    assert watcher.read_status(tmp_path)["state"] == "stopped"
+
+def test_status_without_pid_or_lock_is_never_signalled(tmp_path, monkeypatch):
+    path = watcher.status_path(tmp_path)
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps({"state": "idle"}))
+    kills = []
+    monkeypatch.setattr(watcher.os, "kill", lambda *args: kills.append(args))
+    assert watcher.read_status(tmp_path)["state"] == "stopped"
+    assert watcher.stop(tmp_path) is False
+    path.write_text(json.dumps({"pid": 0, "state": "idle"}))
+    with watcher.FileLock(watcher.lock_path(tmp_path)):
+        assert watcher.stop(tmp_path) is False
+    assert kills == []
+
+def _hold_watcher_lock(root, ready, release):
+    with watcher.FileLock(watcher.lock_path(root)):
+        ready.set()
+        release.wait(10)
+
+def test_second_watcher_refuses_to_start_while_the_lock_is_held(tmp_path, monkeypatch):
+    monkeypatch.setattr(watcher.Watcher, "run", lambda self, once=False: None)
+    monkeypatch.setattr(watcher.signal, "signal", lambda *args: None)
+    ctx = multiprocessing.get_context("fork")
+    ready, release = ctx.Event(), ctx.Event()
+    holder = ctx.Process(target=_hold_watcher_lock, args=(tmp_path, ready, release))
+    holder.start()
+    try:
+        assert ready.wait(10)
+        assert watcher.watch(tmp_path) is False
+    finally:
+        release.set()
+        holder.join()
+    assert watcher.watch(tmp_path) is True
+    assert watcher.read_status(tmp_path)["pid"] == os.getpid()
+
+def test_sync_holds_the_env_lock_for_the_whole_batch(tmp_path, fake_env, monkeypatch):
+    from autoviron.core import execution
+    from autoviron.core.locking import is_locked, lock_path
+    env_lock = lock_path(tmp_path, "env")
+    seen = []
+    w = watcher.Watcher(tmp_path)
+    monkeypatch.setattr(w, "_environment", lambda: ("venv", fake_env.path))
+    monkeypatch.setattr(watcher, "missing_packages", lambda *args: ["six", "yaml"])
+    monkeypatch.setattr(execution, "_auto_install_package",
+                        lambda *args, **kwargs: seen.append(is_locked(env_lock)) or True)
+    publish = w._publish
+    monkeypatch.setattr(w, "_publish", lambda **fields: seen.append((fields["state"], is_locked(env_lock))) or publish(**fields))
+    w.sync({tmp_path / "app.py"})
+    assert seen == [("syncing", True), True, True, ("idle", True)]
+    assert not is_locked(env_lock)